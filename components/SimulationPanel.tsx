@@ -17,6 +17,9 @@ interface SimulationPanelProps {
   sendMessage: (type: string, data?: any) => boolean;
 }
 
+// 视频分块大小（base64后约1.4MB，低于后端消息上限）
+const VIDEO_CHUNK_BYTES = 1024 * 1024;
+
 interface SimulationConfig {
   mode: string;
   speed: number;
@@ -68,9 +71,52 @@ const SimulationPanel: React.FC<SimulationPanelProps> = ({
     fileInputRef.current?.click();
   };
 
+  const readAsDataUrl = (blob: Blob) =>
+    new Promise<string>((resolve, reject) => {
+      const reader = new FileReader();
+      reader.onload = () => resolve(reader.result as string);
+      reader.onerror = () => reject(reader.error);
+      reader.readAsDataURL(blob);
+    });
+
+  // 多张图片或一个视频：按批次逐项发送，后端有界并发处理并按内容去重，逐项推送 upload_batch_progress
+  const uploadBatch = async (files: File[]) => {
+    const batchId = `batch_${Date.now()}`;
+    const video = files.find((f) => f.type.startsWith('video/'));
+    if (video) {
+      // 视频使用计数模式：跨帧跟踪，按植株统计草莓成熟度，推送 video_analysis_progress
+      sendMessage('upload_batch_start', { batch_id: batchId, kind: 'video', mode: 'count', name: video.name, stride: 5 });
+      for (let offset = 0; offset < video.size; offset += VIDEO_CHUNK_BYTES) {
+        const dataUrl = await readAsDataUrl(video.slice(offset, offset + VIDEO_CHUNK_BYTES));
+        sendMessage('upload_batch_item', { batch_id: batchId, chunk: extractBase64(dataUrl) });
+      }
+    } else {
+      sendMessage('upload_batch_start', { batch_id: batchId, kind: 'images', total: files.length });
+      for (const file of files) {
+        const dataUrl = await readAsDataUrl(file);
+        sendMessage('upload_batch_item', { batch_id: batchId, name: file.name, data: extractBase64(dataUrl) });
+      }
+    }
+    sendMessage('upload_batch_end', { batch_id: batchId });
+  };
+
   const handleFileChange: React.ChangeEventHandler<HTMLInputElement> = async (e) => {
-    const file = e.target.files && e.target.files[0];
-    if (!file) return;
+    const files = e.target.files ? Array.from(e.target.files) : [];
+    if (files.length === 0) return;
+    if (files.length > 1 || files[0].type.startsWith('video/')) {
+      setSelectedName(files.length > 1 ? `${files.length} 个文件` : files[0].name);
+      setUploading(true);
+      try {
+        await uploadBatch(files);
+      } catch (error) {
+        console.error('批量上传失败', error);
+      } finally {
+        setUploading(false);
+        e.target.value = '';
+      }
+      return;
+    }
+    const file = files[0];
     setSelectedName(file.name);
     setUploading(true);
     try {
@@ -155,12 +201,13 @@ const SimulationPanel: React.FC<SimulationPanelProps> = ({
             <input
               ref={fileInputRef}
               type="file"
-              accept="image/*"
+              accept="image/*,video/*"
+              multiple
               className="hidden"
               onChange={handleFileChange}
             />
           </div>
-          <p className="text-white/50 text-xs">提示：后端会在开始与完成时分别推送 simulation_started 与 simulation_analysis_complete 日志和处理帧。</p>
+          <p className="text-white/50 text-xs">提示：单张图片返回处理帧；多张图片或视频按批次分析，逐项推送进度并在完成时返回汇总。</p>
         </div>
 
         {/* 新增：模拟QR码扫描 */}
@@ -269,6 +269,39 @@ export const useDroneControl = () => {
                 addLog('info', `检测到${data.data.total_count}个草莓`);
               }
               break;
+            case 'ai_analysis_progress': {
+              // 流式分析的早期字段，完整结果仍以 ai_analysis_complete 到达
+              const partial = data.data?.partial || {};
+              const plantId = data.data?.plant_id;
+              const parts: string[] = [];
+              if (partial.health_score !== undefined) parts.push(`健康评分 ${partial.health_score}/100`);
+              if (partial.urgency) parts.push(`紧急程度 ${partial.urgency}`);
+              if (partial.crop_type?.name) parts.push(`作物 ${partial.crop_type.name}`);
+              if (parts.length > 0) {
+                addLog('info', `植株 ${plantId} 分析中 (${data.data?.elapsed}s): ${parts.join('，')}`);
+              }
+              break;
+            }
+
+            case 'analysis_queue_status': {
+              const queue = data.data?.queue || {};
+              const mode = data.data?.capture_only ? '仅采集' : (data.data?.paused ? '已暂停' : '执行中');
+              addLog('info', `分析队列 (${mode}): 待处理 ${queue.pending ?? 0}，执行中 ${queue.running ?? 0}，已完成 ${queue.done ?? 0}，失败 ${queue.failed ?? 0}`);
+              break;
+            }
+
+            case 'plant_images': {
+              const images = data.data?.images || [];
+              addLog('info', `植株 ${data.data?.plant_id ?? '全部'} 存档图片 ${images.length} 张`);
+              break;
+            }
+
+            case 'flight_recorder_status': {
+              const rec = data.data || {};
+              const state = rec.recording ? `录制中 ${rec.flight_id}` : '未录制';
+              addLog('info', `飞行记录仪 (${state}${rec.auto ? '，自动' : ''}): 已写入 ${rec.frames_written ?? 0} 帧，丢弃 ${rec.frames_dropped ?? 0} 帧，录制 ${(rec.recordings || []).length} 个`);
+              break;
+            }
             case 'ai_analysis_complete':
               addLog('success', 'AI分析完成');
               // 处理AI分析结果并触发相应的无人机动作
@@ -309,6 +342,36 @@ export const useDroneControl = () => {
               addLog('info', payload.message || '模拟分析开始');
               break;
             }
+            case 'upload_batch_progress': {
+              const record = data.data?.record || {};
+              const progress = data.data?.progress || {};
+              const detail = record.status === 'ok'
+                ? `草莓 ${record.strawberries ?? 0} 个${record.cached ? '（缓存）' : ''}`
+                : (record.status === 'duplicate' ? `重复于 ${record.duplicate_of}` : `失败: ${record.message}`);
+              addLog(record.status === 'error' ? 'warning' : 'info', `上传分析 ${progress.done}/${progress.total} ${record.name}: ${detail}`);
+              break;
+            }
+
+            case 'video_analysis_progress': {
+              const p = data.data || {};
+              addLog('info', `视频分析 ${p.percent ?? 0}% (${p.position}/${p.duration}s，${p.realtime_factor}x 实时)，已计数草莓 ${p.fruit ?? 0} 个`);
+              break;
+            }
+
+            case 'upload_batch_complete': {
+              const summary = data.data || {};
+              if (summary.video) {
+                const plants = Object.entries(summary.video.plants || {}) as [string, any][];
+                addLog('success', `视频分析完成: 草莓 ${summary.video.fruit} 个，${summary.video.realtime_factor}x 实时，用时 ${summary.video.wall_seconds}s`);
+                plants.forEach(([plant, c]) => {
+                  addLog('info', `植株 ${plant}: 成熟 ${c.ripe}，半熟 ${c.semi_ripe}，未熟 ${c.unripe}，未知 ${c.unknown}`);
+                });
+                break;
+              }
+              addLog('success', `批量上传分析完成: ${summary.done} 项，分析 ${summary.analyzed}，重复 ${summary.duplicates}，缓存 ${summary.cached}，失败 ${summary.failed}，草莓 ${summary.strawberries} 个，用时 ${summary.elapsed}s`);
+              break;
+            }
+
             case 'simulation_analysis_complete': {
               const payload = data.data || {};
               addLog('success', payload.message || '模拟分析完成');
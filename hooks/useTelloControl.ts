@@ -195,6 +195,22 @@ export const useTelloControl = () => {
                 setMissionStatus(prev => ({ ...prev, active: false }));
                 setTelloState(prev => ({ ...prev, challengeCruiseActive: false }));
                 addLog('info', '挑战卡巡航任务已停止');
+              } else if (data.data?.type === 'challenge_cruise_completed') {
+                setMissionStatus(prev => ({ ...prev, active: false }));
+                setTelloState(prev => ({ ...prev, challengeCruiseActive: false }));
+                addLog('success', data.data.message || '挑战卡巡航任务已完成');
+                (data.data.routes || []).forEach((route: any, index: number) => {
+                  addLog('info', `第${index + 1}轮航线: 航程 ${route.actual_length}/${route.planned_length}cm, 用时 ${route.actual_time}/${route.planned_time}s`);
+                });
+                if (data.data.dwell?.dwells) {
+                  addLog('info', `停留: ${data.data.dwell.dwells}次, 平均${data.data.dwell.average_dwell}s, 节省${data.data.dwell.saved}s`);
+                }
+                if (data.data.survey) {
+                  const survey = data.data.survey;
+                  addLog('info', survey.completed
+                    ? `巡检完成: 共${survey.sorties}次出航`
+                    : `巡检进度: 已访问${survey.visited.length}张挑战卡, 剩余${survey.pending.length}张, 请更换电池后继续`);
+                }
               } else if (data.data?.type === 'progress_update') {
                 addLog('info', data.data.message || '任务进度更新');
               }
@@ -355,7 +371,7 @@ export const useTelloControl = () => {
     return sendMessage('mission_stop');
   }, [sendMessage, addLog]);
 
-  const startChallengeCruise = useCallback((params?: { rounds?: number, height?: number, stayDuration?: number }) => {
+  const startChallengeCruise = useCallback((params?: { rounds?: number, height?: number, stayDuration?: number, plan?: Record<string, unknown>, survey?: boolean, survey_restart?: boolean, battery_reserve?: number }) => {
     addLog('info', '启动挑战卡巡航任务');
     return sendMessage('challenge_cruise_start', params || {});
   }, [sendMessage, addLog]);
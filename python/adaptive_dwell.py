@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+检测驱动的挑战卡停留
+检测流水线把每帧的QR码、草莓跟踪ID和最佳帧候选报告给 DwellMonitor；
+任务控制器在挑战卡上等待"QR码已读取、草莓跟踪连续K次不变、已有最佳帧候选"这些目标达成即离开，
+固定停留时间作为上限；到达上限时如果检测结果仍在变化，则继续延长到封顶时间。
+时间取自任务时钟：使用 VirtualClock 的模拟任务中停留只推进虚拟时间
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from mission_clock import MissionClock
+
+POLL_SECONDS = 0.05
+
+
+@dataclass
+class DwellResult:
+    """一次停留的结果"""
+    pad_id: int
+    elapsed: float
+    reason: str                      # goals / timeout / extended / cancelled
+    goals: Dict[str, bool] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'pad_id': self.pad_id, 'elapsed': round(self.elapsed, 2), 'reason': self.reason,
+                'goals': dict(self.goals)}
+
+
+class DwellMonitor:
+    """按挑战卡收集检测进展并判断停留目标"""
+
+    def __init__(self, stable_updates: int = 5, frame_candidates: int = 3, changing_window: float = 1.0,
+                 min_dwell: float = 0.5, require_tracks: bool = True, require_best_frame: bool = True,
+                 clock: Optional[MissionClock] = None):
+        """
+        Args:
+            stable_updates: 草莓跟踪ID集合连续多少次检测不变视为稳定
+            frame_candidates: 每株植株至少收集多少个候选帧后视为已选出最佳帧
+            changing_window: 最近多少秒内检测结果有变化视为"仍在变化"
+            min_dwell: 最短停留时间（秒）
+            require_tracks: 是否要求草莓跟踪稳定（未启用草莓检测时关闭）
+            require_best_frame: 是否要求最佳帧（未启用最佳帧选择时关闭）
+            clock: 任务时钟（默认真实时间；任务控制器接入时改用控制器的时钟）
+        """
+        self.stable_updates = stable_updates
+        self.frame_candidates = frame_candidates
+        self.changing_window = changing_window
+        self.min_dwell = min_dwell
+        self.require_tracks = require_tracks
+        self.require_best_frame = require_best_frame
+        self.clock = clock or MissionClock()
+
+        self._cond = threading.Condition()
+        self._pad_id = -1
+        self._expected: Set[str] = set()
+        self._seen_plants: Set[str] = set()
+        self._tracks = None
+        self._stable = 0
+        self._candidates: Dict[str, int] = {}
+        self._last_change = 0.0
+        self.stats = {'dwells': 0, 'goals_met': 0, 'timeouts': 0, 'extended': 0,
+                      'total_dwell': 0.0, 'budget': 0.0}
+
+    def begin(self, pad_id: int, plants: Optional[Iterable[Any]] = None):
+        """开始在某张挑战卡上停留（plants: 计划中该卡覆盖的植株，未知时为None）"""
+        with self._cond:
+            self._pad_id = pad_id
+            self._expected = {str(p) for p in plants or []}
+            self._seen_plants = set()
+            self._tracks = None
+            self._stable = 0
+            self._candidates = {}
+            self._last_change = 0.0
+
+    def on_qr(self, plant_id: Any):
+        """检测流水线：看到植株QR码"""
+        plant = str(plant_id)
+        with self._cond:
+            if plant not in self._seen_plants:
+                self._seen_plants.add(plant)
+                self._last_change = self.clock.time()
+                self._cond.notify_all()
+
+    def on_strawberries(self, track_ids: Iterable[Any]):
+        """检测流水线：一次草莓检测后的跟踪ID"""
+        tracks = frozenset(t for t in track_ids if t is not None)
+        with self._cond:
+            if tracks == self._tracks:
+                self._stable += 1
+            else:
+                self._tracks = tracks
+                self._stable = 1
+                self._last_change = self.clock.time()
+            self._cond.notify_all()
+
+    def on_frame_candidate(self, plant_id: Any):
+        """检测流水线：最佳帧选择器收到该植株的一个候选帧"""
+        plant = str(plant_id)
+        with self._cond:
+            self._candidates[plant] = self._candidates.get(plant, 0) + 1
+            self._cond.notify_all()
+
+    def _goals_locked(self) -> Dict[str, bool]:
+        plants = self._expected or self._seen_plants
+        goals = {'qr': bool(self._seen_plants) and self._expected <= self._seen_plants}
+        if self.require_tracks:
+            goals['tracks'] = self._stable >= self.stable_updates
+        if self.require_best_frame:
+            goals['best_frame'] = bool(plants) and all(
+                self._candidates.get(p, 0) >= self.frame_candidates for p in plants)
+        return goals
+
+    def goals(self) -> Dict[str, bool]:
+        with self._cond:
+            return self._goals_locked()
+
+    def wait(self, max_dwell: float, cap: Optional[float] = None,
+             cancel: Optional[Callable[[], bool]] = None) -> DwellResult:
+        """等待停留目标达成
+
+        Args:
+            max_dwell: 正常停留上限（原固定停留时间）
+            cap: 检测仍在变化时可延长到的总时长（默认为 max_dwell 的两倍，最多30秒）
+        """
+        cap = min(30.0, max_dwell * 2) if cap is None else max(cap, max_dwell)
+        clock = self.clock
+        start = clock.time()
+        extended = False
+        with self._cond:
+            pad_id = self._pad_id
+        while True:
+            with self._cond:
+                now = clock.time()
+                elapsed = now - start
+                goals = self._goals_locked()
+                if all(goals.values()) and elapsed >= min(self.min_dwell, max_dwell):
+                    reason = 'goals'
+                    break
+                if cancel is not None and cancel():
+                    reason = 'cancelled'
+                    break
+                if elapsed >= max_dwell:
+                    # 检测结果仍在变化时延长，直到稳定或达到封顶时间
+                    if elapsed >= cap or now - self._last_change >= self.changing_window:
+                        reason = 'extended' if extended else 'timeout'
+                        break
+                    extended = True
+                if not clock.virtual:
+                    # 真实时间：检测回调通知时提前醒来
+                    self._cond.wait(POLL_SECONDS)
+                    continue
+            # 虚拟时间：释放锁后推进时钟，由时钟的定时回调模拟检测
+            clock.sleep(POLL_SECONDS)
+
+        result = DwellResult(pad_id, clock.time() - start, reason, goals)
+        self.stats['dwells'] += 1
+        self.stats['total_dwell'] += result.elapsed
+        self.stats['budget'] += max_dwell
+        if reason == 'goals':
+            self.stats['goals_met'] += 1
+        elif reason == 'extended':
+            self.stats['extended'] += 1
+        elif reason == 'timeout':
+            self.stats['timeouts'] += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['saved'] = round(stats['budget'] - stats['total_dwell'], 2)
+        stats['total_dwell'] = round(stats['total_dwell'], 2)
+        stats['budget'] = round(stats['budget'], 2)
+        stats['average_dwell'] = round(stats['total_dwell'] / stats['dwells'], 2) if stats['dwells'] else 0.0
+        return stats
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+AI分析结果缓存
+基于感知哈希（dHash）识别近似重复的画面，避免无人机悬停时重复调用云端视觉模型
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+
+def compute_dhash(image: np.ndarray, hash_size: int = 8) -> int:
+    """计算图像的差分哈希（dHash），返回 hash_size*hash_size 位整数"""
+    if image is None or image.size == 0:
+        raise ValueError("图像为空，无法计算感知哈希")
+
+    if len(image.shape) == 3:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = image
+
+    # 缩放到 (hash_size+1) x hash_size，比较相邻像素的亮度梯度
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    diff = small[:, 1:] > small[:, :-1]
+
+    value = 0
+    for bit in diff.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """计算两个哈希值的汉明距离"""
+    return bin(hash_a ^ hash_b).count('1')
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目"""
+    image_hash: int
+    plant_id: Any
+    result: Dict[str, Any]
+    created_at: float
+    call_latency: float = 0.0
+    hit_count: int = 0
+
+
+@dataclass
+class CacheStats:
+    """缓存统计信息"""
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    saved_calls: int = 0
+    saved_seconds: float = 0.0
+    hit_distances: Dict[int, int] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'estimated_saved_calls': self.saved_calls,
+            'estimated_saved_seconds': round(self.saved_seconds, 1),
+            'hit_distances': dict(sorted(self.hit_distances.items()))
+        }
+
+
+class AnalysisResultCache:
+    """基于感知哈希的分析结果缓存（TTL + LRU淘汰）"""
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: float = 600.0,
+                 max_distance: int = 6, hash_size: int = 8):
+        """
+        Args:
+            max_entries: 最大缓存条目数，超出后淘汰最久未使用的条目
+            ttl_seconds: 条目有效期（秒）
+            max_distance: 视为同一画面的最大汉明距离
+            hash_size: dHash边长，哈希位数为 hash_size^2
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_distance = int(max_distance)
+        self.hash_size = int(hash_size)
+
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def compute_hash(self, image: np.ndarray) -> int:
+        """按缓存配置计算图像哈希"""
+        return compute_dhash(image, self.hash_size)
+
+    def lookup(self, image_hash: int, plant_id=None) -> Optional[Dict[str, Any]]:
+        """查找近似画面的缓存结果，命中时返回结果副本"""
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+
+            best_key = None
+            best_distance = None
+            for key, entry in self._entries.items():
+                if entry.plant_id != plant_id:
+                    continue
+                distance = hamming_distance(image_hash, entry.image_hash)
+                if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                    best_key = key
+                    best_distance = distance
+                    if distance == 0:
+                        break
+
+            if best_key is None:
+                self.stats.misses += 1
+                return None
+
+            entry = self._entries[best_key]
+            self._entries.move_to_end(best_key)
+            entry.hit_count += 1
+
+            self.stats.hits += 1
+            self.stats.saved_calls += 1
+            self.stats.saved_seconds += entry.call_latency
+            self.stats.hit_distances[best_distance] = self.stats.hit_distances.get(best_distance, 0) + 1
+
+            result = dict(entry.result)
+            result['cache_hit'] = True
+            result['cache_distance'] = best_distance
+            result['cache_age_seconds'] = round(now - entry.created_at, 1)
+            return result
+
+    def store(self, image_hash: int, result: Dict[str, Any], plant_id=None, call_latency: float = 0.0):
+        """写入分析结果"""
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = CacheEntry(
+                image_hash=image_hash,
+                plant_id=plant_id,
+                result=dict(result),
+                created_at=time.time(),
+                call_latency=call_latency
+            )
+            self.stats.stores += 1
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate_plant(self, plant_id):
+        """移除某植株的所有缓存结果"""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.plant_id == plant_id]:
+                del self._entries[key]
+
+    def clear(self):
+        """清空缓存（保留统计信息）"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            stats = self.stats.to_dict()
+            stats.update({
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'max_distance': self.max_distance
+            })
+            return stats
+
+    def _purge_expired(self, now: float):
+        """移除过期条目（调用方需持有锁）"""
+        if self.ttl_seconds <= 0:
+            return
+        expired = [k for k, e in self._entries.items() if now - e.created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+            self.stats.expirations += 1
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+植株AI分析协调器
+按植株ID合并并发请求（single-flight），并在新鲜度窗口内复用最近一次成功的分析结果
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+
+class PlantAnalysisCoordinator:
+    """按植株合并AI分析请求"""
+
+    def __init__(self, freshness_seconds: float = 600.0):
+        """
+        Args:
+            freshness_seconds: 新鲜度窗口（秒），窗口内不再重复分析同一植株；0表示不复用
+        """
+        self.freshness_seconds = max(0.0, float(freshness_seconds))
+
+        self._in_flight: Dict[Any, Future] = {}
+        self._latest: Dict[Any, Dict[str, Any]] = {}
+        self._latest_time: Dict[Any, float] = {}
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'requests': 0,
+            'executed': 0,
+            'coalesced': 0,
+            'fresh_reused': 0
+        }
+
+    def set_freshness(self, freshness_seconds: float):
+        """更新新鲜度窗口"""
+        self.freshness_seconds = max(0.0, float(freshness_seconds))
+        print(f"🕒 植株分析新鲜度窗口设置为 {self.freshness_seconds:.0f} 秒")
+
+    def get_fresh_result(self, plant_id) -> Optional[Dict[str, Any]]:
+        """返回新鲜度窗口内的最近结果副本，没有则返回None"""
+        with self._lock:
+            return self._fresh_result_locked(plant_id, time.time())
+
+    def is_fresh(self, plant_id) -> bool:
+        """植株是否在新鲜度窗口内已有分析结果"""
+        return self.get_fresh_result(plant_id) is not None
+
+    def run(self, plant_id, analyze: Callable[[], Dict[str, Any]], force: bool = False) -> Dict[str, Any]:
+        """执行植株分析
+
+        同一植株已有分析在途时等待并共享其结果；新鲜度窗口内直接复用最近结果，
+        除非 force=True。只有 status 为 ok 的真实分析结果会被记录为最近结果（模拟结果不复用）。
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+
+            if not force:
+                fresh = self._fresh_result_locked(plant_id, time.time())
+                if fresh is not None:
+                    self.stats['fresh_reused'] += 1
+                    return fresh
+
+            future = self._in_flight.get(plant_id)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[plant_id] = future
+                self.stats['executed'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not owner:
+            print(f"🔗 植株 {plant_id} 已有分析在进行，等待共享结果")
+            result = dict(future.result())
+            result['analysis_shared'] = True
+            return result
+
+        try:
+            result = analyze()
+        except Exception as e:
+            with self._lock:
+                self._in_flight.pop(plant_id, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._in_flight.pop(plant_id, None)
+            if result.get('status') == 'ok' and not result.get('simulated'):
+                self._latest[plant_id] = dict(result)
+                self._latest_time[plant_id] = time.time()
+        future.set_result(result)
+        return result
+
+    def invalidate(self, plant_id=None):
+        """清除某植株（或全部植株）的最近结果，使下次分析重新执行"""
+        with self._lock:
+            if plant_id is None:
+                self._latest.clear()
+                self._latest_time.clear()
+            else:
+                self._latest.pop(plant_id, None)
+                self._latest_time.pop(plant_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取协调器统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                'in_flight': len(self._in_flight),
+                'tracked_plants': len(self._latest),
+                'freshness_seconds': self.freshness_seconds
+            })
+            return stats
+
+    def _fresh_result_locked(self, plant_id, now: float) -> Optional[Dict[str, Any]]:
+        """查找新鲜结果（调用方需持有锁）"""
+        if self.freshness_seconds <= 0 or plant_id not in self._latest:
+            return None
+        age = now - self._latest_time[plant_id]
+        if age > self.freshness_seconds:
+            return None
+        result = dict(self._latest[plant_id])
+        result['analysis_reused'] = True
+        result['analysis_age_seconds'] = round(age, 1)
+        return result
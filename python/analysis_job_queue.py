@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+持久化AI分析任务队列
+任务记录在SQLite中，分析帧保存在磁盘上；后端重启后未完成的任务自动恢复。
+飞行时可以只采集不分析，落地后再按链路允许的并发慢慢消化队列
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+DEFER_SECONDS = 60.0    # 延后任务的最短等待时间（预算未给出恢复时间时使用）
+
+
+class JobDeferred(Exception):
+    """任务暂时无法得到真实结果（云端预算不足、云端分析不可用），延后重新排队而不是标记完成"""
+
+    def __init__(self, message: str, retry_after: float = 0.0, count_attempt: bool = True):
+        """
+        Args:
+            retry_after: 建议的重试等待秒数（如预算的 retry_after），不足 DEFER_SECONDS 时按 DEFER_SECONDS
+            count_attempt: 是否计入执行次数；预算不足不是任务本身的问题，不计入
+        """
+        super().__init__(message)
+        self.retry_after = float(retry_after or 0.0)
+        self.count_attempt = count_attempt
+
+
+def check_analysis_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """检查AI分析结果是否可以作为任务的最终结果
+
+    预算不足或云端分析不可用时分析器回退到模拟结果：抛出 JobDeferred 让任务稍后重试，
+    而不是把模拟数据记为完成；其他失败抛出 RuntimeError
+    """
+    if result.get('budget_limited'):
+        raise JobDeferred(f"云端预算不足（{result.get('budget_reason')}）",
+                          retry_after=result.get('budget_retry_after', 0.0), count_attempt=False)
+    if result.get('simulated'):
+        raise JobDeferred('云端分析不可用，仅得到模拟结果')
+    if result.get('status') != 'ok':
+        raise RuntimeError(result.get('message', 'AI分析失败'))
+    return result
+
+
+@dataclass
+class AnalysisJob:
+    """一条分析任务"""
+    job_id: int
+    kind: str
+    plant_id: Any
+    frame_path: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+    status: str = STATUS_PENDING
+    priority: int = 0
+    attempts: int = 0
+    created_at: float = 0.0
+    updated_at: float = 0.0
+    last_error: str = ''
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'plant_id': self.plant_id,
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'last_error': self.last_error
+        }
+
+
+class AnalysisJobQueue:
+    """基于SQLite的分析任务队列，帧图像以JPEG形式存放在磁盘"""
+
+    def __init__(self, db_path: str, frames_dir: Optional[str] = None, max_attempts: int = 3,
+                 jpeg_quality: int = 95):
+        """
+        Args:
+            db_path: SQLite数据库文件路径
+            frames_dir: 任务帧存放目录，默认与数据库同目录下的 frames/
+            max_attempts: 单个任务最多执行次数，超过后标记为失败
+            jpeg_quality: 任务帧的JPEG质量
+        """
+        self.db_path = db_path
+        self.frames_dir = frames_dir or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'frames')
+        self.max_attempts = max(1, int(max_attempts))
+        self.jpeg_quality = jpeg_quality
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        os.makedirs(self.frames_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                plant_id TEXT,
+                frame_path TEXT NOT NULL,
+                payload TEXT NOT NULL DEFAULT '{}',
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                last_error TEXT NOT NULL DEFAULT '',
+                result TEXT,
+                not_before REAL NOT NULL DEFAULT 0
+            )
+        ''')
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        if 'not_before' not in columns:
+            # 旧版本创建的数据库：补上延后执行时间列
+            self._conn.execute('ALTER TABLE jobs ADD COLUMN not_before REAL NOT NULL DEFAULT 0')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, priority, id)')
+
+        self.recovered = self.recover()
+        if self.recovered:
+            print(f"♻️ 恢复了 {self.recovered} 个中断的分析任务")
+
+    def enqueue(self, kind: str, plant_id, frame: np.ndarray, payload: Optional[Dict[str, Any]] = None,
+                priority: int = 0) -> int:
+        """保存帧并加入一条待执行任务，返回任务ID"""
+        frame_path = os.path.join(self.frames_dir, f"{uuid.uuid4().hex}.jpg")
+        if not cv2.imwrite(frame_path, frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]):
+            raise IOError(f"任务帧写入失败: {frame_path}")
+
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO jobs (kind, plant_id, frame_path, payload, status, priority, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (kind, json.dumps(plant_id, ensure_ascii=False), frame_path,
+                 json.dumps(payload or {}, ensure_ascii=False, default=str), STATUS_PENDING, priority, now, now))
+            return cursor.lastrowid
+
+    def claim(self) -> Optional[AnalysisJob]:
+        """取出优先级最高的待执行任务并标记为执行中（延后的任务到时间后才会取出）"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT * FROM jobs WHERE status = ? AND not_before <= ? ORDER BY priority DESC, id ASC LIMIT 1',
+                (STATUS_PENDING, now)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?',
+                               (STATUS_RUNNING, now, row['id']))
+            job = self._row_to_job(row)
+            job.status = STATUS_RUNNING
+            job.attempts += 1
+            job.updated_at = now
+            return job
+
+    def load_frame(self, job: AnalysisJob) -> Optional[np.ndarray]:
+        """读取任务帧，文件缺失时返回None"""
+        if not os.path.exists(job.frame_path):
+            return None
+        return cv2.imread(job.frame_path, cv2.IMREAD_COLOR)
+
+    def complete(self, job_id: int, result: Optional[Dict[str, Any]] = None):
+        """标记任务完成并删除其任务帧"""
+        with self._lock:
+            row = self._conn.execute('SELECT frame_path FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            self._conn.execute('UPDATE jobs SET status = ?, result = ?, updated_at = ? WHERE id = ?',
+                               (STATUS_DONE, json.dumps(result or {}, ensure_ascii=False, default=str),
+                                time.time(), job_id))
+        if row is not None:
+            self._remove_frame(row['frame_path'])
+
+    def fail(self, job_id: int, error: str, retry: bool = True) -> str:
+        """记录任务失败；未超过重试次数时重新排队，返回任务的新状态"""
+        with self._lock:
+            row = self._conn.execute('SELECT attempts, frame_path FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return STATUS_FAILED
+            status = STATUS_PENDING if retry and row['attempts'] < self.max_attempts else STATUS_FAILED
+            self._conn.execute('UPDATE jobs SET status = ?, last_error = ?, updated_at = ? WHERE id = ?',
+                               (status, str(error)[:500], time.time(), job_id))
+        if status == STATUS_FAILED:
+            self._remove_frame(row['frame_path'])
+        return status
+
+    def defer(self, job_id: int, reason: str, delay: float = DEFER_SECONDS, count_attempt: bool = True) -> str:
+        """任务延后 delay 秒重新排队，返回任务的新状态
+
+        count_attempt 为False时本次执行不计入次数；计入时超过重试次数后标记为失败
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT attempts, frame_path FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return STATUS_FAILED
+            attempts = row['attempts'] if count_attempt else max(0, row['attempts'] - 1)
+            status = STATUS_PENDING if attempts < self.max_attempts else STATUS_FAILED
+            now = time.time()
+            self._conn.execute('UPDATE jobs SET status = ?, attempts = ?, last_error = ?, not_before = ?, '
+                               'updated_at = ? WHERE id = ?',
+                               (status, attempts, str(reason)[:500], now + max(0.0, delay), now, job_id))
+        if status == STATUS_FAILED:
+            self._remove_frame(row['frame_path'])
+        return status
+
+    def ready_count(self) -> int:
+        """当前可以执行的待执行任务数（不含尚未到时间的延后任务）"""
+        with self._lock:
+            row = self._conn.execute('SELECT COUNT(*) AS n FROM jobs WHERE status = ? AND not_before <= ?',
+                                     (STATUS_PENDING, time.time())).fetchone()
+        return row['n']
+
+    def recover(self) -> int:
+        """把上次运行中断的任务重新排队，返回恢复的数量"""
+        with self._lock:
+            cursor = self._conn.execute('UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?',
+                                        (STATUS_PENDING, time.time(), STATUS_RUNNING))
+            return cursor.rowcount
+
+    def purge_finished(self, older_than_seconds: float = 7 * 24 * 3600) -> int:
+        """删除较早的已完成/失败记录，返回删除数量"""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            cursor = self._conn.execute('DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?',
+                                        (STATUS_DONE, STATUS_FAILED, cutoff))
+            return cursor.rowcount
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[AnalysisJob]:
+        """列出任务（按ID倒序）"""
+        with self._lock:
+            if status:
+                rows = self._conn.execute('SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?',
+                                          (status, limit)).fetchall()
+            else:
+                rows = self._conn.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        counts = {STATUS_PENDING: 0, STATUS_RUNNING: 0, STATUS_DONE: 0, STATUS_FAILED: 0}
+        counts.update({row['status']: row['n'] for row in rows})
+        return counts
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def _remove_frame(self, frame_path: str):
+        try:
+            if frame_path and os.path.exists(frame_path):
+                os.remove(frame_path)
+        except OSError as e:
+            print(f"⚠️ 删除任务帧失败: {e}")
+
+    @staticmethod
+    def _row_to_job(row) -> AnalysisJob:
+        return AnalysisJob(
+            job_id=row['id'],
+            kind=row['kind'],
+            plant_id=json.loads(row['plant_id']) if row['plant_id'] else None,
+            frame_path=row['frame_path'],
+            payload=json.loads(row['payload'] or '{}'),
+            status=row['status'],
+            priority=row['priority'],
+            attempts=row['attempts'],
+            created_at=row['created_at'],
+            updated_at=row['updated_at'],
+            last_error=row['last_error'] or ''
+        )
+
+
+class AnalysisJobExecutor:
+    """从持久化队列取任务并在工作线程中执行"""
+
+    def __init__(self, queue: AnalysisJobQueue, handler: Callable[[AnalysisJob, np.ndarray], Dict[str, Any]],
+                 concurrency: int = 2, poll_interval: float = 1.0,
+                 ready: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            queue: 任务队列
+            handler: 任务处理函数 handler(job, frame)，返回结果字典；抛出异常视为失败并按次数重试
+            concurrency: 同时执行的任务数
+            poll_interval: 队列为空时的轮询间隔（秒），新任务入队时会立即唤醒
+            ready: 可选的就绪检查，返回False时暂不取任务（如AI分析器尚未配置）
+        """
+        self.queue = queue
+        self.handler = handler
+        self.poll_interval = poll_interval
+        self.ready = ready
+        self.concurrency = max(1, int(concurrency))
+
+        self._wakeup = threading.Condition()
+        self._running = False
+        self._paused = False
+        self._active = 0
+        self._threads: List[threading.Thread] = []
+        self.stats = {
+            'completed': 0,
+            'failed': 0,
+            'retried': 0,
+            'deferred': 0,
+            'claim_errors': 0,
+            'total_seconds': 0.0
+        }
+
+    def start(self):
+        """启动工作线程"""
+        with self._wakeup:
+            if self._running:
+                return
+            self._running = True
+        self._spawn_workers()
+        print(f"✅ 分析任务执行器已启动 (并发={self.concurrency})")
+
+    def stop(self, timeout: float = 5.0):
+        """停止工作线程；执行中的任务完成后退出，未执行的任务留在队列中"""
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def pause(self):
+        """暂停取新任务（仅采集模式）"""
+        with self._wakeup:
+            self._paused = True
+
+    def resume(self):
+        """恢复执行"""
+        with self._wakeup:
+            self._paused = False
+            self._wakeup.notify_all()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    def set_concurrency(self, concurrency: int):
+        """调整并发数（新增的工作线程立即启动，多余的线程在当前任务结束后退出）"""
+        with self._wakeup:
+            self.concurrency = max(1, int(concurrency))
+            self._wakeup.notify_all()
+        if self._running:
+            self._spawn_workers()
+
+    def notify(self):
+        """有新任务入队时唤醒空闲的工作线程"""
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def _spawn_workers(self):
+        with self._wakeup:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.concurrency:
+                index = len(self._threads)
+                thread = threading.Thread(target=self._worker, args=(index,), daemon=True,
+                                          name=f"analysis-job-{index}")
+                self._threads.append(thread)
+                thread.start()
+
+    def _worker(self, index: int):
+        while True:
+            with self._wakeup:
+                if not self._running or index >= self.concurrency:
+                    return
+                if self._paused or (self.ready is not None and not self.ready()):
+                    self._wakeup.wait(self.poll_interval)
+                    continue
+                # 取任务前计入活动数，避免 wait_idle 在取出与执行之间误判为空闲
+                self._active += 1
+            job = None
+            try:
+                try:
+                    job = self.queue.claim()
+                except Exception as e:
+                    # 数据库暂时不可用（如 database is locked）：记录后退避重试，不结束工作线程
+                    self.stats['claim_errors'] += 1
+                    print(f"⚠️ 取分析任务失败，{self.poll_interval}秒后重试: {e}")
+                if job is not None:
+                    self._execute(job)
+            finally:
+                with self._wakeup:
+                    self._active -= 1
+            if job is None:
+                with self._wakeup:
+                    if self._running:
+                        self._wakeup.wait(self.poll_interval)
+
+    def _execute(self, job: AnalysisJob):
+        started = time.time()
+        try:
+            frame = self.queue.load_frame(job)
+            if frame is None:
+                self.queue.fail(job.job_id, '任务帧缺失', retry=False)
+                self.stats['failed'] += 1
+                return
+            result = self.handler(job, frame)
+            self.queue.complete(job.job_id, result)
+            self.stats['completed'] += 1
+        except JobDeferred as e:
+            delay = max(DEFER_SECONDS, e.retry_after)
+            status = self.queue.defer(job.job_id, str(e), delay, e.count_attempt)
+            if status == STATUS_PENDING:
+                self.stats['deferred'] += 1
+                print(f"⏳ 分析任务 #{job.job_id} 延后 {delay:.0f} 秒重试: {e}")
+            else:
+                self.stats['failed'] += 1
+                print(f"❌ 分析任务 #{job.job_id} 最终失败: {e}")
+        except Exception as e:
+            status = self.queue.fail(job.job_id, str(e))
+            if status == STATUS_PENDING:
+                self.stats['retried'] += 1
+                print(f"⚠️ 分析任务 #{job.job_id} 失败，将重试: {e}")
+            else:
+                self.stats['failed'] += 1
+                print(f"❌ 分析任务 #{job.job_id} 最终失败: {e}")
+        finally:
+            self.stats['total_seconds'] += time.time() - started
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """等待可执行的任务清空且没有执行中的任务（延后的任务不等待），返回是否在超时前完成"""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            if self.queue.ready_count() == 0 and self._active == 0:
+                return True
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取执行器与队列统计"""
+        stats = dict(self.stats)
+        finished = stats['completed'] + stats['failed']
+        stats['avg_seconds'] = round(stats.pop('total_seconds') / finished, 3) if finished else 0.0
+        stats['active'] = self._active
+        stats['concurrency'] = self.concurrency
+        stats['paused'] = self._paused
+        stats['queue'] = self.queue.counts()
+        return stats
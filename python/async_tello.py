@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+异步Tello驱动
+基于 asyncio UDP 的 Tello SDK 客户端，替代在协程中直接调用会阻塞数秒的 djitellopy：
+Tello 的应答不带序号，因此命令串行发送、同一时间只有一条在途，每条命令有独立的 future、超时和重试，
+超时命令的迟到应答按应答类型识别后丢弃；状态包（8890）在事件循环中解析并写入遥测环形缓冲，get_battery 等读取缓冲快照而不发查询。
+方法名与 djitellopy 保持一致，动作命令为协程；后台线程（任务控制器、视频线程）通过 blocking() 同步调用
+"""
+
+import asyncio
+import concurrent.futures
+import math
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from telemetry_ring import TelemetryRing
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+TELLO_IP = '192.168.10.1'
+COMMAND_PORT = 8889
+STATE_PORT = 8890
+VIDEO_PORT = 11111
+
+# 应答超时估算
+COMMAND_TIMEOUT = 7.0       # 普通命令与查询
+TAKEOFF_TIMEOUT = 20.0      # 起飞/降落
+MOTION_SPEED = 30.0         # 估算动作命令耗时所用的保守平移速度（cm/s）
+ROTATION_SPEED = 45.0       # 度/秒
+FLIP_SECONDS = 3.0
+SYNC_WAIT_MARGIN = 5.0      # 同步调用在命令超时与重发之外多等待的时间（排队、事件循环调度）
+LONGEST_COMMAND = 'go 500 500 500 10'   # 用于估算未知命令的最长应答时间
+
+# 应答丢失后可以安全重发的命令：重发不会让飞机多飞一段，上一次的迟到应答也同样是本次的应答
+RETRY_SAFE = {'command', 'streamon', 'streamoff', 'mon', 'moff', 'mdirection', 'speed', 'emergency', 'land'}
+
+MOVE_COMMANDS = {'up', 'down', 'left', 'right', 'forward', 'back'}
+
+
+class TelloError(Exception):
+    """Tello 返回 error 或驱动不可用"""
+
+
+class TelloTimeout(TelloError):
+    """命令在超时和重试后仍未收到应答"""
+
+
+def _number(text: str) -> Optional[float]:
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_state(text: str) -> Dict[str, Any]:
+    """解析状态包 "mid:1;x:10;...;bat:87;..."，数值字段转换为 int/float"""
+    state: Dict[str, Any] = {}
+    for field in text.strip().split(';'):
+        if ':' not in field:
+            continue
+        key, value = field.split(':', 1)
+        number = _number(value)
+        if number is None:
+            state[key] = value
+        else:
+            state[key] = int(number) if number.is_integer() and '.' not in value else number
+    return state
+
+
+def state_temperature(snapshot: Optional[Dict[str, Any]]) -> float:
+    """状态包中的温度（templ/temph 的平均值）"""
+    if not snapshot:
+        return 0.0
+    return (snapshot.get('templ', 0) + snapshot.get('temph', 0)) / 2
+
+
+class _CommandProtocol(asyncio.DatagramProtocol):
+    def __init__(self, driver: 'AsyncTello'):
+        self.driver = driver
+
+    def datagram_received(self, data: bytes, addr):
+        self.driver._on_response(data)
+
+    def error_received(self, exc):
+        print(f"⚠️ Tello命令端口错误: {exc}")
+
+
+class _StateProtocol(asyncio.DatagramProtocol):
+    def __init__(self, driver: 'AsyncTello'):
+        self.driver = driver
+
+    def datagram_received(self, data: bytes, addr):
+        self.driver._on_state(data)
+
+
+class FrameReader:
+    """后台线程解码视频流，frame 为最新一帧（用法与 djitellopy 的 BackgroundFrameRead 一致）"""
+
+    def __init__(self, address: str):
+        if not CV2_AVAILABLE:
+            raise TelloError("OpenCV未安装，无法解码视频流")
+        self.address = address
+        self.frame = None
+        self.frames = 0
+        self.stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        capture = cv2.VideoCapture(self.address)
+        try:
+            while not self.stopped:
+                ok, frame = capture.read()
+                if ok:
+                    self.frame = frame
+                    self.frames += 1
+                else:
+                    time.sleep(0.01)
+        finally:
+            capture.release()
+
+    def stop(self):
+        self.stopped = True
+
+
+class AsyncTello:
+    """Tello SDK 的 asyncio 客户端"""
+
+    def __init__(self, host: str = TELLO_IP, command_port: int = COMMAND_PORT, local_port: int = 0,
+                 state_port: Optional[int] = STATE_PORT, video_port: int = VIDEO_PORT,
+                 timeout: float = COMMAND_TIMEOUT, retries: int = 2, stale_grace: float = 0.3,
+                 telemetry_capacity: int = 1200):
+        """
+        Args:
+            host: 无人机地址
+            command_port: 无人机命令端口
+            local_port: 本地命令端口（0为自动分配，Tello 会回复到发送端口）
+            state_port: 本地状态包端口（None 不监听状态包）
+            video_port: 本地视频端口
+            timeout: 普通命令的应答超时（秒），动作命令按距离/角度在此基础上延长
+            retries: 可安全重发的命令超时后的重发次数
+            stale_grace: 上一条命令超时后，发送下一条前等待迟到应答的时间（秒）
+            telemetry_capacity: 遥测环形缓冲保存的状态包数量
+        """
+        self.address = (host, command_port)
+        self.local_port = local_port
+        self.state_port = state_port
+        self.video_port = video_port
+        self.timeout = timeout
+        self.retries = retries
+        self.stale_grace = stale_grace
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._command_transport = None
+        self._state_transport = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._pending: Optional[Tuple[str, asyncio.Future]] = None
+        self._stale = 0
+        self._state: Dict[str, Any] = {}
+        self.telemetry = TelemetryRing(telemetry_capacity)
+        self._state_event: Optional[asyncio.Event] = None
+        self._frame_reader: Optional[FrameReader] = None
+        self.stream_on = False
+        self.stats = {'commands': 0, 'responses': 0, 'timeouts': 0, 'retries': 0, 'errors': 0,
+                      'discarded': 0, 'rc': 0, 'state_packets': 0, 'total_latency': 0.0}
+
+    # ---- 连接 ----
+
+    @property
+    def is_open(self) -> bool:
+        return self._command_transport is not None
+
+    @property
+    def state_address(self) -> Optional[Tuple[str, int]]:
+        """本地状态包端口的实际地址"""
+        return self._state_transport.get_extra_info('sockname') if self._state_transport else None
+
+    async def connect(self, wait_state: float = 2.0):
+        """打开UDP端口并进入SDK模式；wait_state 秒内等待第一个状态包"""
+        if self._command_transport is None:
+            self.loop = asyncio.get_running_loop()
+            self._lock = asyncio.Lock()
+            self._state_event = asyncio.Event()
+            self._command_transport, _ = await self.loop.create_datagram_endpoint(
+                lambda: _CommandProtocol(self), local_addr=('0.0.0.0', self.local_port))
+            if self.state_port is not None:
+                self._state_transport, _ = await self.loop.create_datagram_endpoint(
+                    lambda: _StateProtocol(self), local_addr=('0.0.0.0', self.state_port))
+        try:
+            await self.send_control_command('command')
+        except TelloError:
+            self.close()
+            raise
+        if self._state_transport and wait_state:
+            await self.wait_for_state(wait_state)
+
+    async def wait_for_state(self, timeout: float) -> bool:
+        """等待状态包，timeout 秒内收到返回True"""
+        if self._state:
+            return True
+        try:
+            await asyncio.wait_for(self._state_event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def end(self):
+        """关闭视频流并释放端口"""
+        if self.stream_on and self.is_open:
+            try:
+                await self.streamoff()
+            except TelloError:
+                pass
+        self.close()
+
+    def close(self):
+        """释放端口（不发送命令，可在任意线程调用）"""
+        self.stop_frame_reader()
+        for transport in (self._command_transport, self._state_transport):
+            if transport is not None:
+                if self._on_loop_thread() or self.loop is None or self.loop.is_closed():
+                    transport.close()
+                else:
+                    self.loop.call_soon_threadsafe(transport.close)
+        self._command_transport = None
+        self._state_transport = None
+        self.stream_on = False
+
+    # ---- 命令 ----
+
+    def command_timeout(self, command: str) -> float:
+        """按命令估算应答超时：动作命令在飞完之后才应答"""
+        parts = command.split()
+        name = parts[0] if parts else ''
+        numbers = [abs(n) for n in (_number(p) for p in parts[1:]) if n is not None]
+        if name in ('takeoff', 'land'):
+            return TAKEOFF_TIMEOUT
+        if name in MOVE_COMMANDS and numbers:
+            return self.timeout + numbers[0] / MOTION_SPEED
+        if name in ('cw', 'ccw') and numbers:
+            return self.timeout + numbers[0] / ROTATION_SPEED
+        if name == 'go' and len(numbers) >= 4:
+            return self.timeout + math.sqrt(sum(n * n for n in numbers[:3])) / max(10.0, numbers[3])
+        if name == 'flip':
+            return self.timeout + FLIP_SECONDS
+        return self.timeout
+
+    @staticmethod
+    def retry_safe(command: str) -> bool:
+        return command.endswith('?') or command.split(' ', 1)[0] in RETRY_SAFE
+
+    @staticmethod
+    def _matches(command: str, response: str) -> bool:
+        """应答是否可能属于当前命令：查询命令不接受 ok，控制命令不接受数值（超时查询的迟到应答）"""
+        if response.lower().startswith('error'):
+            return True
+        if command.endswith('?'):
+            return response != 'ok'
+        return _number(response) is None
+
+    async def send_command(self, command: str, timeout: Optional[float] = None,
+                           retries: Optional[int] = None) -> str:
+        """发送一条命令并等待应答，命令之间串行执行
+
+        Args:
+            timeout: 每次等待应答的秒数（默认按命令估算）
+            retries: 超时后的重发次数（默认只有可安全重发的命令才重发）
+
+        Raises:
+            TelloTimeout: 重试后仍无应答
+            TelloError: 无人机返回 error
+        """
+        if self._lock is None:
+            raise TelloError("Tello未连接")
+        timeout = timeout or self.command_timeout(command)
+        if retries is None:
+            retries = self.retries if self.retry_safe(command) else 0
+
+        async with self._lock:
+            if self._stale:
+                # 给上一条超时命令的应答留出到达时间，避免被当成本条命令的应答
+                await asyncio.sleep(self.stale_grace)
+                self._stale = 0
+            for attempt in range(retries + 1):
+                if self._command_transport is None:
+                    raise TelloError("Tello连接已关闭")
+                if attempt:
+                    self.stats['retries'] += 1
+                future = self.loop.create_future()
+                self._pending = (command, future)
+                self.stats['commands'] += 1
+                sent = time.monotonic()
+                self._command_transport.sendto(command.encode('utf-8'), self.address)
+                try:
+                    response = await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    self.stats['timeouts'] += 1
+                    self._stale += 1
+                    continue
+                except asyncio.CancelledError:
+                    # 同步调用等待超时后取消：命令已发出，应答可能之后才到
+                    self._stale += 1
+                    raise
+                finally:
+                    self._pending = None
+                self.stats['total_latency'] += time.monotonic() - sent
+                if response.lower().startswith('error'):
+                    self.stats['errors'] += 1
+                    raise TelloError(f"{command}: {response}")
+                return response
+        raise TelloTimeout(f"{command}: {timeout:.1f}秒内无应答（重发{retries}次）")
+
+    async def send_control_command(self, command: str, timeout: Optional[float] = None) -> bool:
+        """发送控制命令，应答为 ok 时返回True"""
+        response = await self.send_command(command, timeout)
+        if response.lower() != 'ok':
+            raise TelloError(f"{command}: {response}")
+        return True
+
+    async def send_read_command(self, command: str, timeout: Optional[float] = None) -> str:
+        """发送查询命令（以?结尾），返回应答文本"""
+        return await self.send_command(command, timeout)
+
+    def _on_response(self, data: bytes):
+        response = data.decode('utf-8', errors='ignore').strip()
+        pending = self._pending
+        if pending is None or pending[1].done() or not self._matches(pending[0], response):
+            # 超时命令的迟到应答：丢弃
+            self.stats['discarded'] += 1
+            self._stale = max(0, self._stale - 1)
+            return
+        self.stats['responses'] += 1
+        pending[1].set_result(response)
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _send_nowait(self, command: str):
+        """发送无应答的命令（rc），可在任意线程调用"""
+        if self._command_transport is None:
+            raise TelloError("Tello未连接")
+        data = command.encode('utf-8')
+        if self._on_loop_thread():
+            self._command_transport.sendto(data, self.address)
+        else:
+            self.loop.call_soon_threadsafe(self._command_transport.sendto, data, self.address)
+
+    def interrupt(self, command: str):
+        """不排队立即发送（emergency、stop），不等待在途命令完成：
+        其应答可能结束在途命令的等待，也可能之后才到，因此按超时命令处理，下一条命令发送前留出迟到应答的时间"""
+        self._send_nowait(command)
+        self._stale += 1
+        self.stats['commands'] += 1
+
+    def sync_timeout(self, command: Optional[str] = None) -> float:
+        """同步调用的最长等待时间：命令超时乘以发送次数，加上迟到应答的等待与余量；未知命令按最长的动作命令估算"""
+        if command is None:
+            per_attempt = max(TAKEOFF_TIMEOUT, self.command_timeout(LONGEST_COMMAND))
+        else:
+            per_attempt = self.command_timeout(command)
+        return (self.retries + 1) * (per_attempt + self.stale_grace) + SYNC_WAIT_MARGIN
+
+    def run_sync(self, coro, timeout: Optional[float] = None):
+        """在其他线程中同步执行驱动的协程（不能在事件循环线程中调用）
+
+        Args:
+            timeout: 最长等待秒数（默认 sync_timeout()），超时后取消协程并抛出 TelloError
+        """
+        if self.loop is None or self.loop.is_closed():
+            coro.close()
+            raise TelloError("Tello未连接")
+        if self._on_loop_thread():
+            coro.close()
+            raise RuntimeError("事件循环线程中请直接 await")
+        if timeout is None:
+            timeout = self.sync_timeout()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TelloTimeout(f"等待Tello命令结果超过{timeout:.1f}秒，已取消")
+
+    def blocking(self) -> 'BlockingTello':
+        """返回供后台线程使用的同步外观"""
+        return BlockingTello(self)
+
+    # ---- 动作（与 djitellopy 同名） ----
+
+    async def takeoff(self):
+        return await self.send_control_command('takeoff')
+
+    async def land(self):
+        return await self.send_control_command('land')
+
+    async def emergency(self):
+        """紧急停止：不排队、不等待在途命令（动作命令可能要等十几秒才应答），立即发送"""
+        self.interrupt('emergency')
+        return True
+
+    async def move(self, direction: str, x: int):
+        return await self.send_control_command(f'{direction} {int(x)}')
+
+    async def move_up(self, x: int):
+        return await self.move('up', x)
+
+    async def move_down(self, x: int):
+        return await self.move('down', x)
+
+    async def move_left(self, x: int):
+        return await self.move('left', x)
+
+    async def move_right(self, x: int):
+        return await self.move('right', x)
+
+    async def move_forward(self, x: int):
+        return await self.move('forward', x)
+
+    async def move_back(self, x: int):
+        return await self.move('back', x)
+
+    async def rotate_clockwise(self, x: int):
+        return await self.send_control_command(f'cw {int(x)}')
+
+    async def rotate_counter_clockwise(self, x: int):
+        return await self.send_control_command(f'ccw {int(x)}')
+
+    async def flip(self, direction: str):
+        return await self.send_control_command(f'flip {direction}')
+
+    async def set_speed(self, x: int):
+        return await self.send_control_command(f'speed {int(x)}')
+
+    async def go_xyz_speed(self, x: int, y: int, z: int, speed: int):
+        return await self.send_control_command(f'go {int(x)} {int(y)} {int(z)} {int(speed)}')
+
+    async def go_xyz_speed_mid(self, x: int, y: int, z: int, speed: int, mid: int):
+        return await self.send_control_command(f'go {int(x)} {int(y)} {int(z)} {int(speed)} m{int(mid)}')
+
+    async def enable_mission_pads(self):
+        return await self.send_control_command('mon')
+
+    async def disable_mission_pads(self):
+        return await self.send_control_command('moff')
+
+    async def set_mission_pad_detection_direction(self, x: int):
+        return await self.send_control_command(f'mdirection {int(x)}')
+
+    async def streamon(self):
+        await self.send_control_command('streamon')
+        self.stream_on = True
+        return True
+
+    async def streamoff(self):
+        self.stop_frame_reader()
+        await self.send_control_command('streamoff')
+        self.stream_on = False
+        return True
+
+    def send_rc_control(self, left_right_velocity: int, forward_backward_velocity: int,
+                        up_down_velocity: int, yaw_velocity: int):
+        """rc 控制（无应答，不等待，可在任意线程调用）"""
+        values = (max(-100, min(100, int(v))) for v in
+                  (left_right_velocity, forward_backward_velocity, up_down_velocity, yaw_velocity))
+        self._send_nowait('rc {} {} {} {}'.format(*values))
+        self.stats['rc'] += 1
+
+    async def read_battery(self) -> int:
+        """电量：有新鲜状态包时直接读取，否则发送 battery? 查询"""
+        if self.state_age() < 1.0 and self.telemetry.latest('bat') is not None:
+            return int(self.telemetry.latest('bat'))
+        return int(float(await self.send_read_command('battery?')))
+
+    # ---- 状态包 ----
+
+    def _on_state(self, data: bytes):
+        self._state = parse_state(data.decode('ascii', errors='ignore'))
+        self.telemetry.append(self._state)
+        self.stats['state_packets'] += 1
+        if self._state_event is not None:
+            self._state_event.set()
+
+    def state_age(self) -> float:
+        return self.telemetry.age()
+
+    def get_current_state(self) -> Dict[str, Any]:
+        """最新状态包：每个包解析为新的字典，StateStream 按对象是否变化判断新包到达（调用方不要修改）"""
+        return self._state
+
+    def get_state_field(self, key: str, default: Any = -1) -> Any:
+        return self.telemetry.latest(key, default)
+
+    def get_battery(self) -> int:
+        return self.get_state_field('bat')
+
+    def get_height(self) -> int:
+        return self.get_state_field('h', 0)
+
+    def get_temperature(self) -> float:
+        return state_temperature(self.telemetry.snapshot())
+
+    def get_mission_pad_id(self) -> int:
+        return self.get_state_field('mid')
+
+    # ---- 视频 ----
+
+    def get_frame_read(self) -> FrameReader:
+        """返回视频帧读取器（首次调用时启动解码线程）"""
+        if self._frame_reader is None or self._frame_reader.stopped:
+            self._frame_reader = FrameReader(f'udp://@0.0.0.0:{self.video_port}')
+        return self._frame_reader
+
+    def stop_frame_reader(self):
+        if self._frame_reader:
+            self._frame_reader.stop()
+            self._frame_reader = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        answered = stats['responses']
+        stats['average_latency'] = round(stats.pop('total_latency') / answered, 3) if answered else 0.0
+        stats['telemetry'] = self.telemetry.get_stats()
+        return stats
+
+
+class BlockingTello:
+    """AsyncTello 的同步外观：供后台线程调用，协程方法提交到驱动所在的事件循环并等待结果"""
+
+    def __init__(self, driver: AsyncTello):
+        self._driver = driver
+
+    @property
+    def driver(self) -> AsyncTello:
+        return self._driver
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._driver, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            # send_* 方法的命令已知，按该命令估算等待时间；其他动作方法按最长命令估算
+            command = args[0] if name.startswith('send_') and args and isinstance(args[0], str) else None
+            return self._driver.run_sync(attr(*args, **kwargs), self._driver.sync_timeout(command))
+        call.__name__ = name
+        return call
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+录制飞行的离线批量重处理
+对录制视频每N帧（或全部帧）运行QR码识别、草莓检测与成熟度分析，
+工作进程各自加载一份模型并行处理，结果写入植株观测存储。
+用改进后的 best.pt 重跑上周的飞行只需几分钟，无需重新起飞
+
+用法:
+    python batch_reprocess.py recordings/flight_20250601 recordings/flight_20250602 --stride 3 --workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import cv2
+
+from detection_utils import DEFAULT_MODEL_PATH, detect_plant_qr_codes, maturity_counts
+from frame_source import FlightRecording
+from plant_store import PlantObservation, PlantStore
+
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plant_store.db')
+STAGES = ('decode', 'qr', 'strawberry', 'store')
+
+# 工作进程内的模型实例（每个进程一份）
+_worker_analyzer = None
+_worker_qr_detector = None
+
+
+def _init_worker(model_path: Optional[str], quiet: bool):
+    """工作进程初始化：加载本进程的检测模型"""
+    global _worker_analyzer, _worker_qr_detector
+    if quiet:
+        # 检测器逐个草莓打印调试信息，批量处理时关闭
+        sys.stdout = open(os.devnull, 'w')
+    _worker_qr_detector = cv2.QRCodeDetector()
+    _worker_analyzer = None
+    if model_path:
+        try:
+            from strawberry_maturity_analyzer import StrawberryMaturityAnalyzer
+            analyzer = StrawberryMaturityAnalyzer(model_path)
+            _worker_analyzer = analyzer if analyzer.model is not None else None
+        except ImportError:
+            _worker_analyzer = None
+
+
+def _process_frame(item):
+    """工作进程：处理一帧，返回识别结果与各阶段耗时"""
+    index, timestamp, frame, telemetry = item
+    timings = {}
+
+    start = time.perf_counter()
+    qr_codes = detect_plant_qr_codes(frame, _worker_qr_detector)
+    timings['qr'] = time.perf_counter() - start
+
+    detections = []
+    start = time.perf_counter()
+    if _worker_analyzer is not None:
+        for det in _worker_analyzer.detect_strawberries(frame, track=False):
+            detections.append({
+                'bbox': [int(v) for v in det.bbox],
+                'confidence': round(float(det.confidence), 3),
+                'maturity_level': det.maturity_level,
+                'maturity_confidence': round(float(det.maturity_confidence), 3)
+            })
+    timings['strawberry'] = time.perf_counter() - start
+
+    return {
+        'index': index,
+        'timestamp': timestamp,
+        'telemetry': telemetry,
+        'qr_codes': qr_codes,
+        'detections': detections,
+        'timings': timings
+    }
+
+
+@dataclass
+class ReprocessReport:
+    """一次批量重处理的统计"""
+    flight_id: str
+    frames: int = 0
+    observations: int = 0
+    unassigned_frames: int = 0
+    plants: List[Any] = field(default_factory=list)
+    wall_seconds: float = 0.0
+    stage_seconds: Dict[str, float] = field(default_factory=lambda: {stage: 0.0 for stage in STAGES})
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def format(self) -> str:
+        lines = [f"✅ 飞行 {self.flight_id}: {self.frames} 帧，{self.wall_seconds:.1f}s，{self.fps:.1f} 帧/秒",
+                 f"   植株 {len(self.plants)} 株，观测 {self.observations} 条，未归属帧 {self.unassigned_frames}"]
+        for stage in STAGES:
+            per_frame = self.stage_seconds[stage] / self.frames * 1000 if self.frames else 0.0
+            lines.append(f"   - {stage:<10} 合计 {self.stage_seconds[stage]:7.2f}s，平均 {per_frame:6.1f}ms/帧")
+        return '\n'.join(lines)
+
+
+def reprocess_recording(recording: FlightRecording, store: PlantStore, model_path: Optional[str] = DEFAULT_MODEL_PATH,
+                        workers: int = 0, stride: int = 1, limit: Optional[int] = None,
+                        attach_seconds: float = 2.0, quiet: bool = True) -> ReprocessReport:
+    """批量重处理一次录制的飞行
+
+    Args:
+        recording: 录制的飞行
+        store: 植株观测存储（该飞行此前的批处理结果会被替换）
+        model_path: 草莓检测模型路径，为None或加载失败时只做QR识别
+        workers: 工作进程数，0表示CPU核数-1
+        stride: 每N帧处理一帧
+        limit: 最多处理的帧数
+        attach_seconds: 没有QR码的帧归属到此时间内最近识别到的植株
+        quiet: 关闭工作进程的调试输出
+    """
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    report = ReprocessReport(flight_id=recording.flight_id)
+    model_name = os.path.basename(model_path) if model_path else ''
+    store.delete_flight(recording.flight_id, source='batch')
+
+    # Pool.imap 会尽快读完输入，用信号量限制已解码未处理的帧数，避免长视频占满内存
+    chunksize = 4
+    in_flight = threading.BoundedSemaphore(workers * chunksize * 2)
+
+    def frame_items():
+        # 读取与解码在主进程进行，计入 decode 阶段
+        iterator = recording.frames(stride=stride, limit=limit)
+        while True:
+            in_flight.acquire()
+            start = time.perf_counter()
+            source_frame = next(iterator, None)
+            report.stage_seconds['decode'] += time.perf_counter() - start
+            if source_frame is None:
+                return
+            yield source_frame.index, source_frame.timestamp, source_frame.frame, source_frame.telemetry
+
+    started = time.perf_counter()
+    last_plant, last_plant_time = None, None
+    plants = set()
+    pending: List[PlantObservation] = []
+
+    # spawn 启动方式：每个工作进程独立加载模型，避免fork后共享推理库状态
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(workers, initializer=_init_worker, initargs=(model_path, quiet)) as pool:
+        for result in pool.imap(_process_frame, frame_items(), chunksize=chunksize):
+            in_flight.release()
+            report.frames += 1
+            for stage, seconds in result['timings'].items():
+                report.stage_seconds[stage] += seconds
+
+            plant_ids = [code['id'] for code in result['qr_codes']]
+            if plant_ids:
+                last_plant, last_plant_time = plant_ids[-1], result['timestamp']
+            elif last_plant is not None and result['timestamp'] - last_plant_time <= attach_seconds:
+                plant_ids = [last_plant]
+            if not plant_ids:
+                if result['detections']:
+                    report.unassigned_frames += 1
+                continue
+
+            for plant_id in plant_ids:
+                plants.add(plant_id)
+                pending.append(PlantObservation(
+                    plant_id=plant_id,
+                    flight_id=recording.flight_id,
+                    frame_index=result['index'],
+                    video_time=result['timestamp'],
+                    source='batch',
+                    model=model_name,
+                    strawberries=len(result['detections']),
+                    maturity=maturity_counts(result['detections']),
+                    detections=result['detections'],
+                    telemetry=result['telemetry']
+                ))
+
+            if len(pending) >= 200:
+                start = time.perf_counter()
+                report.observations += store.record(pending)
+                report.stage_seconds['store'] += time.perf_counter() - start
+                pending = []
+
+    start = time.perf_counter()
+    report.observations += store.record(pending)
+    report.stage_seconds['store'] += time.perf_counter() - start
+
+    report.wall_seconds = time.perf_counter() - started
+    report.plants = sorted(plants, key=str)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='录制飞行的离线批量重处理')
+    parser.add_argument('recordings', nargs='+', help='录制目录（含 video.* 与 telemetry.jsonl，或飞行记录仪目录）或视频文件')
+    parser.add_argument('--telemetry', help='遥测JSONL文件（仅处理单个视频文件时使用）')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help='草莓检测模型路径')
+    parser.add_argument('--no-model', action='store_true', help='只做QR识别，不运行草莓检测')
+    parser.add_argument('--store', default=DEFAULT_STORE_PATH, help='植株观测数据库路径')
+    parser.add_argument('--workers', type=int, default=0, help='工作进程数（默认CPU核数-1）')
+    parser.add_argument('--stride', type=int, default=1, help='每N帧处理一帧（默认全部帧）')
+    parser.add_argument('--limit', type=int, help='每个录制最多处理的帧数')
+    parser.add_argument('--verbose', action='store_true', help='保留工作进程的调试输出')
+    args = parser.parse_args(argv)
+
+    model_path = None if args.no_model else args.model
+    if model_path and not os.path.exists(model_path):
+        print(f"⚠️ 模型文件不存在: {model_path}，只做QR识别")
+        model_path = None
+
+    store = PlantStore(args.store)
+    total_frames, total_seconds = 0, 0.0
+    try:
+        for path in args.recordings:
+            recording = FlightRecording.open(path, args.telemetry if len(args.recordings) == 1 else None)
+            print(f"🎬 处理 {recording.flight_id}: {recording.video_path} "
+                  f"(遥测 {len(recording.telemetry)} 条，间隔 {args.stride})")
+            report = reprocess_recording(recording, store, model_path=model_path, workers=args.workers,
+                                         stride=args.stride, limit=args.limit, quiet=not args.verbose)
+            print(report.format())
+            total_frames += report.frames
+            total_seconds += report.wall_seconds
+    finally:
+        store.close()
+
+    if len(args.recordings) > 1 and total_seconds > 0:
+        print(f"📊 合计 {total_frames} 帧，{total_seconds:.1f}s，{total_frames / total_seconds:.1f} 帧/秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+云端AI调用预算管理
+按服务商令牌桶限速，按任务/按天限额；操作员发起的请求走优先通道；
+并统计调用次数、延迟与估算费用
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, Optional
+
+
+PRIORITY_OPERATOR = 'operator'   # 操作员主动发起（AI测试、上传分析、自然语言指令）
+PRIORITY_AUTO = 'auto'           # 自动触发（QR识别、巡航分析）
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        """
+        Args:
+            rate_per_minute: 每分钟补充的令牌数
+            burst: 桶容量（允许的突发请求数）
+        """
+        self.rate_per_second = max(0.0, float(rate_per_minute)) / 60.0
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_second)
+        self.updated_at = now
+
+    def try_acquire(self, now: Optional[float] = None) -> bool:
+        """尝试取出一个令牌"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def seconds_until_available(self, now: Optional[float] = None) -> float:
+        """距离下一个令牌可用的秒数"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1.0:
+            return 0.0
+        if self.rate_per_second <= 0:
+            return float('inf')
+        return (1.0 - self.tokens) / self.rate_per_second
+
+
+@dataclass
+class ProviderPolicy:
+    """单个服务商的限速与计价"""
+    rate_per_minute: float = 12.0
+    burst: int = 4
+    operator_rate_per_minute: float = 6.0   # 优先通道的独立额度
+    operator_burst: int = 2
+    price_per_1k_input_tokens: float = 0.003   # 元
+    price_per_1k_output_tokens: float = 0.009  # 元
+    estimated_cost_per_call: float = 0.01      # 无用量信息时的估算（元）
+
+
+@dataclass
+class ProviderCounters:
+    """单个服务商的统计"""
+    granted: int = 0
+    operator_granted: int = 0
+    denied: Dict[str, int] = field(default_factory=dict)
+    calls: int = 0
+    failures: int = 0
+    total_latency: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    estimated_cost: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'granted': self.granted,
+            'operator_granted': self.operator_granted,
+            'denied': dict(self.denied),
+            'calls': self.calls,
+            'failures': self.failures,
+            'avg_latency': round(self.total_latency / self.calls, 3) if self.calls else 0.0,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'estimated_cost': round(self.estimated_cost, 4)
+        }
+
+
+@dataclass
+class BudgetDecision:
+    """预算判定结果"""
+    allowed: bool
+    provider: str
+    priority: str
+    reason: str = ''
+    retry_after: float = 0.0
+
+
+class CloudBudgetManager:
+    """云端调用预算管理器"""
+
+    def __init__(self, policies: Optional[Dict[str, ProviderPolicy]] = None,
+                 mission_quota: int = 60, daily_quota: int = 500,
+                 operator_daily_quota: int = 100, state_path: Optional[str] = None):
+        """
+        Args:
+            policies: 服务商 -> 限速与计价策略，未配置的服务商使用默认策略
+            mission_quota: 每次任务允许的自动调用次数（0表示不限）
+            daily_quota: 每天允许的自动调用次数（0表示不限）
+            operator_daily_quota: 自动额度用尽后，操作员每天额外可用的调用次数
+            state_path: 当日计数的持久化文件（重启后继续累计），为None时不持久化
+        """
+        self.policies: Dict[str, ProviderPolicy] = dict(policies or {})
+        self.mission_quota = int(mission_quota)
+        self.daily_quota = int(daily_quota)
+        self.operator_daily_quota = int(operator_daily_quota)
+        self.state_path = state_path
+
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._operator_buckets: Dict[str, TokenBucket] = {}
+        self._counters: Dict[str, ProviderCounters] = {}
+
+        self.mission_id = None
+        self.mission_calls = 0
+        self.day = date.today().isoformat()
+        self.day_calls = 0
+        self.day_operator_extra = 0
+        self.fallbacks = 0
+        self._load_state()
+
+    def _policy(self, provider: str) -> ProviderPolicy:
+        if provider not in self.policies:
+            self.policies[provider] = ProviderPolicy()
+        return self.policies[provider]
+
+    def _bucket(self, provider: str, operator: bool = False) -> TokenBucket:
+        buckets = self._operator_buckets if operator else self._buckets
+        if provider not in buckets:
+            policy = self._policy(provider)
+            if operator:
+                buckets[provider] = TokenBucket(policy.operator_rate_per_minute, policy.operator_burst)
+            else:
+                buckets[provider] = TokenBucket(policy.rate_per_minute, policy.burst)
+        return buckets[provider]
+
+    def _counter(self, provider: str) -> ProviderCounters:
+        if provider not in self._counters:
+            self._counters[provider] = ProviderCounters()
+        return self._counters[provider]
+
+    def _roll_day(self):
+        today = date.today().isoformat()
+        if today != self.day:
+            self.day = today
+            self.day_calls = 0
+            self.day_operator_extra = 0
+
+    def configure(self, rate_per_minute: Optional[float] = None, mission_quota: Optional[int] = None,
+                  daily_quota: Optional[int] = None, provider: str = 'dashscope'):
+        """运行时调整限速与限额"""
+        with self._lock:
+            if rate_per_minute is not None:
+                policy = self._policy(provider)
+                policy.rate_per_minute = max(0.0, float(rate_per_minute))
+                self._buckets.pop(provider, None)
+            if mission_quota is not None:
+                self.mission_quota = max(0, int(mission_quota))
+            if daily_quota is not None:
+                self.daily_quota = max(0, int(daily_quota))
+
+    def start_mission(self, mission_id):
+        """开始新任务，重置任务内计数"""
+        with self._lock:
+            self.mission_id = mission_id
+            self.mission_calls = 0
+        print(f"💰 任务 {mission_id} 云端调用预算: {self.mission_quota or '不限'} 次")
+
+    def end_mission(self):
+        """结束当前任务"""
+        with self._lock:
+            self.mission_id = None
+            self.mission_calls = 0
+
+    def acquire(self, provider: str = 'dashscope', priority: str = PRIORITY_AUTO) -> BudgetDecision:
+        """申请一次云端调用
+
+        自动请求受令牌桶、任务限额与每日限额约束；操作员请求先用普通额度，
+        普通额度不足时使用优先通道的独立令牌桶与每日额外额度。
+        """
+        operator = priority == PRIORITY_OPERATOR
+        with self._lock:
+            self._roll_day()
+            counter = self._counter(provider)
+
+            reason = ''
+            if self.daily_quota and self.day_calls >= self.daily_quota:
+                reason = 'daily_quota'
+            elif self.mission_id is not None and self.mission_quota and self.mission_calls >= self.mission_quota:
+                reason = 'mission_quota'
+
+            bucket = self._bucket(provider)
+            if not reason and bucket.try_acquire():
+                self._grant(counter, operator, extra=False)
+                return BudgetDecision(True, provider, priority)
+            reason = reason or 'rate_limit'
+
+            if operator:
+                quota_left = (not self.operator_daily_quota or
+                              self.day_operator_extra < self.operator_daily_quota)
+                if quota_left and self._bucket(provider, operator=True).try_acquire():
+                    self._grant(counter, operator, extra=True)
+                    return BudgetDecision(True, provider, priority, reason=f'priority_lane:{reason}')
+                reason = reason if quota_left else 'operator_quota'
+
+            counter.denied[reason] = counter.denied.get(reason, 0) + 1
+            self.fallbacks += 1
+            retry_after = bucket.seconds_until_available() if reason == 'rate_limit' else 0.0
+            return BudgetDecision(False, provider, priority, reason=reason, retry_after=retry_after)
+
+    def _grant(self, counter: ProviderCounters, operator: bool, extra: bool):
+        """记录一次放行（调用方需持有锁）"""
+        counter.granted += 1
+        if operator:
+            counter.operator_granted += 1
+        if extra:
+            self.day_operator_extra += 1
+        else:
+            self.day_calls += 1
+            if self.mission_id is not None:
+                self.mission_calls += 1
+        self._save_state()
+
+    def record(self, provider: str, latency: float, success: bool = True,
+               usage: Optional[Dict[str, Any]] = None):
+        """记录一次已完成的调用：延迟、令牌用量与估算费用"""
+        with self._lock:
+            counter = self._counter(provider)
+            policy = self._policy(provider)
+            counter.calls += 1
+            counter.total_latency += max(0.0, latency)
+            if not success:
+                counter.failures += 1
+
+            input_tokens = int((usage or {}).get('input_tokens', 0) or 0)
+            output_tokens = int((usage or {}).get('output_tokens', 0) or 0)
+            if input_tokens or output_tokens:
+                counter.input_tokens += input_tokens
+                counter.output_tokens += output_tokens
+                counter.estimated_cost += (input_tokens * policy.price_per_1k_input_tokens +
+                                           output_tokens * policy.price_per_1k_output_tokens) / 1000.0
+            else:
+                counter.estimated_cost += policy.estimated_cost_per_call
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取实时预算与调用统计"""
+        with self._lock:
+            self._roll_day()
+            providers = {}
+            for provider, counter in self._counters.items():
+                stats = counter.to_dict()
+                bucket = self._buckets.get(provider)
+                if bucket is not None:
+                    bucket._refill(time.monotonic())
+                    stats['tokens_available'] = round(bucket.tokens, 2)
+                stats['rate_per_minute'] = self._policy(provider).rate_per_minute
+                providers[provider] = stats
+            return {
+                'providers': providers,
+                'mission': {
+                    'id': self.mission_id,
+                    'calls': self.mission_calls,
+                    'quota': self.mission_quota
+                },
+                'day': {
+                    'date': self.day,
+                    'calls': self.day_calls,
+                    'quota': self.daily_quota,
+                    'operator_extra_calls': self.day_operator_extra,
+                    'operator_extra_quota': self.operator_daily_quota
+                },
+                'fallbacks': self.fallbacks
+            }
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('day') == self.day:
+                self.day_calls = int(state.get('day_calls', 0))
+                self.day_operator_extra = int(state.get('day_operator_extra', 0))
+        except Exception as e:
+            print(f"⚠️ 读取云端调用预算状态失败: {e}")
+
+    def _save_state(self):
+        """保存当日计数（调用方需持有锁）"""
+        if not self.state_path:
+            return
+        try:
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'day': self.day,
+                    'day_calls': self.day_calls,
+                    'day_operator_extra': self.day_operator_extra
+                }, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            print(f"⚠️ 保存云端调用预算状态失败: {e}")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+单次遍历的HSV颜色特征提取
+在所有颜色范围的边界处分箱，只统计一次H/S/V联合直方图，即可精确得到任意范围组合的像素占比，
+替代对整幅图像多次调用 cv2.inRange + np.sum。
+清晰度与边缘密度与分辨率相关，下游阈值（清晰度>100、边缘密度>0.05等）按原始分辨率标定，因此仍在原图上计算
+"""
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+HSVBound = Tuple[int, int, int]
+HSVRange = Tuple[HSVBound, HSVBound]  # ((h_min, s_min, v_min), (h_max, s_max, v_max))，闭区间，与cv2.inRange一致
+
+
+class ColorFeatureExtractor:
+    """基于联合直方图的颜色占比提取器"""
+
+    def __init__(self, color_classes: Dict[str, Sequence[HSVRange]]):
+        """
+        Args:
+            color_classes: 颜色类别 -> HSV范围列表（同一类别的多个范围取并集，如红色的两段色调）
+        """
+        self.color_classes = {name: [tuple(map(tuple, r)) for r in ranges]
+                              for name, ranges in color_classes.items()}
+
+        # 每个通道在所有范围边界处切分：下界 lo 与上界 hi+1
+        channel_limits = (180, 256, 256)
+        self._edges = []
+        for channel, limit in enumerate(channel_limits):
+            edges = {0, limit}
+            for ranges in self.color_classes.values():
+                for lower, upper in ranges:
+                    edges.add(min(max(int(lower[channel]), 0), limit))
+                    edges.add(min(max(int(upper[channel]) + 1, 0), limit))
+            self._edges.append(np.array(sorted(edges), dtype=np.int32))
+
+        self._bins = tuple(len(e) - 1 for e in self._edges)
+        n_h, n_s, n_v = self._bins
+        self._total_bins = n_h * n_s * n_v
+
+        # 通道值 -> 联合直方图索引分量的查找表（H分量已乘以 n_s*n_v，S分量乘以 n_v）
+        strides = (n_s * n_v, n_v, 1)
+        luts = []
+        for channel, edges in enumerate(self._edges):
+            values = np.arange(256)
+            bins = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+            luts.append(bins * strides[channel])
+        self._lut = np.stack(luts, axis=-1)
+        # 联合箱数不超过256时可以全程使用uint8和OpenCV原生直方图
+        self._compact = self._total_bins <= 256
+        if self._compact:
+            self._lut_u8 = self._lut.astype(np.uint8).reshape(256, 1, 3)
+
+        # 每个颜色类别在联合直方图上的掩码
+        self._class_masks = {name: self._range_mask(ranges) for name, ranges in self.color_classes.items()}
+
+    def _range_mask(self, ranges: Sequence[HSVRange]) -> np.ndarray:
+        """颜色范围并集在联合直方图上的布尔掩码"""
+        mask = np.zeros(self._bins, dtype=bool)
+        for lower, upper in ranges:
+            selectors = []
+            for channel, edges in enumerate(self._edges):
+                starts = edges[:-1]
+                selectors.append((starts >= lower[channel]) & (starts <= upper[channel]))
+            mask |= selectors[0][:, None, None] & selectors[1][None, :, None] & selectors[2][None, None, :]
+        return mask.ravel()
+
+    def joint_histogram(self, hsv: np.ndarray) -> np.ndarray:
+        """统计HSV图像的联合直方图（一维，长度为联合箱数）"""
+        if self._compact:
+            indexed = cv2.LUT(hsv, self._lut_u8)
+            flat = cv2.transform(indexed, np.ones((1, 3), dtype=np.float32))
+            hist = cv2.calcHist([flat], [0], None, [self._total_bins], [0, self._total_bins])
+            return hist.ravel()
+
+        lut = self._lut
+        index = lut[hsv[..., 0], 0] + lut[hsv[..., 1], 1] + lut[hsv[..., 2], 2]
+        return np.bincount(index.ravel(), minlength=self._total_bins).astype(np.float32)
+
+    def color_ratios(self, image: np.ndarray, hsv: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """计算各颜色类别的像素占比
+
+        Args:
+            image: BGR图像
+            hsv: 已转换的HSV图像（可选，避免重复转换）
+        """
+        if hsv is None:
+            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        hist = self.joint_histogram(hsv)
+        total = float(hsv.shape[0] * hsv.shape[1]) or 1.0
+        return {name: float(hist[mask].sum()) / total for name, mask in self._class_masks.items()}
+
+    @staticmethod
+    def texture_features(image: np.ndarray) -> Dict[str, float]:
+        """亮度、清晰度（拉普拉斯方差）与边缘密度，在原分辨率的灰度图上计算（与旧版数值一致）"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        brightness = float(cv2.mean(gray)[0])
+
+        # 8位灰度图的拉普拉斯响应不超出int16范围：用16位结果与 meanStdDev 求方差，与 CV_64F + var() 相同但快得多
+        _, std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))
+        laplacian_var = float(std[0][0]) ** 2
+        edges = cv2.Canny(gray, 50, 150)
+        edge_density = cv2.countNonZero(edges) / float(edges.size)
+        return {
+            'brightness': brightness,
+            'laplacian_var': laplacian_var,
+            'edge_density': edge_density
+        }
+
+    def extract(self, image: np.ndarray) -> Dict[str, float]:
+        """一次性提取颜色占比与纹理特征"""
+        features = self.color_ratios(image)
+        features.update(self.texture_features(image))
+        return features
+
+
+def inrange_ratios(image: np.ndarray, color_classes: Dict[str, Sequence[HSVRange]]) -> Dict[str, float]:
+    """逐范围调用 cv2.inRange 的参考实现（用于对比测试）"""
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    ratios = {}
+    for name, ranges in color_classes.items():
+        combined = np.zeros(hsv.shape[:2], dtype=np.uint8)
+        for lower, upper in ranges:
+            combined = cv2.bitwise_or(combined, cv2.inRange(hsv, np.array(lower), np.array(upper)))
+        ratios[name] = np.sum(combined > 0) / combined.size
+    return ratios
+
+
+# 作物健康模拟分析使用的颜色类别
+CROP_HEALTH_COLOR_CLASSES: Dict[str, List[HSVRange]] = {
+    'green': [((35, 40, 40), (85, 255, 255))],          # 健康植被
+    'dark_green': [((35, 60, 20), (85, 255, 120))],     # 成熟叶片
+    'light_green': [((35, 30, 120), (85, 255, 255))],   # 新叶
+    'yellow': [((15, 40, 40), (35, 255, 255))],         # 黄化
+    'brown': [((8, 50, 20), (20, 255, 200))]            # 枯死/严重病害
+}
+
+
+def benchmark(image: np.ndarray, color_classes: Dict[str, Sequence[HSVRange]] = None,
+              repeat: int = 20) -> Dict[str, float]:
+    """对比旧版（多次inRange + 全分辨率纹理）与新版提取器的耗时（毫秒）"""
+    color_classes = color_classes or CROP_HEALTH_COLOR_CLASSES
+    extractor = ColorFeatureExtractor(color_classes)
+
+    def legacy():
+        inrange_ratios(image, color_classes)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        np.mean(gray)
+        cv2.Laplacian(gray, cv2.CV_64F).var()
+        edges = cv2.Canny(gray, 50, 150)
+        np.sum(edges > 0)
+
+    timings = {}
+    for label, func in (('legacy_ms', legacy), ('extractor_ms', lambda: extractor.extract(image))):
+        func()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        timings[label] = (time.perf_counter() - start) * 1000 / repeat
+    timings['speedup'] = timings['legacy_ms'] / timings['extractor_ms'] if timings['extractor_ms'] else 0.0
+    return timings
+
+
+if __name__ == "__main__":
+    test_image = np.random.randint(0, 255, (720, 960, 3), dtype=np.uint8)
+    result = benchmark(test_image)
+    print(f"旧版: {result['legacy_ms']:.2f}ms  新版: {result['extractor_ms']:.2f}ms  加速: {result['speedup']:.1f}x")
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+无人机命令调度器
+每架无人机一个调度器，唯一持有 AsyncTello 的命令通道：WebSocket 操作、任务控制器线程、智能体桥接的命令都提交到同一个优先级队列，
+由一个工作协程按 紧急 > 降落 > 操作员 > 任务 > AI 的顺序逐条发送，上一条应答后立即发送下一条（不再固定等待）。
+降落会取消排队中的动作命令，并用 stop 打断正在执行的低优先级动作；紧急停止不排队，立即发送并清空队列。
+统计每个优先级的排队等待时间和命令往返时间
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from async_tello import MOVE_COMMANDS, AsyncTello, BlockingTello, TelloError
+
+# 优先级（数值越小越先执行）
+PRIORITY_EMERGENCY = 'emergency'
+PRIORITY_LAND = 'land'
+PRIORITY_OPERATOR = 'operator'
+PRIORITY_MISSION = 'mission'
+PRIORITY_AI = 'ai'
+PRIORITY_RANK = {
+    PRIORITY_EMERGENCY: 0,
+    PRIORITY_LAND: 1,
+    PRIORITY_OPERATOR: 2,
+    PRIORITY_MISSION: 3,
+    PRIORITY_AI: 4,
+}
+
+# 会让飞机移动的命令：降落/紧急停止时排队中的这些命令被取消
+MOTION_COMMANDS = MOVE_COMMANDS | {'takeoff', 'cw', 'ccw', 'go', 'curve', 'flip', 'jump'}
+
+
+class CommandCancelled(TelloError):
+    """排队中的命令被取消（更高优先级的降落/紧急停止，或调度器停止）"""
+
+
+@dataclass
+class ScheduledCommand:
+    """队列中的一条命令"""
+    command: str
+    priority: str
+    source: str
+    future: asyncio.Future
+    submitted: float
+    timeout: Optional[float] = None
+    retries: Optional[int] = None
+    dispatched: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return self.command.split(' ', 1)[0]
+
+    @property
+    def is_motion(self) -> bool:
+        return self.name in MOTION_COMMANDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'command': self.command, 'priority': self.priority, 'source': self.source}
+
+
+def _class_stats() -> Dict[str, Any]:
+    return {'submitted': 0, 'completed': 0, 'failed': 0, 'cancelled': 0,
+            'total_wait': 0.0, 'max_wait': 0.0, 'total_round_trip': 0.0, 'max_round_trip': 0.0}
+
+
+class CommandScheduler:
+    """单一所有者的优先级命令调度器"""
+
+    def __init__(self, driver: AsyncTello, preempt_with_stop: bool = True):
+        """
+        Args:
+            driver: 已连接的 Tello 驱动（调度器启动后其他代码不应再直接发送命令）
+            preempt_with_stop: 降落时是否发送 stop 打断正在执行的任务/AI 动作（SDK 3.0 起支持）
+        """
+        self.driver = driver
+        self.preempt_with_stop = preempt_with_stop
+        self._queue: List[Tuple[int, int, ScheduledCommand]] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.current: Optional[ScheduledCommand] = None
+        self.stats = {priority: _class_stats() for priority in PRIORITY_RANK}
+        self.preemptions = 0
+
+    # ---- 生命周期 ----
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self):
+        """在事件循环中启动工作协程"""
+        if not self.is_running:
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """停止工作协程，排队中的命令全部取消"""
+        self.cancel(reason='调度器已停止')
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    # ---- 提交与取消 ----
+
+    def submit(self, command: str, priority: str = PRIORITY_OPERATOR, source: Optional[str] = None,
+               timeout: Optional[float] = None, retries: Optional[int] = None) -> asyncio.Future:
+        """提交一条命令（只能在事件循环线程中调用），返回应答的 future
+
+        Args:
+            command: SDK 命令文本
+            priority: 优先级（PRIORITY_*）
+            source: 命令来源，用于按来源取消
+            timeout/retries: 传给驱动的 send_command
+        """
+        if priority not in PRIORITY_RANK:
+            raise ValueError(f"未知的优先级: {priority}")
+        if not self.is_running:
+            raise TelloError("命令调度器未启动")
+        item = ScheduledCommand(command, priority, source or priority, asyncio.get_running_loop().create_future(),
+                                time.monotonic(), timeout, retries)
+        if priority == PRIORITY_LAND:
+            self._preempt_for_land()
+        heapq.heappush(self._queue, (PRIORITY_RANK[priority], next(self._sequence), item))
+        self.stats[priority]['submitted'] += 1
+        self._wakeup.set()
+        return item.future
+
+    async def run(self, command: str, priority: str = PRIORITY_OPERATOR, source: Optional[str] = None,
+                  timeout: Optional[float] = None, retries: Optional[int] = None) -> str:
+        """提交命令并等待应答
+
+        Raises:
+            CommandCancelled: 执行前被取消
+            TelloError: 驱动超时或无人机返回 error
+        """
+        return await self.submit(command, priority, source, timeout, retries)
+
+    def cancel(self, predicate: Optional[Callable[[ScheduledCommand], bool]] = None,
+               reason: str = '已取消') -> int:
+        """取消排队中满足条件的命令（默认全部），返回取消的数量；正在执行的命令不受影响"""
+        kept = []
+        cancelled = 0
+        for entry in self._queue:
+            item = entry[2]
+            if predicate is not None and not predicate(item):
+                kept.append(entry)
+                continue
+            if not item.future.done():
+                item.future.set_exception(CommandCancelled(f"{item.command}: {reason}"))
+                item.future.exception()   # 提交方可能不再等待，避免未读取异常的警告
+            self.stats[item.priority]['cancelled'] += 1
+            cancelled += 1
+        heapq.heapify(kept)
+        self._queue = kept
+        return cancelled
+
+    def cancel_moves(self, source: Optional[str] = None, priority: Optional[str] = None,
+                     reason: str = '已取消') -> int:
+        """取消排队中的动作命令，可按来源或优先级筛选"""
+        return self.cancel(lambda item: item.is_motion
+                           and (source is None or item.source == source)
+                           and (priority is None or item.priority == priority), reason)
+
+    def _preempt_for_land(self):
+        cancelled = self.cancel_moves(reason='降落优先')
+        current = self.current
+        interrupt = (self.preempt_with_stop and current is not None and current.is_motion
+                     and PRIORITY_RANK[current.priority] > PRIORITY_RANK[PRIORITY_OPERATOR])
+        if interrupt:
+            # stop 让飞机立即悬停，Tello 对 stop 的 ok 会结束在途动作的等待，降落随后发送
+            self.driver.interrupt('stop')
+        if cancelled or interrupt:
+            self.preemptions += 1
+            print(f"⏬ 降落抢占: 取消{cancelled}条排队动作" + (f"，打断 {current.command}" if interrupt else ""))
+
+    async def emergency(self) -> bool:
+        """紧急停止：不排队也不等待在途命令，立即发送 emergency，并取消全部排队命令"""
+        cancelled = self.cancel(reason='紧急停止')
+        self.driver.interrupt('emergency')
+        self.stats[PRIORITY_EMERGENCY]['submitted'] += 1
+        self.stats[PRIORITY_EMERGENCY]['completed'] += 1
+        self.preemptions += 1
+        print(f"🚨 紧急停止已发送，取消{cancelled}条排队命令")
+        return True
+
+    # ---- 执行 ----
+
+    async def _run(self):
+        while True:
+            while not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            _, _, item = heapq.heappop(self._queue)
+            if item.future.done():
+                continue
+            item.dispatched = time.monotonic()
+            self.current = item
+            stats = self.stats[item.priority]
+            try:
+                response = await self.driver.send_command(item.command, item.timeout, item.retries)
+            except asyncio.CancelledError:
+                if not item.future.done():
+                    item.future.set_exception(CommandCancelled(f"{item.command}: 调度器已停止"))
+                raise
+            except Exception as e:
+                stats['failed'] += 1
+                if not item.future.done():
+                    item.future.set_exception(e)
+            else:
+                stats['completed'] += 1
+                if not item.future.done():
+                    item.future.set_result(response)
+            finally:
+                self.current = None
+            wait = item.dispatched - item.submitted
+            round_trip = time.monotonic() - item.dispatched
+            stats['total_wait'] += wait
+            stats['max_wait'] = max(stats['max_wait'], wait)
+            stats['total_round_trip'] += round_trip
+            stats['max_round_trip'] = max(stats['max_round_trip'], round_trip)
+
+    def lane(self, priority: str, source: Optional[str] = None) -> 'CommandLane':
+        """以固定优先级提交命令的驱动接口"""
+        return CommandLane(self, priority, source)
+
+    def get_stats(self) -> Dict[str, Any]:
+        classes = {}
+        for priority, stats in self.stats.items():
+            executed = stats['completed'] + stats['failed']
+            classes[priority] = {
+                'submitted': stats['submitted'],
+                'completed': stats['completed'],
+                'failed': stats['failed'],
+                'cancelled': stats['cancelled'],
+                'average_wait': round(stats['total_wait'] / executed, 3) if executed else 0.0,
+                'max_wait': round(stats['max_wait'], 3),
+                'average_round_trip': round(stats['total_round_trip'] / executed, 3) if executed else 0.0,
+                'max_round_trip': round(stats['max_round_trip'], 3),
+            }
+        return {
+            'running': self.is_running,
+            'queued': len(self._queue),
+            'current': self.current.to_dict() if self.current else None,
+            'preemptions': self.preemptions,
+            'classes': classes,
+        }
+
+
+class CommandLane:
+    """以固定优先级经调度器发送命令的驱动接口，动作方法与 AsyncTello 同名；
+    降落总是以降落优先级提交，紧急停止直接走调度器的 emergency；状态读取、rc、视频等其他属性直接访问驱动"""
+
+    def __init__(self, scheduler: CommandScheduler, priority: str, source: Optional[str] = None):
+        if priority not in PRIORITY_RANK:
+            raise ValueError(f"未知的优先级: {priority}")
+        self.scheduler = scheduler
+        self.priority = priority
+        self.source = source or priority
+
+    def __getattr__(self, name: str):
+        return getattr(self.scheduler.driver, name)
+
+    def blocking(self) -> BlockingTello:
+        """返回供后台线程使用的同步外观"""
+        return BlockingTello(self)
+
+    async def send_command(self, command: str, timeout: Optional[float] = None,
+                           retries: Optional[int] = None, priority: Optional[str] = None) -> str:
+        return await self.scheduler.run(command, priority or self.priority, self.source, timeout, retries)
+
+    async def send_control_command(self, command: str, timeout: Optional[float] = None,
+                                   priority: Optional[str] = None) -> bool:
+        """发送控制命令，应答为 ok 时返回True"""
+        response = await self.send_command(command, timeout, priority=priority)
+        if response.lower() != 'ok':
+            raise TelloError(f"{command}: {response}")
+        return True
+
+    async def send_read_command(self, command: str, timeout: Optional[float] = None) -> str:
+        return await self.send_command(command, timeout)
+
+    async def read_battery(self) -> int:
+        """电量：有新鲜状态包时直接读取，否则经调度器发送 battery? 查询"""
+        driver = self.scheduler.driver
+        if driver.state_age() < 1.0 and driver.telemetry.latest('bat') is not None:
+            return int(driver.telemetry.latest('bat'))
+        return int(float(await self.send_read_command('battery?')))
+
+    async def takeoff(self):
+        return await self.send_control_command('takeoff')
+
+    async def land(self):
+        return await self.send_control_command('land', priority=PRIORITY_LAND)
+
+    async def emergency(self):
+        return await self.scheduler.emergency()
+
+    async def move(self, direction: str, x: int):
+        return await self.send_control_command(f'{direction} {int(x)}')
+
+    async def move_up(self, x: int):
+        return await self.move('up', x)
+
+    async def move_down(self, x: int):
+        return await self.move('down', x)
+
+    async def move_left(self, x: int):
+        return await self.move('left', x)
+
+    async def move_right(self, x: int):
+        return await self.move('right', x)
+
+    async def move_forward(self, x: int):
+        return await self.move('forward', x)
+
+    async def move_back(self, x: int):
+        return await self.move('back', x)
+
+    async def rotate_clockwise(self, x: int):
+        return await self.send_control_command(f'cw {int(x)}')
+
+    async def rotate_counter_clockwise(self, x: int):
+        return await self.send_control_command(f'ccw {int(x)}')
+
+    async def flip(self, direction: str):
+        return await self.send_control_command(f'flip {direction}')
+
+    async def set_speed(self, x: int):
+        return await self.send_control_command(f'speed {int(x)}')
+
+    async def go_xyz_speed(self, x: int, y: int, z: int, speed: int):
+        return await self.send_control_command(f'go {int(x)} {int(y)} {int(z)} {int(speed)}')
+
+    async def go_xyz_speed_mid(self, x: int, y: int, z: int, speed: int, mid: int):
+        return await self.send_control_command(f'go {int(x)} {int(y)} {int(z)} {int(speed)} m{int(mid)}')
+
+    async def enable_mission_pads(self):
+        return await self.send_control_command('mon')
+
+    async def disable_mission_pads(self):
+        return await self.send_control_command('moff')
+
+    async def set_mission_pad_detection_direction(self, x: int):
+        return await self.send_control_command(f'mdirection {int(x)}')
+
+    async def streamon(self):
+        await self.send_control_command('streamon')
+        self.scheduler.driver.stream_on = True
+        return True
+
+    async def streamoff(self):
+        self.scheduler.driver.stop_frame_reader()
+        await self.send_control_command('streamoff')
+        self.scheduler.driver.stream_on = False
+        return True
@@ -1,6 +1,9 @@
 # crop_analyzer_dashscope.py - 专业农作物AI分析器
+import asyncio
 import base64
+import concurrent.futures
 import json
+import threading
 import time
 import random
 from io import BytesIO
@@ -8,6 +11,13 @@ import cv2
 import numpy as np
 from datetime import datetime
 
+from analysis_cache import AnalysisResultCache
+from cloud_budget import PRIORITY_AUTO, PRIORITY_OPERATOR, CloudBudgetManager
+from color_features import CROP_HEALTH_COLOR_CLASSES, ColorFeatureExtractor
+from image_preparation import ImagePreparer
+from json_extraction import PartialFieldScanner, extract_json_object
+from dashscope_client import AIOHTTP_AVAILABLE, AsyncDashScopeClient, extract_message_text
+
 try:
     import dashscope
     from dashscope import MultiModalConversation
@@ -18,68 +28,14 @@ except ImportError:
     print("警告: dashscope库未安装，将使用专业模拟分析模式")
 
 
-class CropAnalyzer:
-    """专业农作物健康分析器 - 集成农业专家知识库"""
-
-    def __init__(self, api_key, app_id=None):
-        self.api_key = api_key
-        self.app_id = app_id
-        self.model_name = "qwen-vl-max"  # 使用通义千问视觉模型
-
-        # 验证API配置
-        self.is_configured = self._validate_config()
-
-        # 分析计数器，确保每次分析都不同
-        self.analysis_count = 0
-
-        print(f"专业农作物分析器初始化: {'真实AI模式' if self.is_configured else '专业模拟模式'}")
-
-    def _validate_config(self):
-        """验证API配置"""
-        if not DASHSCOPE_AVAILABLE:
-            print("❌ dashscope库未安装")
-            return False
-
-        if not self.api_key or self.api_key == "your-api-key-here":
-            print("❌ API密钥未配置")
-            return False
-
-        try:
-            # 设置API密钥
-            dashscope.api_key = self.api_key
-            print("✅ API密钥配置成功")
-            return True
-        except Exception as e:
-            print(f"❌ API配置失败: {str(e)}")
-            return False
-
-    def _image_to_base64(self, image):
-        """将OpenCV图像转换为base64编码"""
-        try:
-            # 确保图像是BGR格式
-            if len(image.shape) == 3 and image.shape[2] == 3:
-                # BGR to RGB
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-            # 编码为JPEG
-            _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 85])
-
-            # 转换为base64
-            image_base64 = base64.b64encode(buffer).decode('utf-8')
-
-            return f"data:image/jpeg;base64,{image_base64}"
+# 流式响应中提前展示的字段
+PROGRESS_FIELDS = ('health_score', 'urgency', 'crop_type')
 
-        except Exception as e:
-            print(f"图像编码失败: {str(e)}")
-            return None
-
-    def _call_real_ai_api(self, image_base64):
-        """调用真实的阿里云百炼AI API进行专业农业分析"""
-        try:
-            print("🤖 正在调用阿里云百炼专业农业AI...")
+# 工作线程等待客户端事件循环结果时，在客户端截止时间之外额外留出的余量（秒）
+LOOP_WAIT_MARGIN = 5.0
 
-            # 构建专业农业分析提示
-            prompt = """
+# 专业农业分析提示词
+PROFESSIONAL_ANALYSIS_PROMPT = """
 请作为一位资深的农业专家和植物病理学家，对这张农作物图片进行专业分析。
 
 分析要求：
@@ -147,20 +103,114 @@ class CropAnalyzer:
 请基于图片中的实际情况进行专业分析，提供具体可行的农业指导建议。
 """
 
-            # 调用API
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {"image": image_base64},
-                        {"text": prompt}
-                    ]
-                }
-            ]
+
+class CropAnalyzer:
+    """专业农作物健康分析器 - 集成农业专家知识库"""
+
+    def __init__(self, api_key, app_id=None, result_cache=None, image_preparer=None, budget=None):
+        self.api_key = api_key
+        self.app_id = app_id
+        self.model_name = "qwen-vl-max"  # 使用通义千问视觉模型
+
+        # 感知哈希结果缓存：悬停时近似画面直接复用云端分析结果
+        self.result_cache = result_cache if result_cache is not None else AnalysisResultCache()
+
+        # 模拟分析使用的单次遍历颜色特征提取器
+        self.color_extractor = ColorFeatureExtractor(CROP_HEALTH_COLOR_CLASSES)
+
+        # 上传前的图像预处理（ROI裁剪、尺寸上限、按字节预算选择JPEG质量）
+        self.image_preparer = image_preparer if image_preparer is not None else ImagePreparer()
+
+        # 云端调用预算（限速、任务/每日限额），预算耗尽时回退到专业模拟
+        self.budget = budget if budget is not None else CloudBudgetManager()
+        self.budget_provider = 'dashscope'
+
+        # 异步客户端及其所在的事件循环（未绑定外部循环时按需启动私有循环）
+        self.streaming_enabled = True
+        self.async_client = None
+        self._client_loop = None
+        self._loop_lock = threading.Lock()
+
+        # 验证API配置
+        self.is_configured = self._validate_config()
+
+        # 分析计数器，确保每次分析都不同
+        self.analysis_count = 0
+
+        print(f"专业农作物分析器初始化: {'真实AI模式' if self.is_configured else '专业模拟模式'}")
+
+    def _validate_config(self):
+        """验证API配置"""
+        if not DASHSCOPE_AVAILABLE and not AIOHTTP_AVAILABLE:
+            print("❌ dashscope库与aiohttp库均未安装")
+            return False
+
+        if not self.api_key or self.api_key == "your-api-key-here":
+            print("❌ API密钥未配置")
+            return False
+
+        try:
+            if AIOHTTP_AVAILABLE:
+                self.async_client = AsyncDashScopeClient(self.api_key)
+            if DASHSCOPE_AVAILABLE:
+                # 设置API密钥
+                dashscope.api_key = self.api_key
+            print("✅ API密钥配置成功")
+            return True
+        except Exception as e:
+            print(f"❌ API配置失败: {str(e)}")
+            return False
+
+    def _prepare_image(self, image, roi_boxes=None):
+        """按上传预算预处理图像，返回 PreparedImage，失败时返回None"""
+        try:
+            return self.image_preparer.prepare(image, roi_boxes)
+        except Exception as e:
+            print(f"图像编码失败: {str(e)}")
+            return None
+
+    def _image_to_base64(self, image, roi_boxes=None):
+        """将OpenCV图像转换为base64编码"""
+        prepared = self._prepare_image(image, roi_boxes)
+        return prepared.data_url if prepared else None
+
+    def _record_upload(self, image, prepared, started_at, plant_id):
+        """记录本次分析的上传字节数与端到端延迟"""
+        try:
+            baseline = self.image_preparer.baseline_bytes(image) if self.image_preparer.measure_baseline else None
+            latency = time.time() - started_at
+            self.image_preparer.record(prepared, latency, baseline_bytes=baseline, plant_id=plant_id)
+            print(f"📦 上传 {prepared.upload_bytes / 1024:.1f}KB "
+                  f"({prepared.prepared_size[0]}x{prepared.prepared_size[1]}, q={prepared.quality})，"
+                  f"端到端 {latency:.2f}s")
+        except Exception as e:
+            print(f"⚠️ 上传统计记录失败: {e}")
+
+    def _build_messages(self, image_base64):
+        """构建多模态分析消息"""
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {"image": image_base64},
+                    {"text": PROFESSIONAL_ANALYSIS_PROMPT}
+                ]
+            }
+        ]
+
+    def _call_real_ai_api(self, image_base64, progress_callback=None):
+        """调用真实的阿里云百炼AI API进行专业农业分析（同步入口）"""
+        # 优先使用异步客户端：有并发上限和截止时间，不会无限堆积线程
+        if self.async_client is not None:
+            return self._run_on_client_loop(self._call_real_ai_api_async(image_base64, progress_callback))
+
+        try:
+            print("🤖 正在调用阿里云百炼专业农业AI...")
+            started = time.monotonic()
 
             response = MultiModalConversation.call(
                 model=self.model_name,
-                messages=messages,
+                messages=self._build_messages(image_base64),
                 top_p=0.8,
                 temperature=0.3  # 降低随机性，提高一致性
             )
@@ -168,70 +218,18 @@ class CropAnalyzer:
             if response.status_code == 200:
                 # 【修复】正确解析API响应格式
                 raw_response = response.output.choices[0].message.content
-                print(f"✅ 专业农业AI响应: {str(raw_response)[:200]}...")
-
-                try:
-                    # 处理不同的响应格式
-                    if isinstance(raw_response, list):
-                        # 如果响应是列表，提取文本内容
-                        ai_response = ""
-                        for item in raw_response:
-                            if isinstance(item, dict) and 'text' in item:
-                                ai_response += item['text']
-                            else:
-                                ai_response += str(item)
-                    else:
-                        # 如果响应是字符串
-                        ai_response = str(raw_response)
-
-                    print(f"📝 解析后的文本: {ai_response[:200]}...")
-
-                    # 尝试解析JSON响应
-                    if ai_response.strip().startswith('{'):
-                        analysis_data = json.loads(ai_response)
-                    elif '```json' in ai_response:
-                        # 如果响应包含markdown格式的JSON
-                        import re
-                        json_match = re.search(r'```json\s*\n(.*?)\n```', ai_response, re.DOTALL)
-                        if json_match:
-                            json_text = json_match.group(1).strip()
-                            analysis_data = json.loads(json_text)
-                        else:
-                            # 尝试找到任何JSON对象
-                            json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-                            if json_match:
-                                analysis_data = json.loads(json_match.group())
-                            else:
-                                raise ValueError("无法提取JSON数据")
-                    else:
-                        # 如果响应不是JSON，尝试提取JSON部分
-                        import re
-                        json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-                        if json_match:
-                            analysis_data = json.loads(json_match.group())
-                        else:
-                            raise ValueError("无法提取JSON数据")
-
-                    # 验证必要字段
-                    required_fields = ['health_score', 'analysis_summary']
-                    for field in required_fields:
-                        if field not in analysis_data:
-                            analysis_data[field] = self._get_default_value(field)
-
-                    # 添加分析ID和时间戳
-                    analysis_data["analysis_id"] = f"AI_{self.analysis_count}_{int(time.time())}"
-                    analysis_data["analysis_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                    return {
-                        "status": "ok",
-                        **analysis_data
-                    }
-
-                except json.JSONDecodeError as e:
-                    print(f"❌ JSON解析失败: {str(e)}")
-                    # 返回基于文本的分析结果
-                    return self._parse_text_response(ai_response)
-
+                result = self._parse_ai_content(raw_response)
+                usage = getattr(response, 'usage', None)
+                if usage:
+                    result["usage"] = dict(usage)
+                # SDK 不支持流式输出：完整结果到达时一次性回调进度字段
+                if progress_callback is not None and result.get("status") == "ok":
+                    fields = {key: result[key] for key in PROGRESS_FIELDS if key in result}
+                    try:
+                        progress_callback(fields, time.monotonic() - started)
+                    except Exception as e:
+                        print(f"⚠️ 分析进度回调失败: {e}")
+                return result
             else:
                 error_msg = f"API调用失败: {response.status_code}"
                 print(f"❌ {error_msg}")
@@ -242,6 +240,164 @@ class CropAnalyzer:
             print(f"❌ {error_msg}")
             return {"status": "error", "message": error_msg}
 
+    async def _call_real_ai_api_async(self, image_base64, progress_callback=None):
+        """通过异步客户端调用百炼多模态接口，提供 progress_callback 时使用流式输出"""
+        try:
+            print("🤖 正在调用阿里云百炼专业农业AI...")
+            if progress_callback is not None and self.streaming_enabled:
+                return await self._stream_real_ai_api(image_base64, progress_callback)
+
+            response = await self.async_client.call_multimodal(
+                self.model_name,
+                self._build_messages(image_base64),
+                parameters={"top_p": 0.8, "temperature": 0.3}
+            )
+            result = self._parse_ai_content(extract_message_text(response))
+            if response.get("usage"):
+                result["usage"] = dict(response["usage"])
+            return result
+
+        except asyncio.TimeoutError:
+            error_msg = "真实AI分析超时"
+            print(f"❌ {error_msg}")
+            return {"status": "error", "message": error_msg}
+        except Exception as e:
+            error_msg = f"真实AI分析失败: {str(e)}"
+            print(f"❌ {error_msg}")
+            return {"status": "error", "message": error_msg}
+
+    async def _stream_real_ai_api(self, image_base64, progress_callback):
+        """流式调用：health_score、urgency、crop_type 一出现即回调，结束后返回完整解析结果
+
+        progress_callback(fields, elapsed) 在客户端事件循环线程中调用，不应阻塞。
+        """
+        started = time.monotonic()
+        scanner = PartialFieldScanner(PROGRESS_FIELDS)
+        first_field_at = None
+        parts = []
+        usage = {}
+
+        async for delta in self.async_client.stream_multimodal(
+                self.model_name,
+                self._build_messages(image_base64),
+                parameters={"top_p": 0.8, "temperature": 0.3},
+                usage=usage):
+            parts.append(delta)
+            found = scanner.feed(delta)
+            if found:
+                elapsed = time.monotonic() - started
+                if first_field_at is None:
+                    first_field_at = elapsed
+                    print(f"⚡ {elapsed:.2f}s 收到首个分析字段: {', '.join(found)}")
+                try:
+                    progress_callback(dict(scanner.values), elapsed)
+                except Exception as e:
+                    print(f"⚠️ 分析进度回调失败: {e}")
+
+        result = self._parse_ai_content(''.join(parts))
+        if usage:
+            result["usage"] = usage
+        if result.get("status") == "ok":
+            result["stream_first_field_seconds"] = round(first_field_at, 2) if first_field_at is not None else None
+            result["stream_total_seconds"] = round(time.monotonic() - started, 2)
+        return result
+
+    def _parse_ai_content(self, raw_response):
+        """解析模型回复内容为结构化分析结果"""
+        print(f"✅ 专业农业AI响应: {str(raw_response)[:200]}...")
+
+        # 处理不同的响应格式
+        if isinstance(raw_response, list):
+            # 如果响应是列表，提取文本内容
+            ai_response = ""
+            for item in raw_response:
+                if isinstance(item, dict) and 'text' in item:
+                    ai_response += item['text']
+                else:
+                    ai_response += str(item)
+        else:
+            # 如果响应是字符串
+            ai_response = str(raw_response)
+
+        try:
+            print(f"📝 解析后的文本: {ai_response[:200]}...")
+
+            # 线性扫描提取第一个完整的JSON对象（支持markdown代码块与前后说明文字）
+            analysis_data = extract_json_object(ai_response)
+            if not isinstance(analysis_data, dict):
+                if '{' in ai_response:
+                    raise json.JSONDecodeError("未找到完整的JSON对象", ai_response, ai_response.find('{'))
+                raise ValueError("无法提取JSON数据")
+
+            # 验证必要字段
+            required_fields = ['health_score', 'analysis_summary']
+            for field in required_fields:
+                if field not in analysis_data:
+                    analysis_data[field] = self._get_default_value(field)
+
+            # 添加分析ID和时间戳
+            analysis_data["analysis_id"] = f"AI_{self.analysis_count}_{int(time.time())}"
+            analysis_data["analysis_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            return {
+                "status": "ok",
+                **analysis_data
+            }
+
+        except json.JSONDecodeError as e:
+            print(f"❌ JSON解析失败: {str(e)}")
+            # 返回基于文本的分析结果
+            return self._parse_text_response(ai_response)
+        except ValueError as e:
+            error_msg = f"真实AI分析失败: {str(e)}"
+            print(f"❌ {error_msg}")
+            return {"status": "error", "message": error_msg}
+
+    def attach_event_loop(self, loop):
+        """将异步客户端绑定到外部事件循环（如后端主循环）"""
+        self._client_loop = loop
+
+    def _run_on_client_loop(self, coro):
+        """在客户端事件循环上执行协程并同步等待结果（供工作线程调用）"""
+        loop = self._client_loop
+        if loop is None or loop.is_closed():
+            loop = self._start_private_loop()
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            # 在事件循环线程内同步等待会造成死锁，应改用 analyze_crop_health_async
+            coro.close()
+            return {"status": "error", "message": "不能在事件循环线程中同步调用AI分析"}
+
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        # 客户端内部已有截止时间，这里额外留出余量防止永久阻塞
+        timeout = self.async_client.deadline + LOOP_WAIT_MARGIN
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            # 事件循环阻塞或协程未响应截止时间：取消协程，返回错误让调用方走模拟分析
+            future.cancel()
+            print(f"⏰ 等待AI分析结果超过{timeout:.1f}秒，已取消")
+            return {"status": "error", "message": f"AI分析等待超时（{timeout:.1f}秒）"}
+
+    def _start_private_loop(self):
+        """没有外部事件循环时，启动一个私有后台事件循环"""
+        with self._loop_lock:
+            if self._client_loop is None or self._client_loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="dashscope-client-loop", daemon=True)
+                thread.start()
+                self._client_loop = loop
+            return self._client_loop
+
+    async def close(self):
+        """关闭异步客户端连接池"""
+        if self.async_client is not None:
+            await self.async_client.close()
+
     def _parse_text_response(self, text_response):
         """解析文本响应为结构化数据"""
         try:
@@ -316,6 +472,8 @@ class CropAnalyzer:
             # 添加时间戳确保唯一性
             analysis["analysis_id"] = f"PRO_{self.analysis_count}_{int(time.time())}"
             analysis["analysis_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            # 标记为模拟结果：调用方据此区分真实分析（如分析队列保留任务稍后重试）
+            analysis["simulated"] = True
 
             return analysis
 
@@ -329,49 +487,17 @@ class CropAnalyzer:
     def _analyze_image_features_professional(self, image):
         """基于实际图像特征的专业农作物分析"""
         try:
-            # 转换为HSV进行颜色分析
-            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-
-            # 分析绿色区域（健康植被）
-            green_lower = np.array([35, 40, 40])
-            green_upper = np.array([85, 255, 255])
-            green_mask = cv2.inRange(hsv, green_lower, green_upper)
-            green_ratio = np.sum(green_mask > 0) / (image.shape[0] * image.shape[1])
-
-            # 分析深绿色（成熟叶片）
-            dark_green_lower = np.array([35, 60, 20])
-            dark_green_upper = np.array([85, 255, 120])
-            dark_green_mask = cv2.inRange(hsv, dark_green_lower, dark_green_upper)
-            dark_green_ratio = np.sum(dark_green_mask > 0) / (image.shape[0] * image.shape[1])
-
-            # 分析浅绿色（新叶）
-            light_green_lower = np.array([35, 30, 120])
-            light_green_upper = np.array([85, 255, 255])
-            light_green_mask = cv2.inRange(hsv, light_green_lower, light_green_upper)
-            light_green_ratio = np.sum(light_green_mask > 0) / (image.shape[0] * image.shape[1])
-
-            # 分析黄色/棕色区域（可能的病害）
-            yellow_lower = np.array([15, 40, 40])
-            yellow_upper = np.array([35, 255, 255])
-            yellow_mask = cv2.inRange(hsv, yellow_lower, yellow_upper)
-            yellow_ratio = np.sum(yellow_mask > 0) / (image.shape[0] * image.shape[1])
-
-            # 分析棕色区域（严重病害或枯死）
-            brown_lower = np.array([8, 50, 20])
-            brown_upper = np.array([20, 255, 200])
-            brown_mask = cv2.inRange(hsv, brown_lower, brown_upper)
-            brown_ratio = np.sum(brown_mask > 0) / (image.shape[0] * image.shape[1])
-
-            # 分析图像亮度
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            brightness = np.mean(gray)
-
-            # 分析图像清晰度
-            laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-
-            # 分析叶片形状特征（边缘检测）
-            edges = cv2.Canny(gray, 50, 150)
-            edge_density = np.sum(edges > 0) / (image.shape[0] * image.shape[1])
+            # 一次联合直方图得到全部颜色占比（绿色/深绿/浅绿/黄色/棕色），
+            # 亮度、清晰度与边缘密度在原分辨率的灰度图上计算，与下方阈值的标定一致
+            features = self.color_extractor.extract(image)
+            green_ratio = features['green']
+            dark_green_ratio = features['dark_green']
+            light_green_ratio = features['light_green']
+            yellow_ratio = features['yellow']
+            brown_ratio = features['brown']
+            brightness = features['brightness']
+            laplacian_var = features['laplacian_var']
+            edge_density = features['edge_density']
 
             # 推断作物类型
             crop_type = self._identify_crop_type(green_ratio, dark_green_ratio, light_green_ratio, edge_density)
@@ -969,41 +1095,181 @@ class CropAnalyzer:
 
         return scenario
 
-    def analyze_crop_health(self, image):
-        """分析农作物健康状况 - 专业版本"""
+    def _lookup_cache(self, image, plant_id, use_cache):
+        """查询近似画面的缓存结果，返回 (命中结果, 图像哈希)"""
+        if not use_cache or self.result_cache is None or image is None:
+            return None, None
+        try:
+            image_hash = self.result_cache.compute_hash(image)
+            cached = self.result_cache.lookup(image_hash, plant_id=plant_id)
+            if cached is not None:
+                print(f"♻️ 命中分析缓存 (距离={cached['cache_distance']}, 已节省调用 {self.result_cache.stats.saved_calls} 次)")
+            return cached, image_hash
+        except Exception as e:
+            print(f"⚠️ 分析缓存查询失败: {e}")
+            return None, None
+
+    def _store_cache(self, image_hash, result, plant_id, call_latency):
+        """缓存成功的云端分析结果"""
+        if image_hash is not None:
+            self.result_cache.store(image_hash, result, plant_id=plant_id, call_latency=call_latency)
+
+    def _acquire_budget(self, priority):
+        """申请一次云端调用预算，被拒绝时返回 BudgetDecision，放行时返回None"""
+        if self.budget is None:
+            return None
+        decision = self.budget.acquire(self.budget_provider, priority)
+        if decision.allowed:
+            return None
+        print(f"💰 云端调用预算不足 ({decision.reason})，切换到专业模拟")
+        return decision
+
+    def _record_budget(self, result, call_latency):
+        """记录一次云端调用的延迟与令牌用量"""
+        if self.budget is not None:
+            self.budget.record(self.budget_provider, call_latency,
+                               success=result.get("status") == "ok", usage=result.get("usage"))
+
+    @staticmethod
+    def _mark_budget_limited(result, decision):
+        """标记因预算不足而使用模拟分析的结果"""
+        if decision is not None:
+            result["budget_limited"] = True
+            result["budget_reason"] = decision.reason
+            result["budget_retry_after"] = round(decision.retry_after, 1)
+        return result
+
+    def _analysis_error(self, e):
+        """构建分析异常时的返回结果"""
+        error_msg = f"专业分析过程出错: {str(e)}"
+        print(f"❌ {error_msg}")
+        return {
+            "status": "error",
+            "message": error_msg,
+            "health_score": 0,
+            "analysis_summary": "专业分析失败",
+            "urgency": "high",
+            "issues": [],
+            "recommendations": ["请检查系统配置", "重新尝试分析"]
+        }
+
+    def analyze_crop_health(self, image, plant_id=None, use_cache=True, roi_boxes=None,
+                            progress_callback=None, priority=PRIORITY_AUTO):
+        """分析农作物健康状况 - 专业版本
+
+        Args:
+            image: OpenCV BGR图像
+            plant_id: 植株ID（可选），与图像哈希共同组成缓存键
+            use_cache: 是否允许复用近似画面的云端分析结果
+            roi_boxes: 感兴趣区域检测框列表 (x1, y1, x2, y2)，上传前裁剪到其并集
+            progress_callback: 流式分析进度回调 callback(已解析字段, 已用秒数)
+            priority: 调用优先级，'operator' 为操作员主动发起，可使用预算的优先通道
+        """
+        started_at = time.time()
+        denied = None
         try:
             print(f"🔍 开始专业农业分析 #{self.analysis_count + 1}")
 
             if self.is_configured:
+                # 先查缓存，避免对近似画面重复付费调用
+                cached, image_hash = self._lookup_cache(image, plant_id, use_cache)
+                if cached is not None:
+                    return cached
+
+                denied = self._acquire_budget(priority)
+
                 # 尝试真实AI分析
-                image_base64 = self._image_to_base64(image)
-                if image_base64:
-                    result = self._call_real_ai_api(image_base64)
+                prepared = self._prepare_image(image, roi_boxes) if denied is None else None
+                if prepared:
+                    call_start = time.time()
+                    result = self._call_real_ai_api(prepared.data_url, progress_callback)
+                    self._record_budget(result, time.time() - call_start)
+                    self._record_upload(image, prepared, started_at, plant_id)
                     if result["status"] == "ok":
                         print("✅ 真实专业农业AI分析成功")
+                        self._store_cache(image_hash, result, plant_id, time.time() - call_start)
                         return result
                     else:
                         print("⚠️ 真实AI分析失败，切换到专业模拟")
-                else:
+                elif denied is None:
                     print("⚠️ 图像编码失败，切换到专业模拟")
 
             # 使用专业模拟分析
             result = self._generate_professional_simulation(image)
             print("✅ 专业农业模拟分析完成")
-            return result
+            return self._mark_budget_limited(result, denied)
 
         except Exception as e:
-            error_msg = f"专业分析过程出错: {str(e)}"
-            print(f"❌ {error_msg}")
-            return {
-                "status": "error",
-                "message": error_msg,
-                "health_score": 0,
-                "analysis_summary": "专业分析失败",
-                "urgency": "high",
-                "issues": [],
-                "recommendations": ["请检查系统配置", "重新尝试分析"]
-            }
+            return self._analysis_error(e)
+
+    async def analyze_crop_health_async(self, image, plant_id=None, use_cache=True, roi_boxes=None,
+                                        progress_callback=None, priority=PRIORITY_AUTO):
+        """分析农作物健康状况 - 异步版本，供事件循环内直接 await
+
+        图像编码与模拟分析属于CPU密集操作，放到默认线程池执行；
+        云端调用走异步客户端，受并发上限与截止时间约束。
+        """
+        loop = asyncio.get_running_loop()
+        started_at = time.time()
+        denied = None
+        try:
+            print(f"🔍 开始专业农业分析 #{self.analysis_count + 1}")
+
+            if self.is_configured:
+                cached, image_hash = self._lookup_cache(image, plant_id, use_cache)
+                if cached is not None:
+                    return cached
+
+                denied = self._acquire_budget(priority)
+                prepared = None
+                if denied is None:
+                    prepared = await loop.run_in_executor(None, self._prepare_image, image, roi_boxes)
+                if prepared:
+                    call_start = time.time()
+                    if self.async_client is not None:
+                        result = await self._call_real_ai_api_async(prepared.data_url, progress_callback)
+                    else:
+                        result = await loop.run_in_executor(None, self._call_real_ai_api, prepared.data_url,
+                                                            progress_callback)
+                    self._record_budget(result, time.time() - call_start)
+                    self._record_upload(image, prepared, started_at, plant_id)
+                    if result["status"] == "ok":
+                        print("✅ 真实专业农业AI分析成功")
+                        self._store_cache(image_hash, result, plant_id, time.time() - call_start)
+                        return result
+                    else:
+                        print("⚠️ 真实AI分析失败，切换到专业模拟")
+                elif denied is None:
+                    print("⚠️ 图像编码失败，切换到专业模拟")
+
+            result = await loop.run_in_executor(None, self._generate_professional_simulation, image)
+            print("✅ 专业农业模拟分析完成")
+            return self._mark_budget_limited(result, denied)
+
+        except Exception as e:
+            return self._analysis_error(e)
+
+    def get_cache_stats(self):
+        """获取分析缓存统计（命中率、估算节省的调用次数）"""
+        if self.result_cache is None:
+            return {}
+        return self.result_cache.get_stats()
+
+    def get_upload_stats(self):
+        """获取上传统计（每次分析的上传字节数、端到端延迟）"""
+        return self.image_preparer.get_stats()
+
+    def get_client_stats(self):
+        """获取异步客户端统计（在途请求数、重试、超时、平均延迟）"""
+        if self.async_client is None:
+            return {}
+        return self.async_client.get_stats()
+
+    def get_budget_stats(self):
+        """获取云端调用预算统计（调用次数、延迟、估算费用、限额使用情况）"""
+        if self.budget is None:
+            return {}
+        return self.budget.get_stats()
 
     def test_connection(self):
         """测试API连接"""
@@ -1015,7 +1281,27 @@ class CropAnalyzer:
             test_image = np.zeros((100, 100, 3), dtype=np.uint8)
             test_image[:] = (0, 255, 0)  # 绿色测试图像
 
-            result = self.analyze_crop_health(test_image)
+            result = self.analyze_crop_health(test_image, use_cache=False, priority=PRIORITY_OPERATOR)
+
+            if result["status"] == "ok":
+                return {"status": "ok", "message": "专业农业AI连接测试成功"}
+            else:
+                return {"status": "error", "message": f"测试失败: {result.get('message', '未知错误')}"}
+
+        except Exception as e:
+            return {"status": "error", "message": f"连接测试异常: {str(e)}"}
+
+    async def test_connection_async(self):
+        """测试API连接 - 异步版本"""
+        if not self.is_configured:
+            return {"status": "error", "message": "API未正确配置"}
+
+        try:
+            test_image = np.zeros((100, 100, 3), dtype=np.uint8)
+            test_image[:] = (0, 255, 0)  # 绿色测试图像
+
+            result = await self.analyze_crop_health_async(test_image, use_cache=False,
+                                                          priority=PRIORITY_OPERATOR)
 
             if result["status"] == "ok":
                 return {"status": "ok", "message": "专业农业AI连接测试成功"}
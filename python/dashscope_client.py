@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+阿里云百炼（DashScope）多模态接口异步客户端
+连接池复用 + 并发上限 + 请求截止时间 + 抖动重试，另附本地桩服务器用于测试
+"""
+
+import asyncio
+import json
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+try:
+    import aiohttp
+    from aiohttp import web
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+    print("警告: aiohttp库未安装，DashScope异步客户端不可用")
+
+
+DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com"
+MULTIMODAL_PATH = "/api/v1/services/aigc/multimodal-generation/generation"
+
+# 可重试的HTTP状态码：限流与服务端错误
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class DashScopeAPIError(Exception):
+    """DashScope接口调用错误"""
+
+    def __init__(self, message, status=None, code=None, retryable=False):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.retryable = retryable
+
+
+class AsyncDashScopeClient:
+    """DashScope多模态异步客户端"""
+
+    def __init__(self, api_key: str, base_url: str = DASHSCOPE_BASE_URL,
+                 max_concurrency: int = 4, request_timeout: float = 20.0,
+                 deadline: float = 45.0, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 pool_size: int = 8):
+        """
+        Args:
+            api_key: DashScope API密钥
+            base_url: 服务地址（测试时可指向本地桩服务器）
+            max_concurrency: 同时在途的请求上限
+            request_timeout: 单次HTTP尝试的超时（秒）
+            deadline: 单个请求（含重试与排队）的默认截止时间（秒）
+            max_retries: 最大重试次数
+            backoff_base: 退避基数（秒）
+            backoff_max: 单次退避上限（秒）
+            pool_size: HTTP连接池大小
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("aiohttp库未安装，无法创建DashScope异步客户端")
+
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.request_timeout = float(request_timeout)
+        self.deadline = float(deadline)
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.pool_size = max(1, int(pool_size))
+
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+        # 统计信息
+        self.stats = {
+            'requests': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'retries': 0,
+            'timeouts': 0,
+            'in_flight': 0,
+            'waiting': 0,
+            'max_in_flight': 0,
+            'total_latency': 0.0
+        }
+
+    async def _ensure_session(self):
+        """在当前事件循环中创建（或复用）连接池会话"""
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is not loop:
+            # 连接池绑定在其他事件循环上：先在原事件循环中关闭旧会话，避免泄漏连接
+            await self._close_session()
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    'Authorization': f'Bearer {self.api_key}',
+                    'Content-Type': 'application/json'
+                }
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._session
+
+    async def close(self):
+        """关闭连接池"""
+        await self._close_session()
+
+    async def _close_session(self):
+        """在会话所属的事件循环中关闭会话
+
+        Raises:
+            RuntimeError: 会话所属的事件循环已停止，无法关闭（拒绝改绑到新的事件循环）
+        """
+        session, owner = self._session, self._loop
+        if session is None or session.closed:
+            self._session = None
+            return
+        if owner is None or owner is asyncio.get_running_loop():
+            await session.close()
+        elif owner.is_running():
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), owner))
+        else:
+            raise RuntimeError("DashScope连接池所在的事件循环已停止，无法关闭旧会话；请在该事件循环结束前调用 close()")
+        self._session = None
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """指数退避 + 全抖动"""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    async def call_multimodal(self, model: str, messages: List[Dict[str, Any]],
+                              parameters: Optional[Dict[str, Any]] = None,
+                              deadline: Optional[float] = None) -> Dict[str, Any]:
+        """调用多模态生成接口，返回原始JSON响应
+
+        Args:
+            model: 模型名称，如 qwen-vl-max
+            messages: 与SDK相同格式的消息列表
+            parameters: 生成参数（top_p、temperature等）
+            deadline: 本次请求的截止时间（秒），默认使用客户端配置
+
+        Raises:
+            DashScopeAPIError: 接口返回错误或重试耗尽
+            asyncio.TimeoutError: 超过截止时间
+        """
+        session = await self._ensure_session()
+        payload = {
+            'model': model,
+            'input': {'messages': messages},
+            'parameters': parameters or {}
+        }
+        url = f"{self.base_url}{MULTIMODAL_PATH}"
+        expires_at = time.monotonic() + (deadline if deadline is not None else self.deadline)
+        start_time = time.monotonic()
+        self.stats['requests'] += 1
+
+        try:
+            self.stats['waiting'] += 1
+            try:
+                remaining = expires_at - time.monotonic()
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=max(0.0, remaining))
+            finally:
+                self.stats['waiting'] -= 1
+
+            try:
+                self.stats['in_flight'] += 1
+                self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+                result = await self._post_with_retries(session, url, payload, expires_at)
+            finally:
+                self.stats['in_flight'] -= 1
+                self._semaphore.release()
+
+            self.stats['succeeded'] += 1
+            self.stats['total_latency'] += time.monotonic() - start_time
+            return result
+
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            self.stats['failed'] += 1
+            raise
+        except Exception:
+            self.stats['failed'] += 1
+            raise
+
+    async def _post_with_retries(self, session, url, payload, expires_at) -> Dict[str, Any]:
+        """带截止时间与抖动退避的POST请求"""
+        attempt = 0
+        while True:
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError("DashScope请求超过截止时间")
+
+            timeout = aiohttp.ClientTimeout(total=min(self.request_timeout, remaining))
+            try:
+                async with session.post(url, json=payload, timeout=timeout) as response:
+                    body = await response.text()
+                    if response.status == 200:
+                        return json.loads(body)
+
+                    code, message = None, body[:200]
+                    try:
+                        error_body = json.loads(body)
+                        code = error_body.get('code')
+                        message = error_body.get('message', message)
+                    except ValueError:
+                        pass
+                    raise DashScopeAPIError(
+                        f"API调用失败: {response.status} {message}",
+                        status=response.status,
+                        code=code,
+                        retryable=response.status in RETRYABLE_STATUS
+                    )
+
+            except DashScopeAPIError as e:
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise
+                    raise DashScopeAPIError(f"网络错误: {e}", retryable=True) from e
+                error = e
+
+            delay = self._backoff_delay(attempt)
+            if time.monotonic() + delay >= expires_at:
+                raise asyncio.TimeoutError(f"DashScope请求超过截止时间（最后错误: {error}）")
+            attempt += 1
+            self.stats['retries'] += 1
+            print(f"⚠️ DashScope请求失败，{delay:.2f}秒后重试 ({attempt}/{self.max_retries}): {error}")
+            await asyncio.sleep(delay)
+
+    async def stream_multimodal(self, model: str, messages: List[Dict[str, Any]],
+                                parameters: Optional[Dict[str, Any]] = None,
+                                deadline: Optional[float] = None,
+                                usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """以SSE流式调用多模态接口，逐段产出增量文本
+
+        只在收到首个数据前重试；开始产出文本后出错直接抛出，由调用方决定是否回退。
+        提供 usage 字典时，用响应中的令牌用量更新它。
+
+        Raises:
+            DashScopeAPIError: 接口返回错误或重试耗尽
+            asyncio.TimeoutError: 超过截止时间
+        """
+        session = await self._ensure_session()
+        payload = {
+            'model': model,
+            'input': {'messages': messages},
+            'parameters': dict(parameters or {}, incremental_output=True)
+        }
+        headers = {'X-DashScope-SSE': 'enable', 'Accept': 'text/event-stream'}
+        url = f"{self.base_url}{MULTIMODAL_PATH}"
+        expires_at = time.monotonic() + (deadline if deadline is not None else self.deadline)
+        start_time = time.monotonic()
+        self.stats['requests'] += 1
+
+        try:
+            self.stats['waiting'] += 1
+            try:
+                remaining = expires_at - time.monotonic()
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=max(0.0, remaining))
+            finally:
+                self.stats['waiting'] -= 1
+
+            try:
+                self.stats['in_flight'] += 1
+                self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+                attempt = 0
+                while True:
+                    response = await self._open_stream(session, url, payload, headers, expires_at, attempt)
+                    if response is not None:
+                        break
+                    attempt += 1
+
+                async with response:
+                    while True:
+                        remaining = expires_at - time.monotonic()
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError("DashScope流式请求超过截止时间")
+                        line = await asyncio.wait_for(response.content.readline(), timeout=remaining)
+                        if not line:
+                            break
+                        event = self._parse_sse_event(line.decode('utf-8', errors='replace'))
+                        if event is None:
+                            continue
+                        if usage is not None and event.get('usage'):
+                            usage.update(event['usage'])
+                        text = extract_message_text(event) if 'output' in event else ''
+                        if text:
+                            yield text
+            finally:
+                self.stats['in_flight'] -= 1
+                self._semaphore.release()
+
+            self.stats['succeeded'] += 1
+            self.stats['total_latency'] += time.monotonic() - start_time
+
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            self.stats['failed'] += 1
+            raise
+        except Exception:
+            self.stats['failed'] += 1
+            raise
+
+    async def _open_stream(self, session, url, payload, headers, expires_at, attempt):
+        """发起流式请求；可重试的失败返回None（已完成退避等待）"""
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("DashScope流式请求超过截止时间")
+
+        try:
+            response = await asyncio.wait_for(
+                session.post(url, json=payload, headers=headers), timeout=min(self.request_timeout, remaining))
+            if response.status == 200:
+                return response
+            body = await response.text()
+            response.release()
+            error = DashScopeAPIError(f"API调用失败: {response.status} {body[:200]}",
+                                      status=response.status,
+                                      retryable=response.status in RETRYABLE_STATUS)
+            if not error.retryable or attempt >= self.max_retries:
+                raise error
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # 与非流式请求一致：单次请求超时在截止时间内按退避重试
+            if attempt >= self.max_retries:
+                if isinstance(e, asyncio.TimeoutError):
+                    raise
+                raise DashScopeAPIError(f"网络错误: {e}", retryable=True) from e
+            error = e
+
+        delay = self._backoff_delay(attempt)
+        if time.monotonic() + delay >= expires_at:
+            raise asyncio.TimeoutError(f"DashScope请求超过截止时间（最后错误: {error}）")
+        self.stats['retries'] += 1
+        print(f"⚠️ DashScope流式请求失败，{delay:.2f}秒后重试 ({attempt + 1}/{self.max_retries}): {error}")
+        await asyncio.sleep(delay)
+        return None
+
+    @staticmethod
+    def _parse_sse_event(line: str) -> Optional[Dict[str, Any]]:
+        """解析一行SSE，返回其中的事件数据，非数据行返回None"""
+        if not line.startswith('data:'):
+            return None
+        data = line[5:].strip()
+        if not data:
+            return None
+        event = json.loads(data)
+        if 'output' not in event and event.get('code'):
+            raise DashScopeAPIError(f"流式响应错误: {event.get('code')} {event.get('message', '')}",
+                                    code=event.get('code'))
+        return event
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取客户端统计"""
+        stats = dict(self.stats)
+        succeeded = stats['succeeded']
+        stats['avg_latency'] = round(stats.pop('total_latency') / succeeded, 3) if succeeded else 0.0
+        stats['max_concurrency'] = self.max_concurrency
+        return stats
+
+
+def extract_message_text(response: Dict[str, Any]) -> str:
+    """从多模态响应中提取文本内容"""
+    choices = response['output'].get('choices') or []
+    if not choices:
+        return ''
+    content = choices[0]['message']['content']
+    if isinstance(content, list):
+        return ''.join(item['text'] if isinstance(item, dict) and 'text' in item else str(item)
+                       for item in content)
+    return str(content)
+
+
+class DashScopeStubServer:
+    """本地DashScope桩服务器，用于测试并发、超时与重试行为"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay: float = 0.0,
+                 fail_first: int = 0, fail_status: int = 503, reply_text: Optional[str] = None,
+                 stream_chunk_size: int = 16, stream_chunk_delay: float = 0.0):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口（0表示自动分配）
+            delay: 每个请求的模拟处理延迟（秒）
+            fail_first: 前N个请求返回 fail_status
+            fail_status: 注入错误时返回的状态码
+            reply_text: 模型回复文本，默认返回固定的健康分析JSON
+            stream_chunk_size: 流式响应中每个事件携带的字符数
+            stream_chunk_delay: 流式响应中相邻事件的间隔（秒）
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("aiohttp库未安装，无法启动桩服务器")
+
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.reply_text = reply_text or json.dumps({
+            'health_score': 82,
+            'analysis_summary': '桩服务器返回的测试分析',
+            'urgency': 'low',
+            'crop_type': {'name': '草莓', 'confidence': 90, 'characteristics': '测试'},
+            'recommendations': ['继续观察']
+        }, ensure_ascii=False)
+
+        self.stream_chunk_size = max(1, int(stream_chunk_size))
+        self.stream_chunk_delay = stream_chunk_delay
+
+        self.request_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.last_payload = None
+        self._runner = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def _handle_generation(self, request):
+        self.request_count += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            self.last_payload = await request.json()
+            if self.delay > 0:
+                await asyncio.sleep(self.delay)
+            if self.request_count <= self.fail_first:
+                return web.json_response({'code': 'Throttling', 'message': '桩服务器注入错误'},
+                                         status=self.fail_status)
+            if request.headers.get('X-DashScope-SSE') == 'enable':
+                return await self._stream_reply(request)
+            return web.json_response({
+                'output': {'choices': [{
+                    'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': [{'text': self.reply_text}]}
+                }]},
+                'usage': {'input_tokens': 100, 'output_tokens': 50},
+                'request_id': f'stub-{self.request_count}'
+            })
+        finally:
+            self.in_flight -= 1
+
+    async def _stream_reply(self, request):
+        """按SSE格式分块返回回复文本（增量输出）"""
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        text = self.reply_text
+        chunks = [text[i:i + self.stream_chunk_size] for i in range(0, len(text), self.stream_chunk_size)]
+        for index, chunk in enumerate(chunks, 1):
+            event = {
+                'output': {'choices': [{
+                    'finish_reason': 'stop' if index == len(chunks) else 'null',
+                    'message': {'role': 'assistant', 'content': [{'text': chunk}]}
+                }]},
+                'request_id': f'stub-{self.request_count}'
+            }
+            if index == len(chunks):
+                event['usage'] = {'input_tokens': 100, 'output_tokens': 50}
+            await response.write(
+                f"id:{index}\nevent:result\n:HTTP_STATUS/200\ndata:{json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+            if self.stream_chunk_delay > 0:
+                await asyncio.sleep(self.stream_chunk_delay)
+        await response.write_eof()
+        return response
+
+    async def start(self):
+        """启动桩服务器"""
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post(MULTIMODAL_PATH, self._handle_generation)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # 回填自动分配的端口
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        """停止桩服务器"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+离线与实时检测共用的辅助函数
+植株QR码识别（与实时检测相同的预处理）与草莓成熟度计数，供后端、批量重处理与视频分析使用
+"""
+
+import os
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+
+from plant_store import parse_plant_id
+
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'best.pt')
+
+
+def detect_plant_qr_codes(frame: np.ndarray, detector=None) -> List[Dict[str, Any]]:
+    """识别帧中的植株QR码（与实时检测相同的预处理：灰度、去噪、CLAHE）"""
+    detector = detector or cv2.QRCodeDetector()
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = cv2.GaussianBlur(gray, (3, 3), 0)
+    gray = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(gray)
+
+    codes = []
+    ok, decoded, points, _ = detector.detectAndDecodeMulti(gray)
+    if not ok:
+        return codes
+    for data, corners in zip(decoded, points):
+        if not data:
+            continue
+        xs, ys = corners[:, 0], corners[:, 1]
+        left, top = int(xs.min()), int(ys.min())
+        codes.append({
+            'id': parse_plant_id(data),
+            'data': data,
+            'rect': (left, top, int(xs.max()) - left, int(ys.max()) - top)
+        })
+    return codes
+
+
+def maturity_counts(detections: List[Dict[str, Any]]) -> Dict[str, int]:
+    """按成熟度统计草莓检测结果，未知等级计入 unknown"""
+    counts = {'ripe': 0, 'semi_ripe': 0, 'unripe': 0, 'unknown': 0}
+    for det in detections:
+        level = det['maturity_level']
+        counts[level if level in counts else 'unknown'] += 1
+    return counts
@@ -28,14 +28,11 @@ if sys.platform.startswith('win'):
     except:
         pass
 
-# DJI Tello导入
-try:
-    from djitellopy import Tello
-    TELLO_AVAILABLE = True
-    print("✓ djitellopy库加载成功")
-except ImportError as e:
-    TELLO_AVAILABLE = False
-    print(f"✗ djitellopy库导入失败: {e}")
+# Tello SDK 驱动：asyncio UDP 客户端，动作命令在协程中等待应答，不阻塞事件循环
+from async_tello import AsyncTello, state_temperature
+from command_scheduler import (PRIORITY_AI, PRIORITY_MISSION, PRIORITY_OPERATOR as COMMAND_PRIORITY_OPERATOR,
+                               CommandCancelled, CommandScheduler)
+from rc_control_loop import RCControlLoop
 
 # QR码检测库导入
 try:
@@ -73,6 +70,58 @@ except ImportError as e:
     ANALYZER_AVAILABLE = False
     print(f"✗ AI分析器模块导入失败: {e}")
 
+from analysis_coordinator import PlantAnalysisCoordinator
+from image_preparation import qr_rect_to_box
+from cloud_budget import PRIORITY_OPERATOR, CloudBudgetManager
+from analysis_job_queue import AnalysisJobExecutor, AnalysisJobQueue, check_analysis_result
+from plant_store import parse_plant_id
+from state_stream import MissionPadMonitor, StateStream
+from settle_detector import SettleDetector
+from mission_planner import EnergyModel, MissionPlan, SurveyProgress
+from adaptive_dwell import DwellMonitor
+
+# 可选功能模块：导入失败时对应功能降级，其余服务照常运行
+try:
+    from frame_selector import BestFrameSelector
+    FRAME_SELECTOR_AVAILABLE = True
+    print("✓ 最佳帧选择模块加载成功")
+except ImportError as e:
+    FRAME_SELECTOR_AVAILABLE = False
+    print(f"✗ 最佳帧选择模块导入失败，检测到植株后立即分析: {e}")
+
+try:
+    from image_archive import ImageArchive
+    IMAGE_ARCHIVE_AVAILABLE = True
+    print("✓ 图片存档模块加载成功")
+except ImportError as e:
+    IMAGE_ARCHIVE_AVAILABLE = False
+    print(f"✗ 图片存档模块导入失败，将直接保存到 images/ 目录: {e}")
+
+try:
+    from flight_recorder import FlightRecorder
+    FLIGHT_RECORDER_AVAILABLE = True
+    print("✓ 飞行记录仪模块加载成功")
+except ImportError as e:
+    FLIGHT_RECORDER_AVAILABLE = False
+    print(f"✗ 飞行记录仪模块导入失败: {e}")
+
+try:
+    from upload_batch import KIND_VIDEO, MODE_FRAMES, UploadBatchProcessor
+    from detection_utils import detect_plant_qr_codes, maturity_counts
+    UPLOAD_BATCH_AVAILABLE = True
+    print("✓ 批量上传分析模块加载成功")
+except ImportError as e:
+    UPLOAD_BATCH_AVAILABLE = False
+    print(f"✗ 批量上传分析模块导入失败: {e}")
+
+try:
+    from video_analysis import VideoFruitCounter
+    VIDEO_ANALYSIS_AVAILABLE = True
+    print("✓ 视频计数模块加载成功")
+except ImportError as e:
+    VIDEO_ANALYSIS_AVAILABLE = False
+    print(f"✗ 视频计数模块导入失败: {e}")
+
 # 导入挑战卡巡航控制器
 try:
     from mission_controller import MissionController
@@ -100,13 +149,58 @@ except ImportError:
 
 
 class DroneControllerAdapter:
-    """无人机控制器适配器，为MissionController提供统一接口"""
+    """无人机控制器适配器，为MissionController提供统一接口
+
+    MissionController 在后台线程中运行，tello_drone 为命令调度器任务通道的同步外观（CommandLane.blocking()）；
+    协程中需要调用起飞、降落等会等待应答的方法时，通过 run_in_executor 调用
+    """
     
     def __init__(self, tello_drone):
         self.tello = tello_drone
         self._mission_pad_id = -1
         self._is_connected = False
         self._is_flying = False
+
+        # 状态包流：任务垫变化以事件形式发布，任务逻辑按事件等待而不是定时轮询
+        self.state_stream = StateStream(self._read_state)
+        self.pad_monitor = MissionPadMonitor()
+        self.state_stream.subscribe(self.pad_monitor.on_state)
+        # 悬停稳定检测：替代任务中起飞、调高、go mid 之后的固定等待
+        self.settle_detector = SettleDetector()
+        self.state_stream.subscribe(self.settle_detector.on_state)
+        self._mission_pads_enabled = False
+
+    def _read_state(self):
+        return self.tello.get_current_state() if self.tello else None
+
+    @property
+    def pad_events_available(self):
+        """状态流运行且有新鲜的状态包"""
+        return self.state_stream.running and self.state_stream.age() < 1.0
+
+    def wait_for_pad(self, pad_id=None, timeout=10.0, sightings=2, cancel=None):
+        """等待任务垫连续出现 sightings 个状态包，返回任务垫ID，超时返回-1"""
+        return self.pad_monitor.wait_for(pad_id, sightings=sightings, timeout=timeout, cancel=cancel)
+
+    @property
+    def battery(self):
+        """当前电量（读取遥测缓冲中的最新状态包，不发查询），没有状态包时为None"""
+        try:
+            battery = self.tello.get_battery() if self.tello else None
+        except Exception:
+            return None
+        return battery if battery is not None and battery >= 0 else None
+
+    @property
+    def pad_position(self):
+        """相对当前任务垫的 (x, y, z)，看不到任务垫时为None"""
+        if not self.pad_events_available or self.pad_monitor.visible_pad() <= 0:
+            return None
+        return self.pad_monitor.position
+
+    def wait_settled(self, timeout=3.0, cancel=None):
+        """等待速度、姿态和任务垫坐标稳定，最长 timeout 秒，返回 SettleResult"""
+        return self.settle_detector.wait_settled(timeout=timeout, cancel=cancel)
         
     @property
     def is_connected(self):
@@ -119,10 +213,11 @@ class DroneControllerAdapter:
     @property
     def mission_pad_id(self):
         """获取当前检测到的任务垫ID"""
+        if self.pad_events_available:
+            return self.pad_monitor.visible_pad()
         if self.tello:
             try:
-                # djitellopy中正确的方法是get_mission_pad_id()
-                # 但需要先启用mission pad检测
+                # 读取最新状态包中的mid（需要先启用mission pad检测）
                 pad_id = self.tello.get_mission_pad_id()
                 if pad_id and pad_id > 0:
                     self._mission_pad_id = pad_id
@@ -187,13 +282,13 @@ class DroneControllerAdapter:
         """手动控制"""
         try:
             if self.tello:
-                # djitellopy参数范围限制: -100到100，必须是整数
+                # SDK参数范围限制: -100到100，必须是整数
                 left_right = max(-100, min(100, int(left_right)))
                 forward_backward = max(-100, min(100, int(forward_backward)))
                 up_down = max(-100, min(100, int(up_down)))
                 yaw = max(-100, min(100, int(yaw)))
                 
-                # 使用djitellopy的正确方法
+                # rc 命令无应答，直接发送不等待
                 self.tello.send_rc_control(left_right, forward_backward, up_down, yaw)
                 return True
         except Exception as e:
@@ -204,10 +299,12 @@ class DroneControllerAdapter:
         """移动到指定任务垫位置"""
         try:
             if self.tello:
-                # 启用任务垫检测
-                self.tello.enable_mission_pads()
-                time.sleep(0.5)
-                # 检查参数范围 - djitellopy对参数有严格限制
+                # 启用任务垫检测（每次连接只需一次）
+                if not self._mission_pads_enabled:
+                    self.tello.enable_mission_pads()
+                    self._mission_pads_enabled = True
+                    time.sleep(0.5)
+                # 检查参数范围 - SDK对参数有严格限制
                 x = max(-500, min(500, x))  # 限制在-500到500cm
                 y = max(-500, min(500, y))
                 z = max(20, min(500, z))    # 高度最低20cm
@@ -220,9 +317,18 @@ class DroneControllerAdapter:
             print(f"移动到任务垫失败: {e}")
         return False
         
+    def update_flying_status(self, flying):
+        """同步飞行状态（起飞/降落由操作员或AI通道执行、未经过适配器时）"""
+        self._is_flying = flying
+
     def update_connection_status(self, connected):
-        """更新连接状态"""
+        """更新连接状态（连接后启动状态包流）"""
         self._is_connected = connected
+        if connected:
+            self.state_stream.start()
+        else:
+            self.state_stream.stop()
+            self._mission_pads_enabled = False
 
 
 class QRDroneBackendService:
@@ -238,8 +344,15 @@ class QRDroneBackendService:
 
         self.drone = None
         self.drone_adapter = None
+        # 命令调度器：唯一持有无人机命令通道，操作员/任务/AI 通过各自优先级的通道提交命令
+        self.command_scheduler = None
+        self.operator_drone = None
+        self.ai_drone = None
+        # 手动控制：摇杆消息只更新最新状态，由固定频率的发送协程发出 rc 命令
+        self.rc_control = RCControlLoop(self._send_rc, rate_hz=float(os.getenv('TELLO_RC_RATE_HZ', '30')))
         self.mission_controller = None
         self.crop_analyzer = None
+        self.main_loop = None
         self.video_thread = None
         self.is_running = True
         # Track connected websocket clients
@@ -251,6 +364,7 @@ class QRDroneBackendService:
             'challenge_cruise_active': False,  # 新增挑战卡巡航状态
             'wifi_signal': 0,
             'temperature': 0,
+            'height': 0,
             'connected': False
         }
 
@@ -264,7 +378,7 @@ class QRDroneBackendService:
         self.last_fps_time = time.time()
         self.fps = 0
 
-        # 命令串行执行锁，确保来自智能代理或本地的动作不会并发
+        # 智能代理的一段指令整体提交，不同消息的指令不交叉（单条命令的串行由命令调度器保证）
         self.command_lock = asyncio.Lock()
 
         # QR码检测相关
@@ -272,7 +386,59 @@ class QRDroneBackendService:
         self.cooldown_duration = 3.0  # 减少冷却时间到3秒
         self.last_detection_time = 0
         self.detection_interval = 0.5
+
+        # 植株AI分析协调：同一植株的并发请求共享结果，新鲜度窗口内不重复分析
+        self.analysis_coordinator = PlantAnalysisCoordinator(freshness_seconds=600.0)
+
+        # 最佳帧选择：悬停期间收集候选帧，植株窗口关闭时只分析最清晰的一帧
+        self.best_frame_selection = FRAME_SELECTOR_AVAILABLE
+        self.frame_selector = BestFrameSelector() if FRAME_SELECTOR_AVAILABLE else None
+
+        # 挑战卡停留：检测目标达成即离开，stay_duration 为上限
+        self.dwell_monitor = DwellMonitor()
+
+        # 云端调用预算：令牌桶限速与任务/每日限额，操作员请求走优先通道
+        self.cloud_budget = CloudBudgetManager(
+            state_path=os.path.join(os.path.dirname(__file__), 'cloud_budget_state.json'))
         
+        # 持久化分析任务队列：待分析帧落盘，重启后继续执行；仅采集模式下暂停执行，落地后再消化
+        self.capture_only_mode = False
+        self.analysis_jobs = None
+        self.analysis_executor = None
+        try:
+            jobs_dir = os.path.join(os.path.dirname(__file__), 'analysis_jobs')
+            self.analysis_jobs = AnalysisJobQueue(os.path.join(jobs_dir, 'jobs.db'))
+            self.analysis_executor = AnalysisJobExecutor(
+                self.analysis_jobs, self._run_analysis_job, concurrency=2,
+                ready=lambda: self.crop_analyzer is not None)
+        except Exception as e:
+            print(f"⚠️ 分析任务队列初始化失败，将直接在线程中分析: {e}")
+
+        # 分析图片存档：内容寻址去重、索引与缩略图，后台按大小与天数清理
+        self.image_archive = None
+        try:
+            if IMAGE_ARCHIVE_AVAILABLE:
+                self.image_archive = ImageArchive(os.path.join(os.path.dirname(__file__), 'image_archive'))
+        except Exception as e:
+            print(f"⚠️ 图片存档初始化失败，将直接保存到 images/ 目录: {e}")
+
+        # 飞行记录仪：原始视频分段 + 二进制遥测，按需开启或随起飞/降落自动录制
+        self.flight_recorder = None
+        self.auto_flight_recording = False
+        try:
+            if FLIGHT_RECORDER_AVAILABLE:
+                self.flight_recorder = FlightRecorder(os.path.join(os.path.dirname(__file__), 'recordings'))
+        except Exception as e:
+            print(f"⚠️ 飞行记录仪初始化失败: {e}")
+
+        # 上传分析：有界工作池 + 内容哈希去重，替代每条消息一个线程（模块不可用时单帧分析退回独立线程）
+        self.upload_processor = None
+        if UPLOAD_BATCH_AVAILABLE:
+            self.upload_processor = UploadBatchProcessor(self._analyze_upload_frame, workers=4, max_pending=16,
+                                                         count_video=self._count_uploaded_video)
+        self.upload_batch_owners = {}
+        self._upload_model_lock = threading.Lock()
+
         # 初始化QR码检测器
         self.qr_detector = None
         self.init_qr_detector()
@@ -320,7 +486,7 @@ class QRDroneBackendService:
 
             if api_key and app_id:
                 if 'CropAnalyzer' in globals():
-                    self.crop_analyzer = CropAnalyzer(api_key=api_key, app_id=app_id)
+                    self.crop_analyzer = CropAnalyzer(api_key=api_key, app_id=app_id, budget=self.cloud_budget)
                     print("✅ AI分析器初始化成功")
                 else:
                     print("❌ CropAnalyzer未正确导入，无法初始化AI分析器")
@@ -361,6 +527,16 @@ class QRDroneBackendService:
         # 保存主事件循环引用
         self.main_loop = asyncio.get_event_loop()
 
+        # AI云端调用统一在主事件循环上执行，由异步客户端限制并发
+        if self.crop_analyzer:
+            self.crop_analyzer.attach_event_loop(self.main_loop)
+
+        # 事件循环就绪后开始消化分析队列（包括上次未完成的任务）
+        if self.analysis_executor:
+            self.analysis_executor.start()
+        if self.image_archive:
+            self.image_archive.start_retention()
+
         async def handle_client(websocket, path=None):
             client_ip = websocket.remote_address[0] if websocket.remote_address else "unknown"
             print(f"🔌 客户端连接: {client_ip}")
@@ -405,12 +581,23 @@ class QRDroneBackendService:
                 traceback.print_exc()
             finally:
                 self.connected_clients.discard(websocket)
+                for batch_id, owner in list(self.upload_batch_owners.items()):
+                    if owner is websocket:
+                        self.upload_batch_owners.pop(batch_id, None)
+                        if self.upload_processor:
+                            self.upload_processor.discard(batch_id)
 
         # 启动服务器
         if websockets is not None:
-            server = await websockets.serve(handle_client, "localhost", self.ws_port)
+            # 单张手机照片的base64可达数MB，超过默认的1MB消息上限
+            server = await websockets.serve(handle_client, "localhost", self.ws_port, max_size=16 * 1024 * 1024)
             print(f"✅ QR码检测WebSocket服务器已启动: ws://localhost:{self.ws_port}")
 
+            # 电量/高度/温度取自遥测缓冲，变化时广播
+            asyncio.create_task(self.telemetry_broadcast_loop())
+            # rc 发送协程：没有手动控制输入时不发送
+            self.rc_control.start()
+
             # 启动智能代理桥接（连接到3004端口）
             if self.use_agent_mode and websockets is not None:
                 try:
@@ -442,7 +629,7 @@ class QRDroneBackendService:
                     print("⚠️ 无人机连接已断开，停止视频流")
                     break
                     
-                # djitellopy正确的视频帧获取方式
+                # 读取后台解码线程的最新视频帧
                 try:
                     frame_read = self.drone.get_frame_read()
                     if frame_read is None:
@@ -450,9 +637,10 @@ class QRDroneBackendService:
                         if connection_retry_count > max_connection_retry:
                                 print("❌ 视频流连接失败次数过多，尝试重新初始化")
                                 try:
-                                    self.drone.streamoff()
+                                    blocking = self.operator_drone.blocking()
+                                    blocking.streamoff()
                                     time.sleep(1)
-                                    self.drone.streamon()
+                                    blocking.streamon()
                                     time.sleep(2)  # 等待视频流稳定
                                     connection_retry_count = 0
                                     print("✅ 视频流重新初始化完成")
@@ -509,6 +697,10 @@ class QRDroneBackendService:
                 self.update_fps_stats()
                 current_time = time.time()
 
+                # 录制原始帧（检测叠加之前），写入在后台线程完成
+                if self.flight_recorder and self.flight_recorder.is_recording:
+                    self.flight_recorder.add_frame(frame)
+
                 # 执行检测处理 - 根据不同模式控制检测行为
                 should_detect_qr = self.ai_analysis_enabled and (current_time - self.last_detection_time) >= self.detection_interval
                 should_detect_strawberry = (self.strawberry_detection_enabled or self.drone_state.get('challenge_cruise_active', False)) and (current_time - last_strawberry_detection) >= strawberry_detection_interval
@@ -576,7 +768,10 @@ class QRDroneBackendService:
             # 不再修改原帧，直接在原帧上检测
             processed_frame = frame.copy()
             detected_qr_info = None
+            visible_qr_info = None
             strawberry_detections = []
+            # 实时视频流中AI分析推迟到植株窗口关闭，文件模式仍立即分析
+            defer_analysis = self.best_frame_selection and not file_mode
 
             # 1. QR码检测
             if (should_detect_qr and
@@ -584,10 +779,14 @@ class QRDroneBackendService:
                     QR_DETECTOR_AVAILABLE):
 
                 detected_qrs = self.detect_qr_codes(frame)  # 在原始帧上检测
+                for qr_info in detected_qrs:
+                    self.dwell_monitor.on_qr(qr_info.get('id', 'Unknown'))
 
                 for qr_info in detected_qrs:
                     qr_data = qr_info['data']
                     current_time = time.time()
+                    if visible_qr_info is None:
+                        visible_qr_info = qr_info
 
                     # 检查冷却时间
                     if qr_data in self.detection_cooldown:
@@ -603,7 +802,7 @@ class QRDroneBackendService:
                     self.draw_qr_detection(processed_frame, qr_info, color=(0, 255, 0))
 
                     # 处理QR码检测结果
-                    self.handle_qr_detection(frame, qr_info)
+                    self.handle_qr_detection(frame, qr_info, analyze=not defer_analysis)
                     break  # 只处理第一个新检测到的QR码，避免重复检测
 
             # 2. 草莓成熟度检测
@@ -616,6 +815,7 @@ class QRDroneBackendService:
                     strawberry_detections = self.strawberry_analyzer.detect_strawberries(
                         frame, qr_id=qr_id  # 在原始帧上检测
                     )
+                    self.dwell_monitor.on_strawberries(det.track_id for det in strawberry_detections)
                     
                     if strawberry_detections:
                         # 在帧上绘制草莓检测结果
@@ -663,12 +863,23 @@ class QRDroneBackendService:
                         print(f"🍓 检测到 {len(strawberry_detections)} 个草莓，成熟度分布: {summary}")
                         
                         # 3. 如果检测到QR码和草莓，触发AI分析
-                        if detected_qr_info and self.crop_analyzer:
+                        if detected_qr_info and self.crop_analyzer and not defer_analysis:
                             self.trigger_comprehensive_analysis(frame, detected_qr_info, strawberry_detections)
                                     
                 except Exception as e:
                     print(f"❌ 草莓检测错误: {e}")
 
+            # 4. 最佳帧选择：记录候选帧，窗口关闭（植株离开画面或超时）时分析最佳帧
+            if defer_analysis and self.crop_analyzer:
+                closed_windows = []
+                if visible_qr_info is not None:
+                    closed_windows.extend(self.frame_selector.offer(
+                        visible_qr_info.get('id', 'Unknown'), frame, visible_qr_info, strawberry_detections))
+                    self.dwell_monitor.on_frame_candidate(visible_qr_info.get('id', 'Unknown'))
+                closed_windows.extend(self.frame_selector.poll())
+                for window in closed_windows:
+                    self.analyze_best_frame(window)
+
             # 仅在文件模式下添加覆盖信息，实时模式保持干净的图像
             if file_mode:
                 self.add_frame_overlay(processed_frame, strawberry_count=len(strawberry_detections))
@@ -683,82 +894,122 @@ class QRDroneBackendService:
             print(f"❌ 集成检测处理错误: {e}")
             return frame
 
-    def trigger_comprehensive_analysis(self, frame, qr_info, strawberry_detections):
-        """触发综合分析：拍照 + AI分析"""
+    def analyze_best_frame(self, window):
+        """植株窗口关闭：只把得分最高的候选帧送去分析与存档"""
+        best = window.best
+        if best is None:
+            return
+        print(f"🎯 植株 {window.plant_id} 从 {window.candidates} 个候选帧中选出最佳帧 "
+              f"(得分={best.score:.2f}, 清晰度={best.sharpness:.0f})")
+        if best.strawberry_detections:
+            self.trigger_comprehensive_analysis(best.frame, best.qr_info, best.strawberry_detections,
+                                                frame_quality=best.to_dict())
+        else:
+            self.analyze_plant_ai(best.frame, best.qr_info)
+
+    def flush_frame_selection(self):
+        """视频流停止或任务结束：关闭全部植株窗口并分析各自的最佳帧，避免最后一株植株的结果丢失"""
+        if self.frame_selector is None:
+            return
+        try:
+            windows = self.frame_selector.flush()
+            if windows and not self.crop_analyzer:
+                print(f"⚠️ 作物分析器不可用，丢弃 {len(windows)} 个植株窗口")
+                return
+            for window in windows:
+                self.analyze_best_frame(window)
+        except Exception as e:
+            print(f"❌ 最佳帧窗口结算失败: {e}")
+
+    def trigger_comprehensive_analysis(self, frame, qr_info, strawberry_detections, force=False,
+                                       frame_quality=None):
+        """触发综合分析：拍照 + AI分析（加入持久化分析队列）"""
         try:
             plant_id = qr_info.get('id', 'Unknown')
-            
-            def comprehensive_analysis_worker():
-                try:
-                    print(f"📸 开始综合分析植株 {plant_id}...")
-                    
-                    # 保存当前帧作为分析图片
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    image_filename = f"plant_{plant_id}_{timestamp}.jpg"
-                    image_path = os.path.join(os.path.dirname(__file__), 'images', image_filename)
-                    
-                    # 确保images目录存在
-                    os.makedirs(os.path.dirname(image_path), exist_ok=True)
-                    
-                    # 保存图片
-                    cv2.imwrite(image_path, frame)
-                    print(f"📸 已保存分析图片: {image_filename}")
-                    
-                    # 执行AI分析
-                    result = self.crop_analyzer.analyze_crop_health(frame)
-                    
-                    if result['status'] == 'ok':
-                        # 准备综合分析结果
-                        comprehensive_result = {
-                            'plant_id': plant_id,
-                            'timestamp': datetime.now().isoformat(),
-                            'image_filename': image_filename,
-                            'qr_info': qr_info,
-                            'strawberry_analysis': {
-                                'total_strawberries': len(strawberry_detections),
-                                'maturity_distribution': self.strawberry_analyzer.get_maturity_summary(strawberry_detections),
-                                'detections': [{
-                                    'maturity_level': det.maturity_level,
-                                    'maturity_confidence': det.maturity_confidence,
-                                    'center': det.center,
-                                    'area': det.area,
-                                    'track_id': det.track_id,
-                                    'last_seen': det.last_seen
-                                } for det in strawberry_detections]
-                            },
-                            'ai_analysis': result
-                        }
-                        
-                        # 发送综合分析结果
-                        if self.main_loop and not self.main_loop.is_closed():
-                            try:
-                                future = asyncio.run_coroutine_threadsafe(
-                                    self.broadcast_message('comprehensive_analysis_complete', comprehensive_result),
-                                    self.main_loop
-                                )
-                                future.result(timeout=2.0)
-                            except Exception as e:
-                                print(f"❌ 发送综合分析结果失败: {e}")
-                        
-                        health_score = result.get('health_score', 0)
-                        print(f"✅ 植株 {plant_id} 综合分析完成")
-                        print(f"   - 草莓数量: {len(strawberry_detections)}")
-                        print(f"   - AI健康评分: {health_score}/100")
-                        print(f"   - 图片已保存: {image_filename}")
-                    else:
-                        print(f"❌ 植株 {plant_id} AI分析失败: {result.get('message')}")
-                        
-                except Exception as e:
-                    print(f"❌ 综合分析执行错误: {e}")
-            
-            # 在单独线程中运行综合分析
-            analysis_thread = threading.Thread(target=comprehensive_analysis_worker)
-            analysis_thread.daemon = True
-            analysis_thread.start()
-            
+
+            # 上传区域：草莓检测框并集 + QR码所在植株区域
+            roi_boxes = [[int(v) for v in det.bbox] for det in strawberry_detections]
+            if qr_info.get('rect'):
+                roi_boxes.append(list(qr_rect_to_box(qr_info['rect'])))
+
+            payload = {
+                'qr_info': qr_info,
+                'force': force,
+                'roi_boxes': roi_boxes,
+                'frame_quality': frame_quality,
+                'strawberry_analysis': {
+                    'total_strawberries': len(strawberry_detections),
+                    'maturity_distribution': self.strawberry_analyzer.get_maturity_summary(strawberry_detections),
+                    'detections': [{
+                        'maturity_level': det.maturity_level,
+                        'maturity_confidence': det.maturity_confidence,
+                        'center': det.center,
+                        'area': det.area,
+                        'track_id': det.track_id,
+                        'last_seen': det.last_seen
+                    } for det in strawberry_detections]
+                }
+            }
+            self._enqueue_analysis('comprehensive', plant_id, frame, payload)
+
         except Exception as e:
             print(f"❌ 触发综合分析错误: {e}")
 
+    def _run_comprehensive_analysis(self, frame, plant_id, payload):
+        """执行综合分析：保存分析图片、调用AI并广播综合结果"""
+        qr_info = payload.get('qr_info', {})
+        strawberry_analysis = payload.get('strawberry_analysis', {})
+        print(f"📸 开始综合分析植株 {plant_id}...")
+
+        # 保存当前帧作为分析图片
+        image_filename, archive_entry = self._archive_analysis_image(frame, plant_id, {
+            'kind': 'comprehensive',
+            'total_strawberries': strawberry_analysis.get('total_strawberries', 0),
+            'frame_quality': payload.get('frame_quality')
+        })
+
+        # 执行AI分析：与同一植株的在途分析合并，新鲜度窗口内复用最近结果
+        force = payload.get('force', False)
+        result = self.analysis_coordinator.run(
+            plant_id,
+            lambda: self._analyze_crop(frame, plant_id, payload.get('roi_boxes') or None, force),
+            force=force
+        )
+
+        # 模拟或失败的结果不广播：抛出 JobDeferred / RuntimeError，由分析队列延后重试
+        result = check_analysis_result(result)
+
+        # 准备综合分析结果
+        comprehensive_result = {
+            'plant_id': plant_id,
+            'timestamp': datetime.now().isoformat(),
+            'image_filename': image_filename,
+            'image': archive_entry,
+            'qr_info': qr_info,
+            'strawberry_analysis': strawberry_analysis,
+            'ai_analysis': result
+        }
+        if payload.get('frame_quality'):
+            comprehensive_result['frame_quality'] = payload['frame_quality']
+
+        # 发送综合分析结果
+        if self.main_loop and not self.main_loop.is_closed():
+            try:
+                future = asyncio.run_coroutine_threadsafe(
+                    self.broadcast_message('comprehensive_analysis_complete', comprehensive_result),
+                    self.main_loop
+                )
+                future.result(timeout=2.0)
+            except Exception as e:
+                print(f"❌ 发送综合分析结果失败: {e}")
+
+        health_score = result.get('health_score', 0)
+        print(f"✅ 植株 {plant_id} 综合分析完成")
+        print(f"   - 草莓数量: {strawberry_analysis.get('total_strawberries', 0)}")
+        print(f"   - AI健康评分: {health_score}/100")
+        print(f"   - 图片已保存: {image_filename}")
+        return result
+
     def detect_qr_codes(self, frame):
         """检测QR码 - 支持OpenCV和pyzbar"""
         detected_codes = []
@@ -872,40 +1123,7 @@ class QRDroneBackendService:
 
     def parse_plant_id(self, data):
         """从QR码数据中解析植物ID"""
-        try:
-            # 1. 尝试JSON格式
-            if data.strip().startswith('{'):
-                parsed = json.loads(data)
-                if 'id' in parsed:
-                    return parsed['id']
-                elif 'plant_id' in parsed:
-                    return parsed['plant_id']
-                elif 'plantId' in parsed:
-                    return parsed['plantId']
-
-            # 2. 尝试plant_数字格式
-            if 'plant_' in data.lower():
-                import re
-                match = re.search(r'plant[_-]?(\d+)', data.lower())
-                if match:
-                    return int(match.group(1))
-
-            # 3. 尝试纯数字
-            if data.strip().isdigit():
-                return int(data.strip())
-
-            # 4. 尝试提取任何数字
-            import re
-            numbers = re.findall(r'\d+', data)
-            if numbers:
-                return int(numbers[0])
-
-            # 5. 使用数据内容作为ID
-            return data.strip()[:20]  # 限制长度
-
-        except Exception as e:
-            print(f"❌ 解析植物ID失败: {e}")
-            return data.strip()[:20]
+        return parse_plant_id(data)
 
     def draw_qr_detection(self, frame, qr_info, color=(0, 255, 0)):
         """绘制QR码检测结果"""
@@ -962,7 +1180,7 @@ class QRDroneBackendService:
         except Exception as e:
             print(f"❌ 绘制QR检测结果错误: {e}")
 
-    def handle_qr_detection(self, frame, qr_info):
+    def handle_qr_detection(self, frame, qr_info, analyze=True):
         """处理QR码检测结果"""
         try:
             qr_id = qr_info.get('id', 'Unknown')
@@ -984,7 +1202,9 @@ class QRDroneBackendService:
                 except Exception as e:
                     print(f"❌ 发送QR检测事件失败: {e}")
 
-            # 进行AI分析
+            # 进行AI分析（启用最佳帧选择时由窗口关闭触发）
+            if not analyze:
+                return
             if self.crop_analyzer:
                 self.analyze_plant_ai(frame, qr_info)
             else:
@@ -993,48 +1213,140 @@ class QRDroneBackendService:
         except Exception as e:
             print(f"❌ 处理QR检测结果错误: {e}")
 
-    def analyze_plant_ai(self, frame, qr_info):
-        """AI分析植物"""
+    def analyze_plant_ai(self, frame, qr_info, force=False):
+        """AI分析植物（加入持久化分析队列）"""
         try:
             plant_id = qr_info.get('id', 'Unknown')
 
-            def ai_analysis_worker():
-                try:
-                    print(f"🤖 开始AI分析植株 {plant_id}...")
-
-                    result = self.crop_analyzer.analyze_crop_health(frame)
+            # 冷却结束后的重复识别：新鲜度窗口内已有结果则不再分析
+            if not force and self.analysis_coordinator.is_fresh(plant_id):
+                print(f"🕒 植株 {plant_id} 在新鲜度窗口内已分析，跳过")
+                return
 
-                    if result['status'] == 'ok':
-                        if self.main_loop and not self.main_loop.is_closed():
-                            try:
-                                future = asyncio.run_coroutine_threadsafe(
-                                    self.broadcast_message('ai_analysis_complete', {
-                                        'plant_id': plant_id,
-                                        'timestamp': datetime.now().isoformat(),
-                                        'analysis': result,
-                                        'qr_info': qr_info
-                                    }),
-                                    self.main_loop
-                                )
-                                future.result(timeout=2.0)
-                            except Exception as e:
-                                print(f"❌ 发送AI分析结果失败: {e}")
+            self._enqueue_analysis('plant_ai', plant_id, frame, {'qr_info': qr_info, 'force': force})
 
-                        health_score = result.get('health_score', 0)
-                        print(f"✅ 植株 {plant_id} AI分析完成，健康评分: {health_score}/100")
-                    else:
-                        print(f"❌ 植株 {plant_id} AI分析失败: {result.get('message')}")
+        except Exception as e:
+            print(f"❌ AI分析启动错误: {e}")
 
-                except Exception as e:
-                    print(f"❌ AI分析执行错误: {e}")
+    def _archive_analysis_image(self, frame, plant_id, metadata):
+        """存档分析图片，返回 (可通过HTTP服务访问的相对路径, 存档记录字典)"""
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        if self.image_archive is not None:
+            try:
+                entry = self.image_archive.store(frame, plant_id, metadata=metadata)
+                info = entry.to_dict(root=base_dir)
+                print(f"📸 已存档分析图片: {entry.image_hash[:12]}")
+                return info['image_url'], info
+            except Exception as e:
+                print(f"⚠️ 图片存档失败，直接保存: {e}")
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        image_filename = f"plant_{plant_id}_{timestamp}.jpg"
+        image_path = os.path.join(base_dir, 'images', image_filename)
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        cv2.imwrite(image_path, frame)
+        print(f"📸 已保存分析图片: {image_filename}")
+        return image_filename, None
+
+    def _run_plant_ai_analysis(self, frame, plant_id, payload):
+        """执行植株AI分析并广播结果"""
+        qr_info = payload.get('qr_info', {})
+        print(f"🤖 开始AI分析植株 {plant_id}...")
+
+        # 只上传QR码所在的植株区域
+        roi_boxes = [qr_rect_to_box(qr_info['rect'])] if qr_info.get('rect') else None
+
+        # 与综合分析等并发请求合并为一次云端调用
+        force = payload.get('force', False)
+        result = self.analysis_coordinator.run(
+            plant_id,
+            lambda: self._analyze_crop(frame, plant_id, roi_boxes, force),
+            force=force
+        )
+
+        # 模拟或失败的结果不广播：抛出 JobDeferred / RuntimeError，由分析队列延后重试
+        result = check_analysis_result(result)
+
+        if self.main_loop and not self.main_loop.is_closed():
+            try:
+                future = asyncio.run_coroutine_threadsafe(
+                    self.broadcast_message('ai_analysis_complete', {
+                        'plant_id': plant_id,
+                        'timestamp': datetime.now().isoformat(),
+                        'analysis': result,
+                        'qr_info': qr_info
+                    }),
+                    self.main_loop
+                )
+                future.result(timeout=2.0)
+            except Exception as e:
+                print(f"❌ 发送AI分析结果失败: {e}")
+
+        health_score = result.get('health_score', 0)
+        print(f"✅ 植株 {plant_id} AI分析完成，健康评分: {health_score}/100")
+        return result
+
+    def _analyze_crop(self, frame, plant_id, roi_boxes, force=False):
+        """调用作物分析器；强制重新分析时清除该植株的近似画面缓存并跳过缓存查找"""
+        if force and self.crop_analyzer.result_cache is not None:
+            self.crop_analyzer.result_cache.invalidate_plant(plant_id)
+        return self.crop_analyzer.analyze_crop_health(
+            frame, plant_id=plant_id, use_cache=not force, roi_boxes=roi_boxes,
+            progress_callback=self._analysis_progress_callback(plant_id))
+
+    def _enqueue_analysis(self, kind, plant_id, frame, payload):
+        """把分析任务写入持久化队列；队列不可用时退回到独立线程直接执行"""
+        if self.analysis_jobs is not None:
+            try:
+                job_id = self.analysis_jobs.enqueue(kind, plant_id, frame, payload)
+                print(f"🗂️ 植株 {plant_id} 分析任务 #{job_id} 已入队"
+                      f"{'（仅采集模式，暂不执行）' if self.capture_only_mode else ''}")
+                self.analysis_executor.notify()
+                return
+            except Exception as e:
+                print(f"⚠️ 分析任务入队失败，直接执行: {e}")
 
-            # 在单独线程中运行AI分析
-            ai_thread = threading.Thread(target=ai_analysis_worker)
-            ai_thread.daemon = True
-            ai_thread.start()
+        def analysis_worker():
+            try:
+                self._dispatch_analysis(kind, frame, plant_id, payload)
+            except Exception as e:
+                print(f"❌ AI分析执行错误: {e}")
+
+        threading.Thread(target=analysis_worker, daemon=True).start()
+
+    def _dispatch_analysis(self, kind, frame, plant_id, payload):
+        """按任务类型执行分析"""
+        if kind == 'comprehensive':
+            return self._run_comprehensive_analysis(frame, plant_id, payload)
+        return self._run_plant_ai_analysis(frame, plant_id, payload)
+
+    def _run_analysis_job(self, job, frame):
+        """分析队列的任务处理函数，返回写入队列的结果摘要
+
+        预算不足或云端不可用时分析器返回模拟结果：分析函数抛出 JobDeferred，任务延后重试，不以模拟数据标记完成
+        """
+        result = self._dispatch_analysis(job.kind, frame, job.plant_id, job.payload)
+        return {
+            'status': result.get('status'),
+            'health_score': result.get('health_score'),
+            'analysis_id': result.get('analysis_id')
+        }
 
-        except Exception as e:
-            print(f"❌ AI分析启动错误: {e}")
+    def _analysis_progress_callback(self, plant_id):
+        """构建流式AI分析的进度回调：字段一出现就推送 ai_analysis_progress"""
+        def on_progress(fields, elapsed):
+            if self.main_loop and not self.main_loop.is_closed():
+                # 不等待发送完成，回调可能运行在事件循环线程中
+                asyncio.run_coroutine_threadsafe(
+                    self.broadcast_message('ai_analysis_progress', {
+                        'plant_id': plant_id,
+                        'partial': fields,
+                        'elapsed': round(elapsed, 2),
+                        'timestamp': datetime.now().isoformat()
+                    }),
+                    self.main_loop
+                )
+        return on_progress
 
     def add_frame_overlay(self, frame, strawberry_count=0):
         """添加帧覆盖信息"""
@@ -1139,6 +1451,20 @@ class QRDroneBackendService:
                 await self.handle_qr_reset(websocket, message_data)
             elif message_type == 'ai_test':
                 await self.handle_ai_test(websocket, message_data)
+            elif message_type == 'reanalyze_plant':
+                await self.handle_reanalyze_plant(websocket, message_data)
+            elif message_type == 'get_ai_cache_stats':
+                await self.handle_get_ai_cache_stats(websocket, message_data)
+            elif message_type == 'get_command_stats':
+                await self.handle_get_command_stats(websocket, message_data)
+            elif message_type == 'analysis_queue_control':
+                await self.handle_analysis_queue_control(websocket, message_data)
+            elif message_type == 'get_analysis_queue_status':
+                await self.handle_get_analysis_queue_status(websocket, message_data)
+            elif message_type == 'get_plant_images':
+                await self.handle_get_plant_images(websocket, message_data)
+            elif message_type == 'flight_recorder_control':
+                await self.handle_flight_recorder_control(websocket, message_data)
             elif message_type == 'config_update':  # 新增配置更新处理
                 await self.handle_config_update(websocket, message_data)
             elif message_type == 'heartbeat':
@@ -1171,6 +1497,12 @@ class QRDroneBackendService:
                 await self.handle_simulate_detection(websocket, message_data)
             elif message_type == 'analyze_uploaded_frame':  # 新增上传帧分析
                 await self.handle_analyze_uploaded_frame(websocket, message_data)
+            elif message_type == 'upload_batch_start':
+                await self.handle_upload_batch_start(websocket, message_data)
+            elif message_type == 'upload_batch_item':
+                await self.handle_upload_batch_item(websocket, message_data)
+            elif message_type == 'upload_batch_end':
+                await self.handle_upload_batch_end(websocket, message_data)
             elif message_type == 'start_strawberry_detection':  # 开始草莓检测
                 await self.handle_start_strawberry_detection(websocket, message_data)
             elif message_type == 'stop_strawberry_detection':   # 停止草莓检测
@@ -1257,8 +1589,8 @@ class QRDroneBackendService:
                         except Exception as e:
                             print(f"❌ YOLO检测失败: {e}")
                     
-                    # 执行AI分析
-                    result = self.crop_analyzer.analyze_crop_health(frame)
+                    # 执行AI分析（操作员上传的图片走预算优先通道）
+                    result = self.crop_analyzer.analyze_crop_health(frame, priority=PRIORITY_OPERATOR)
                     
                     # 将处理后的图像（带检测框）转换为base64
                     processed_image_base64 = None
@@ -1342,8 +1674,8 @@ class QRDroneBackendService:
     async def handle_analyze_uploaded_frame(self, websocket, data):
         """处理上传帧分析请求"""
         try:
-            # 获取base64图片数据
-            frame_data = data.get('frame')
+            # 获取base64图片数据（模拟面板以 image_data 字段发送）
+            frame_data = data.get('frame') or data.get('image_data')
             timestamp = data.get('timestamp', datetime.now().isoformat())
             
             if not frame_data:
@@ -1417,19 +1749,200 @@ class QRDroneBackendService:
                             self.main_loop
                         )
 
-            # 在单独线程中运行帧分析
-            analysis_thread = threading.Thread(target=frame_analysis_worker)
-            analysis_thread.daemon = True
-            analysis_thread.start()
+            # 在上传工作池中运行帧分析，工作池已满时跳过该帧
+            if self.upload_processor is None:
+                threading.Thread(target=frame_analysis_worker, daemon=True).start()
+            elif not self.upload_processor.try_submit(frame_analysis_worker):
+                await self.send_error(websocket, "上传分析繁忙，已跳过该帧")
 
         except Exception as e:
             print(f"❌ 处理上传帧分析请求失败: {e}")
             await self.send_error(websocket, str(e))
 
+    def _analyze_upload_frame(self, frame):
+        """批量上传的单帧分析：QR码 + 草莓检测，返回紧凑记录"""
+        qr_codes = [{'id': code['id'], 'data': code['data'], 'rect': list(code['rect'])}
+                    for code in detect_plant_qr_codes(frame)]
+        detections = []
+        if self.strawberry_analyzer and self.strawberry_analyzer.model:
+            # 检测模型在工作线程间共享，推理串行执行
+            with self._upload_model_lock:
+                strawberries = self.strawberry_analyzer.detect_strawberries(frame, track=False)
+            detections = [{
+                'bbox': [int(v) for v in det.bbox],
+                'confidence': round(float(det.confidence), 3),
+                'maturity_level': det.maturity_level,
+                'maturity_confidence': round(float(det.maturity_confidence), 3)
+            } for det in strawberries]
+        return {
+            'qr_codes': qr_codes,
+            'strawberries': len(detections),
+            'maturity': maturity_counts(detections),
+            'detections': detections
+        }
+
+    def _count_uploaded_video(self, video_path, stride, on_progress):
+        """上传视频的计数模式：跳帧解码 + 批量推理 + 跨帧跟踪，按植株统计草莓成熟度"""
+        if not VIDEO_ANALYSIS_AVAILABLE:
+            raise ValueError("视频计数模块不可用")
+        if not self.strawberry_analyzer or not self.strawberry_analyzer.model:
+            raise ValueError("草莓检测模型未加载")
+        counter = VideoFruitCounter(self.strawberry_analyzer, stride=stride, min_hits=2,
+                                    model_lock=self._upload_model_lock)
+        report = counter.analyze(video_path, on_progress=on_progress)
+        print(report.format())
+        return report.to_dict()
+
+    @staticmethod
+    def _decode_base64_payload(payload):
+        """解码base64数据（兼容 data:...;base64, 前缀）"""
+        if ',' in payload[:100]:
+            payload = payload.split(',', 1)[1]
+        return base64.b64decode(payload)
+
+    async def handle_upload_batch_start(self, websocket, data):
+        """开始批量上传：kind 为 images（逐张发送 upload_batch_item）或 video（分块发送）；
+        视频 mode 为 count 时跨帧跟踪并按植株计数草莓
+        """
+        try:
+            if self.upload_processor is None:
+                await self.send_error(websocket, "批量上传分析模块不可用")
+                return
+            loop = asyncio.get_event_loop()
+
+            def on_progress(record, progress):
+                # 工作线程回调，逐项回报进度（只发送给上传方）
+                if loop.is_closed():
+                    return
+                asyncio.run_coroutine_threadsafe(websocket.send(json.dumps({
+                    'type': 'upload_batch_progress',
+                    'data': {'record': record, 'progress': progress},
+                    'timestamp': datetime.now().isoformat()
+                }, ensure_ascii=False, default=str)), loop)
+
+            def on_video_progress(progress):
+                if loop.is_closed():
+                    return
+                asyncio.run_coroutine_threadsafe(websocket.send(json.dumps({
+                    'type': 'video_analysis_progress',
+                    'data': dict(progress, batch_id=batch.batch_id),
+                    'timestamp': datetime.now().isoformat()
+                }, ensure_ascii=False)), loop)
+
+            batch = self.upload_processor.begin(
+                kind=data.get('kind', 'images'),
+                name=data.get('name', ''),
+                total=data.get('total'),
+                stride=int(data.get('stride', 5)),
+                on_progress=on_progress,
+                batch_id=data.get('batch_id'),
+                mode=data.get('mode', MODE_FRAMES),
+                on_video_progress=on_video_progress)
+            self.upload_batch_owners[batch.batch_id] = websocket
+            print(f"📦 开始批量上传 {batch.batch_id} ({batch.kind}，预计 {batch.total or '?'} 项)")
+            await websocket.send(json.dumps({
+                'type': 'upload_batch_started',
+                'data': {'batch_id': batch.batch_id, 'kind': batch.kind},
+                'timestamp': datetime.now().isoformat()
+            }, ensure_ascii=False))
+        except (TypeError, ValueError) as e:
+            await self.send_error(websocket, f"批量上传参数错误: {str(e)}")
+        except Exception as e:
+            print(f"❌ 开始批量上传失败: {e}")
+            await self.send_error(websocket, f"开始批量上传失败: {str(e)}")
+
+    async def handle_upload_batch_item(self, websocket, data):
+        """接收批量上传的一项：图片 {name, data} 或视频数据块 {chunk}"""
+        try:
+            batch = self.upload_processor.get(data.get('batch_id')) if self.upload_processor else None
+            if batch is None:
+                await self.send_error(websocket, "批量上传不存在或已结束")
+                return
+
+            loop = asyncio.get_event_loop()
+            if batch.kind == KIND_VIDEO:
+                chunk = self._decode_base64_payload(data.get('chunk', ''))
+                await loop.run_in_executor(None, batch.add_video_chunk, chunk)
+            else:
+                payload = data.get('data')
+                if not payload:
+                    await self.send_error(websocket, "未提供图片数据")
+                    return
+                # 工作池已满时在执行器中等待空位，本连接的后续消息随之排队，形成背压
+                await loop.run_in_executor(None, batch.add_image, data.get('name', ''),
+                                           self._decode_base64_payload(payload))
+        except Exception as e:
+            print(f"❌ 接收上传项失败: {e}")
+            await self.send_error(websocket, f"接收上传项失败: {str(e)}")
+
+    async def handle_upload_batch_end(self, websocket, data):
+        """结束批量上传，等待全部项分析完成后返回汇总"""
+        batch_id = data.get('batch_id')
+        try:
+            if self.upload_processor is None or self.upload_processor.get(batch_id) is None:
+                await self.send_error(websocket, "批量上传不存在或已结束")
+                return
+
+            summary = await asyncio.get_event_loop().run_in_executor(None, self.upload_processor.finish, batch_id)
+            print(f"✅ 批量上传 {batch_id} 完成: {summary['done']} 项，分析 {summary['analyzed']}，"
+                  f"重复 {summary['duplicates']}，缓存 {summary['cached']}，失败 {summary['failed']}，"
+                  f"{summary['elapsed']}s")
+            await websocket.send(json.dumps({
+                'type': 'upload_batch_complete',
+                'data': summary,
+                'timestamp': datetime.now().isoformat()
+            }, ensure_ascii=False, default=str))
+        except Exception as e:
+            print(f"❌ 批量上传处理失败: {e}")
+            await self.send_error(websocket, f"批量上传处理失败: {str(e)}")
+        finally:
+            self.upload_batch_owners.pop(batch_id, None)
+
     async def handle_config_update(self, websocket, data):
         """处理配置更新"""
         try:
             print("🔧 收到配置更新请求")
+
+            # 分析调优参数（新鲜度窗口、上传尺寸与字节预算、是否统计旧版整帧字节数、
+            # 是否预处理上传图像——关闭期间按旧版整帧上传，用于实测前后延迟），可单独更新
+            tuning_keys = ('analysis_freshness_seconds', 'upload_max_side', 'upload_target_kb',
+                           'upload_measure_baseline', 'upload_preprocess', 'budget_rate_per_minute', 'budget_mission_quota', 'budget_daily_quota',
+                           'rc_rate_hz', 'rc_deadman_seconds')
+            if any(key in data for key in tuning_keys):
+                try:
+                    if 'analysis_freshness_seconds' in data:
+                        self.analysis_coordinator.set_freshness(float(data['analysis_freshness_seconds']))
+                    self.rc_control.configure(rate_hz=data.get('rc_rate_hz'),
+                                              deadman_timeout=data.get('rc_deadman_seconds'))
+                    self.cloud_budget.configure(
+                        rate_per_minute=data.get('budget_rate_per_minute'),
+                        mission_quota=data.get('budget_mission_quota'),
+                        daily_quota=data.get('budget_daily_quota')
+                    )
+                    upload_keys = ('upload_max_side', 'upload_target_kb', 'upload_measure_baseline', 'upload_preprocess')
+                    if self.crop_analyzer and any(key in data for key in upload_keys):
+                        target_kb = data.get('upload_target_kb')
+                        self.crop_analyzer.image_preparer.configure(
+                            max_side=data.get('upload_max_side'),
+                            target_bytes=float(target_kb) * 1024 if target_kb is not None else None,
+                            measure_baseline=data.get('upload_measure_baseline'),
+                            enabled=data.get('upload_preprocess')
+                        )
+                except (TypeError, ValueError):
+                    await self.broadcast_message('config_updated', {
+                        'success': False,
+                        'message': '分析参数必须是数字'
+                    })
+                    return
+
+                if 'dashscope_api_key' not in data and 'dashscope_app_id' not in data:
+                    await self.broadcast_message('config_updated', {
+                        'success': True,
+                        'message': '分析参数已更新',
+                        'analysis_freshness_seconds': self.analysis_coordinator.freshness_seconds,
+                        'rc_rate_hz': self.rc_control.rate_hz
+                    })
+                    return
             
             # 获取新的API配置
             api_key = data.get('dashscope_api_key', '').strip()
@@ -1446,11 +1959,18 @@ class QRDroneBackendService:
             try:
                 if ANALYZER_AVAILABLE:
                     from crop_analyzer_dashscope import CropAnalyzer
-                    self.crop_analyzer = CropAnalyzer(api_key=api_key, app_id=app_id)
+                    # 保留已有的分析缓存，避免重新配置后重复分析同一画面
+                    previous_cache = self.crop_analyzer.result_cache if self.crop_analyzer else None
+                    previous_preparer = self.crop_analyzer.image_preparer if self.crop_analyzer else None
+                    if self.crop_analyzer:
+                        await self.crop_analyzer.close()
+                    self.crop_analyzer = CropAnalyzer(api_key=api_key, app_id=app_id, result_cache=previous_cache,
+                                                      image_preparer=previous_preparer, budget=self.cloud_budget)
+                    self.crop_analyzer.attach_event_loop(self.main_loop)
                     print("✅ AI分析器重新初始化成功")
                     
-                    # 测试连接
-                    test_result = self.crop_analyzer.test_connection()
+                    # 测试连接（异步执行，不阻塞事件循环）
+                    test_result = await self.crop_analyzer.test_connection_async()
                     if test_result['status'] == 'ok':
                         await self.broadcast_message('config_updated', {
                             'success': True,
@@ -1533,6 +2053,26 @@ class QRDroneBackendService:
             rounds = max(1, min(10, rounds))
             height = max(40, min(300, height))
             stay_duration = max(0.5, min(30, stay_duration))
+
+            # 可选的挑战卡任务计划（plan: 计划JSON，或 plan_file: 计划文件路径）
+            plan = None
+            try:
+                if data.get('plan'):
+                    plan = MissionPlan.from_dict(data['plan'])
+                elif data.get('plan_file'):
+                    plan = MissionPlan.load(data['plan_file'])
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                await self.send_error(websocket, f"任务计划无效: {str(e)}")
+                return
+
+            # 分段巡检：按电量把计划拆成多次出航，进度按计划保存，下次从未访问的挑战卡继续
+            survey = None
+            energy_model = None
+            if plan is not None and data.get('survey'):
+                survey = SurveyProgress(os.path.join(os.path.dirname(__file__), 'survey_progress',
+                                                     f"{plan.signature()[:12]}.json"))
+                survey.bind(plan, restart=bool(data.get('survey_restart')))
+                energy_model = await asyncio.get_event_loop().run_in_executor(None, self._fit_energy_model)
             
             # 初始化任务控制器
             if not self.mission_controller:
@@ -1554,17 +2094,28 @@ class QRDroneBackendService:
             self.mission_controller.set_mission_rounds(rounds)
             self.mission_controller.set_mission_height(height)
             self.mission_controller.set_stay_duration(stay_duration)
+            self.mission_controller.set_mission_plan(plan)
+            self.mission_controller.set_survey(survey, energy_model, data.get('battery_reserve', 25))
+
+            # 自适应停留：只要求当前启用的检测环节达成目标
+            self.dwell_monitor.require_tracks = self.strawberry_analyzer is not None
+            self.dwell_monitor.require_best_frame = bool(self.best_frame_selection and self.crop_analyzer)
+            self.mission_controller.set_dwell_monitor(
+                self.dwell_monitor if data.get('adaptive_dwell', True) else None)
             
             # 启动任务
             success = self.mission_controller.start_mission()
             
             if success:
                 self.drone_state['challenge_cruise_active'] = True
+                self.cloud_budget.start_mission(f"cruise-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
                 await self.broadcast_message('mission_status', {
                     'type': 'challenge_cruise_started',
                     'rounds': rounds,
                     'height': height,
-                    'stay_duration': stay_duration
+                    'stay_duration': stay_duration,
+                    'plan': plan.to_dict() if plan else None,
+                    'survey': self.mission_controller.get_survey_summary()
                 })
                 await self.broadcast_message('status_update', 
                     f'挑战卡巡航任务已启动 - 轮次: {rounds}, 高度: {height}cm, 停留: {stay_duration}秒')
@@ -1584,6 +2135,8 @@ class QRDroneBackendService:
                 self.mission_controller.stop_mission_execution()
                 
             self.drone_state['challenge_cruise_active'] = False
+            self.flush_frame_selection()
+            self.cloud_budget.end_mission()
             
             await self.broadcast_message('mission_status', {
                 'type': 'challenge_cruise_stopped'
@@ -1595,6 +2148,13 @@ class QRDroneBackendService:
             print(f"停止挑战卡巡航失败: {e}")
             await self.send_error(websocket, f"停止挑战卡巡航失败: {str(e)}")
 
+    def _fit_energy_model(self):
+        """用飞行记录仪的遥测日志拟合电量模型（数据不足时为默认模型）"""
+        logs = self.flight_recorder.telemetry_logs() if self.flight_recorder else []
+        model = EnergyModel.from_telemetry(logs)
+        print(f"🔋 电量模型: {model.to_dict()}")
+        return model
+
     def reset_challenge_cruise_state(self):
         """重置挑战卡巡航状态 - 任务完成回调函数"""
         try:
@@ -1602,13 +2162,19 @@ class QRDroneBackendService:
             
             # 重置挑战卡巡航状态
             self.drone_state['challenge_cruise_active'] = False
+            self.flush_frame_selection()
+            self.cloud_budget.end_mission()
             
             # 广播状态更新
             if self.main_loop:
                 asyncio.run_coroutine_threadsafe(
                     self.broadcast_message('mission_status', {
                         'type': 'challenge_cruise_completed',
-                        'message': '挑战卡任务已完成，状态已重置'
+                        'message': '挑战卡任务已完成，状态已重置',
+                        'routes': self.mission_controller.get_route_reports() if self.mission_controller else [],
+                        'settle': self.mission_controller.get_settle_stats() if self.mission_controller else None,
+                        'survey': self.mission_controller.get_survey_summary() if self.mission_controller else None,
+                        'dwell': self.dwell_monitor.get_stats()
                     }),
                     self.main_loop
                 )
@@ -1661,6 +2227,9 @@ class QRDroneBackendService:
         try:
             self.processed_qr_data.clear()
             self.detection_cooldown.clear()
+            self.analysis_coordinator.invalidate()
+            if self.frame_selector:
+                self.frame_selector.discard()
             await self.broadcast_message('status_update', '🔄 QR码检测已重置')
             print("✅ QR码检测状态已重置")
         except Exception as e:
@@ -1702,7 +2271,8 @@ class QRDroneBackendService:
 
             await self.broadcast_message('status_update', '🧪 正在进行AI分析测试...')
 
-            result = self.crop_analyzer.analyze_crop_health(test_image)
+            result = await self.crop_analyzer.analyze_crop_health_async(test_image, use_cache=False,
+                                                                        priority=PRIORITY_OPERATOR)
 
             if result['status'] == 'ok':
                 health_score = result.get('health_score', 0)
@@ -1731,6 +2301,218 @@ class QRDroneBackendService:
                 'message': f'AI测试异常: {str(e)}'
             })
 
+    async def handle_reanalyze_plant(self, websocket, data):
+        """处理植株重新分析：取该植株最近一张存档图片重新排队分析，force 默认为真（忽略新鲜度窗口）"""
+        try:
+            plant_id = data.get('plant_id')
+            if plant_id is None:
+                await self.send_error(websocket, "缺少plant_id")
+                return
+            if not self.crop_analyzer:
+                await self.send_error(websocket, "AI分析器未初始化，请先保存API配置")
+                return
+            if not self.image_archive:
+                await self.send_error(websocket, "图片存档不可用")
+                return
+
+            # 存档按识别出的植株ID（整数或字符串）记录：先按解析后的ID查找，再按原值查找
+            entries = []
+            for candidate in dict.fromkeys([self.parse_plant_id(str(plant_id)), plant_id]):
+                entries = self.image_archive.lookup(plant_id=candidate, limit=1)
+                if entries:
+                    plant_id = candidate
+                    break
+            frame = cv2.imread(entries[0].image_path) if entries else None
+            if frame is None:
+                await self.send_error(websocket, f"植株 {plant_id} 没有可用的存档图片")
+                return
+
+            self.analyze_plant_ai(frame, {'id': plant_id}, force=bool(data.get('force', True)))
+            await self.broadcast_message('status_update', f'🔁 植株 {plant_id} 已重新加入分析队列')
+        except Exception as e:
+            print(f"❌ 植株重新分析失败: {e}")
+            await self.send_error(websocket, f"植株重新分析失败: {str(e)}")
+
+    async def handle_analysis_queue_control(self, websocket, data):
+        """处理分析队列控制：capture_only 仅采集不分析，drain 开始消化队列，可同时调整并发数"""
+        try:
+            if not self.analysis_executor:
+                await self.send_error(websocket, "分析任务队列不可用")
+                return
+
+            if 'concurrency' in data:
+                self.analysis_executor.set_concurrency(int(data['concurrency']))
+
+            action = data.get('action')
+            if action == 'capture_only':
+                self.capture_only_mode = True
+                self.analysis_executor.pause()
+                await self.broadcast_message('status_update', '📷 已进入仅采集模式，分析任务将排队等待')
+            elif action in ('drain', 'resume'):
+                self.capture_only_mode = False
+                self.analysis_executor.resume()
+                pending = self.analysis_jobs.counts()['pending']
+                await self.broadcast_message('status_update', f'🗂️ 开始消化分析队列，待处理 {pending} 个任务')
+
+            await self.handle_get_analysis_queue_status(websocket, {})
+        except (TypeError, ValueError):
+            await self.send_error(websocket, "并发数必须是整数")
+        except Exception as e:
+            print(f"❌ 分析队列控制失败: {e}")
+            await self.send_error(websocket, f"分析队列控制失败: {str(e)}")
+
+    async def handle_get_analysis_queue_status(self, websocket, data):
+        """处理分析队列状态查询"""
+        try:
+            if not self.analysis_executor:
+                await self.send_error(websocket, "分析任务队列不可用")
+                return
+
+            status = self.analysis_executor.get_stats()
+            status['capture_only'] = self.capture_only_mode
+            status['recent_jobs'] = [job.to_dict() for job in self.analysis_jobs.list_jobs(limit=int(data.get('limit', 20)))]
+
+            await websocket.send(json.dumps({
+                'type': 'analysis_queue_status',
+                'data': status,
+                'timestamp': datetime.now().isoformat()
+            }, ensure_ascii=False, default=str))
+        except Exception as e:
+            print(f"❌ 获取分析队列状态失败: {e}")
+            await self.send_error(websocket, f"获取分析队列状态失败: {str(e)}")
+
+    async def handle_get_plant_images(self, websocket, data):
+        """处理植株存档图片查询（返回缩略图与原图地址）"""
+        try:
+            if not self.image_archive:
+                await self.send_error(websocket, "图片存档不可用")
+                return
+
+            plant_id = data.get('plant_id')
+            limit = max(1, min(200, int(data.get('limit', 20))))
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            entries = self.image_archive.lookup(plant_id=plant_id, limit=limit)
+
+            await websocket.send(json.dumps({
+                'type': 'plant_images',
+                'data': {
+                    'plant_id': plant_id,
+                    'images': [entry.to_dict(root=base_dir) for entry in entries]
+                },
+                'timestamp': datetime.now().isoformat()
+            }, ensure_ascii=False, default=str))
+        except (TypeError, ValueError):
+            await self.send_error(websocket, "limit必须是整数")
+        except Exception as e:
+            print(f"❌ 查询植株图片失败: {e}")
+            await self.send_error(websocket, f"查询植株图片失败: {str(e)}")
+
+    def _drone_state_packet(self):
+        """飞行记录仪的遥测来源：遥测缓冲中的最新状态包（bat, h, mid, x, y, z ...）"""
+        if not self.drone or not self.drone_state.get('connected', False):
+            return None
+        return self.drone.telemetry.snapshot()
+
+    def start_flight_recording(self, flight_id=None):
+        """开始飞行录制，返回飞行ID"""
+        if not self.flight_recorder:
+            return None
+        return self.flight_recorder.start(flight_id=flight_id, state_provider=self._drone_state_packet)
+
+    async def handle_flight_recorder_control(self, websocket, data):
+        """处理飞行记录仪控制：start / stop / status，auto 控制是否随起飞降落自动录制"""
+        try:
+            if not self.flight_recorder:
+                await self.send_error(websocket, "飞行记录仪不可用")
+                return
+
+            if 'auto' in data:
+                self.auto_flight_recording = bool(data['auto'])
+            if 'segment_seconds' in data:
+                self.flight_recorder.segment_seconds = max(5.0, float(data['segment_seconds']))
+            if 'max_gb' in data:
+                self.flight_recorder.max_bytes = int(max(0.1, float(data['max_gb'])) * 1024 ** 3)
+
+            action = data.get('action', 'status')
+            if action == 'start':
+                flight_id = await asyncio.get_event_loop().run_in_executor(
+                    None, self.start_flight_recording, data.get('flight_id'))
+                await self.broadcast_message('status_update', f'⏺️ 飞行记录开始: {flight_id}')
+            elif action == 'stop':
+                await asyncio.get_event_loop().run_in_executor(None, self.flight_recorder.stop)
+                await self.broadcast_message('status_update', '⏹️ 飞行记录已停止')
+            elif action != 'status':
+                await self.send_error(websocket, f"未知的记录仪操作: {action}")
+                return
+
+            status = self.flight_recorder.get_stats()
+            status['auto'] = self.auto_flight_recording
+            status['recordings'] = self.flight_recorder.list_recordings()[:20]
+            await websocket.send(json.dumps({
+                'type': 'flight_recorder_status',
+                'data': status,
+                'timestamp': datetime.now().isoformat()
+            }, ensure_ascii=False, default=str))
+        except (TypeError, ValueError):
+            await self.send_error(websocket, "记录仪参数格式错误")
+        except Exception as e:
+            print(f"❌ 飞行记录仪控制失败: {e}")
+            await self.send_error(websocket, f"飞行记录仪控制失败: {str(e)}")
+
+    async def handle_get_ai_cache_stats(self, websocket, data):
+        """处理AI分析缓存统计查询"""
+        try:
+            if not self.crop_analyzer:
+                await self.send_error(websocket, "AI分析器未初始化")
+                return
+
+            if data.get('clear'):
+                self.crop_analyzer.result_cache.clear()
+
+            stats = self.crop_analyzer.get_cache_stats()
+            stats['client'] = self.crop_analyzer.get_client_stats()
+            stats['coordinator'] = self.analysis_coordinator.get_stats()
+            stats['upload'] = self.crop_analyzer.get_upload_stats()
+            if self.frame_selector:
+                stats['frame_selection'] = self.frame_selector.get_stats()
+            stats['budget'] = self.cloud_budget.get_stats()
+            if self.image_archive:
+                stats['archive'] = self.image_archive.get_stats()
+            if self.upload_processor:
+                stats['upload_batches'] = self.upload_processor.get_stats()
+
+            await websocket.send(json.dumps({
+                'type': 'ai_cache_stats',
+                'data': stats,
+                'timestamp': datetime.now().isoformat()
+            }, ensure_ascii=False))
+        except Exception as e:
+            print(f"❌ 获取AI缓存统计失败: {e}")
+            await self.send_error(websocket, f"获取AI缓存统计失败: {str(e)}")
+
+    async def handle_get_command_stats(self, websocket, data):
+        """处理命令调度统计查询（各优先级的排队等待与往返时间）；cancel_moves 为真时先取消排队中的动作命令"""
+        try:
+            if not self.command_scheduler:
+                await self.send_error(websocket, "无人机未连接")
+                return
+
+            if data.get('cancel_moves'):
+                cancelled = self.command_scheduler.cancel_moves(source=data.get('source'), reason='操作员取消')
+                await self.broadcast_message('status_update', f'已取消{cancelled}条排队动作')
+
+            stats = self.command_scheduler.get_stats()
+            stats['driver'] = self.drone.get_stats()
+            stats['rc'] = self.rc_control.get_stats()
+            await websocket.send(json.dumps({
+                'type': 'command_stats',
+                'data': stats,
+                'timestamp': datetime.now().isoformat()
+            }, ensure_ascii=False))
+        except Exception as e:
+            print(f"❌ 获取命令调度统计失败: {e}")
+            await self.send_error(websocket, f"获取命令调度统计失败: {str(e)}")
+
     async def handle_start_strawberry_detection(self, websocket, data):
         """处理开始草莓检测"""
         try:
@@ -1795,23 +2577,17 @@ class QRDroneBackendService:
     async def handle_drone_connect(self, websocket, data):
         """处理无人机连接"""
         try:
-            if not TELLO_AVAILABLE:
-                await self.send_error(websocket, "djitellopy库未安装，无法连接无人机")
-                return
-
             if self.drone is None:
                 print("正在连接无人机...")
                 await self.broadcast_message('status_update', '🔗 正在连接无人机...')
                 
-                self.drone = Tello()
-                # djitellopy连接超时设置
-                self.drone.RESPONSE_TIMEOUT = 10  # 设置响应超时为10秒
-                self.drone.connect()
-
-                await asyncio.sleep(2)
+                self.drone = AsyncTello(timeout=10)  # 响应超时10秒
+                # 进入SDK模式并等待第一个状态包，期间事件循环照常服务其他客户端和视频
+                await self.drone.connect(wait_state=2.0)
+                self._start_command_scheduler()
 
                 try:
-                    battery = self.drone.get_battery()
+                    battery = await self.operator_drone.read_battery()
                     if battery < 0:  # 电池值异常表示连接可能有问题
                         raise Exception("无法获取有效的电池信息")
                     self.drone_state.update({
@@ -1831,12 +2607,13 @@ class QRDroneBackendService:
                 await self.broadcast_drone_status() # 广播无人机状态，确保前端更新挑战卡任务状态
 
                 # 创建无人机适配器
-                self.drone_adapter = DroneControllerAdapter(self.drone)
+                self.drone_adapter = DroneControllerAdapter(
+                    self.command_scheduler.lane(PRIORITY_MISSION, 'mission').blocking())
                 self.drone_adapter.update_connection_status(True)
                 
                 # 启用任务垫检测
                 try:
-                    self.drone.enable_mission_pads()
+                    await self.operator_drone.enable_mission_pads()
                     print("✅ 任务垫检测已启用")
                 except Exception as e:
                     print(f"⚠️ 启用任务垫检测失败: {e}")
@@ -1852,7 +2629,7 @@ class QRDroneBackendService:
                 
                 while video_retry < max_video_retry and not video_stream_started:
                     try:
-                        self.drone.streamon()
+                        await self.operator_drone.streamon()
                         await asyncio.sleep(3)  # 等待视频流稳定
                         video_stream_started = True
                         print(f"✅ 视频流启动成功 (尝试 {video_retry + 1}/{max_video_retry})")
@@ -1919,13 +2696,39 @@ class QRDroneBackendService:
                 'timestamp': datetime.now().isoformat()
             })
             if self.drone:
+                await self._stop_command_scheduler()
                 try:
-                    self.drone.end()
+                    await self.drone.end()
                 except:
                     pass
                 self.drone = None
                 self.drone_adapter = None
 
+    def _start_command_scheduler(self):
+        """连接后启动命令调度器，之后所有需要应答的命令都经调度器发送"""
+        self.command_scheduler = CommandScheduler(self.drone)
+        self.command_scheduler.start()
+        self.operator_drone = self.command_scheduler.lane(COMMAND_PRIORITY_OPERATOR, 'operator')
+        self.ai_drone = self.command_scheduler.lane(PRIORITY_AI, 'agent')
+
+    async def _stop_command_scheduler(self):
+        if self.command_scheduler:
+            await self.command_scheduler.stop()
+        self.command_scheduler = None
+        self.operator_drone = None
+        self.ai_drone = None
+
+    def _set_flying(self, flying):
+        self.drone_state['flying'] = flying
+        if self.drone_adapter:
+            self.drone_adapter.update_flying_status(flying)
+        if not flying:
+            self.rc_control.neutral()
+
+    def _send_rc(self, left_right, forward_backward, up_down, yaw):
+        if self.drone:
+            self.drone.send_rc_control(left_right, forward_backward, up_down, yaw)
+
     def start_video_streaming(self):
         """启动视频流"""
         if self.video_thread is None or not self.video_thread.is_alive():
@@ -2009,8 +2812,9 @@ class QRDroneBackendService:
                                                 await self.broadcast_message('drone_command', {'action': act, 'parameters': params})
                                                 res = await self._execute_local_drone_command(act, params)
                                                 await self.broadcast_message('status_update', res.get('message', f'执行 {act}'))
-                                                # 执行间隔
-                                                await asyncio.sleep(0.5)
+                                                # 上一条应答后立即执行下一条；被降落/急停取消时放弃剩余指令
+                                                if res.get('cancelled'):
+                                                    break
                                             except Exception as ex:
                                                 await self.broadcast_message('status_update', f'命令执行失败: {str(ex)}')
                                                 break
@@ -2043,7 +2847,8 @@ class QRDroneBackendService:
                                                 await self.broadcast_message('drone_command', {'action': act, 'parameters': params})
                                                 res = await self._execute_local_drone_command(act, params)
                                                 await self.broadcast_message('status_update', res.get('message', f'执行 {act}'))
-                                                await asyncio.sleep(0.5)
+                                                if res.get('cancelled'):
+                                                    break
                                             except Exception as ex:
                                                 await self.broadcast_message('status_update', f'命令执行失败: {str(ex)}')
                                                 break
@@ -2080,60 +2885,35 @@ class QRDroneBackendService:
             return False
 
     async def _execute_local_drone_command(self, action: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
-        """在本地无人机上执行从智能代理解析出的命令"""
+        """在本地无人机上执行从智能代理解析出的命令（经命令调度器的AI通道，优先级低于操作员和任务）"""
         try:
-            if not TELLO_AVAILABLE:
-                return {'success': False, 'message': 'djitellopy未安装'}
-            if not self.drone:
+            if not self.drone or not self.ai_drone:
                 return {'success': False, 'message': '无人机未连接'}
 
             # 基础命令
             if action == 'takeoff':
-                if self.drone_adapter:
-                    ok = self.drone_adapter.takeoff()
-                else:
-                    self.drone.takeoff()
-                    ok = True
-                if ok:
-                    self.drone_state['flying'] = True
+                if await self.ai_drone.takeoff():
+                    self._set_flying(True)
                     return {'success': True, 'message': '✅ 起飞成功'}
                 return {'success': False, 'message': '起飞失败'}
 
             if action == 'land':
-                if self.drone_adapter:
-                    ok = self.drone_adapter.land()
-                else:
-                    self.drone.land()
-                    ok = True
-                if ok:
-                    self.drone_state['flying'] = False
+                # 通道上的降落以降落优先级提交
+                if await self.ai_drone.land():
+                    self._set_flying(False)
                     return {'success': True, 'message': '✅ 降落成功'}
                 return {'success': False, 'message': '降落失败'}
 
             if action == 'emergency':
-                try:
-                    self.drone.emergency()
-                except Exception:
-                    pass
-                self.drone_state['flying'] = False
+                await self.command_scheduler.emergency()
+                self._set_flying(False)
                 return {'success': True, 'message': '⛔ 紧急停止执行'}
 
             # 移动命令
             if action in ['move_forward','move_back','move_left','move_right','move_up','move_down']:
                 dist = int(parameters.get('distance', 20))
                 dist = max(20, min(500, dist))
-                if action == 'move_forward':
-                    self.drone.move_forward(dist)
-                elif action == 'move_back':
-                    self.drone.move_back(dist)
-                elif action == 'move_left':
-                    self.drone.move_left(dist)
-                elif action == 'move_right':
-                    self.drone.move_right(dist)
-                elif action == 'move_up':
-                    self.drone.move_up(dist)
-                elif action == 'move_down':
-                    self.drone.move_down(dist)
+                await self.ai_drone.move(action[len('move_'):], dist)
                 return {'success': True, 'message': f'➡️ 移动完成 {action} {dist}cm'}
 
             # 旋转命令
@@ -2141,14 +2921,14 @@ class QRDroneBackendService:
                 deg = int(parameters.get('degrees', 90))
                 deg = max(1, min(360, deg))
                 if action == 'rotate_clockwise':
-                    self.drone.rotate_clockwise(deg)
+                    await self.ai_drone.rotate_clockwise(deg)
                 else:
-                    self.drone.rotate_counter_clockwise(deg)
+                    await self.ai_drone.rotate_counter_clockwise(deg)
                 return {'success': True, 'message': f'🔄 旋转完成 {deg}°'}
 
             # 状态命令
             if action == 'get_battery':
-                b = self.drone.get_battery()
+                b = await self.ai_drone.read_battery()
                 self.drone_state['battery'] = b
                 return {'success': True, 'message': f'🔋 电池: {b}%'}
 
@@ -2159,6 +2939,8 @@ class QRDroneBackendService:
 
             # 未知命令
             return {'success': False, 'message': f'未知命令: {action}'}
+        except CommandCancelled as e:
+            return {'success': False, 'cancelled': True, 'message': f'命令已取消: {str(e)}'}
         except Exception as e:
             return {'success': False, 'message': f'命令执行异常: {str(e)}'}
 
@@ -2167,14 +2949,15 @@ class QRDroneBackendService:
         self.video_streaming = False
         if self.video_thread and self.video_thread.is_alive():
             self.video_thread.join(timeout=2)
+        self.flush_frame_selection()
         print("📹 QR码检测视频流已停止")
 
     async def handle_start_video_streaming(self, websocket, data):
         """处理开启视频流指令"""
         try:
-            if self.drone:
+            if self.operator_drone:
                 try:
-                    self.drone.streamon()
+                    await self.operator_drone.streamon()
                 except Exception as e:
                     print(f"开启Tello视频失败(忽略继续): {e}")
             self.start_video_streaming()
@@ -2190,9 +2973,9 @@ class QRDroneBackendService:
         """处理停止视频流指令"""
         try:
             self.stop_video_streaming()
-            if self.drone:
+            if self.operator_drone:
                 try:
-                    self.drone.streamoff()
+                    await self.operator_drone.streamoff()
                 except Exception as e:
                     print(f"关闭Tello视频失败(忽略继续): {e}")
             await self.broadcast_message('status_update', '视频流已关闭')
@@ -2250,17 +3033,15 @@ class QRDroneBackendService:
     async def handle_emergency_stop(self, websocket, data):
         """处理急停"""
         try:
-            if not TELLO_AVAILABLE:
-                await self.send_error(websocket, "djitellopy库未安装，无法控制无人机")
-                return
             if not self.drone:
                 await self.send_error(websocket, "无人机未连接")
                 return
             try:
-                self.drone.emergency()
+                # 不排队、不等待在途命令，并取消所有排队命令
+                await self.command_scheduler.emergency()
             except Exception as e:
                 print(f"执行急停失败(可能不支持): {e}")
-            self.drone_state['flying'] = False
+            self._set_flying(False)
             await self.broadcast_message('status_update', '紧急停止命令已下达')
         except Exception as e:
             await self.send_error(websocket, f"急停失败: {str(e)}")
@@ -2268,9 +3049,6 @@ class QRDroneBackendService:
     async def handle_move(self, websocket, data):
         """处理位移移动指令"""
         try:
-            if not TELLO_AVAILABLE:
-                await self.send_error(websocket, "djitellopy库未安装，无法控制无人机")
-                return
             if not self.drone:
                 await self.send_error(websocket, "无人机未连接")
                 return
@@ -2278,17 +3056,17 @@ class QRDroneBackendService:
             distance = int(data.get('distance') or 20)
             distance = max(20, min(500, distance))
             if direction in ['forward','front','f']:
-                self.drone.move_forward(distance)
+                await self.operator_drone.move_forward(distance)
             elif direction in ['back','backward','b']:
-                self.drone.move_back(distance)
+                await self.operator_drone.move_back(distance)
             elif direction in ['left','l']:
-                self.drone.move_left(distance)
+                await self.operator_drone.move_left(distance)
             elif direction in ['right','r']:
-                self.drone.move_right(distance)
+                await self.operator_drone.move_right(distance)
             elif direction == 'up':
-                self.drone.move_up(distance)
+                await self.operator_drone.move_up(distance)
             elif direction == 'down':
-                self.drone.move_down(distance)
+                await self.operator_drone.move_down(distance)
             else:
                 await self.send_error(websocket, f"不支持的移动方向: {direction}")
                 return
@@ -2299,9 +3077,6 @@ class QRDroneBackendService:
     async def handle_rotate(self, websocket, data):
         """处理旋转指令"""
         try:
-            if not TELLO_AVAILABLE:
-                await self.send_error(websocket, "djitellopy库未安装，无法控制无人机")
-                return
             if not self.drone:
                 await self.send_error(websocket, "无人机未连接")
                 return
@@ -2309,9 +3084,9 @@ class QRDroneBackendService:
             degrees = int(data.get('degrees') or 90)
             degrees = max(1, min(360, degrees))
             if direction in ['cw','clockwise']:
-                self.drone.rotate_clockwise(degrees)
+                await self.operator_drone.rotate_clockwise(degrees)
             elif direction in ['ccw','counterclockwise']:
-                self.drone.rotate_counter_clockwise(degrees)
+                await self.operator_drone.rotate_counter_clockwise(degrees)
             else:
                 await self.send_error(websocket, f"不支持的旋转方向: {direction}")
                 return
@@ -2322,9 +3097,6 @@ class QRDroneBackendService:
     async def handle_flip(self, websocket, data):
         """处理翻转指令"""
         try:
-            if not TELLO_AVAILABLE:
-                await self.send_error(websocket, "djitellopy库未安装，无法控制无人机")
-                return
             if not self.drone:
                 await self.send_error(websocket, "无人机未连接")
                 return
@@ -2332,7 +3104,7 @@ class QRDroneBackendService:
             if direction not in ['l','r','f','b']:
                 await self.send_error(websocket, f"不支持的翻转方向: {direction}")
                 return
-            self.drone.flip(direction)
+            await self.operator_drone.flip(direction)
             await self.broadcast_message('status_update', f'翻转 {direction} 完成')
         except Exception as e:
             await self.send_error(websocket, f"翻转失败: {str(e)}")
@@ -2340,10 +3112,6 @@ class QRDroneBackendService:
     async def handle_drone_takeoff(self, websocket, data):
         """处理无人机起飞"""
         try:
-            if not TELLO_AVAILABLE:
-                await self.send_error(websocket, "djitellopy库未安装，无法控制无人机")
-                return
-                
             if not self.drone:
                 await self.send_error(websocket, "无人机未连接")
                 return
@@ -2355,24 +3123,26 @@ class QRDroneBackendService:
             print("🚁 正在起飞...")
             await self.broadcast_message('status_update', '🚁 无人机正在起飞...')
             
-            # 使用适配器起飞，带重试与连接刷新
+            # 经操作员通道起飞，带重试与SDK模式刷新
             ok = False
-            if self.drone_adapter:
-                for attempt in range(4):
-                    try:
-                        if self.drone_adapter.takeoff():
-                            ok = True
-                            break
-                    except Exception:
-                        pass
-                    try:
-                        if self.drone:
-                            self.drone.connect()
-                    except Exception:
-                        pass
-                    await asyncio.sleep(2)
+            for attempt in range(4):
+                try:
+                    if await self.operator_drone.takeoff():
+                        ok = True
+                        break
+                except CommandCancelled:
+                    break
+                except Exception:
+                    pass
+                try:
+                    await self.operator_drone.send_control_command('command')
+                except Exception:
+                    pass
+                await asyncio.sleep(2)
             if ok:
-                self.drone_state['flying'] = True
+                self._set_flying(True)
+                if self.auto_flight_recording and self.flight_recorder and not self.flight_recorder.is_recording:
+                    self.start_flight_recording()
                 await self.broadcast_message('status_update', '✅ 无人机起飞成功')
                 await self.broadcast_message('drone_takeoff_complete', {
                     'success': True,
@@ -2395,10 +3165,6 @@ class QRDroneBackendService:
     async def handle_drone_land(self, websocket, data):
         """处理无人机降落"""
         try:
-            if not TELLO_AVAILABLE:
-                await self.send_error(websocket, "djitellopy库未安装，无法控制无人机")
-                return
-                
             if not self.drone:
                 await self.send_error(websocket, "无人机未连接")
                 return
@@ -2410,9 +3176,14 @@ class QRDroneBackendService:
             print("🛬 正在降落...")
             await self.broadcast_message('status_update', '🛬 无人机正在降落...')
             
-            # 使用适配器降落
-            if self.drone_adapter and self.drone_adapter.land():
-                self.drone_state['flying'] = False
+            # 以降落优先级提交：取消排队中的动作，并打断正在执行的任务/AI动作；摇杆先归零
+            self.rc_control.neutral()
+            landed = await self.operator_drone.land()
+            if landed:
+                self._set_flying(False)
+                self.flush_frame_selection()
+                if self.auto_flight_recording and self.flight_recorder and self.flight_recorder.is_recording:
+                    await asyncio.get_event_loop().run_in_executor(None, self.flight_recorder.stop)
                 await self.broadcast_message('status_update', '✅ 无人机降落成功')
                 await self.broadcast_message('drone_land_complete', {
                     'success': True,
@@ -2441,10 +3212,12 @@ class QRDroneBackendService:
                 self.drone_state['challenge_cruise_active'] = False
                 await self.broadcast_drone_status() # 广播无人机状态，确保前端更新挑战卡任务状态
                 self.stop_video_streaming()
+                if self.drone_adapter:
+                    self.drone_adapter.update_connection_status(False)
+                self.rc_control.neutral()
+                await self._stop_command_scheduler()
                 try:
-                    self.drone.streamoff()
-                    await asyncio.sleep(0.5)
-                    self.drone.end()
+                    await self.drone.end()
                 except:
                     pass
                 self.drone = None
@@ -2467,6 +3240,7 @@ class QRDroneBackendService:
         try:
             self.drone_state['mission_active'] = False
             self.qr_detection_enabled = False
+            self.flush_frame_selection()
             await self.broadcast_message('status_update', '⏹️ QR码分析任务已停止')
             await self.broadcast_drone_status()
         except Exception as e:
@@ -2513,30 +3287,21 @@ class QRDroneBackendService:
                 await self.send_error(websocket, "无人机未在飞行中")
                 return
 
-            # 获取控制参数
-            left_right = data.get('left_right', 0)  # 左右移动 (-100 到 100)
-            forward_backward = data.get('forward_backward', 0)  # 前后移动 (-100 到 100)
-            up_down = data.get('up_down', 0)  # 上下移动 (-100 到 100)
-            yaw = data.get('yaw', 0)  # 偏航旋转 (-100 到 100)
-            
-            # djitellopy参数范围限制和类型转换
-            left_right = max(-100, min(100, int(left_right)))
-            forward_backward = max(-100, min(100, int(forward_backward)))
-            up_down = max(-100, min(100, int(up_down)))
-            yaw = max(-100, min(100, int(yaw)))
-            
-            # 执行手动控制
-            success = self.drone_adapter.manual_control(left_right, forward_backward, up_down, yaw)
-            
-            if success:
-                await self.broadcast_message('manual_control_ack', {
-                    'left_right': left_right,
-                    'forward_backward': forward_backward,
-                    'up_down': up_down,
-                    'yaw': yaw
-                })
-            else:
-                await self.send_error(websocket, "手动控制执行失败")
+            # 获取控制参数（-100 到 100）：只更新最新摇杆状态，由 rc 发送协程按固定频率发送，
+            # 高频消息合并为一次发送，输入中断超过失联保护时间后自动归零
+            left_right, forward_backward, up_down, yaw = self.rc_control.update(
+                data.get('left_right', 0),        # 左右移动
+                data.get('forward_backward', 0),  # 前后移动
+                data.get('up_down', 0),           # 上下移动
+                data.get('yaw', 0)                # 偏航旋转
+            )
+
+            await self.broadcast_message('manual_control_ack', {
+                'left_right': left_right,
+                'forward_backward': forward_backward,
+                'up_down': up_down,
+                'yaw': yaw
+            })
                 
         except Exception as e:
             print(f"手动控制失败: {e}")
@@ -2575,8 +3340,35 @@ class QRDroneBackendService:
         except Exception as e:
             print(f"❌ 发送错误消息失败: {e}")
 
+    def _refresh_telemetry(self):
+        """用遥测缓冲的最新快照更新电量、高度和温度，有变化时返回True"""
+        if not self.drone or not self.drone_state.get('connected', False) or self.drone.state_age() > 2.0:
+            return False
+        snapshot = self.drone.telemetry.snapshot()
+        if not snapshot:
+            return False
+        update = {
+            'battery': snapshot.get('bat', self.drone_state['battery']),
+            'height': snapshot.get('h', self.drone_state['height']),
+            'temperature': int(state_temperature(snapshot)),
+        }
+        changed = any(self.drone_state.get(key) != value for key, value in update.items())
+        self.drone_state.update(update)
+        return changed
+
+    async def telemetry_broadcast_loop(self, interval=1.0):
+        """每秒读取遥测快照，电量/高度/温度变化时广播无人机状态"""
+        while self.is_running:
+            try:
+                if self._refresh_telemetry():
+                    await self.broadcast_drone_status()
+            except Exception as e:
+                print(f"⚠️ 遥测状态广播失败: {e}")
+            await asyncio.sleep(interval)
+
     async def broadcast_drone_status(self):
         """广播无人机状态"""
+        self._refresh_telemetry()
         await self.broadcast_message('drone_status', self.drone_state)
 
     def cleanup(self):
@@ -2585,10 +3377,26 @@ class QRDroneBackendService:
         self.is_running = False
         self.stop_video_streaming()
 
+        # 未执行的分析任务保留在磁盘队列中，下次启动后继续
+        if self.analysis_executor:
+            self.analysis_executor.stop()
+        if self.image_archive:
+            self.image_archive.stop()
+        if self.flight_recorder:
+            self.flight_recorder.stop()
+        if self.upload_processor:
+            self.upload_processor.shutdown()
+
+        if self.drone_adapter:
+            self.drone_adapter.update_connection_status(False)
+        if self.command_scheduler:
+            self.command_scheduler.cancel(reason='服务停止')
+        # 摇杆归零并停止 rc 发送协程：归零命令在关闭无人机连接之前同步发出
+        self.rc_control.neutral()
+        self.rc_control.halt()
         if self.drone:
             try:
-                self.drone.streamoff()
-                self.drone.end()
+                self.drone.close()
             except:
                 pass
             self.drone = None
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模拟无人机
+实现 MissionController 使用的适配器接口（与 DroneControllerAdapter 一致），按挑战卡布局计算当前看到的任务垫；
+每个动作按估算耗时在注入的时钟上等待，配合 VirtualClock 可在毫秒内跑完多轮任务，同时得到真实尺度的任务时长
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from mission_clock import MissionClock
+
+# 动作耗时估算（秒）
+TAKEOFF_SECONDS = 5.0
+LAND_SECONDS = 4.0
+COMMAND_OVERHEAD = 0.5
+VERTICAL_SPEED = 50.0      # cm/s
+YAW_SPEED = 90.0           # 度/秒
+
+
+class SimulatedDrone:
+    """按挑战卡布局模拟任务垫检测的无人机"""
+
+    def __init__(self, pads: Dict[int, Tuple[float, float]], clock: Optional[MissionClock] = None,
+                 start_pad: Optional[int] = None, detect_radius: float = 30.0, min_detect_height: float = 30.0,
+                 battery: float = 100.0, drain_per_second: float = 0.12, missed_sightings: Optional[Dict[int, int]] = None):
+        """
+        Args:
+            pads: 挑战卡ID -> (x, y) 位置（cm，x 对应 manual_control 的左右通道）
+            clock: 动作耗时所用的时钟
+            start_pad: 起飞位置所在的挑战卡（默认第一张）
+            detect_radius: 水平距离在该范围内的挑战卡可被检测到（取最近的一张）
+            min_detect_height: 低于该高度时看不到任务垫
+            battery: 初始电量
+            drain_per_second: 飞行中每秒耗电（%）
+            missed_sightings: 挑战卡ID -> 前N次查询漏检（模拟检测丢失，用于测试恢复逻辑）
+        """
+        self.pads = dict(pads)
+        self.clock = clock or MissionClock()
+        start = start_pad if start_pad in self.pads else next(iter(self.pads))
+        self.position = list(self.pads[start])
+        self.height = 0.0
+        self.yaw = 0.0
+        self.velocity = (0.0, 0.0)
+        self.detect_radius = detect_radius
+        self.min_detect_height = min_detect_height
+        self._battery = float(battery)
+        self.drain_per_second = drain_per_second
+        self.missed_sightings = dict(missed_sightings or {})
+
+        self.is_connected = True
+        self._is_flying = False
+        self._last_update = self.clock.time()
+        self.commands: List[Tuple[float, str, Tuple[Any, ...]]] = []
+        self.distance_flown = 0.0
+
+    # ---- 状态 ----
+
+    def _update(self):
+        """按时钟推进位置（manual_control 速度）与电量"""
+        now = self.clock.time()
+        dt = max(0.0, now - self._last_update)
+        self._last_update = now
+        if not self._is_flying or dt == 0:
+            return
+        vx, vy = self.velocity
+        if vx or vy:
+            self.position[0] += vx * dt
+            self.position[1] += vy * dt
+            self.distance_flown += math.hypot(vx, vy) * dt
+        self._battery = max(0.0, self._battery - self.drain_per_second * dt)
+
+    def _spend(self, seconds: float):
+        self.clock.sleep(seconds)
+        self._update()
+
+    def _log(self, command: str, *args):
+        self.commands.append((self.clock.time(), command, args))
+
+    @property
+    def is_flying(self) -> bool:
+        return self._is_flying
+
+    @property
+    def battery(self) -> int:
+        self._update()
+        return int(self._battery)
+
+    def _nearest_pad(self) -> int:
+        if not self._is_flying or self.height < self.min_detect_height:
+            return -1
+        best, best_distance = -1, self.detect_radius
+        for pad_id, (x, y) in self.pads.items():
+            distance = math.hypot(self.position[0] - x, self.position[1] - y)
+            if distance <= best_distance:
+                best, best_distance = pad_id, distance
+        return best
+
+    @property
+    def mission_pad_id(self) -> int:
+        self._update()
+        pad = self._nearest_pad()
+        if pad > 0 and self.missed_sightings.get(pad, 0) > 0:
+            self.missed_sightings[pad] -= 1
+            return -1
+        return pad
+
+    @property
+    def pad_position(self) -> Optional[Tuple[float, float, float]]:
+        self._update()
+        pad = self._nearest_pad()
+        if pad <= 0:
+            return None
+        x, y = self.pads[pad]
+        return self.position[0] - x, self.position[1] - y, self.height
+
+    # ---- 动作 ----
+
+    def takeoff(self) -> bool:
+        self._log('takeoff')
+        if self._is_flying:
+            return False
+        self._is_flying = True
+        self._update()
+        self.height = 80.0
+        self._spend(TAKEOFF_SECONDS)
+        return True
+
+    def land(self) -> bool:
+        self._log('land')
+        if not self._is_flying:
+            return False
+        self.velocity = (0.0, 0.0)
+        self._spend(LAND_SECONDS)
+        self._is_flying = False
+        self.height = 0.0
+        return True
+
+    def set_height(self, height_cm: float) -> bool:
+        self._log('set_height', height_cm)
+        if not self._is_flying:
+            return False
+        self._spend(COMMAND_OVERHEAD + abs(height_cm - self.height) / VERTICAL_SPEED)
+        self.height = float(height_cm)
+        return True
+
+    def rotate(self, degrees: float) -> bool:
+        self._log('rotate', degrees)
+        if not self._is_flying:
+            return False
+        self._spend(COMMAND_OVERHEAD + abs(degrees) / YAW_SPEED)
+        self.yaw = (self.yaw + degrees) % 360
+        return True
+
+    def move_to_mission_pad(self, pad_id: int, x: float, y: float, z: float, speed: float) -> bool:
+        """go x y z speed mid：只有看到 pad_id 时才能执行"""
+        self._log('go', x, y, z, speed, pad_id)
+        self._update()
+        if not self._is_flying or self._nearest_pad() != pad_id:
+            return False
+        px, py = self.pads[pad_id]
+        target = (px + max(-500, min(500, x)), py + max(-500, min(500, y)))
+        distance = math.hypot(target[0] - self.position[0], target[1] - self.position[1])
+        distance3d = math.hypot(distance, z - self.height)
+        self._spend(COMMAND_OVERHEAD + distance3d / max(10, min(100, speed)))
+        self.position = list(target)
+        self.height = float(max(20, min(500, z)))
+        self.distance_flown += distance
+        return True
+
+    def manual_control(self, left_right: float, forward_backward: float, up_down: float, yaw: float) -> bool:
+        """rc 控制：通道值按 cm/s 计，直到下一次 manual_control"""
+        self._log('rc', left_right, forward_backward, up_down, yaw)
+        self._update()
+        self.velocity = (float(left_right), float(forward_backward))
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'commands': len(self.commands),
+            'distance_flown': round(self.distance_flown, 1),
+            'battery': self.battery,
+            'flight_time': round(self.clock.time() - self.commands[0][0], 1) if self.commands else 0.0,
+        }
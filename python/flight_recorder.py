@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+飞行记录仪
+视频帧由后台线程写入分段视频文件，每段附带逐帧时间戳（用于按时间定位）；
+遥测（电量、高度、任务垫ID、x/y/z）以紧凑二进制格式按状态包频率记录；
+所有录制共享一个磁盘容量上限，超出时从最早的分段开始删除，可在每次飞行时常开。
+录制目录可直接交给 frame_source.FlightRecording 回放
+"""
+
+import json
+import os
+import queue
+import shutil
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+
+INDEX_FILENAME = 'index.json'
+TELEMETRY_FILENAME = 'telemetry.bin'
+TELEMETRY_MAGIC = b'TLM1'
+TELEMETRY_HEADER = struct.Struct('<4sd')      # 魔数, 录制开始的UNIX时间
+TELEMETRY_RECORD = struct.Struct('<d6h')      # t, 电量, 高度, 任务垫ID, x, y, z
+TELEMETRY_FIELDS = ('bat', 'h', 'mid', 'x', 'y', 'z')
+
+
+def _clamp_int16(value) -> int:
+    try:
+        return max(-32768, min(32767, int(value)))
+    except (TypeError, ValueError):
+        return 0
+
+
+def read_telemetry_log(path: str) -> List[Dict[str, Any]]:
+    """读取二进制遥测日志，返回 [{'t': 秒, 'state': {...}}]（末尾不完整的记录被忽略）"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < TELEMETRY_HEADER.size:
+        return []
+    magic, _ = TELEMETRY_HEADER.unpack_from(data, 0)
+    if magic != TELEMETRY_MAGIC:
+        raise ValueError(f"不是遥测日志文件: {path}")
+    body = memoryview(data)[TELEMETRY_HEADER.size:]
+    usable = len(body) - len(body) % TELEMETRY_RECORD.size
+    return [{'t': record[0], 'state': dict(zip(TELEMETRY_FIELDS, record[1:]))}
+            for record in TELEMETRY_RECORD.iter_unpack(body[:usable])]
+
+
+def read_index(flight_dir: str) -> Optional[Dict[str, Any]]:
+    """读取录制目录的分段索引，不存在时返回None"""
+    path = os.path.join(flight_dir, INDEX_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+class FlightRecorder:
+    """分段视频 + 二进制遥测的飞行记录仪"""
+
+    def __init__(self, root: str, segment_seconds: float = 60.0, max_bytes: int = 4 * 1024 ** 3,
+                 fps: float = 30.0, queue_frames: int = 90, jpeg_quality: int = 85):
+        """
+        Args:
+            root: 录制根目录，每次飞行一个子目录
+            segment_seconds: 单个视频分段的时长
+            max_bytes: 全部录制的磁盘上限，超出时删除最早的分段
+            fps: 写入视频容器的名义帧率（实际时间以逐帧时间戳为准）
+            queue_frames: 写入队列长度，写入跟不上时丢弃新帧而不阻塞视频流
+            jpeg_quality: MJPG分段的压缩质量
+        """
+        self.root = root
+        self.segment_seconds = segment_seconds
+        self.max_bytes = int(max_bytes)
+        self.fps = fps
+        self.jpeg_quality = jpeg_quality
+        os.makedirs(root, exist_ok=True)
+
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=queue_frames)
+        self._lock = threading.Lock()
+        self._writer_thread = None
+        self._telemetry_thread = None
+        self._stop_event = threading.Event()
+        self._recording = False
+
+        self.flight_id = None
+        self.flight_dir = None
+        self._index = None
+        self._started_mono = 0.0
+        self._telemetry_file = None
+        self._segment = None
+        self.stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {
+            'frames_written': 0,
+            'frames_dropped': 0,
+            'segments': 0,
+            'telemetry_records': 0,
+            'segments_evicted': 0
+        }
+
+    @property
+    def is_recording(self) -> bool:
+        return self._recording
+
+    def start(self, flight_id: Optional[str] = None, state_provider: Optional[Callable[[], Optional[Dict]]] = None,
+              telemetry_hz: float = 10.0) -> str:
+        """开始录制，返回飞行ID
+
+        Args:
+            flight_id: 录制名称，默认按时间生成
+            state_provider: 返回当前状态包字典（如 tello.get_current_state()），提供时按 telemetry_hz 记录遥测
+            telemetry_hz: 遥测采样频率（Tello状态包约10Hz）
+        """
+        with self._lock:
+            if self._recording:
+                return self.flight_id
+            self.flight_id = flight_id or f"flight_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            self.flight_dir = os.path.join(self.root, self.flight_id)
+            os.makedirs(self.flight_dir, exist_ok=True)
+            self._started_mono = time.monotonic()
+            self._index = {
+                'flight_id': self.flight_id,
+                'started_at': time.time(),
+                'fps': self.fps,
+                'segments': []
+            }
+            _write_json_atomic(os.path.join(self.flight_dir, INDEX_FILENAME), self._index)
+            self._telemetry_file = open(os.path.join(self.flight_dir, TELEMETRY_FILENAME), 'wb')
+            self._telemetry_file.write(TELEMETRY_HEADER.pack(TELEMETRY_MAGIC, self._index['started_at']))
+            self.stats = self._empty_stats()
+            self._stop_event.clear()
+            self._recording = True
+
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True, name="flight-recorder")
+        self._writer_thread.start()
+        if state_provider is not None:
+            self._telemetry_thread = threading.Thread(target=self._telemetry_loop, args=(state_provider, telemetry_hz),
+                                                      daemon=True, name="flight-recorder-telemetry")
+            self._telemetry_thread.start()
+        print(f"⏺️ 飞行记录开始: {self.flight_id}")
+        return self.flight_id
+
+    def stop(self) -> Dict[str, Any]:
+        """停止录制：写完队列中的帧、关闭当前分段并写入索引，返回录制统计"""
+        with self._lock:
+            if not self._recording:
+                return self.get_stats()
+            self._recording = False
+        self._stop_event.set()
+        for thread in (self._telemetry_thread, self._writer_thread):
+            if thread is not None:
+                thread.join(timeout=10.0)
+        self._writer_thread = self._telemetry_thread = None
+        with self._lock:
+            if self._telemetry_file is not None:
+                self._telemetry_file.close()
+                self._telemetry_file = None
+        stats = self.get_stats()
+        print(f"⏹️ 飞行记录结束: {self.flight_id}，{stats['frames_written']} 帧，"
+              f"{stats['segments']} 段，丢弃 {stats['frames_dropped']} 帧")
+        return stats
+
+    def add_frame(self, frame: np.ndarray, t: Optional[float] = None) -> bool:
+        """提交一帧（不阻塞），队列已满时丢弃并返回False"""
+        if not self._recording:
+            return False
+        t = time.monotonic() - self._started_mono if t is None else t
+        try:
+            self._queue.put_nowait((t, frame.copy()))
+            return True
+        except queue.Full:
+            self.stats['frames_dropped'] += 1
+            return False
+
+    def record_state(self, state: Optional[Dict[str, Any]], t: Optional[float] = None):
+        """记录一条遥测状态（键名与Tello状态包一致：bat, h, mid, x, y, z）"""
+        if not state or not self._recording:
+            return
+        t = time.monotonic() - self._started_mono if t is None else t
+        record = TELEMETRY_RECORD.pack(t, *(_clamp_int16(state.get(key, 0)) for key in TELEMETRY_FIELDS))
+        with self._lock:
+            if self._telemetry_file is not None:
+                self._telemetry_file.write(record)
+                self.stats['telemetry_records'] += 1
+
+    def _telemetry_loop(self, state_provider, telemetry_hz: float):
+        interval = 1.0 / max(0.1, telemetry_hz)
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.record_state(state_provider())
+            except Exception as e:
+                print(f"⚠️ 遥测记录失败: {e}")
+            self._stop_event.wait(max(0.0, interval - (time.monotonic() - started)))
+
+    def _writer_loop(self):
+        while True:
+            try:
+                t, frame = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    break
+                continue
+            try:
+                self._write_frame(t, frame)
+            except Exception as e:
+                print(f"❌ 录制写入失败: {e}")
+        self._close_segment()
+
+    def _write_frame(self, t: float, frame: np.ndarray):
+        segment = self._segment
+        if segment is not None and t - segment['start_t'] >= self.segment_seconds:
+            self._close_segment()
+            segment = None
+        if segment is None:
+            segment = self._open_segment(t, frame)
+        height, width = segment['size'][1], segment['size'][0]
+        if frame.shape[0] != height or frame.shape[1] != width:
+            frame = cv2.resize(frame, (width, height))
+        segment['writer'].write(frame)
+        segment['timestamps'].append(t)
+        self.stats['frames_written'] += 1
+
+    def _open_segment(self, t: float, frame: np.ndarray) -> Dict[str, Any]:
+        number = len(self._index['segments']) + self.stats['segments_evicted']
+        name = f"segment_{number:04d}"
+        size = (frame.shape[1], frame.shape[0])
+        writer = cv2.VideoWriter(os.path.join(self.flight_dir, f"{name}.avi"),
+                                 cv2.VideoWriter_fourcc(*'MJPG'), self.fps, size)
+        writer.set(cv2.VIDEOWRITER_PROP_QUALITY, self.jpeg_quality)
+        self._segment = {'name': name, 'writer': writer, 'start_t': t, 'size': size, 'timestamps': [],
+                         'first_index': self.stats['frames_written']}
+        return self._segment
+
+    def _close_segment(self):
+        segment, self._segment = self._segment, None
+        if segment is None:
+            return
+        segment['writer'].release()
+        timestamps = np.asarray(segment['timestamps'], dtype='<f8')
+        ts_name = f"{segment['name']}.ts"
+        timestamps.tofile(os.path.join(self.flight_dir, ts_name))
+        video_name = f"{segment['name']}.avi"
+        size_bytes = os.path.getsize(os.path.join(self.flight_dir, video_name)) + timestamps.nbytes
+        with self._lock:
+            self._index['segments'].append({
+                'file': video_name,
+                'ts_file': ts_name,
+                'start_t': float(timestamps[0]) if len(timestamps) else segment['start_t'],
+                'end_t': float(timestamps[-1]) if len(timestamps) else segment['start_t'],
+                'frames': int(len(timestamps)),
+                'first_index': segment['first_index'],
+                'bytes': size_bytes
+            })
+            self.stats['segments'] += 1
+            _write_json_atomic(os.path.join(self.flight_dir, INDEX_FILENAME), self._index)
+        self.enforce_ring()
+
+    def enforce_ring(self) -> int:
+        """磁盘用量超出上限时删除最早的分段（当前录制中的分段除外），返回删除数量"""
+        flights = []
+        for name in os.listdir(self.root):
+            flight_dir = os.path.join(self.root, name)
+            try:
+                index = read_index(flight_dir) if os.path.isdir(flight_dir) else None
+            except (OSError, ValueError):
+                index = None
+            if index is not None and flight_dir == self.flight_dir and self._index is not None:
+                index = self._index
+            if index is not None:
+                flights.append((index.get('started_at', 0.0), flight_dir, index))
+        flights.sort(key=lambda item: item[0])
+
+        total = sum(seg.get('bytes', 0) for _, _, index in flights for seg in index['segments'])
+        total += sum(self._telemetry_size(flight_dir) for _, flight_dir, _ in flights)
+        evicted = 0
+        for _, flight_dir, index in flights:
+            current = flight_dir == self.flight_dir
+            while total > self.max_bytes and index['segments']:
+                # 当前录制至少保留最近一段
+                if current and len(index['segments']) <= 1:
+                    break
+                with self._lock:
+                    segment = index['segments'].pop(0)
+                for filename in (segment['file'], segment['ts_file']):
+                    path = os.path.join(flight_dir, filename)
+                    if os.path.exists(path):
+                        os.remove(path)
+                total -= segment.get('bytes', 0)
+                evicted += 1
+                if current:
+                    with self._lock:
+                        self.stats['segments_evicted'] += 1
+                        _write_json_atomic(os.path.join(flight_dir, INDEX_FILENAME), index)
+            if not current:
+                if not index['segments']:
+                    total -= self._telemetry_size(flight_dir)
+                    shutil.rmtree(flight_dir, ignore_errors=True)
+                elif evicted:
+                    _write_json_atomic(os.path.join(flight_dir, INDEX_FILENAME), index)
+            if total <= self.max_bytes:
+                break
+        if evicted:
+            print(f"🧹 录制空间超出上限，已删除最早的 {evicted} 个分段")
+        return evicted
+
+    @staticmethod
+    def _telemetry_size(flight_dir: str) -> int:
+        path = os.path.join(flight_dir, TELEMETRY_FILENAME)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def list_recordings(self) -> List[Dict[str, Any]]:
+        """列出磁盘上的录制（按开始时间倒序）"""
+        recordings = []
+        for name in os.listdir(self.root):
+            flight_dir = os.path.join(self.root, name)
+            index = read_index(flight_dir) if os.path.isdir(flight_dir) else None
+            if index is None:
+                continue
+            segments = index['segments']
+            recordings.append({
+                'flight_id': index['flight_id'],
+                'started_at': datetime.fromtimestamp(index['started_at']).isoformat(),
+                'segments': len(segments),
+                'frames': sum(seg['frames'] for seg in segments),
+                'duration': round(segments[-1]['end_t'] - segments[0]['start_t'], 1) if segments else 0.0,
+                'mb': round(sum(seg['bytes'] for seg in segments) / 1024 / 1024, 1)
+            })
+        recordings.sort(key=lambda r: r['started_at'], reverse=True)
+        return recordings
+
+    def telemetry_logs(self, limit: int = 20) -> List[List[Dict[str, Any]]]:
+        """读取最近 limit 次录制的遥测日志（用于拟合电量模型等离线分析）"""
+        paths = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name, TELEMETRY_FILENAME)
+            if os.path.isfile(path):
+                paths.append((os.path.getmtime(path), path))
+        logs = []
+        for _, path in sorted(paths, reverse=True)[:limit]:
+            try:
+                logs.append(read_telemetry_log(path))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 读取遥测日志失败 {path}: {e}")
+        return logs
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取录制统计"""
+        stats = dict(self.stats)
+        stats['recording'] = self._recording
+        stats['flight_id'] = self.flight_id
+        stats['queue'] = self._queue.qsize()
+        stats['max_gb'] = round(self.max_bytes / 1024 ** 3, 2)
+        return stats
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+植株最佳帧选择
+无人机在植株前悬停时收集候选帧，按清晰度、曝光与QR码尺寸打分；
+植株窗口关闭时只交出得分最高的一帧用于云端分析与存档
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+
+def score_frame(frame: np.ndarray, qr_rect=None, max_side: int = 320) -> Dict[str, float]:
+    """为候选帧打分
+
+    Args:
+        frame: BGR图像
+        qr_rect: QR码矩形 (left, top, width, height)，可选
+        max_side: 计算清晰度时的缩小尺寸
+
+    Returns:
+        sharpness（缩小灰度图的拉普拉斯方差）、exposure（0-1）、qr_ratio（QR码面积占比）与综合得分 score
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
+    height, width = gray.shape[:2]
+    longest = max(height, width)
+    if longest > max_side:
+        scale = max_side / float(longest)
+        gray = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+    # 曝光：均值越接近中间灰越好，过曝/欠曝像素比例额外扣分
+    mean = float(cv2.mean(gray)[0])
+    clipped = (cv2.countNonZero(cv2.inRange(gray, 0, 8)) +
+               cv2.countNonZero(cv2.inRange(gray, 247, 255))) / float(gray.size)
+    exposure = max(0.0, 1.0 - abs(mean - 128.0) / 128.0 - clipped)
+
+    qr_ratio = 0.0
+    if qr_rect is not None:
+        qr_ratio = (float(qr_rect[2]) * float(qr_rect[3])) / float(width * height)
+
+    # 清晰度取对数压缩动态范围；QR码越大说明距离越近、构图越正
+    sharpness_term = np.log1p(sharpness) / np.log1p(2000.0)
+    qr_term = min(1.0, qr_ratio / 0.05)
+    score = 0.6 * min(1.0, sharpness_term) + 0.25 * exposure + 0.15 * qr_term
+
+    return {
+        'sharpness': sharpness,
+        'exposure': exposure,
+        'qr_ratio': qr_ratio,
+        'score': float(score)
+    }
+
+
+@dataclass
+class FrameCandidate:
+    """候选帧"""
+    frame: np.ndarray
+    score: float
+    sharpness: float
+    exposure: float
+    qr_ratio: float
+    timestamp: float
+    qr_info: Dict[str, Any] = field(default_factory=dict)
+    strawberry_detections: List[Any] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'score': round(self.score, 3),
+            'sharpness': round(self.sharpness, 1),
+            'exposure': round(self.exposure, 3),
+            'qr_ratio': round(self.qr_ratio, 4),
+            'timestamp': self.timestamp
+        }
+
+
+@dataclass
+class PlantWindow:
+    """某植株的候选帧窗口"""
+    plant_id: Any
+    opened_at: float
+    last_seen: float
+    best: Optional[FrameCandidate] = None
+    candidates: int = 0
+    with_strawberries: int = 0
+
+
+class BestFrameSelector:
+    """按植株收集候选帧并在窗口关闭时选出最佳帧"""
+
+    def __init__(self, idle_seconds: float = 1.5, max_window_seconds: float = 6.0,
+                 close_on_switch: bool = True, score_max_side: int = 320):
+        """
+        Args:
+            idle_seconds: 植株连续多久未出现即关闭窗口
+            max_window_seconds: 窗口最长持续时间（长时间悬停时也按时交出结果）
+            close_on_switch: 出现另一株植株时立即关闭其他窗口
+            score_max_side: 打分时的缩小尺寸
+        """
+        self.idle_seconds = idle_seconds
+        self.max_window_seconds = max_window_seconds
+        self.close_on_switch = close_on_switch
+        self.score_max_side = score_max_side
+
+        self._windows: Dict[Any, PlantWindow] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'frames_offered': 0,
+            'windows_closed': 0,
+            'frames_skipped': 0
+        }
+
+    def offer(self, plant_id, frame: np.ndarray, qr_info: Dict[str, Any],
+              strawberry_detections: Optional[List[Any]] = None, now: Optional[float] = None) -> List[PlantWindow]:
+        """提交一帧候选，返回因切换植株而关闭的窗口"""
+        now = time.time() if now is None else now
+        strawberry_detections = list(strawberry_detections or [])
+        metrics = score_frame(frame, qr_info.get('rect'), self.score_max_side)
+
+        closed = []
+        with self._lock:
+            self.stats['frames_offered'] += 1
+            if self.close_on_switch:
+                for other_id in [pid for pid in self._windows if pid != plant_id]:
+                    closed.append(self._close_locked(other_id))
+
+            window = self._windows.get(plant_id)
+            if window is None:
+                window = PlantWindow(plant_id=plant_id, opened_at=now, last_seen=now)
+                self._windows[plant_id] = window
+            window.last_seen = now
+            window.candidates += 1
+            if strawberry_detections:
+                window.with_strawberries += 1
+
+            # 有草莓检测结果的帧优先，其次比较综合得分
+            best = window.best
+            better = (best is None or
+                      (bool(strawberry_detections), metrics['score']) >
+                      (bool(best.strawberry_detections), best.score))
+            if better:
+                window.best = FrameCandidate(
+                    frame=frame.copy(),
+                    score=metrics['score'],
+                    sharpness=metrics['sharpness'],
+                    exposure=metrics['exposure'],
+                    qr_ratio=metrics['qr_ratio'],
+                    timestamp=now,
+                    qr_info=dict(qr_info),
+                    strawberry_detections=strawberry_detections
+                )
+            else:
+                self.stats['frames_skipped'] += 1
+        return closed
+
+    def poll(self, now: Optional[float] = None) -> List[PlantWindow]:
+        """关闭空闲或超时的窗口并返回它们"""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [pid for pid, w in self._windows.items()
+                       if now - w.last_seen >= self.idle_seconds or now - w.opened_at >= self.max_window_seconds]
+            return [self._close_locked(pid) for pid in expired]
+
+    def flush(self) -> List[PlantWindow]:
+        """立即关闭全部窗口（如任务结束时）"""
+        with self._lock:
+            return [self._close_locked(pid) for pid in list(self._windows)]
+
+    def discard(self):
+        """丢弃全部窗口，不交出结果"""
+        with self._lock:
+            self._windows.clear()
+
+    def _close_locked(self, plant_id) -> PlantWindow:
+        window = self._windows.pop(plant_id)
+        self.stats['windows_closed'] += 1
+        return window
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取选择统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['open_windows'] = len(self._windows)
+        closed = stats['windows_closed']
+        stats['frames_per_window'] = round(stats['frames_offered'] / closed, 1) if closed else 0.0
+        return stats
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+录制飞行的帧来源
+读取飞行视频（每N帧取一帧，跳过的帧只grab不解码）并按时间对齐遥测记录。
+录制目录约定：video.* 为视频文件，telemetry.jsonl 每行一条 {"t": 相对录制开始的秒数, "state": {...}}；
+飞行记录仪（flight_recorder）的目录含 index.json、分段视频及逐帧时间戳、telemetry.bin，可按时间定位回放
+"""
+
+import bisect
+import glob
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+from flight_recorder import INDEX_FILENAME, TELEMETRY_FILENAME, read_index, read_telemetry_log
+
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.h264')
+
+
+@dataclass
+class SourceFrame:
+    """一帧录制画面及其对齐的遥测"""
+    index: int
+    timestamp: float
+    frame: np.ndarray
+    telemetry: Optional[Dict[str, Any]] = None
+
+
+class TelemetryTrack:
+    """按时间排序的遥测记录，支持最近邻查找"""
+
+    def __init__(self, records: Optional[List[Dict[str, Any]]] = None):
+        records = sorted(records or [], key=lambda r: r['t'])
+        self.times = [float(r['t']) for r in records]
+        self.records = records
+
+    @classmethod
+    def load(cls, path: str) -> 'TelemetryTrack':
+        """读取遥测文件：飞行记录仪的二进制日志，或JSONL（跳过无法解析的行）"""
+        if path.endswith('.bin'):
+            return cls(read_telemetry_log(path))
+        records = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if 't' in record:
+                    records.append(record)
+        return cls(records)
+
+    def nearest(self, t: float, max_gap: float = 0.5) -> Optional[Dict[str, Any]]:
+        """返回与 t 最接近的遥测状态，相差超过 max_gap 秒时返回None"""
+        if not self.times:
+            return None
+        pos = bisect.bisect_left(self.times, t)
+        best = None
+        for i in (pos - 1, pos):
+            if 0 <= i < len(self.times) and (best is None or abs(self.times[i] - t) < abs(self.times[best] - t)):
+                best = i
+        if abs(self.times[best] - t) > max_gap:
+            return None
+        return self.records[best].get('state', self.records[best])
+
+    def __len__(self):
+        return len(self.records)
+
+
+def iter_video_frames(video_path: str, stride: int = 1, start: int = 0,
+                      limit: Optional[int] = None) -> Iterator[SourceFrame]:
+    """逐帧读取视频，每 stride 帧解码一帧
+
+    Args:
+        video_path: 视频文件路径
+        stride: 取帧间隔，1表示全部帧
+        start: 起始帧号
+        limit: 最多产出的帧数
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise IOError(f"无法打开视频: {video_path}")
+    stride = max(1, int(stride))
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    try:
+        if start > 0:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        index = start
+        produced = 0
+        while limit is None or produced < limit:
+            if (index - start) % stride:
+                # 跳过的帧只grab不解码
+                if not capture.grab():
+                    break
+                index += 1
+                continue
+            ok, frame = capture.read()
+            if not ok:
+                break
+            position = capture.get(cv2.CAP_PROP_POS_MSEC)
+            timestamp = position / 1000.0 if position > 0 else index / fps
+            yield SourceFrame(index=index, timestamp=timestamp, frame=frame)
+            produced += 1
+            index += 1
+    finally:
+        capture.release()
+
+
+@dataclass
+class FlightRecording:
+    """一次录制的飞行：视频（单个文件或飞行记录仪的分段）与可选的遥测"""
+    video_path: str
+    telemetry_path: Optional[str] = None
+    flight_id: str = ''
+    telemetry: TelemetryTrack = field(default_factory=TelemetryTrack)
+    segments: List[Dict[str, Any]] = field(default_factory=list)
+
+    def __post_init__(self):
+        if not self.flight_id:
+            parent = os.path.dirname(os.path.abspath(self.video_path))
+            stem = os.path.splitext(os.path.basename(self.video_path))[0]
+            self.flight_id = os.path.basename(parent) if stem == 'video' else stem
+        if self.telemetry_path and os.path.exists(self.telemetry_path):
+            self.telemetry = TelemetryTrack.load(self.telemetry_path)
+
+    @classmethod
+    def open(cls, path: str, telemetry_path: Optional[str] = None) -> 'FlightRecording':
+        """打开录制目录（普通录制或飞行记录仪目录）或单个视频文件"""
+        if os.path.isdir(path) and os.path.exists(os.path.join(path, INDEX_FILENAME)):
+            return cls._open_recorder_dir(path, telemetry_path)
+        if os.path.isdir(path):
+            videos = sorted(p for p in glob.glob(os.path.join(path, 'video.*'))
+                            if p.lower().endswith(VIDEO_EXTENSIONS))
+            if not videos:
+                raise FileNotFoundError(f"录制目录中没有视频文件: {path}")
+            default_telemetry = os.path.join(path, 'telemetry.jsonl')
+            return cls(videos[0], telemetry_path or (default_telemetry if os.path.exists(default_telemetry) else None),
+                       flight_id=os.path.basename(os.path.normpath(path)))
+        if telemetry_path is None:
+            sibling = os.path.splitext(path)[0] + '.jsonl'
+            telemetry_path = sibling if os.path.exists(sibling) else None
+        return cls(path, telemetry_path)
+
+    @classmethod
+    def _open_recorder_dir(cls, path: str, telemetry_path: Optional[str]) -> 'FlightRecording':
+        index = read_index(path)
+        segments = []
+        for segment in index['segments']:
+            video = os.path.join(path, segment['file'])
+            if not os.path.exists(video):
+                continue
+            # 逐帧时间戳（float64小端），用于定位与遥测对齐
+            timestamps = np.fromfile(os.path.join(path, segment['ts_file']), dtype='<f8')
+            segments.append(dict(segment, path=video, timestamps=timestamps))
+        if not segments:
+            raise FileNotFoundError(f"录制目录中没有视频分段: {path}")
+        default_telemetry = os.path.join(path, TELEMETRY_FILENAME)
+        return cls(segments[0]['path'],
+                   telemetry_path or (default_telemetry if os.path.exists(default_telemetry) else None),
+                   flight_id=index.get('flight_id') or os.path.basename(os.path.normpath(path)),
+                   segments=segments)
+
+    def frame_count(self) -> int:
+        """视频总帧数（容器未记录时返回0）"""
+        if self.segments:
+            return sum(len(segment['timestamps']) for segment in self.segments)
+        capture = cv2.VideoCapture(self.video_path)
+        try:
+            return int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        finally:
+            capture.release()
+
+    def frames(self, stride: int = 1, limit: Optional[int] = None, max_telemetry_gap: float = 0.5,
+               start_time: Optional[float] = None) -> Iterator[SourceFrame]:
+        """按间隔产出帧，并附上时间最接近的遥测状态
+
+        Args:
+            stride: 取帧间隔
+            limit: 最多产出的帧数
+            max_telemetry_gap: 遥测对齐允许的最大时间差
+            start_time: 从该时间（秒，相对录制开始）起读取
+        """
+        if self.segments:
+            iterator = self._segment_frames(stride, limit, start_time)
+        else:
+            start = 0
+            if start_time:
+                capture = cv2.VideoCapture(self.video_path)
+                fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+                capture.release()
+                start = max(0, int(round(start_time * fps)))
+            iterator = iter_video_frames(self.video_path, stride=stride, start=start, limit=limit)
+        for source_frame in iterator:
+            source_frame.telemetry = self.telemetry.nearest(source_frame.timestamp, max_telemetry_gap)
+            yield source_frame
+
+    def seek(self, t: float, stride: int = 1, limit: Optional[int] = None) -> Iterator[SourceFrame]:
+        """从时间 t 处开始回放"""
+        return self.frames(stride=stride, limit=limit, start_time=t)
+
+    def _segment_frames(self, stride: int, limit: Optional[int],
+                        start_time: Optional[float]) -> Iterator[SourceFrame]:
+        """跨分段读取：帧号全局连续，时间戳取录制时记录的逐帧时间"""
+        stride = max(1, int(stride))
+        produced = 0
+        next_index = None
+        for segment in self.segments:
+            timestamps = segment['timestamps']
+            if not len(timestamps) or (start_time is not None and timestamps[-1] < start_time):
+                continue
+            first_index = segment.get('first_index', 0)
+            local_start = 0
+            if next_index is None:
+                if start_time is not None:
+                    local_start = bisect.bisect_left(timestamps.tolist(), start_time)
+                next_index = first_index + local_start
+            local_start = max(local_start, next_index - first_index)
+            if local_start >= len(timestamps):
+                continue
+            remaining = None if limit is None else limit - produced
+            for source_frame in iter_video_frames(segment['path'], stride=stride, start=local_start, limit=remaining):
+                if source_frame.index >= len(timestamps):
+                    break
+                source_frame.timestamp = float(timestamps[source_frame.index])
+                source_frame.index += first_index
+                next_index = source_frame.index + stride
+                produced += 1
+                yield source_frame
+            if limit is not None and produced >= limit:
+                return
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分析图片内容寻址存档
+图片按SHA-256存放在两级哈希分片目录中（相同画面只存一份），
+SQLite索引记录植株/时间到图片的映射，并为仪表盘生成缩略图；
+后台按总大小与保存天数清理过期图片
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+
+LEGACY_FILENAME_PATTERN = re.compile(r'^plant_(?P<plant>.+)_(?P<ts>\d{8}_\d{6})\.jpg$')
+
+
+@dataclass
+class ArchiveEntry:
+    """一次存档记录"""
+    capture_id: int
+    plant_id: Any
+    captured_at: float
+    image_hash: str
+    image_path: str
+    thumbnail_path: str
+    size: int
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self, root: Optional[str] = None) -> Dict[str, Any]:
+        """转换为可广播的字典；提供 root 时路径转换为相对于 root 的URL路径"""
+        def rel(path):
+            return os.path.relpath(path, root).replace(os.sep, '/') if root else path
+        return {
+            'capture_id': self.capture_id,
+            'plant_id': self.plant_id,
+            'captured_at': datetime.fromtimestamp(self.captured_at).isoformat(),
+            'image_hash': self.image_hash,
+            'image_url': rel(self.image_path),
+            'thumbnail_url': rel(self.thumbnail_path),
+            'size': self.size,
+            'metadata': self.metadata
+        }
+
+
+class ImageArchive:
+    """内容寻址的图片存档"""
+
+    def __init__(self, root: str, max_bytes: int = 2 * 1024 ** 3, max_age_days: float = 180.0,
+                 thumbnail_side: int = 256, jpeg_quality: int = 90):
+        """
+        Args:
+            root: 存档根目录（其下为 blobs/、thumbs/ 与 index.db）
+            max_bytes: 图片与缩略图的总大小上限，超出时从最早的记录开始清理（0表示不限）
+            max_age_days: 记录保存天数（0表示不限）
+            thumbnail_side: 缩略图最长边
+            jpeg_quality: 存档JPEG质量
+        """
+        self.root = root
+        self.blobs_dir = os.path.join(root, 'blobs')
+        self.thumbs_dir = os.path.join(root, 'thumbs')
+        self.max_bytes = int(max_bytes)
+        self.max_age_days = float(max_age_days)
+        self.thumbnail_side = thumbnail_side
+        self.jpeg_quality = jpeg_quality
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.thumbs_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS captures (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                plant_id TEXT,
+                captured_at REAL NOT NULL,
+                hash TEXT NOT NULL REFERENCES blobs (hash),
+                metadata TEXT NOT NULL DEFAULT '{}'
+            );
+            CREATE INDEX IF NOT EXISTS idx_captures_plant ON captures (plant_id, captured_at);
+            CREATE INDEX IF NOT EXISTS idx_captures_time ON captures (captured_at);
+            CREATE INDEX IF NOT EXISTS idx_captures_hash ON captures (hash);
+        ''')
+
+        self._retention_thread = None
+        self._retention_stop = threading.Event()
+        self.stats = {
+            'stored': 0,
+            'deduplicated': 0,
+            'retention_runs': 0,
+            'captures_expired': 0,
+            'blobs_removed': 0,
+            'bytes_removed': 0
+        }
+
+    def _shard_path(self, base: str, image_hash: str) -> str:
+        return os.path.join(base, image_hash[:2], image_hash[2:4], f"{image_hash}.jpg")
+
+    def blob_path(self, image_hash: str) -> str:
+        """原图路径"""
+        return self._shard_path(self.blobs_dir, image_hash)
+
+    def thumbnail_path(self, image_hash: str) -> str:
+        """缩略图路径"""
+        return self._shard_path(self.thumbs_dir, image_hash)
+
+    def _make_thumbnail(self, image: np.ndarray) -> bytes:
+        height, width = image.shape[:2]
+        scale = min(1.0, self.thumbnail_side / float(max(height, width)))
+        if scale < 1.0:
+            image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if not ok:
+            raise IOError("缩略图编码失败")
+        return buffer.tobytes()
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def store(self, image: np.ndarray, plant_id=None, captured_at: Optional[float] = None,
+              metadata: Optional[Dict[str, Any]] = None, encoded: Optional[bytes] = None) -> ArchiveEntry:
+        """存档一张图片
+
+        Args:
+            image: BGR图像（用于编码与生成缩略图）
+            plant_id: 植株ID
+            captured_at: 拍摄时间戳，默认当前时间
+            metadata: 附加信息（JSON可序列化）
+            encoded: 已编码的JPEG字节，提供时直接按其内容寻址（如迁移旧文件）
+        """
+        captured_at = time.time() if captured_at is None else captured_at
+        if encoded is None:
+            ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise IOError("图片编码失败")
+            encoded = buffer.tobytes()
+        image_hash = hashlib.sha256(encoded).hexdigest()
+        image_path = self.blob_path(image_hash)
+        thumb_path = self.thumbnail_path(image_hash)
+
+        with self._lock:
+            exists = self._conn.execute('SELECT size FROM blobs WHERE hash = ?', (image_hash,)).fetchone()
+            if exists is None or not os.path.exists(image_path):
+                thumbnail = self._make_thumbnail(image)
+                self._write_atomic(image_path, encoded)
+                self._write_atomic(thumb_path, thumbnail)
+                size = len(encoded) + len(thumbnail)
+                self._conn.execute('INSERT OR REPLACE INTO blobs (hash, size, created_at) VALUES (?, ?, ?)',
+                                   (image_hash, size, time.time()))
+                self.stats['stored'] += 1
+            else:
+                size = exists['size']
+                self.stats['deduplicated'] += 1
+
+            cursor = self._conn.execute(
+                'INSERT INTO captures (plant_id, captured_at, hash, metadata) VALUES (?, ?, ?, ?)',
+                (json.dumps(plant_id, ensure_ascii=False), captured_at, image_hash,
+                 json.dumps(metadata or {}, ensure_ascii=False, default=str)))
+
+        return ArchiveEntry(cursor.lastrowid, plant_id, captured_at, image_hash,
+                            image_path, thumb_path, size, dict(metadata or {}))
+
+    def lookup(self, plant_id=None, since: Optional[float] = None, until: Optional[float] = None,
+               limit: int = 50) -> List[ArchiveEntry]:
+        """按植株与时间范围查询存档记录（最新的在前）"""
+        clauses, params = [], []
+        if plant_id is not None:
+            clauses.append('c.plant_id = ?')
+            params.append(json.dumps(plant_id, ensure_ascii=False))
+        if since is not None:
+            clauses.append('c.captured_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('c.captured_at <= ?')
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT c.*, b.size FROM captures c JOIN blobs b ON b.hash = c.hash {where} '
+                f'ORDER BY c.captured_at DESC LIMIT ?', (*params, limit)).fetchall()
+        return [ArchiveEntry(row['id'], json.loads(row['plant_id']) if row['plant_id'] else None,
+                             row['captured_at'], row['hash'], self.blob_path(row['hash']),
+                             self.thumbnail_path(row['hash']), row['size'], json.loads(row['metadata'] or '{}'))
+                for row in rows]
+
+    def enforce_retention(self, now: Optional[float] = None) -> Dict[str, int]:
+        """按保存天数与总大小清理存档，返回本次清理的数量"""
+        now = time.time() if now is None else now
+        expired = 0
+        with self._lock:
+            if self.max_age_days > 0:
+                cutoff = now - self.max_age_days * 86400
+                expired += self._conn.execute('DELETE FROM captures WHERE captured_at < ?', (cutoff,)).rowcount
+            removed_blobs, removed_bytes = self._remove_orphans()
+
+            if self.max_bytes > 0:
+                total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+                while total > self.max_bytes:
+                    # 从最早的记录开始，每批删除一天的拍摄
+                    oldest = self._conn.execute('SELECT MIN(captured_at) FROM captures').fetchone()[0]
+                    if oldest is None:
+                        break
+                    expired += self._conn.execute('DELETE FROM captures WHERE captured_at < ?',
+                                                  (oldest + 86400,)).rowcount
+                    blobs, freed = self._remove_orphans()
+                    removed_blobs += blobs
+                    removed_bytes += freed
+                    total -= freed
+
+            self.stats['retention_runs'] += 1
+            self.stats['captures_expired'] += expired
+            self.stats['blobs_removed'] += removed_blobs
+            self.stats['bytes_removed'] += removed_bytes
+
+        if expired or removed_blobs:
+            print(f"🧹 图片存档清理: {expired} 条记录，{removed_blobs} 张图片，释放 {removed_bytes / 1024 / 1024:.1f}MB")
+        return {'captures_expired': expired, 'blobs_removed': removed_blobs, 'bytes_removed': removed_bytes}
+
+    def _remove_orphans(self):
+        """删除不再被任何记录引用的图片（调用方需持有锁）"""
+        rows = self._conn.execute(
+            'SELECT hash, size FROM blobs WHERE hash NOT IN (SELECT DISTINCT hash FROM captures)').fetchall()
+        freed = 0
+        for row in rows:
+            for path in (self.blob_path(row['hash']), self.thumbnail_path(row['hash'])):
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    print(f"⚠️ 删除存档图片失败: {e}")
+            freed += row['size']
+        if rows:
+            self._conn.executemany('DELETE FROM blobs WHERE hash = ?', [(row['hash'],) for row in rows])
+        return len(rows), freed
+
+    def start_retention(self, interval_seconds: float = 3600.0):
+        """启动后台清理线程"""
+        if self._retention_thread is not None and self._retention_thread.is_alive():
+            return
+        self._retention_stop.clear()
+
+        def retention_loop():
+            while not self._retention_stop.is_set():
+                try:
+                    self.enforce_retention()
+                except Exception as e:
+                    print(f"❌ 图片存档清理失败: {e}")
+                self._retention_stop.wait(interval_seconds)
+
+        self._retention_thread = threading.Thread(target=retention_loop, daemon=True, name="image-archive-retention")
+        self._retention_thread.start()
+
+    def stop(self):
+        """停止后台清理线程"""
+        self._retention_stop.set()
+        if self._retention_thread is not None:
+            self._retention_thread.join(timeout=5.0)
+            self._retention_thread = None
+
+    def close(self):
+        """停止清理线程并关闭索引"""
+        self.stop()
+        with self._lock:
+            self._conn.close()
+
+    def migrate_legacy_images(self, directory: str, remove: bool = False) -> int:
+        """导入旧版 images/ 目录中的 plant_{id}_{时间}.jpg 文件，返回导入数量"""
+        imported = 0
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                match = LEGACY_FILENAME_PATTERN.match(entry.name)
+                if not match or not entry.is_file():
+                    continue
+                try:
+                    with open(entry.path, 'rb') as f:
+                        encoded = f.read()
+                    image = cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_COLOR)
+                    if image is None:
+                        continue
+                    plant = match.group('plant')
+                    plant_id = int(plant) if plant.isdigit() else plant
+                    captured_at = datetime.strptime(match.group('ts'), "%Y%m%d_%H%M%S").timestamp()
+                    self.store(image, plant_id, captured_at, {'legacy_filename': entry.name}, encoded=encoded)
+                    imported += 1
+                    if remove:
+                        os.remove(entry.path)
+                except Exception as e:
+                    print(f"⚠️ 导入 {entry.name} 失败: {e}")
+        return imported
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存档统计"""
+        with self._lock:
+            blobs, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+            captures, plants = self._conn.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT plant_id) FROM captures').fetchone()
+        stats = dict(self.stats)
+        stats.update({
+            'captures': captures,
+            'plants': plants,
+            'blobs': blobs,
+            'total_mb': round(total / 1024 / 1024, 2),
+            'max_mb': round(self.max_bytes / 1024 / 1024, 2) if self.max_bytes else 0,
+            'max_age_days': self.max_age_days
+        })
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='分析图片存档维护')
+    parser.add_argument('--root', default=os.path.join(os.path.dirname(__file__), 'image_archive'), help='存档根目录')
+    parser.add_argument('--migrate', help='导入旧版图片目录（如 images/）')
+    parser.add_argument('--remove', action='store_true', help='导入后删除旧文件')
+    parser.add_argument('--retention', action='store_true', help='立即执行一次保留策略清理')
+    args = parser.parse_args()
+
+    archive = ImageArchive(args.root)
+    if args.migrate:
+        start = time.perf_counter()
+        count = archive.migrate_legacy_images(args.migrate, remove=args.remove)
+        print(f"✅ 导入 {count} 张图片，耗时 {time.perf_counter() - start:.1f}s")
+    if args.retention:
+        archive.enforce_retention()
+    print(json.dumps(archive.get_stats(), ensure_ascii=False, indent=2))
+    archive.close()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+云端视觉调用的图像预处理
+裁剪到感兴趣区域、限制最长边，并按上传字节预算选择JPEG质量，降低田间路由器上行带宽占用。
+前后对比：measure_baseline 只额外编码整帧统计旧版上传字节数，不额外调用云端；
+延迟的对比来自关闭预处理（enabled=False）期间按旧版方式上传的实际分析，两种方式的端到端延迟分别统计
+"""
+
+import base64
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+Box = Tuple[int, int, int, int]  # x1, y1, x2, y2
+
+
+def qr_rect_to_box(rect: Sequence[int], context_scale: float = 4.0) -> Box:
+    """将QR码矩形 (left, top, width, height) 扩展为其周围的植株区域"""
+    left, top, width, height = [int(v) for v in rect]
+    cx = left + width / 2.0
+    cy = top + height / 2.0
+    half_w = width * context_scale / 2.0
+    half_h = height * context_scale / 2.0
+    return int(cx - half_w), int(cy - half_h), int(cx + half_w), int(cy + half_h)
+
+
+def compute_roi(image_shape: Tuple[int, ...], boxes: Iterable[Box], margin: float = 0.15,
+                min_side: int = 224) -> Optional[Box]:
+    """计算若干检测框并集加边距后的感兴趣区域，裁剪到图像范围内
+
+    Returns:
+        (x1, y1, x2, y2)，没有有效检测框时返回None
+    """
+    height, width = image_shape[:2]
+    boxes = [b for b in boxes if b is not None]
+    if not boxes:
+        return None
+
+    x1 = min(b[0] for b in boxes)
+    y1 = min(b[1] for b in boxes)
+    x2 = max(b[2] for b in boxes)
+    y2 = max(b[3] for b in boxes)
+
+    pad_x = (x2 - x1) * margin
+    pad_y = (y2 - y1) * margin
+    x1, y1, x2, y2 = x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y
+
+    # 区域过小时保证最小边长，为模型保留足够上下文
+    if x2 - x1 < min_side:
+        cx = (x1 + x2) / 2.0
+        x1, x2 = cx - min_side / 2.0, cx + min_side / 2.0
+    if y2 - y1 < min_side:
+        cy = (y1 + y2) / 2.0
+        y1, y2 = cy - min_side / 2.0, cy + min_side / 2.0
+
+    x1 = max(0, int(round(x1)))
+    y1 = max(0, int(round(y1)))
+    x2 = min(width, int(round(x2)))
+    y2 = min(height, int(round(y2)))
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+
+@dataclass
+class PreparedImage:
+    """预处理后的上传图像"""
+    data_url: str
+    original_size: Tuple[int, int]   # (width, height)
+    prepared_size: Tuple[int, int]   # (width, height)
+    roi: Optional[Box]
+    quality: int
+    jpeg_bytes: int
+    upload_bytes: int                # base64编码后的实际上传字节数
+    encode_attempts: int
+    prepare_seconds: float
+    legacy: bool = False             # 旧版整帧上传（预处理关闭）
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'original_size': list(self.original_size),
+            'prepared_size': list(self.prepared_size),
+            'roi': list(self.roi) if self.roi else None,
+            'quality': self.quality,
+            'jpeg_bytes': self.jpeg_bytes,
+            'upload_bytes': self.upload_bytes,
+            'encode_attempts': self.encode_attempts,
+            'prepare_ms': round(self.prepare_seconds * 1000, 1),
+            'legacy': self.legacy
+        }
+
+
+@dataclass
+class UploadStats:
+    """上传统计：每次分析的上传字节数与端到端延迟，旧版整帧上传的分析单独统计延迟"""
+    analyses: int = 0
+    total_upload_bytes: int = 0
+    total_baseline_bytes: int = 0
+    baseline_samples: int = 0
+    total_latency: float = 0.0
+    legacy_analyses: int = 0
+    legacy_upload_bytes: int = 0
+    total_legacy_latency: float = 0.0
+    recent: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        prepared = self.analyses - self.legacy_analyses
+        avg_bytes = (self.total_upload_bytes - self.legacy_upload_bytes) / prepared if prepared else 0
+        avg_latency = (self.total_latency - self.total_legacy_latency) / prepared if prepared else 0.0
+        stats = {
+            'analyses': self.analyses,
+            'total_upload_bytes': self.total_upload_bytes,
+            'avg_upload_bytes': int(avg_bytes),
+            'avg_latency': round(avg_latency, 3),
+            'legacy_analyses': self.legacy_analyses,
+            'recent': list(self.recent)
+        }
+        if self.baseline_samples:
+            avg_baseline = self.total_baseline_bytes / self.baseline_samples
+            stats['avg_baseline_bytes'] = int(avg_baseline)
+            stats['bytes_saved_ratio'] = round(1 - avg_bytes / avg_baseline, 3) if avg_baseline and prepared else 0.0
+        if self.legacy_analyses:
+            # 实测的旧版延迟：只有两种上传方式都有样本时才给出节省比例
+            avg_legacy = self.total_legacy_latency / self.legacy_analyses
+            stats['avg_baseline_latency'] = round(avg_legacy, 3)
+            if prepared and avg_legacy:
+                stats['latency_saved_ratio'] = round(1 - avg_latency / avg_legacy, 3)
+        return stats
+
+
+class ImagePreparer:
+    """按带宽预算准备云端分析图像"""
+
+    # 旧版上传方式：整帧、JPEG质量85
+    LEGACY_QUALITY = 85
+
+    def __init__(self, max_side: int = 1024, target_bytes: int = 120 * 1024,
+                 min_quality: int = 40, max_quality: int = 85, roi_margin: float = 0.15,
+                 min_roi_side: int = 224, measure_baseline: bool = False, enabled: bool = True):
+        """
+        Args:
+            max_side: 最长边上限（像素）
+            target_bytes: 单张图像的JPEG字节预算
+            min_quality: 允许的最低JPEG质量，低于此质量时改为继续缩小尺寸
+            max_quality: 最高JPEG质量
+            roi_margin: 感兴趣区域四周的相对边距
+            min_roi_side: 感兴趣区域的最小边长（像素）
+            measure_baseline: 是否额外编码整帧以统计旧版上传字节数（只对比字节数，不测量旧版延迟）
+            enabled: 关闭时退回旧版整帧上传，这些分析的延迟作为实测的旧版延迟
+        """
+        self.max_side = int(max_side)
+        self.target_bytes = int(target_bytes)
+        self.min_quality = int(min_quality)
+        self.max_quality = int(max_quality)
+        self.roi_margin = float(roi_margin)
+        self.min_roi_side = int(min_roi_side)
+        self.measure_baseline = measure_baseline
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self.stats = UploadStats()
+
+    def configure(self, max_side: Optional[int] = None, target_bytes: Optional[int] = None,
+                  enabled: Optional[bool] = None, measure_baseline: Optional[bool] = None):
+        """运行时更新参数"""
+        if max_side is not None:
+            self.max_side = max(64, int(max_side))
+        if target_bytes is not None:
+            self.target_bytes = max(8 * 1024, int(target_bytes))
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if measure_baseline is not None:
+            self.measure_baseline = bool(measure_baseline)
+
+    @staticmethod
+    def _encode(image: np.ndarray, quality: int) -> np.ndarray:
+        ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        if not ok:
+            raise ValueError("JPEG编码失败")
+        return buffer
+
+    def _resize_to(self, image: np.ndarray, max_side: int) -> np.ndarray:
+        height, width = image.shape[:2]
+        longest = max(height, width)
+        if longest <= max_side:
+            return image
+        scale = max_side / float(longest)
+        size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    def _fit_quality(self, image: np.ndarray) -> Tuple[np.ndarray, int, int]:
+        """二分查找预算内的最高JPEG质量，返回 (编码结果, 质量, 编码次数)"""
+        attempts = 1
+        buffer = self._encode(image, self.max_quality)
+        if buffer.nbytes <= self.target_bytes:
+            return buffer, self.max_quality, attempts
+
+        # 未找到满足预算的质量时保留最低质量结果，由调用方决定是否缩小尺寸
+        best, best_quality = None, self.min_quality
+        lo, hi = self.min_quality, self.max_quality - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            candidate = self._encode(image, mid)
+            attempts += 1
+            if candidate.nbytes <= self.target_bytes:
+                best, best_quality = candidate, mid
+                lo = mid + 1
+            else:
+                if mid == self.min_quality:
+                    best = candidate
+                hi = mid - 1
+
+        return best, best_quality, attempts
+
+    def prepare(self, image: np.ndarray, roi_boxes: Optional[Iterable[Box]] = None) -> PreparedImage:
+        """裁剪、缩放并编码图像为data URL"""
+        start = time.perf_counter()
+        height, width = image.shape[:2]
+
+        if not self.enabled:
+            buffer = self._encode(image, self.LEGACY_QUALITY)
+            return self._build(buffer, (width, height), (width, height), None,
+                               self.LEGACY_QUALITY, 1, start, legacy=True)
+
+        roi = compute_roi(image.shape, roi_boxes or [], self.roi_margin, self.min_roi_side)
+        working = image[roi[1]:roi[3], roi[0]:roi[2]] if roi else image
+        # cv2.imencode 按BGR顺序编码，OpenCV帧直接编码即为正确颜色的JPEG
+        working = self._resize_to(working, self.max_side)
+
+        buffer, quality, attempts = self._fit_quality(working)
+        # 最低质量仍超预算时逐步缩小尺寸
+        while buffer.nbytes > self.target_bytes and max(working.shape[:2]) > 256:
+            working = self._resize_to(working, int(max(working.shape[:2]) * 0.75))
+            buffer, quality, more = self._fit_quality(working)
+            attempts += more
+
+        prepared_size = (working.shape[1], working.shape[0])
+        return self._build(buffer, (width, height), prepared_size, roi, quality, attempts, start)
+
+    def _build(self, buffer, original_size, prepared_size, roi, quality, attempts, start,
+               legacy=False) -> PreparedImage:
+        image_base64 = base64.b64encode(buffer).decode('utf-8')
+        data_url = f"data:image/jpeg;base64,{image_base64}"
+        return PreparedImage(
+            data_url=data_url,
+            original_size=original_size,
+            prepared_size=prepared_size,
+            roi=roi,
+            quality=quality,
+            jpeg_bytes=int(buffer.nbytes),
+            upload_bytes=len(data_url),
+            encode_attempts=attempts,
+            prepare_seconds=time.perf_counter() - start,
+            legacy=legacy
+        )
+
+    def baseline_bytes(self, image: np.ndarray) -> int:
+        """旧版整帧上传的字节数（base64后）"""
+        buffer = self._encode(image, self.LEGACY_QUALITY)
+        return 4 * ((int(buffer.nbytes) + 2) // 3) + len("data:image/jpeg;base64,")
+
+    def record(self, prepared: PreparedImage, latency: float, baseline_bytes: Optional[int] = None,
+               plant_id=None):
+        """记录一次分析的上传字节数与端到端延迟"""
+        with self._lock:
+            self.stats.analyses += 1
+            self.stats.total_upload_bytes += prepared.upload_bytes
+            self.stats.total_latency += latency
+            if prepared.legacy:
+                self.stats.legacy_analyses += 1
+                self.stats.legacy_upload_bytes += prepared.upload_bytes
+                self.stats.total_legacy_latency += latency
+            if baseline_bytes:
+                self.stats.total_baseline_bytes += baseline_bytes
+                self.stats.baseline_samples += 1
+            entry = {'plant_id': plant_id, 'latency': round(latency, 3), **prepared.to_dict()}
+            if baseline_bytes:
+                entry['baseline_bytes'] = baseline_bytes
+            self.stats.recent.append(entry)
+            del self.stats.recent[:-20]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取上传统计"""
+        with self._lock:
+            stats = self.stats.to_dict()
+        stats.update({
+            'enabled': self.enabled,
+            'max_side': self.max_side,
+            'target_bytes': self.target_bytes,
+            'measure_baseline': self.measure_baseline
+        })
+        return stats
+
+
+# 对比测试：旧版整帧上传 vs 预处理后上传
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    frame = rng.integers(60, 200, (720, 960, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (7, 7), 0)
+    cv2.circle(frame, (500, 380), 120, (40, 40, 200), -1)
+    boxes = [(420, 300, 580, 460)]
+
+    preparer = ImagePreparer()
+    legacy = preparer.baseline_bytes(frame)
+
+    for label, roi in (("整帧", None), ("草莓区域", boxes)):
+        prepared = preparer.prepare(frame, roi)
+        print(f"{label}: {prepared.prepared_size} q={prepared.quality} "
+              f"{prepared.upload_bytes / 1024:.1f}KB (旧版 {legacy / 1024:.1f}KB), "
+              f"耗时 {prepared.prepare_seconds * 1000:.1f}ms")
+        # 以1 Mbit/s上行带宽估算上传时间（只是字节数的换算；实测延迟对比见 get_stats 的 avg_baseline_latency）
+        print(f"   估算上传时间: {prepared.upload_bytes * 8 / 1e6:.2f}s (旧版 {legacy * 8 / 1e6:.2f}s)")
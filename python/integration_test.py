@@ -8,6 +8,7 @@ Tests the integration of status update optimization and cleanup callback system
 
 import time
 import threading
+from mission_clock import VirtualClock
 from mission_controller import MissionController
 
 
@@ -75,32 +76,32 @@ def test_status_update_optimization():
     print("\n=== 测试状态更新优化 ===")
     
     status_messages = []
+    clock = VirtualClock()
     
     def status_callback(message):
-        status_messages.append((time.time(), message))
+        status_messages.append((clock.time(), message))
         print(f"📢 状态更新: {message}")
     
     # Create mission controller
     mock_drone = MockDroneController()
-    mission_controller = MissionController(mock_drone, status_callback=status_callback)
+    mission_controller = MissionController(mock_drone, status_callback=status_callback, clock=clock)
     
     # Test rapid status updates (should be optimized)
     print("\n--- 测试快速重复状态更新 ---")
-    start_time = time.time()
     
     for i in range(5):
         mission_controller.optimized_status_callback("测试重复消息")
-        time.sleep(0.1)  # 快速发送，应该被优化
+        clock.sleep(0.1)  # 快速发送，应该被优化
     
     # Test different messages (should not be optimized)
     print("\n--- 测试不同状态消息 ---")
     for i in range(3):
         mission_controller.optimized_status_callback(f"不同消息 {i}")
-        time.sleep(0.1)
+        clock.sleep(0.1)
     
     # Test after interval (should send duplicate)
     print("\n--- 测试间隔后的重复消息 ---")
-    time.sleep(1.1)  # 等待超过状态更新间隔
+    clock.sleep(1.1)  # 等待超过状态更新间隔
     mission_controller.optimized_status_callback("测试重复消息")
     
     print(f"\n📊 总共收到 {len(status_messages)} 条状态消息")
@@ -158,6 +159,7 @@ def test_mission_integration():
     print("\n=== 测试任务集成 ===")
     
     status_messages = []
+    clock = VirtualClock()
     
     def status_callback(message):
         status_messages.append(message)
@@ -165,7 +167,7 @@ def test_mission_integration():
     
     # Create mission controller
     mock_drone = MockDroneController()
-    mission_controller = MissionController(mock_drone, status_callback=status_callback)
+    mission_controller = MissionController(mock_drone, status_callback=status_callback, clock=clock)
     
     # Create and register resource managers
     resource_manager = TestResourceManager("MissionResource")
@@ -175,18 +177,18 @@ def test_mission_integration():
     # Simulate mission operations with status updates
     print("\n--- 模拟任务执行 ---")
     mission_controller.optimized_status_callback("任务初始化")
-    time.sleep(0.2)
+    clock.sleep(0.2)
     
     mission_controller.optimized_status_callback("起飞准备")
-    time.sleep(0.2)
+    clock.sleep(0.2)
     
     mission_controller.optimized_status_callback("执行任务")
-    time.sleep(0.2)
+    clock.sleep(0.2)
     
     # Rapid duplicate updates (should be optimized)
     for i in range(3):
         mission_controller.optimized_status_callback("执行任务")
-        time.sleep(0.1)
+        clock.sleep(0.1)
     
     mission_controller.optimized_status_callback("任务完成")
     
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+大模型回复中的JSON提取
+单次线性扫描，识别括号嵌套、字符串与转义，找到第一个完整的JSON对象（或```代码块中的JSON），
+支持流式逐块输入；CropAnalyzer 与 TelloIntelligentAgent 共用
+"""
+
+import json
+import re
+from typing import Any, List, Optional
+
+# 只关心这些字符：括号、引号、反斜杠与代码块围栏，其余文本整段跳过
+_TOKEN_PATTERN = re.compile(r'```|[{}"\\]')
+
+
+class _Span:
+    """一对匹配的大括号，记录其内部已闭合的直接子对象"""
+    __slots__ = ('start', 'end', 'children')
+
+    def __init__(self, start: int):
+        self.start = start
+        self.end = -1
+        self.children: List['_Span'] = []
+
+
+class StreamingJSONExtractor:
+    """流式JSON对象提取器
+
+    每个字符只扫描一次；只在顶层对象闭合时尝试解析，失败后才依次尝试其内部的子对象。
+    解析直接在缓冲区上用 raw_decode 进行，不复制子串，无效候选在出错位置即停止。
+    """
+
+    def __init__(self, required_key: Optional[str] = None):
+        """
+        Args:
+            required_key: 只接受包含该键的对象（如 'commands'），为None时接受任意对象
+        """
+        self.required_key = required_key
+        self.buffer = ''
+        self.result: Any = None
+        self.done = False
+
+        self._decoder = json.JSONDecoder()
+        self._pos = 0
+        self._stack: List[_Span] = []
+        self._in_string = False
+        self._skip_at = -1          # 转义字符后一个位置，扫描时忽略
+        self._fence_start = -1      # 代码块内容起点
+        self.parse_attempts = 0
+        self.parsed_chars = 0
+
+    def feed(self, chunk: str) -> Any:
+        """追加一段文本，找到目标对象时返回它，否则返回None"""
+        if self.done:
+            return self.result
+        self.buffer += chunk
+        # 末尾的反引号可能属于尚未完整的围栏，留到下次再扫描
+        limit = len(self.buffer)
+        while limit > self._pos and limit > len(self.buffer) - 3 and self.buffer[limit - 1] == '`':
+            limit -= 1
+        self._scan(limit)
+        return self.result if self.done else None
+
+    def finish(self) -> Any:
+        """输入结束：扫描剩余文本，并在未闭合对象内部已闭合的子对象中查找"""
+        if not self.done:
+            self._scan(len(self.buffer))
+        if not self.done:
+            for span in self._stack:
+                if any(self._try_span(child) for child in span.children):
+                    break
+        return self.result if self.done else None
+
+    def _scan(self, limit: int):
+        buffer = self.buffer
+        stack = self._stack
+        for match in _TOKEN_PATTERN.finditer(buffer, self._pos, limit):
+            index = match.start()
+            if index == self._skip_at:
+                continue
+            token = match.group()
+
+            if self._in_string:
+                if token == '\\':
+                    self._skip_at = index + 1
+                elif token == '"':
+                    self._in_string = False
+                continue
+
+            if token == '{':
+                stack.append(_Span(index))
+            elif token == '}':
+                if not stack:
+                    continue
+                span = stack.pop()
+                span.end = index + 1
+                if stack:
+                    stack[-1].children.append(span)
+                elif self._try_span(span):
+                    self._pos = index + 1
+                    return
+            elif token == '"':
+                # 只在对象内部跟踪字符串，正文中的引号不影响扫描
+                if stack:
+                    self._in_string = True
+            elif token == '```' and not stack:
+                if self._fence_start < 0:
+                    newline = buffer.find('\n', match.end(), limit)
+                    self._fence_start = newline + 1 if newline >= 0 else match.end()
+                else:
+                    fence_start, self._fence_start = self._fence_start, -1
+                    if self._try_fence(fence_start, index):
+                        self._pos = match.end()
+                        return
+
+        self._pos = max(self._pos, limit)
+
+    def _decode_at(self, start: int):
+        """在缓冲区 start 处解码一个JSON值，返回 (值, 结束位置)，失败返回None"""
+        self.parse_attempts += 1
+        try:
+            value, end = self._decoder.raw_decode(self.buffer, start)
+        except ValueError as e:
+            self.parsed_chars += max(0, getattr(e, 'pos', start) - start)
+            return None
+        self.parsed_chars += end - start
+        return value, end
+
+    def _try_span(self, span: _Span) -> bool:
+        """尝试解析一对括号；不满足条件时依次尝试其内部子对象"""
+        decoded = self._decode_at(span.start)
+        if decoded is not None and decoded[1] == span.end and self._accept(decoded[0]):
+            self.result = decoded[0]
+            self.done = True
+            return True
+        return any(self._try_span(child) for child in span.children)
+
+    def _try_fence(self, start: int, end: int) -> bool:
+        """尝试解析代码块内容（允许数组等非对象JSON）"""
+        text = self.buffer[start:end].strip()
+        if not text:
+            return False
+        self.parse_attempts += 1
+        self.parsed_chars += len(text)
+        try:
+            value = json.loads(text)
+        except ValueError:
+            return False
+        if self._accept(value):
+            self.result = value
+            self.done = True
+            return True
+        return False
+
+    def _accept(self, value) -> bool:
+        if self.required_key is None:
+            return isinstance(value, (dict, list))
+        return isinstance(value, dict) and self.required_key in value
+
+
+class PartialFieldScanner:
+    """从尚未输出完整的JSON文本中提前读取指定字段
+
+    字段值完整出现（其后紧跟逗号或右括号）即可读取，用于流式回复的早期进度展示。
+    每个字段只向前查找，已扫描的文本不会重复查找。
+    """
+
+    def __init__(self, fields):
+        """
+        Args:
+            fields: 需要提前读取的顶层字段名列表，如 ['health_score', 'urgency', 'crop_type']
+        """
+        self._decoder = json.JSONDecoder()
+        self._pending = {name: 0 for name in fields}  # 字段名 -> 下次查找起点
+        self.values = {}
+        self.buffer = ''
+
+    def feed(self, chunk: str):
+        """追加文本，返回本次新解析出的字段（没有则为空字典）"""
+        self.buffer += chunk
+        found = {}
+        for name, offset in list(self._pending.items()):
+            value = self._find(name, offset)
+            if value is not _MISSING:
+                found[name] = value
+                self.values[name] = value
+                del self._pending[name]
+        return found
+
+    def _find(self, name: str, offset: int):
+        buffer = self.buffer
+        key = f'"{name}"'
+        while True:
+            index = buffer.find(key, offset)
+            if index < 0:
+                # 键可能被截断在末尾，下次从可能的起点继续
+                self._pending[name] = max(offset, len(buffer) - len(key) + 1)
+                return _MISSING
+            position = _skip_space(buffer, index + len(key))
+            if position >= len(buffer):
+                self._pending[name] = index
+                return _MISSING
+            if buffer[position] != ':':
+                # 出现在其他字符串中的同名文本，跳过
+                offset = index + 1
+                continue
+            position = _skip_space(buffer, position + 1)
+            try:
+                value, end = self._decoder.raw_decode(buffer, position)
+            except ValueError:
+                self._pending[name] = index
+                return _MISSING
+            # 数字等值可能尚未输出完整，必须看到后面的分隔符
+            after = _skip_space(buffer, end)
+            if after >= len(buffer):
+                self._pending[name] = index
+                return _MISSING
+            if buffer[after] not in ',}':
+                offset = index + 1
+                continue
+            return value
+
+
+_MISSING = object()
+
+
+def _skip_space(text: str, position: int) -> int:
+    while position < len(text) and text[position] in ' \t\r\n':
+        position += 1
+    return position
+
+
+def extract_json_object(text: str, required_key: Optional[str] = None) -> Any:
+    """从完整文本中提取第一个JSON对象（或代码块中的JSON），找不到时返回None"""
+    if text is None:
+        return None
+    stripped = text.strip()
+    # 整段就是JSON时直接解析
+    if stripped[:1] in ('{', '['):
+        try:
+            value = json.loads(stripped)
+            if required_key is None or (isinstance(value, dict) and required_key in value):
+                return value
+        except ValueError:
+            pass
+    extractor = StreamingJSONExtractor(required_key)
+    extractor.feed(text)
+    return extractor.finish()
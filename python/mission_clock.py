@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务时钟
+MissionController 通过注入的时钟取时间和等待：默认使用真实时间，
+测试中使用 VirtualClock，sleep 直接推进虚拟时间并按顺序触发定时回调，多轮任务可在毫秒级完成
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, List, Tuple
+
+
+class MissionClock:
+    """真实时钟"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    @property
+    def virtual(self) -> bool:
+        return False
+
+
+class VirtualClock(MissionClock):
+    """虚拟时钟：sleep 不阻塞，只推进时间（单线程使用）"""
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+        self._timers: List[Tuple[float, int, Callable[[], None]]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self.slept = 0.0
+        self.sleeps = 0
+
+    @property
+    def virtual(self) -> bool:
+        return True
+
+    def time(self) -> float:
+        with self._lock:
+            return self._now
+
+    def call_at(self, t: float, callback: Callable[[], None]):
+        """在虚拟时间 t 触发回调（时间推进经过 t 时调用）"""
+        with self._lock:
+            heapq.heappush(self._timers, (t, next(self._sequence), callback))
+
+    def call_later(self, delay: float, callback: Callable[[], None]):
+        self.call_at(self.time() + delay, callback)
+
+    def advance(self, seconds: float):
+        """推进虚拟时间，按时间顺序执行到期的回调"""
+        with self._lock:
+            target = self._now + max(0.0, seconds)
+        while True:
+            with self._lock:
+                if not self._timers or self._timers[0][0] > target:
+                    self._now = target
+                    return
+                t, _, callback = heapq.heappop(self._timers)
+                self._now = max(self._now, t)
+            callback()
+
+    def sleep(self, seconds: float):
+        self.sleeps += 1
+        self.slept += max(0.0, seconds)
+        self.advance(seconds)
@@ -6,22 +6,29 @@ Mission Controller Module
 Handles mission planning and execution for challenge pads
 """
 
+import math
 import threading
 import time
 
+from mission_clock import MissionClock
+from mission_planner import EnergyModel, RouteReport, partition_sorties, plan_route
+
 
 class MissionController:
     """Class for controlling drone missions with challenge pads"""
 
-    def __init__(self, drone_controller, status_callback=None, position_callback=None):
+    def __init__(self, drone_controller, status_callback=None, position_callback=None, clock=None):
         """Initialize the mission controller
 
         Args:
             drone_controller: DroneController instance
             status_callback: Function to call with mission status updates
             position_callback: Function to call with position updates (for UI)
+            clock: MissionClock for fixed delays and polling (VirtualClock in simulations);
+                state-stream event waits always run in real time
         """
         self.drone = drone_controller
+        self.clock = clock or MissionClock()
         self.status_callback = status_callback
         # 新增：位置回调
         self.position_callback = position_callback
@@ -40,6 +47,24 @@ class MissionController:
 
         # Last detected pad
         self.last_pad_id = -1
+
+        # Consecutive state packets (or polls) showing the same pad before it is accepted
+        self.required_sightings = 2
+
+        # Pad-graph mission plan (None: legacy pad 1 <-> pad 6 round trip)
+        self.mission_plan = None
+        self.route_reports = []
+
+        # Detection-driven dwell (None: fixed stay_duration sleep)
+        self.dwell_monitor = None
+
+        # Battery-aware survey: one sortie per mission, progress persisted between batteries
+        self.survey = None
+        self.energy_model = EnergyModel()
+        self.battery_reserve = 25.0
+
+        # Stabilisation waits: ended early by the settle detector, never longer than the old fixed sleeps
+        self.settle_stats = {'waits': 0, 'settled': 0, 'timeouts': 0, 'waited': 0.0, 'budget': 0.0}
         
         # 新增：挑战卡停留时间功能
         self.stay_duration = 3.0     # 默认停留时间（秒）
@@ -68,12 +93,56 @@ class MissionController:
         """
         self.mission_height = max(40, min(300, height_cm))
 
+    def set_required_sightings(self, sightings):
+        """Set how many consistent sightings confirm a mission pad
+
+        Args:
+            sightings: Number of consecutive sightings (1-10)
+        """
+        self.required_sightings = max(1, min(10, int(sightings)))
+
+    def settle(self, max_wait):
+        """Wait until the drone holds position, at most max_wait seconds
+
+        Uses the telemetry settle detector when the state stream is live, otherwise
+        falls back to a fixed sleep of max_wait seconds.
+
+        Returns:
+            Seconds actually waited
+        """
+        settled = False
+        if self._pad_events_available() and hasattr(self.drone, 'wait_settled'):
+            result = self.drone.wait_settled(timeout=max_wait, cancel=lambda: self.stop_mission)
+            settled = result.settled
+            waited = result.elapsed
+        else:
+            self.clock.sleep(max_wait)
+            waited = max_wait
+
+        self.settle_stats['waits'] += 1
+        self.settle_stats['settled' if settled else 'timeouts'] += 1
+        self.settle_stats['waited'] += waited
+        self.settle_stats['budget'] += max_wait
+        return waited
+
+    def get_settle_stats(self):
+        """Stabilisation wait totals, including seconds saved against the fixed delays"""
+        stats = dict(self.settle_stats)
+        stats['waited'] = round(stats['waited'], 2)
+        stats['saved'] = round(max(0.0, stats['budget'] - stats['waited']), 2)
+        stats['budget'] = round(stats['budget'], 2)
+        return stats
+
+    def _pad_events_available(self):
+        """Whether the drone controller publishes pad events from the state stream"""
+        return bool(getattr(self.drone, 'pad_events_available', False))
+
     def optimized_status_callback(self, message):
         """Optimized status callback that reduces unnecessary updates"""
         if not self.status_callback:
             return
             
-        current_time = time.time()
+        current_time = self.clock.time()
         
         # Skip duplicate messages within the interval
         if (message == self.last_status_message and 
@@ -120,6 +189,36 @@ class MissionController:
         
         print("🧹 All cleanup callbacks executed")
 
+    def set_dwell_monitor(self, monitor):
+        """End each pad dwell as soon as the detection goals for the pad are met
+
+        Args:
+            monitor: DwellMonitor fed by the detection pipeline, or None for fixed dwells;
+                it is switched to this controller's clock
+        """
+        if monitor is not None:
+            monitor.clock = self.clock
+        self.dwell_monitor = monitor
+
+    def dwell(self, pad_id, plants=None):
+        """Stay on a pad for at most stay_duration seconds, longer only while detections keep changing
+
+        Args:
+            pad_id: Pad the drone is hovering over
+            plants: Plants the pad is expected to cover (None when unknown)
+
+        Returns:
+            Seconds spent on the pad
+        """
+        if self.dwell_monitor is None:
+            self.clock.sleep(self.stay_duration)
+            return self.stay_duration
+
+        self.dwell_monitor.begin(pad_id, plants)
+        result = self.dwell_monitor.wait(self.stay_duration, cancel=lambda: self.stop_mission)
+        print(f"Dwell on pad {pad_id}: {result.elapsed:.1f}s ({result.reason}, goals {result.goals})")
+        return result.elapsed
+
     def set_stay_duration(self, duration):
         """Set the duration to stay at each challenge card
 
@@ -162,8 +261,12 @@ class MissionController:
             # 避免位置上报影响主流程
             print(f"emit_position error: {e}")
 
-    def start_mission(self):
-        """Start the mission execution"""
+    def start_mission(self, blocking=False):
+        """Start the mission execution
+
+        Args:
+            blocking: Run the mission in the calling thread (simulations with a VirtualClock)
+        """
         if self.is_mission_running:
             self.optimized_status_callback("Mission already running")
             return False
@@ -174,6 +277,12 @@ class MissionController:
 
         self.stop_mission = False
         self.is_mission_running = True
+        self.route_reports = []
+
+        if blocking:
+            self.optimized_status_callback("Mission started")
+            self.mission_sequence()
+            return True
 
         # Start mission in a separate thread
         self.mission_thread = threading.Thread(target=self.mission_sequence)
@@ -238,12 +347,12 @@ class MissionController:
                     return
 
                 # Wait for stabilization
-                time.sleep(2)
+                self.settle(2)
 
             # Raise to initial height
             self.optimized_status_callback("Adjusting height")
             self.drone.set_height(self.mission_height)
-            time.sleep(2)
+            self.settle(2)
 
             # Search for challenge card
             self.optimized_status_callback("Searching for challenge card")
@@ -252,21 +361,26 @@ class MissionController:
                 return
 
             # Execute mission rounds
+            # A survey flies a single battery-sized sortie per mission
+            rounds = 1 if self.survey is not None else self.mission_rounds
             successful_rounds = 0
-            for i in range(self.mission_rounds):
+            for i in range(rounds):
                 if self.stop_mission:
                     break
 
-                self.optimized_status_callback(f"Round {i + 1}/{self.mission_rounds}")
+                self.optimized_status_callback(f"Round {i + 1}/{rounds}")
 
-                if self.execute_round_trip():
+                sortie = self.execute_plan_sortie if self.mission_plan else self.execute_round_trip
+                if sortie():
                     successful_rounds += 1
 
-                if i < self.mission_rounds - 1 and not self.stop_mission:
-                    time.sleep(2)  # Short pause between rounds
+                if i < rounds - 1 and not self.stop_mission:
+                    self.clock.sleep(2)  # Short pause between rounds
 
             # Mission complete, prepare for landing
-            self.optimized_status_callback(f"Mission complete: {successful_rounds}/{self.mission_rounds} rounds successful")
+            self.optimized_status_callback(f"Mission complete: {successful_rounds}/{rounds} rounds successful")
+            settle = self.get_settle_stats()
+            print(f"Stabilisation: {settle['waits']} waits, {settle['waited']}s waited, {settle['saved']}s saved")
 
             self.prepare_for_landing()
 
@@ -311,34 +425,50 @@ class MissionController:
         max_time = 10  # Maximum search time in seconds
         pad_detected = False
 
-        while detect_time < max_time and not pad_detected and not self.stop_mission:
-            if self.drone.mission_pad_id > 0:
-                pad_detected = True
-                self.last_pad_id = self.drone.mission_pad_id
-                break
-
-            time.sleep(0.5)
-            detect_time += 0.5
-
-            # Rotate to search for pads every 2 seconds
-            if detect_time % 2 == 0:
+        if self._pad_events_available():
+            # Wake on pad events; rotate after every 2 s window without a confirmed pad
+            deadline = time.time() + max_time
+            while not self.stop_mission and time.time() < deadline:
+                pad_id = self.drone.wait_for_pad(None, timeout=min(2.0, deadline - time.time()),
+                                                 sightings=self.required_sightings,
+                                                 cancel=lambda: self.stop_mission)
+                if pad_id > 0:
+                    pad_detected = True
+                    self.last_pad_id = pad_id
+                    break
                 try:
                     self.drone.rotate(30)  # Rotate clockwise
                 except Exception as e:
                     print(f"Rotation error during pad search: {e}")
+        else:
+            while detect_time < max_time and not pad_detected and not self.stop_mission:
+                if self.drone.mission_pad_id > 0:
+                    pad_detected = True
+                    self.last_pad_id = self.drone.mission_pad_id
+                    break
+
+                self.clock.sleep(0.5)
+                detect_time += 0.5
+
+                # Rotate to search for pads every 2 seconds
+                if detect_time % 2 == 0:
+                    try:
+                        self.drone.rotate(30)  # Rotate clockwise
+                    except Exception as e:
+                        print(f"Rotation error during pad search: {e}")
 
         if pad_detected:
-            print(f"Detected challenge card ID: {self.drone.mission_pad_id}")
+            print(f"Detected challenge card ID: {self.last_pad_id}")
 
             # Move to position above the pad
             try:
                 # Using move_to_mission_pad for better precision
                 self.drone.move_to_mission_pad(
-                    self.drone.mission_pad_id,
+                    self.last_pad_id,
                     0, 0, self.mission_height,
                     20
                 )
-                time.sleep(2)
+                self.settle(2)
 
                 self.yaw_aligned = True
                 return True
@@ -363,10 +493,10 @@ class MissionController:
 
         # Position precisely on pad 1
         self.precise_positioning_on_pad(1)
-        self.optimized_status_callback(f"在挑战卡 1 停留 {self.stay_duration} 秒")
+        self.optimized_status_callback(f"在挑战卡 1 停留（最长 {self.stay_duration} 秒）")
         # 上报位于PAD1
         self.emit_position(current_pad=1, x=0, y=0, z=self.mission_height, target_pad=1, progress=0.0, note='位于PAD1')
-        time.sleep(self.stay_duration)
+        self.dwell(1)
 
         # 2. Move right to find pad 6
         found_pad6 = False
@@ -382,7 +512,7 @@ class MissionController:
 
                 # Move right with reduced strength for more stable movement
                 self.drone.manual_control(25, 0, 0, 0)  # Reduced from 40 to 25
-                time.sleep(0.8)  # Reduced from 1.0 to 0.8 seconds
+                self.clock.sleep(0.8)  # Reduced from 1.0 to 0.8 seconds
                 self.drone.manual_control(0, 0, 0, 0)  # Stop movement
 
                 # Wait for pad detection with increased timeout
@@ -397,10 +527,10 @@ class MissionController:
         if found_pad6:
             # 3. Position precisely on pad 6
             self.precise_positioning_on_pad(6)
-            self.optimized_status_callback(f"在挑战卡 6 停留 {self.stay_duration} 秒")
+            self.optimized_status_callback(f"在挑战卡 6 停留（最长 {self.stay_duration} 秒）")
             # 上报位于PAD6
             self.emit_position(current_pad=6, x=200, y=0, z=self.mission_height, target_pad=6, progress=50.0, note='位于PAD6')
-            time.sleep(self.stay_duration)
+            self.dwell(6)
 
             # 4. Move left to return to pad 1
             found_pad1 = False
@@ -416,7 +546,7 @@ class MissionController:
 
                     # Move left with reduced strength for more stable movement
                     self.drone.manual_control(-25, 0, 0, 0)  # Reduced from -40 to -25
-                    time.sleep(0.8)  # Reduced from 1.0 to 0.8 seconds
+                    self.clock.sleep(0.8)  # Reduced from 1.0 to 0.8 seconds
                     self.drone.manual_control(0, 0, 0, 0)  # Stop movement
 
                     # Wait for pad detection with increased timeout
@@ -447,6 +577,226 @@ class MissionController:
 
 
 
+    def set_mission_plan(self, plan):
+        """Fly a pad-graph mission plan instead of the pad 1 <-> pad 6 round trip
+
+        Args:
+            plan: MissionPlan instance, or None to restore the round trip
+        """
+        self.mission_plan = plan
+        if plan is not None:
+            self.optimized_status_callback(f"任务计划: {len(plan.pads)} 张挑战卡")
+
+    def get_route_reports(self):
+        """Planned vs actual path length and time for each sortie of the current mission"""
+        return [report.to_dict() for report in self.route_reports]
+
+    def _pad_offset(self):
+        """Drone x/y relative to the pad it currently sees (0, 0 when unknown)"""
+        position = getattr(self.drone, 'pad_position', None)
+        return (position[0], position[1]) if position else (0, 0)
+
+    def execute_plan_sortie(self):
+        """Visit the pads of the mission plan once, in the planned order
+
+        Each hop is a single `go x y z speed mid` move in the frame of the pad
+        the drone is hovering over. In a survey only the pads assigned to the
+        next battery-sized sortie are visited.
+
+        Returns:
+            Boolean indicating success
+        """
+        if not self.drone.is_connected:
+            self.optimized_status_callback("错误：无人机未连接")
+            return False
+
+        plan = self.mission_plan
+        start_pad = self.last_pad_id if self.last_pad_id in plan.pads else plan.start_pad
+        sortie = None
+        if self.survey is not None:
+            sortie = self._next_survey_sortie(start_pad)
+            if sortie is None:
+                return False
+        targets = sortie.pads if sortie else list(plan.pads)
+        route = plan_route(plan, start_pad, pads=targets)
+        visits = [p for p in route.order if p in targets]
+        report = RouteReport(
+            planned_order=visits,
+            planned_length=route.length,
+            planned_time=route.length / plan.speed + self.stay_duration * len(visits),
+        )
+        self.route_reports.append(report)
+        self.optimized_status_callback(
+            f"航线: {' → '.join(f'PAD{p}' for p in route.order)}，计划航程 {route.length:.0f}cm")
+
+        started = self.clock.time()
+        battery_start = self._battery()
+        cut_short = False
+        try:
+            if not self.precise_positioning_on_pad(start_pad):
+                report.failed_pad = start_pad
+                return False
+            if start_pad in targets:
+                self._visit_plan_pad(start_pad, visits, report)
+
+            for index, leg in enumerate(route.legs):
+                # The last leg of a closed route is the return to the start pad
+                returning = index >= len(route.order) - 1
+                if not returning and not self._battery_allows(leg, start_pad):
+                    self.optimized_status_callback("电量不足，提前返回起始挑战卡")
+                    leg = plan.path(leg[0], start_pad)
+                    returning = cut_short = True
+                for from_pad, to_pad in zip(leg, leg[1:]):
+                    if self.stop_mission:
+                        return False
+                    if not self._fly_plan_hop(from_pad, to_pad, report):
+                        report.failed_pad = to_pad
+                        return False
+                if returning:
+                    break
+                self._visit_plan_pad(leg[-1], visits, report)
+
+            report.completed = not cut_short
+            return report.completed
+        finally:
+            report.actual_time = self.clock.time() - started
+            print(report.format())
+            self.optimized_status_callback(
+                f"航线完成度 {len(report.visited)}/{len(visits)}，"
+                f"航程 {report.actual_length:.0f}/{report.planned_length:.0f}cm，"
+                f"用时 {report.actual_time:.0f}/{report.planned_time:.0f}s")
+            if sortie is not None:
+                self._record_survey_sortie(sortie, report, battery_start)
+
+    def set_survey(self, progress, energy_model=None, reserve=25.0):
+        """Split the mission plan into battery-sized sorties with persistent progress
+
+        Each mission then flies one sortie, resuming at the first unvisited pad.
+
+        Args:
+            progress: SurveyProgress bound to the current plan, or None to fly the whole plan
+            energy_model: EnergyModel (e.g. fitted from flight recorder telemetry)
+            reserve: Battery percentage that must remain on return to the start pad (10-60)
+        """
+        self.survey = progress
+        if energy_model is not None:
+            self.energy_model = energy_model
+        self.battery_reserve = max(10.0, min(60.0, float(reserve)))
+        if progress is not None:
+            self.energy_model.calibrate(progress.sorties)
+
+    def get_survey_summary(self):
+        """Visited and pending pads of the current survey (None when not surveying)"""
+        if self.survey is None or self.mission_plan is None:
+            return None
+        summary = self.survey.summary(self.mission_plan)
+        summary['energy_model'] = self.energy_model.to_dict()
+        summary['battery_reserve'] = self.battery_reserve
+        return summary
+
+    def _battery(self):
+        """Current battery percentage, or None when unknown"""
+        try:
+            battery = getattr(self.drone, 'battery', None)
+            return float(battery) if battery is not None and battery >= 0 else None
+        except (TypeError, ValueError):
+            return None
+
+    def _next_survey_sortie(self, start_pad):
+        """Plan the pending pads into sorties and return the one to fly now (None if it cannot be flown)"""
+        plan = self.mission_plan
+        pending = self.survey.pending(plan)
+        if not pending:
+            self.optimized_status_callback("巡检已全部完成")
+            return None
+
+        battery = self._battery()
+        try:
+            sorties = partition_sorties(plan, self.energy_model, pending, self.stay_duration,
+                                        battery=100.0 if battery is None else battery,
+                                        reserve=self.battery_reserve, start_pad=start_pad)
+        except ValueError as e:
+            self.optimized_status_callback(f"巡检分段失败：{str(e)}")
+            return None
+
+        sortie = sorties[0]
+        if battery is not None and sortie.predicted > battery - self.battery_reserve:
+            self.optimized_status_callback(
+                f"电量 {battery:.0f}% 不足以完成下一段巡检（预计消耗 {sortie.predicted:.0f}%），请更换电池")
+            return None
+        self.optimized_status_callback(
+            f"巡检进度 {len(self.survey.visited)}/{len(plan.pads)}，还需 {len(sorties)} 次出航；"
+            f"本次访问 {', '.join(f'PAD{p}' for p in sortie.pads)}，预计耗电 {sortie.predicted:.0f}%")
+        return sortie
+
+    def _battery_allows(self, leg, start_pad):
+        """Whether the next visit and the way back still fit above the battery reserve"""
+        battery = self._battery()
+        if battery is None:
+            return True
+        plan = self.mission_plan
+        back = plan.path(leg[-1], start_pad)
+        length = sum(plan.distance(a, b) for path in (leg, back) for a, b in zip(path, path[1:]))
+        need = self.energy_model.leg_cost(length, plan.speed) + self.energy_model.visit_cost(self.stay_duration)
+        return battery - need >= self.battery_reserve
+
+    def _record_survey_sortie(self, sortie, report, battery_start):
+        battery_end = self._battery()
+        used = battery_start - battery_end if battery_start is not None and battery_end is not None else None
+        self.survey.record_sortie({
+            'finished_at': time.time(),
+            'planned': sortie.pads,
+            'visited': report.visited,
+            'predicted': round(sortie.predicted, 1),
+            'battery_start': battery_start,
+            'battery_end': battery_end,
+            'battery_used': used,
+            'length': round(report.actual_length, 1),
+            'time': round(report.actual_time, 1),
+            'completed': report.completed,
+        })
+
+    def _fly_plan_hop(self, from_pad, to_pad, report):
+        """Fly from the pad below the drone to a neighbouring pad and position on it"""
+        if not self.drone.is_flying:
+            self.optimized_status_callback("错误：无人机未在飞行状态")
+            return False
+
+        dx, dy = self.mission_plan.offset(from_pad, to_pad)
+        start_x, start_y = self._pad_offset()
+        if not self.drone.move_to_mission_pad(from_pad, int(round(dx)), int(round(dy)),
+                                              self.mission_height, self.mission_plan.speed):
+            self.optimized_status_callback(f"移动失败：PAD{from_pad} → PAD{to_pad}")
+            return False
+        report.hops += 1
+
+        if not self.wait_for_pad(to_pad, timeout=4):
+            report.recoveries += 1
+            if not self.find_pad_by_rotation(to_pad):
+                self.optimized_status_callback(f"定位错误：无法找到挑战卡{to_pad}")
+                return False
+
+        # Path estimate from pad-relative telemetry: the hop itself plus the centring correction
+        end_x, end_y = self._pad_offset()
+        report.actual_length += math.hypot(dx + end_x - start_x, dy + end_y - start_y) + math.hypot(end_x, end_y)
+        return self.precise_positioning_on_pad(to_pad)
+
+    def _visit_plan_pad(self, pad_id, visits, report):
+        """Dwell on a planned pad and report the plants it covers"""
+        node = self.mission_plan.pads[pad_id]
+        report.visited.append(pad_id)
+        report.plants.extend(p for p in node.plants if p not in report.plants)
+        if self.survey is not None:
+            self.survey.mark_visited(pad_id, self.mission_plan)
+        position = visits.index(pad_id)
+        next_pad = visits[position + 1] if position + 1 < len(visits) else None
+        plants = '、'.join(node.plants) if node.plants else '无'
+        self.optimized_status_callback(f"在挑战卡 {pad_id} 停留（最长 {self.stay_duration} 秒，植株: {plants}）")
+        self.emit_position(current_pad=pad_id, x=node.x, y=node.y, z=self.mission_height, target_pad=next_pad,
+                           progress=round(100.0 * len(report.visited) / len(visits), 1),
+                           note=f'位于PAD{pad_id}，植株: {plants}')
+        self.dwell(pad_id, node.plants)
+
     def wait_for_pad(self, pad_id, timeout=10):
         """Wait for a specific pad to be detected with improved detection logic
 
@@ -457,11 +807,22 @@ class MissionController:
         Returns:
             Boolean indicating if pad was found
         """
-        start_time = time.time()
+        if self._pad_events_available():
+            # Returns as soon as enough consistent state packets arrive
+            found = self.drone.wait_for_pad(pad_id, timeout=timeout, sightings=self.required_sightings,
+                                            cancel=lambda: self.stop_mission)
+            if found == pad_id:
+                self.last_pad_id = pad_id
+                print(f"Successfully detected pad {pad_id} (confirmed {self.required_sightings} times)")
+                return True
+            print(f"Could not detect pad {pad_id} consistently")
+            return False
+
+        start_time = self.clock.time()
         detection_count = 0
-        required_detections = 2  # Require multiple consistent detections
+        required_detections = self.required_sightings  # Require multiple consistent detections
         
-        while time.time() - start_time < timeout and not self.stop_mission:
+        while self.clock.time() - start_time < timeout and not self.stop_mission:
             if self.drone.mission_pad_id == pad_id:
                 detection_count += 1
                 if detection_count >= required_detections:
@@ -471,7 +832,7 @@ class MissionController:
             else:
                 detection_count = 0  # Reset if detection is lost
             
-            time.sleep(0.2)  # Slightly longer interval for more stable detection
+            self.clock.sleep(0.2)  # Slightly longer interval for more stable detection
 
         print(f"Could not detect pad {pad_id} consistently")
         return False
@@ -498,10 +859,15 @@ class MissionController:
             print(f"Rotation search for pad {pad_id}, attempt {i + 1}")
             # Reduce rotation angle from 45 to 30 degrees for gentler movement
             self.drone.rotate(30)
-            time.sleep(1.5)  # Reduced wait time for faster response
+            if self._pad_events_available():
+                # Event wait replaces the fixed 2 s pause after each rotation step
+                if self.wait_for_pad(pad_id, timeout=2.0):
+                    return True
+                continue
+            self.clock.sleep(1.5)  # Reduced wait time for faster response
             
             # Check again after rotation
-            time.sleep(0.5)  # Brief pause for detection
+            self.clock.sleep(0.5)  # Brief pause for detection
             if self.drone.mission_pad_id == pad_id:
                 self.last_pad_id = pad_id
                 return True
@@ -531,8 +897,8 @@ class MissionController:
             success = self.drone.move_to_mission_pad(pad_id, 0, 0, self.mission_height, 15)  # Reduced speed from 20 to 15
             
             if success:
-                # Allow more time for stabilization
-                time.sleep(3)  # Increased from 2 to 3 seconds
+                # Allow up to 3 seconds for stabilization
+                self.settle(3)
                 
                 # Verify positioning with wait_for_pad
                 if self.wait_for_pad(pad_id, timeout=3):
@@ -575,11 +941,11 @@ class MissionController:
             try:
                 # Move to pad center at safer height
                 self.drone.move_to_mission_pad(target_pad, 0, 0, 60, 20)
-                time.sleep(2)
+                self.settle(2)
 
                 # Lower to landing height
                 self.drone.move_to_mission_pad(target_pad, 0, 0, 30, 15)
-                time.sleep(2)
+                self.settle(2)
 
                 print("Position and altitude adjusted, ready for landing")
                 return True
@@ -593,7 +959,7 @@ class MissionController:
             # Gently lower altitude for safer landing
             try:
                 self.drone.set_height(30)  # Use set_height for smoother descent
-                time.sleep(2)
+                self.settle(2)
                 return False
 
             except Exception as e:
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+挑战卡任务规划
+任务计划描述挑战卡的相对位置（cm，所有挑战卡朝向一致）以及每张卡覆盖的植株；
+规划器在"单次 go x y z speed mid 可达"的挑战卡图上，用最近邻 + 2-opt 计算较短的访问顺序，
+超出单次移动范围的航段按图上最短路径拆分为多跳。
+一块电池飞不完的巡检按能耗模型拆分为多次出航，巡检进度持久化，下一次出航从未访问的挑战卡继续
+"""
+
+import hashlib
+import json
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# go x y z speed mid 单轴移动范围 ±500cm
+MAX_HOP_CM = 500
+
+
+@dataclass
+class PadNode:
+    """计划中的一张挑战卡"""
+    pad_id: int
+    x: float
+    y: float
+    plants: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'id': self.pad_id, 'x': self.x, 'y': self.y, 'plants': list(self.plants)}
+
+
+@dataclass
+class MissionPlan:
+    """挑战卡任务计划"""
+    pads: Dict[int, PadNode]
+    start_pad: int
+    speed: int = 30
+    return_to_start: bool = True
+    name: str = ''
+    max_hop: float = MAX_HOP_CM
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MissionPlan':
+        """从JSON结构创建计划：{"pads": [{"id": 1, "x": 0, "y": 0, "plants": ["1"]}, ...], "start_pad": 1, ...}"""
+        pads: Dict[int, PadNode] = {}
+        for item in data.get('pads') or []:
+            pad_id = int(item['id'])
+            if not 1 <= pad_id <= 8:
+                raise ValueError(f"挑战卡ID必须在1-8之间: {pad_id}")
+            if pad_id in pads:
+                raise ValueError(f"挑战卡ID重复: {pad_id}")
+            plants = [str(p) for p in item.get('plants') or []]
+            pads[pad_id] = PadNode(pad_id, float(item.get('x', 0)), float(item.get('y', 0)), plants)
+        if not pads:
+            raise ValueError("任务计划中没有挑战卡")
+
+        start_pad = int(data.get('start_pad') or next(iter(pads)))
+        if start_pad not in pads:
+            raise ValueError(f"起始挑战卡不在计划中: {start_pad}")
+
+        plan = cls(
+            pads=pads,
+            start_pad=start_pad,
+            speed=max(10, min(100, int(data.get('speed', 30)))),
+            return_to_start=bool(data.get('return_to_start', True)),
+            name=str(data.get('name', '')),
+        )
+        plan.hop_graph()  # 提前检查连通性
+        return plan
+
+    @classmethod
+    def load(cls, path: str) -> 'MissionPlan':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'start_pad': self.start_pad,
+            'speed': self.speed,
+            'return_to_start': self.return_to_start,
+            'pads': [pad.to_dict() for pad in self.pads.values()],
+        }
+
+    def signature(self) -> str:
+        """计划内容的摘要（挑战卡位置或植株变化时改变）"""
+        payload = json.dumps(self.to_dict(), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def path(self, from_pad: int, to_pad: int) -> List[int]:
+        """两卡之间逐跳经过的挑战卡（含起终点）"""
+        _, nxt = self.hop_graph()
+        return _expand(from_pad, to_pad, nxt)
+
+    def offset(self, from_pad: int, to_pad: int) -> Tuple[float, float]:
+        """to_pad 在 from_pad 坐标系中的位置"""
+        a, b = self.pads[from_pad], self.pads[to_pad]
+        return b.x - a.x, b.y - a.y
+
+    def distance(self, from_pad: int, to_pad: int) -> float:
+        dx, dy = self.offset(from_pad, to_pad)
+        return math.hypot(dx, dy)
+
+    def reachable(self, from_pad: int, to_pad: int) -> bool:
+        """能否一次 go 指令到达"""
+        dx, dy = self.offset(from_pad, to_pad)
+        return abs(dx) <= self.max_hop and abs(dy) <= self.max_hop
+
+    def hop_graph(self) -> Tuple[Dict[Tuple[int, int], float], Dict[Tuple[int, int], int]]:
+        """任意两卡之间的最短距离与下一跳（Floyd-Warshall，挑战卡最多8张）
+
+        Raises:
+            ValueError: 存在无法通过多跳到达的挑战卡
+        """
+        ids = list(self.pads)
+        dist: Dict[Tuple[int, int], float] = {}
+        nxt: Dict[Tuple[int, int], int] = {}
+        for a in ids:
+            for b in ids:
+                if a == b:
+                    dist[a, b] = 0.0
+                    nxt[a, b] = b
+                elif self.reachable(a, b):
+                    dist[a, b] = self.distance(a, b)
+                    nxt[a, b] = b
+                else:
+                    dist[a, b] = math.inf
+        for k in ids:
+            for a in ids:
+                for b in ids:
+                    through = dist[a, k] + dist[k, b]
+                    if through < dist[a, b]:
+                        dist[a, b] = through
+                        nxt[a, b] = nxt[a, k]
+        unreachable = [b for b in ids if math.isinf(dist[self.start_pad, b])]
+        if unreachable:
+            raise ValueError(f"挑战卡 {unreachable} 与起始卡的距离超出单次移动范围，且没有中转卡")
+        return dist, nxt
+
+
+@dataclass
+class PlannedRoute:
+    """规划结果"""
+    order: List[int]            # 访问顺序（不含返航）
+    legs: List[List[int]]       # 每个航段经过的挑战卡（含起终点，超程航段含中转卡）
+    length: float               # 计划航程（cm）
+    closed: bool = False        # 是否返回起始卡
+
+    def hops(self) -> List[Tuple[int, int]]:
+        return [(a, b) for leg in self.legs for a, b in zip(leg, leg[1:])]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'order': self.order, 'legs': self.legs, 'length': round(self.length, 1), 'closed': self.closed}
+
+
+def route_length(order: List[int], dist: Dict[Tuple[int, int], float], closed: bool) -> float:
+    length = sum(dist[a, b] for a, b in zip(order, order[1:]))
+    if closed and len(order) > 1:
+        length += dist[order[-1], order[0]]
+    return length
+
+
+def _nearest_neighbour(start: int, pads: List[int], dist: Dict[Tuple[int, int], float]) -> List[int]:
+    order = [start]
+    remaining = set(pads) - {start}
+    while remaining:
+        last = order[-1]
+        nearest = min(remaining, key=lambda p: (dist[last, p], p))
+        order.append(nearest)
+        remaining.remove(nearest)
+    return order
+
+
+def _two_opt(order: List[int], dist: Dict[Tuple[int, int], float], closed: bool) -> List[int]:
+    """2-opt 改进（起点固定）"""
+    order = list(order)
+    n = len(order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            for k in range(i + 1, n):
+                a, b = order[i - 1], order[i]
+                c = order[k]
+                d = order[k + 1] if k + 1 < n else (order[0] if closed else None)
+                before = dist[a, b] + (dist[c, d] if d is not None else 0.0)
+                after = dist[a, c] + (dist[b, d] if d is not None else 0.0)
+                if after < before - 1e-9:
+                    order[i:k + 1] = reversed(order[i:k + 1])
+                    improved = True
+    return order
+
+
+def _expand(a: int, b: int, nxt: Dict[Tuple[int, int], int]) -> List[int]:
+    path = [a]
+    while path[-1] != b:
+        path.append(nxt[path[-1], b])
+    return path
+
+
+def plan_route(plan: MissionPlan, start_pad: Optional[int] = None,
+               pads: Optional[Iterable[int]] = None) -> PlannedRoute:
+    """计算一次出航的访问顺序
+
+    Args:
+        plan: 任务计划
+        start_pad: 出发挑战卡（默认计划的起始卡）；返航时回到该卡
+        pads: 只访问这些挑战卡（默认全部）；中转仍可经过其他挑战卡
+    """
+    start = start_pad if start_pad in plan.pads else plan.start_pad
+    dist, nxt = plan.hop_graph()
+    closed = plan.return_to_start
+    targets = list(plan.pads) if pads is None else [p for p in plan.pads if p in set(pads)]
+    order = _two_opt(_nearest_neighbour(start, targets + [start], dist), dist, closed)
+    stops = order + [start] if closed and len(order) > 1 else order
+    legs = [_expand(a, b, nxt) for a, b in zip(stops, stops[1:])]
+    return PlannedRoute(order=order, legs=legs, length=route_length(order, dist, closed), closed=closed)
+
+
+@dataclass
+class RouteReport:
+    """一次出航的计划与实际对比"""
+    planned_order: List[int]
+    planned_length: float
+    planned_time: float
+    visited: List[int] = field(default_factory=list)
+    plants: List[str] = field(default_factory=list)
+    actual_length: float = 0.0
+    actual_time: float = 0.0
+    hops: int = 0
+    recoveries: int = 0           # 未直接看到目标卡、靠旋转搜索找回的次数
+    completed: bool = False
+    failed_pad: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'planned_order': self.planned_order,
+            'planned_length': round(self.planned_length, 1),
+            'planned_time': round(self.planned_time, 1),
+            'visited': self.visited,
+            'plants': self.plants,
+            'actual_length': round(self.actual_length, 1),
+            'actual_time': round(self.actual_time, 1),
+            'hops': self.hops,
+            'recoveries': self.recoveries,
+            'completed': self.completed,
+            'failed_pad': self.failed_pad,
+        }
+
+    def format(self) -> str:
+        order = ' → '.join(f"PAD{p}" for p in self.planned_order)
+        status = '完成' if self.completed else f"中断于PAD{self.failed_pad}"
+        return (f"航线 {order}（{status}）\n"
+                f"  航程: 计划 {self.planned_length:.0f}cm / 实际 {self.actual_length:.0f}cm\n"
+                f"  用时: 计划 {self.planned_time:.1f}s / 实际 {self.actual_time:.1f}s\n"
+                f"  访问 {len(self.visited)} 张卡，覆盖 {len(self.plants)} 株植株，恢复搜索 {self.recoveries} 次")
+
+
+@dataclass
+class EnergyModel:
+    """电量消耗模型（电量百分比）
+
+    悬停/飞行时间按 hover_rate 消耗，移动距离另按 move_rate 消耗，每次出航固定消耗 overhead（起飞、降落）；
+    scale 为按实际出航记录校准的系数
+    """
+    hover_rate: float = 0.12      # %/秒
+    move_rate: float = 0.002      # %/cm
+    overhead: float = 4.0         # %/次出航
+    settle_allowance: float = 3.0  # 每张卡定位与稳定的预留时间（秒）
+    scale: float = 1.0
+    fitted_seconds: float = 0.0   # 拟合使用的空中时长
+
+    def leg_cost(self, length: float, speed: float) -> float:
+        return self.scale * (self.hover_rate * length / max(speed, 1) + self.move_rate * length)
+
+    def visit_cost(self, dwell: float) -> float:
+        return self.scale * self.hover_rate * (dwell + self.settle_allowance)
+
+    def sortie_cost(self, plan: MissionPlan, start: int, pads: List[int], dwell: float,
+                    dist: Optional[Dict[Tuple[int, int], float]] = None) -> Tuple[float, float]:
+        """按给定顺序从 start 出发访问 pads 并返回的 (电量, 航程)"""
+        if dist is None:
+            dist, _ = plan.hop_graph()
+        stops = [start] + [p for p in pads if p != start] + [start]
+        length = sum(dist[a, b] for a, b in zip(stops, stops[1:]))
+        cost = self.scale * self.overhead + self.leg_cost(length, plan.speed) + len(pads) * self.visit_cost(dwell)
+        return cost, length
+
+    @staticmethod
+    def _telemetry_windows(records: List[Dict[str, Any]], window: float) -> List[Tuple[float, float, float]]:
+        """把空中的遥测切成窗口：(秒, 相对任务垫移动距离cm, 电量下降%)"""
+        rows = []
+        first = prev = None
+        distance = 0.0
+        for record in records:
+            state = record['state']
+            if state.get('h', 0) <= 10:
+                first = prev = None
+                continue
+            if prev is not None and record['t'] - prev['t'] > 1.0:
+                first = prev = None
+            if first is None:
+                first = prev = record
+                distance = 0.0
+                continue
+            if state.get('mid', -1) > 0 and state.get('mid') == prev['state'].get('mid'):
+                distance += math.hypot(state['x'] - prev['state']['x'], state['y'] - prev['state']['y'])
+            prev = record
+            if record['t'] - first['t'] >= window:
+                rows.append((record['t'] - first['t'], distance, float(first['state']['bat'] - state['bat'])))
+                first = record
+                distance = 0.0
+        return rows
+
+    @classmethod
+    def from_telemetry(cls, logs: Iterable[List[Dict[str, Any]]], window: float = 30.0,
+                       min_seconds: float = 120.0) -> 'EnergyModel':
+        """从飞行记录仪的遥测日志（read_telemetry_log 的结果）拟合 hover_rate 与 move_rate
+
+        数据不足时返回默认模型
+        """
+        rows = []
+        for records in logs:
+            rows.extend(cls._telemetry_windows(records, window))
+        model = cls()
+        seconds = sum(r[0] for r in rows)
+        if seconds < min_seconds:
+            return model
+
+        # 两个未知数的最小二乘：drop = hover_rate * 秒 + move_rate * 距离
+        stt = sum(t * t for t, _, _ in rows)
+        std = sum(t * d for t, d, _ in rows)
+        sdd = sum(d * d for _, d, _ in rows)
+        sty = sum(t * y for t, _, y in rows)
+        sdy = sum(d * y for _, d, y in rows)
+        det = stt * sdd - std * std
+        hover = move = -1.0
+        if det > 1e-9:
+            hover = (sty * sdd - sdy * std) / det
+            move = (stt * sdy - std * sty) / det
+        if hover <= 0 or move < 0:
+            # 移动距离信息不足，只拟合悬停消耗
+            hover, move = sty / stt, model.move_rate
+        model.hover_rate = hover
+        model.move_rate = move
+        model.fitted_seconds = seconds
+        return model
+
+    def calibrate(self, sorties: List[Dict[str, Any]]):
+        """按历次出航的实际/预测电量消耗校准 scale（取中位数，限制在0.5-2倍）"""
+        ratios = sorted(s['battery_used'] / s['predicted'] for s in sorties
+                        if s.get('predicted', 0) > 0 and s.get('battery_used', 0) > 0)
+        if ratios:
+            self.scale = max(0.5, min(2.0, ratios[len(ratios) // 2]))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'hover_rate': round(self.hover_rate, 4),
+            'move_rate': round(self.move_rate, 5),
+            'overhead': self.overhead,
+            'scale': round(self.scale, 3),
+            'fitted_seconds': round(self.fitted_seconds, 1),
+        }
+
+
+@dataclass
+class SortiePlan:
+    """一次出航要访问的挑战卡及预计消耗"""
+    pads: List[int]
+    predicted: float     # 预计电量消耗（%）
+    length: float        # 预计航程（cm）
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'pads': self.pads, 'predicted': round(self.predicted, 1), 'length': round(self.length, 1)}
+
+
+def partition_sorties(plan: MissionPlan, model: EnergyModel, pending: Iterable[int], dwell: float,
+                      battery: float = 100.0, reserve: float = 25.0, start_pad: Optional[int] = None,
+                      full_battery: float = 100.0) -> List[SortiePlan]:
+    """把待访问的挑战卡按全程访问顺序依次装入出航，每次出航返回起始卡时电量不低于 reserve
+
+    Args:
+        pending: 尚未访问的挑战卡
+        dwell: 每张卡的停留时间（秒）
+        battery: 当前电量（第一次出航），之后的出航按满电 full_battery 计算
+
+    Raises:
+        ValueError: 满电也无法访问某张挑战卡并返回
+    """
+    start = start_pad if start_pad in plan.pads else plan.start_pad
+    pending = set(pending)
+    dist, _ = plan.hop_graph()
+    order = [p for p in plan_route(plan, start, pads=pending).order if p in pending]
+
+    sorties: List[SortiePlan] = []
+    current: List[int] = []
+    available = battery
+    for pad in order:
+        cost, _ = model.sortie_cost(plan, start, current + [pad], dwell, dist)
+        if cost <= available - reserve:
+            current.append(pad)
+            continue
+        if current:
+            cost, length = model.sortie_cost(plan, start, current, dwell, dist)
+            sorties.append(SortiePlan(current, cost, length))
+        elif available >= full_battery:
+            raise ValueError(f"满电也无法访问挑战卡 {pad} 并返回（预计消耗 {cost:.0f}%，保留 {reserve:.0f}%）")
+        available = full_battery
+        current = [pad]
+        cost, _ = model.sortie_cost(plan, start, current, dwell, dist)
+        if cost > available - reserve:
+            raise ValueError(f"满电也无法访问挑战卡 {pad} 并返回（预计消耗 {cost:.0f}%，保留 {reserve:.0f}%）")
+    if current:
+        cost, length = model.sortie_cost(plan, start, current, dwell, dist)
+        sorties.append(SortiePlan(current, cost, length))
+    return sorties
+
+
+class SurveyProgress:
+    """多次出航巡检的持久化进度（JSON文件，每次访问挑战卡后写入）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: Dict[str, Any] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 巡检进度文件损坏，重新开始: {e}")
+                self.data = {}
+
+    def bind(self, plan: MissionPlan, restart: bool = False):
+        """关联任务计划：计划变化、巡检已完成或要求重新开始时清空进度"""
+        signature = plan.signature()
+        if restart or self.data.get('plan') != signature or self.data.get('completed_at'):
+            self.data = {'plan': signature, 'name': plan.name, 'started_at': time.time(),
+                         'completed_at': None, 'visited': [], 'sorties': []}
+            self.save()
+
+    @property
+    def visited(self) -> List[int]:
+        return list(self.data.get('visited', []))
+
+    @property
+    def sorties(self) -> List[Dict[str, Any]]:
+        return list(self.data.get('sorties', []))
+
+    def pending(self, plan: MissionPlan) -> List[int]:
+        done = set(self.visited)
+        return [p for p in plan.pads if p not in done]
+
+    def mark_visited(self, pad_id: int, plan: MissionPlan):
+        if pad_id not in self.data['visited']:
+            self.data['visited'].append(pad_id)
+            if not self.pending(plan):
+                self.data['completed_at'] = time.time()
+            self.save()
+
+    def record_sortie(self, sortie: Dict[str, Any]):
+        self.data['sorties'].append(sortie)
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def summary(self, plan: MissionPlan) -> Dict[str, Any]:
+        return {
+            'name': plan.name,
+            'visited': self.visited,
+            'pending': self.pending(plan),
+            'sorties': len(self.sorties),
+            'completed': bool(self.data.get('completed_at')),
+        }
@@ -20,6 +20,8 @@ from typing import List, Dict, Optional, Tuple, Any
 from enum import Enum
 import logging
 
+from color_features import ColorFeatureExtractor
+
 # YOLO导入
 try:
     from ultralytics import YOLO
@@ -140,6 +142,13 @@ class MultiModelDetector:
         self.last_detection_time = 0
         self.frame_skip_count = 0
         self.max_frame_skip = 2  # 最大跳帧数
+
+        # 成熟度颜色范围（辅助YOLO检测），使用单次遍历提取器
+        self.maturity_color_extractor = ColorFeatureExtractor({
+            'ripe': [((0, 50, 50), (20, 255, 255)), ((160, 50, 50), (180, 255, 255))],  # 红色
+            'semi_ripe': [((20, 50, 50), (40, 255, 255))],  # 橙黄色
+            'unripe': [((40, 50, 50), (80, 255, 255))]      # 绿色
+        })
         
         # 线程安全锁
         self.detection_lock = threading.Lock()
@@ -316,30 +325,12 @@ class MultiModelDetector:
             if roi.size == 0:
                 return None
             
-            # 转换到HSV色彩空间
-            hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-            
-            # 定义颜色范围
-            color_ranges = {
-                'ripe': [(0, 50, 50), (20, 255, 255), (160, 50, 50), (180, 255, 255)],  # 红色
-                'semi_ripe': [(20, 50, 50), (40, 255, 255)],  # 橙黄色
-                'unripe': [(40, 50, 50), (80, 255, 255)]      # 绿色
-            }
-            
             max_ratio = 0
             best_maturity = 'unknown'
             
-            for maturity, ranges in color_ranges.items():
-                total_mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
-                
-                # 处理多个颜色范围（如红色的两个范围）
-                for i in range(0, len(ranges), 2):
-                    if i + 1 < len(ranges):
-                        mask = cv2.inRange(hsv, ranges[i], ranges[i + 1])
-                        total_mask = cv2.bitwise_or(total_mask, mask)
-                
-                ratio = np.sum(total_mask > 0) / total_mask.size
-                
+            # 一次联合直方图得到全部成熟度颜色占比
+            ratios = self.maturity_color_extractor.color_ratios(roi)
+            for maturity, ratio in ratios.items():
                 if ratio > max_ratio:
                     max_ratio = ratio
                     best_maturity = maturity
@@ -43,14 +43,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# DJI Tello导入
-try:
-    from djitellopy import Tello
-    TELLO_AVAILABLE = True
-    logger.info("✅ djitellopy库加载成功")
-except ImportError as e:
-    TELLO_AVAILABLE = False
-    logger.error(f"✗ djitellopy库导入失败: {e}")
+# Tello SDK 驱动：asyncio UDP 客户端，动作命令在协程中等待应答，不阻塞事件循环
+from async_tello import AsyncTello
 
 # OpenCV导入
 try:
@@ -511,16 +505,12 @@ class OptimizedDroneService:
     async def handle_drone_connect(self, websocket, data):
         """处理无人机连接"""
         try:
-            if not TELLO_AVAILABLE:
-                await self.send_error(websocket, "Tello库不可用")
-                return
-            
-            self.drone = Tello()
-            self.drone.connect()
+            self.drone = AsyncTello()
+            await self.drone.connect()
             
             # 更新状态
             self.drone_state['connected'] = True
-            self.drone_state['battery'] = self.drone.get_battery()
+            self.drone_state['battery'] = await self.drone.read_battery()
             
             # 发送成功响应
             message = OptimizedMessage(
@@ -542,7 +532,7 @@ class OptimizedDroneService:
                 return
             
             if not self.drone_state['video_streaming']:
-                self.drone.streamon()
+                await self.drone.streamon()
                 self.drone_state['video_streaming'] = True
                 
                 # 启动视频处理线程
@@ -764,10 +754,10 @@ class OptimizedDroneService:
         
         self.is_running = False
         
-        # 停止视频流
-        if self.drone and self.drone_state.get('video_streaming', False):
+        # 停止视频流并释放Tello端口
+        if self.drone:
             try:
-                self.drone.streamoff()
+                self.drone.close()
             except:
                 pass
         
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+植株观测数据存储
+按飞行、帧号与来源（实时/离线批处理）记录每株植株的草莓数量与成熟度分布；
+用新模型重跑同一飞行时覆盖该飞行的旧结果
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def parse_plant_id(data: str):
+    """从QR码数据中解析植物ID"""
+    try:
+        # 1. 尝试JSON格式
+        if data.strip().startswith('{'):
+            parsed = json.loads(data)
+            if 'id' in parsed:
+                return parsed['id']
+            elif 'plant_id' in parsed:
+                return parsed['plant_id']
+            elif 'plantId' in parsed:
+                return parsed['plantId']
+
+        # 2. 尝试plant_数字格式
+        if 'plant_' in data.lower():
+            match = re.search(r'plant[_-]?(\d+)', data.lower())
+            if match:
+                return int(match.group(1))
+
+        # 3. 尝试纯数字
+        if data.strip().isdigit():
+            return int(data.strip())
+
+        # 4. 尝试提取任何数字
+        numbers = re.findall(r'\d+', data)
+        if numbers:
+            return int(numbers[0])
+
+        # 5. 使用数据内容作为ID
+        return data.strip()[:20]  # 限制长度
+
+    except Exception as e:
+        print(f"❌ 解析植物ID失败: {e}")
+        return data.strip()[:20]
+
+
+@dataclass
+class PlantObservation:
+    """一次植株观测"""
+    plant_id: Any
+    flight_id: str
+    frame_index: int
+    video_time: float
+    source: str = 'batch'
+    model: str = ''
+    strawberries: int = 0
+    maturity: Dict[str, int] = field(default_factory=dict)
+    detections: List[Dict[str, Any]] = field(default_factory=list)
+    telemetry: Optional[Dict[str, Any]] = None
+
+
+class PlantStore:
+    """基于SQLite的植株观测存储"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS observations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                plant_id TEXT NOT NULL,
+                flight_id TEXT NOT NULL,
+                frame_index INTEGER NOT NULL,
+                video_time REAL NOT NULL,
+                source TEXT NOT NULL,
+                model TEXT NOT NULL DEFAULT '',
+                strawberries INTEGER NOT NULL DEFAULT 0,
+                ripe INTEGER NOT NULL DEFAULT 0,
+                semi_ripe INTEGER NOT NULL DEFAULT 0,
+                unripe INTEGER NOT NULL DEFAULT 0,
+                unknown INTEGER NOT NULL DEFAULT 0,
+                detections TEXT NOT NULL DEFAULT '[]',
+                telemetry TEXT,
+                created_at REAL NOT NULL,
+                UNIQUE (flight_id, frame_index, plant_id, source)
+            );
+            CREATE INDEX IF NOT EXISTS idx_observations_plant ON observations (plant_id, created_at);
+        ''')
+        self._conn.commit()
+
+    def record(self, observations: Iterable[PlantObservation]) -> int:
+        """批量写入观测（同一飞行/帧/植株/来源的旧记录被覆盖），返回写入数量"""
+        now = time.time()
+        rows = []
+        for obs in observations:
+            maturity = obs.maturity or {}
+            rows.append((
+                json.dumps(obs.plant_id, ensure_ascii=False), obs.flight_id, obs.frame_index, obs.video_time,
+                obs.source, obs.model, obs.strawberries,
+                maturity.get('ripe', 0), maturity.get('semi_ripe', 0),
+                maturity.get('unripe', 0), maturity.get('unknown', 0),
+                json.dumps(obs.detections, ensure_ascii=False, default=str),
+                json.dumps(obs.telemetry, ensure_ascii=False, default=str) if obs.telemetry is not None else None,
+                now
+            ))
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany('''
+                INSERT OR REPLACE INTO observations
+                    (plant_id, flight_id, frame_index, video_time, source, model, strawberries,
+                     ripe, semi_ripe, unripe, unknown, detections, telemetry, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            self._conn.commit()
+        return len(rows)
+
+    def delete_flight(self, flight_id: str, source: Optional[str] = None) -> int:
+        """删除某次飞行的观测（重跑前清理），返回删除数量"""
+        with self._lock:
+            if source:
+                cursor = self._conn.execute('DELETE FROM observations WHERE flight_id = ? AND source = ?',
+                                            (flight_id, source))
+            else:
+                cursor = self._conn.execute('DELETE FROM observations WHERE flight_id = ?', (flight_id,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def plant_summary(self, flight_id: Optional[str] = None) -> Dict[Any, Dict[str, Any]]:
+        """按植株汇总：观测帧数，以及单帧最多草莓数那一帧的成熟度分布"""
+        where, params = ('WHERE flight_id = ?', (flight_id,)) if flight_id else ('', ())
+        with self._lock:
+            rows = self._conn.execute(f'''
+                SELECT plant_id, COUNT(*) AS frames, MAX(strawberries) AS max_strawberries,
+                       MIN(video_time) AS first_seen, MAX(video_time) AS last_seen
+                FROM observations {where} GROUP BY plant_id
+            ''', params).fetchall()
+            summary = {}
+            for row in rows:
+                best = self._conn.execute(f'''
+                    SELECT ripe, semi_ripe, unripe, unknown, frame_index, flight_id FROM observations
+                    WHERE plant_id = ? {'AND flight_id = ?' if flight_id else ''}
+                    ORDER BY strawberries DESC, created_at DESC LIMIT 1
+                ''', (row['plant_id'], *params)).fetchone()
+                summary[json.loads(row['plant_id'])] = {
+                    'frames': row['frames'],
+                    'max_strawberries': row['max_strawberries'],
+                    'first_seen': row['first_seen'],
+                    'last_seen': row['last_seen'],
+                    'best_frame': {'flight_id': best['flight_id'], 'frame_index': best['frame_index']},
+                    'maturity': {key: best[key] for key in ('ripe', 'semi_ripe', 'unripe', 'unknown')}
+                }
+        return summary
+
+    def count(self, flight_id: Optional[str] = None) -> int:
+        """观测记录数"""
+        with self._lock:
+            if flight_id:
+                return self._conn.execute('SELECT COUNT(*) FROM observations WHERE flight_id = ?',
+                                          (flight_id,)).fetchone()[0]
+            return self._conn.execute('SELECT COUNT(*) FROM observations').fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
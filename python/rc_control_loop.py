@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+固定频率的 rc 控制发送器
+手动控制消息只更新最新摇杆状态，发送协程按固定频率（默认30Hz）发送最近一次的摇杆值：
+前端发得快时多条合并为一次发送，发得慢时按上一次的摇杆值持续发送，控制更平滑。
+超过失联保护时间没有新输入时摇杆归零；归零几次后停止发送，不占用 UDP 链路，也不干扰任务控制器自己的 rc 命令。
+统计发送间隔的抖动（实际发送时刻相对计划时刻的延迟）
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_RATE_HZ = 30.0
+MIN_RATE_HZ = 5.0
+MAX_RATE_HZ = 50.0
+DEADMAN_TIMEOUT = 0.5       # 秒：超过该时间无新输入时摇杆归零
+NEUTRAL_REPEATS = 3         # 归零后重复发送的次数（UDP 可能丢包），之后停止发送
+
+NEUTRAL = (0, 0, 0, 0)
+
+
+def clamp_sticks(left_right: Any, forward_backward: Any, up_down: Any, yaw: Any) -> Tuple[int, int, int, int]:
+    """摇杆值转换为 SDK 范围内的整数（-100 到 100）"""
+    return tuple(max(-100, min(100, int(v))) for v in (left_right, forward_backward, up_down, yaw))
+
+
+class RCControlLoop:
+    """按固定频率发送最新摇杆状态的 rc 发送器"""
+
+    def __init__(self, send: Callable[[int, int, int, int], Any], rate_hz: float = DEFAULT_RATE_HZ,
+                 deadman_timeout: float = DEADMAN_TIMEOUT, history: int = 500):
+        """
+        Args:
+            send: 发送 rc 命令的函数（如 AsyncTello.send_rc_control），不等待应答
+            rate_hz: 发送频率，限制在 5-50Hz
+            deadman_timeout: 失联保护时间（秒）
+            history: 保留用于统计抖动的最近发送次数
+        """
+        self.send = send
+        self.rate_hz = DEFAULT_RATE_HZ
+        self.deadman_timeout = deadman_timeout
+        self.configure(rate_hz=rate_hz)
+
+        self._sticks: Tuple[int, int, int, int] = NEUTRAL
+        self._last_input = 0.0
+        self._neutral_left = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._jitter: Deque[float] = deque(maxlen=history)
+        self.stats = {'inputs': 0, 'sent': 0, 'coalesced': 0, 'deadman_trips': 0,
+                      'overruns': 0, 'send_errors': 0}
+        self._pending_inputs = 0
+
+    def configure(self, rate_hz: Optional[float] = None, deadman_timeout: Optional[float] = None):
+        """调整发送频率与失联保护时间（为None的参数保持不变），运行中下一拍生效"""
+        if rate_hz is not None:
+            self.rate_hz = max(MIN_RATE_HZ, min(MAX_RATE_HZ, float(rate_hz)))
+        if deadman_timeout is not None:
+            self.deadman_timeout = max(0.05, float(deadman_timeout))
+
+    @property
+    def period(self) -> float:
+        return 1.0 / self.rate_hz
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def active(self) -> bool:
+        """是否正在发送（有新输入，或归零命令尚未发完）"""
+        return self._last_input > 0 or self._neutral_left > 0
+
+    @property
+    def sticks(self) -> Tuple[int, int, int, int]:
+        return self._sticks
+
+    # ---- 输入 ----
+
+    def update(self, left_right: Any, forward_backward: Any, up_down: Any, yaw: Any) -> Tuple[int, int, int, int]:
+        """记录最新摇杆状态（只在事件循环线程调用），返回限幅后的值；实际发送由发送协程完成"""
+        self._sticks = clamp_sticks(left_right, forward_backward, up_down, yaw)
+        self._last_input = time.monotonic()
+        self._neutral_left = 0
+        self.stats['inputs'] += 1
+        self._pending_inputs += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return self._sticks
+
+    def neutral(self):
+        """立即把摇杆归零（降落、急停、断开前调用），随后发送几次归零命令"""
+        self._sticks = NEUTRAL
+        self._last_input = 0.0
+        self._neutral_left = NEUTRAL_REPEATS
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # ---- 发送 ----
+
+    def start(self):
+        """在事件循环中启动发送协程"""
+        if not self.is_running:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def halt(self) -> Optional[asyncio.Task]:
+        """同步停止发送协程（正在输入或归零命令未发完时立即发送一次归零），不等待协程结束，
+        供关闭无人机连接前的同步清理使用；返回被取消的任务"""
+        task = self._task
+        if task is None:
+            return None
+        if self.active:
+            self._transmit(NEUTRAL)
+        task.cancel()
+        self._task = None
+        self._sticks = NEUTRAL
+        self._last_input = 0.0
+        self._neutral_left = 0
+        return task
+
+    async def stop(self):
+        """停止发送协程并等待其结束"""
+        task = self.halt()
+        if task is None:
+            return
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def _transmit(self, sticks: Tuple[int, int, int, int]):
+        try:
+            self.send(*sticks)
+            self.stats['sent'] += 1
+        except Exception as e:
+            self.stats['send_errors'] += 1
+            if self.stats['send_errors'] == 1:
+                print(f"⚠️ rc 命令发送失败: {e}")
+
+    def _tick(self, now: float):
+        """发送一拍：失联保护到期时归零"""
+        if self._last_input > 0 and now - self._last_input > self.deadman_timeout:
+            self.stats['deadman_trips'] += 1
+            print(f"⚠️ 手动控制输入中断超过{self.deadman_timeout:.2f}秒，摇杆归零")
+            self.neutral()
+        if self._last_input > 0:
+            sticks = self._sticks
+        else:
+            sticks = NEUTRAL
+            self._neutral_left -= 1
+        if self._pending_inputs > 1:
+            self.stats['coalesced'] += self._pending_inputs - 1
+        self._pending_inputs = 0
+        self._transmit(sticks)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            if not self.active:
+                # 没有输入时不发送，等待下一次输入
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                deadline = loop.time()
+            else:
+                self._jitter.append(max(0.0, loop.time() - deadline))
+            self._tick(time.monotonic())
+            # 按绝对时刻排下一拍，避免累积漂移；落后超过一拍时跳过错过的拍
+            deadline += self.period
+            if deadline < loop.time():
+                self.stats['overruns'] += 1
+                deadline = loop.time() + self.period
+            await asyncio.sleep(deadline - loop.time())
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats.update({
+            'rate_hz': self.rate_hz,
+            'deadman_timeout': self.deadman_timeout,
+            'running': self.is_running,
+            'active': self.active,
+            'sticks': list(self._sticks),
+        })
+        if self._jitter:
+            jitter = np.array(self._jitter) * 1000.0
+            stats['jitter_ms'] = {
+                'mean': round(float(jitter.mean()), 2),
+                'p95': round(float(np.percentile(jitter, 95)), 2),
+                'max': round(float(jitter.max()), 2),
+            }
+        else:
+            stats['jitter_ms'] = None
+        return stats
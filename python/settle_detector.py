@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+基于遥测的悬停稳定检测
+订阅状态包流，观察速度（vgx/vgy/vgz）、姿态（pitch/roll）、高度以及任务垫相对坐标（x/y/z），
+在一个短时间窗口内读数都保持在容差内时判定"已稳定"，并设最长等待时间，替代任务中固定的 sleep(2)/sleep(3)
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass
+class SettleResult:
+    """一次稳定等待的结果"""
+    settled: bool
+    elapsed: float
+    samples: int
+    reason: str = ''
+
+
+class SettleDetector:
+    """悬停稳定检测器（状态流订阅者）"""
+
+    def __init__(self, window: float = 0.4, speed_tolerance: float = 1.0, attitude_tolerance: float = 3.0,
+                 position_tolerance: float = 5.0, height_tolerance: float = 5.0, min_samples: int = 3):
+        """
+        Args:
+            window: 读数需持续保持在容差内的时长（秒）
+            speed_tolerance: 速度容差（Tello状态包 vgx/vgy/vgz 单位 dm/s）
+            attitude_tolerance: 俯仰/横滚角容差（度）
+            position_tolerance: 窗口内任务垫相对坐标的最大变化（cm）
+            height_tolerance: 窗口内高度的最大变化（cm）
+            min_samples: 窗口内至少需要的状态包数
+        """
+        self.window = window
+        self.speed_tolerance = speed_tolerance
+        self.attitude_tolerance = attitude_tolerance
+        self.position_tolerance = position_tolerance
+        self.height_tolerance = height_tolerance
+        self.min_samples = min_samples
+
+        self._samples: deque = deque()
+        self._cond = threading.Condition()
+        self.stats = {'waits': 0, 'settled': 0, 'timeouts': 0, 'total_wait': 0.0}
+
+    def on_state(self, state: Dict[str, Any], t: float):
+        """状态流回调"""
+        with self._cond:
+            self._samples.append((t, state))
+            # 只保留最近两个窗口的数据
+            while self._samples and t - self._samples[0][0] > self.window * 2:
+                self._samples.popleft()
+            self._cond.notify_all()
+
+    @staticmethod
+    def _value(state: Dict[str, Any], key: str) -> float:
+        try:
+            return float(state.get(key, 0))
+        except (TypeError, ValueError):
+            return 0.0
+
+    def _sample_steady(self, state: Dict[str, Any]) -> bool:
+        speed = max(abs(self._value(state, key)) for key in ('vgx', 'vgy', 'vgz'))
+        attitude = max(abs(self._value(state, key)) for key in ('pitch', 'roll'))
+        return speed <= self.speed_tolerance and attitude <= self.attitude_tolerance
+
+    def _window_steady(self, samples) -> bool:
+        """窗口内每个样本静止，且高度与任务垫坐标的变化都在容差内"""
+        if len(samples) < self.min_samples or samples[-1][0] - samples[0][0] < self.window:
+            return False
+        if not all(self._sample_steady(state) for _, state in samples):
+            return False
+        heights = [self._value(state, 'h') for _, state in samples]
+        if max(heights) - min(heights) > self.height_tolerance:
+            return False
+        pads = {int(self._value(state, 'mid')) for _, state in samples}
+        if len(pads) == 1 and pads.pop() > 0:
+            for key in ('x', 'y', 'z'):
+                values = [self._value(state, key) for _, state in samples]
+                if max(values) - min(values) > self.position_tolerance:
+                    return False
+        return True
+
+    def is_settled(self, since: Optional[float] = None) -> bool:
+        """最近一个窗口的读数是否稳定（since之前的样本不计入）"""
+        with self._cond:
+            return self._check(since)
+
+    def _check(self, since: Optional[float]) -> bool:
+        if not self._samples:
+            return False
+        # 从最新的包往前取，直到覆盖整个窗口
+        latest = self._samples[-1][0]
+        samples = []
+        for t, state in reversed(self._samples):
+            if since is not None and t < since:
+                break
+            samples.append((t, state))
+            if latest - t >= self.window:
+                break
+        samples.reverse()
+        return self._window_steady(samples)
+
+    def wait_settled(self, timeout: float = 3.0, cancel: Optional[Callable[[], bool]] = None) -> SettleResult:
+        """等待稳定，最长 timeout 秒；只使用调用之后到达的状态包"""
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._cond:
+            while True:
+                if self._check(start):
+                    result = SettleResult(True, time.monotonic() - start, len(self._samples))
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    result = SettleResult(False, time.monotonic() - start, len(self._samples), 'timeout')
+                    break
+                if cancel is not None and cancel():
+                    result = SettleResult(False, time.monotonic() - start, len(self._samples), 'cancelled')
+                    break
+                self._cond.wait(min(remaining, 0.1))
+
+        self.stats['waits'] += 1
+        self.stats['total_wait'] += result.elapsed
+        self.stats['settled' if result.settled else 'timeouts'] += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['total_wait'] = round(stats['total_wait'], 2)
+        stats['average_wait'] = round(stats['total_wait'] / stats['waits'], 2) if stats['waits'] else 0.0
+        return stats
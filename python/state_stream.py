@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tello状态包流
+Tello驱动（AsyncTello）接收状态包时，每个包解析为一个新的字典（get_current_state() 返回最新的一个）；
+本模块以毫秒级间隔检查是否有新包到达并发布给订阅者，使任务逻辑的反应延迟等于状态包延迟，而不是轮询间隔。
+MissionPadMonitor 订阅状态流，在任务垫ID变化时发布事件，并支持带截止时间的"连续N次看到"等待
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+# 订阅回调：(状态包, 到达时间 time.monotonic())
+StateCallback = Callable[[Dict[str, Any], float], None]
+
+
+class StateStream:
+    """状态包发布器"""
+
+    def __init__(self, state_source: Optional[Callable[[], Optional[Dict[str, Any]]]] = None,
+                 poll_interval: float = 0.005):
+        """
+        Args:
+            state_source: 返回最新状态包的函数（如 tello.get_current_state），为None时只能手动 publish
+            poll_interval: 检查新包的间隔（只比较对象身份，开销很小）
+        """
+        self.state_source = state_source
+        self.poll_interval = poll_interval
+        self.latest: Optional[Dict[str, Any]] = None
+        self.latest_time = 0.0
+        self.packets = 0
+        self._subscribers: List[StateCallback] = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def subscribe(self, callback: StateCallback) -> StateCallback:
+        with self._lock:
+            self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: StateCallback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, state: Dict[str, Any], t: Optional[float] = None):
+        """发布一个状态包（后台线程或模拟器调用）"""
+        t = time.monotonic() if t is None else t
+        with self._lock:
+            self.latest = state
+            self.latest_time = t
+            self.packets += 1
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(state, t)
+            except Exception as e:
+                print(f"⚠️ 状态订阅回调失败: {e}")
+
+    def start(self):
+        if self.running or self.state_source is None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="tello-state-stream")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _loop(self):
+        last = None
+        while not self._stop_event.is_set():
+            try:
+                state = self.state_source()
+            except Exception:
+                state = None
+            # 每个新状态包是一个新对象，身份变化即新包到达
+            if state and state is not last:
+                last = state
+                self.publish(state)
+            self._stop_event.wait(self.poll_interval)
+
+    def age(self) -> float:
+        """最新状态包距今的秒数"""
+        return time.monotonic() - self.latest_time if self.latest is not None else float('inf')
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'running': self.running, 'packets': self.packets, 'age': round(self.age(), 3)}
+
+
+@dataclass
+class PadEvent:
+    """任务垫变化事件"""
+    pad_id: int
+    previous_pad: int
+    t: float
+    x: int = 0
+    y: int = 0
+    z: int = 0
+
+
+class MissionPadMonitor:
+    """根据状态包中的 mid 字段跟踪当前任务垫"""
+
+    def __init__(self, stale_after: float = 0.5):
+        """
+        Args:
+            stale_after: 超过该时间没有新状态包时，当前任务垫视为未知
+        """
+        self.stale_after = stale_after
+        self.current_pad = -1
+        self.streak = 0            # 当前任务垫连续出现的状态包数
+        self.position = (0, 0, 0)  # 相对当前任务垫的 x, y, z
+        self.last_update = 0.0
+        self.events = 0
+        self._cond = threading.Condition()
+        self._listeners: List[Callable[[PadEvent], None]] = []
+
+    def add_listener(self, callback: Callable[[PadEvent], None]):
+        self._listeners.append(callback)
+
+    def on_state(self, state: Dict[str, Any], t: float):
+        """状态流回调"""
+        try:
+            pad_id = int(state.get('mid', -1))
+        except (TypeError, ValueError):
+            pad_id = -1
+        if pad_id <= 0:
+            pad_id = -1
+        event = None
+        with self._cond:
+            if pad_id > 0:
+                self.position = tuple(int(state.get(key, 0)) for key in ('x', 'y', 'z'))
+            if pad_id == self.current_pad:
+                self.streak += 1
+            else:
+                x, y, z = self.position if pad_id > 0 else (0, 0, 0)
+                event = PadEvent(pad_id, self.current_pad, t, x, y, z)
+                self.current_pad = pad_id
+                self.streak = 1
+                self.events += 1
+            self.last_update = t
+            self._cond.notify_all()
+        if event is not None:
+            for callback in list(self._listeners):
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"⚠️ 任务垫事件回调失败: {e}")
+
+    def _fresh(self) -> bool:
+        return time.monotonic() - self.last_update <= self.stale_after
+
+    def visible_pad(self) -> int:
+        """当前看到的任务垫ID（状态包过期时返回-1）"""
+        with self._cond:
+            return self.current_pad if self._fresh() else -1
+
+    def wait_for(self, pad_id: Optional[int] = None, sightings: int = 2, timeout: float = 10.0,
+                 cancel: Optional[Callable[[], bool]] = None) -> int:
+        """等待指定任务垫（pad_id为None时为任意任务垫）连续出现 sightings 个状态包
+
+        Returns:
+            看到的任务垫ID，超时或取消时返回-1
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                pad = self.current_pad
+                if (pad > 0 and (pad_id is None or pad == pad_id)
+                        and self.streak >= sightings and self._fresh()):
+                    return pad
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (cancel is not None and cancel()):
+                    return -1
+                # 限制单次等待时长，以便及时响应取消
+                self._cond.wait(min(remaining, 0.1))
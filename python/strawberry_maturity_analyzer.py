@@ -16,6 +16,8 @@ from datetime import datetime
 from dataclasses import dataclass
 from typing import List, Dict, Optional, Tuple
 
+from color_features import ColorFeatureExtractor
+
 # YOLO导入
 try:
     from ultralytics import YOLO
@@ -57,17 +59,93 @@ class TrackedStrawberry:
     is_active: bool = True
 
 
+class StrawberryTracker:
+    """按中心点距离匹配的草莓跟踪器
+
+    时间由调用方传入：实时视频用 time.time()，离线视频用视频内时间戳
+    """
+
+    def __init__(self, track_timeout: float = 2.0, distance_threshold: float = 60, verbose: bool = True):
+        self.tracks: Dict[str, TrackedStrawberry] = {}
+        self.track_timeout = track_timeout
+        self.distance_threshold = distance_threshold
+        self.verbose = verbose
+        self.next_track_id = 1
+
+    def update(self, current_detections: List[StrawberryDetection], current_time: float):
+        """为当前检测分配跟踪ID（写入 detection.track_id），并移除超时的跟踪"""
+        # 标记所有跟踪的草莓为未更新
+        for tracked in self.tracks.values():
+            tracked.is_active = False
+
+        # 为当前检测到的草莓分配跟踪ID
+        for detection in current_detections:
+            best_match_id = None
+            min_distance = float('inf')
+
+            # 寻找最佳匹配的已跟踪草莓
+            for track_id, tracked in self.tracks.items():
+                if not tracked.is_active:  # 只考虑未更新的草莓
+                    distance = self.calculate_distance(detection.center, tracked.detection.center)
+                    if distance < self.distance_threshold and distance < min_distance:
+                        min_distance = distance
+                        best_match_id = track_id
+
+            if best_match_id:
+                # 更新已存在的跟踪
+                tracked = self.tracks[best_match_id]
+                tracked.detection = detection
+                tracked.last_updated = current_time
+                tracked.update_count += 1
+                tracked.is_active = True
+                detection.track_id = best_match_id
+            else:
+                # 创建新的跟踪
+                track_id = f"strawberry_{self.next_track_id}"
+                self.next_track_id += 1
+                detection.track_id = track_id
+
+                self.tracks[track_id] = TrackedStrawberry(
+                    track_id=track_id,
+                    detection=detection,
+                    first_detected=current_time,
+                    last_updated=current_time
+                )
+                if self.verbose:
+                    print(f"🆕 新草莓跟踪: {track_id} 成熟度={detection.maturity_level}")
+
+        # 移除超时的草莓
+        expired_tracks = [track_id for track_id, tracked in self.tracks.items()
+                          if not tracked.is_active and (current_time - tracked.last_updated) > self.track_timeout]
+        for track_id in expired_tracks:
+            del self.tracks[track_id]
+            if self.verbose:
+                print(f"⏰ 草莓跟踪超时移除: {track_id}")
+
+    @staticmethod
+    def calculate_distance(center1: Tuple[int, int], center2: Tuple[int, int]) -> float:
+        """计算两个中心点之间的欧几里得距离"""
+        return ((center1[0] - center2[0]) ** 2 + (center1[1] - center2[1]) ** 2) ** 0.5
+
+    def active(self, current_time: float) -> List[StrawberryDetection]:
+        """超时范围内的跟踪结果"""
+        return [tracked.detection for tracked in self.tracks.values()
+                if (current_time - tracked.last_updated) <= self.track_timeout]
+
+    def clear(self):
+        self.tracks.clear()
+        self.next_track_id = 1
+
+
 class StrawberryMaturityAnalyzer:
     """草莓成熟度分析器"""
     
     def __init__(self, model_path):
         self.model_path = model_path
         self.model = None
-        self.tracked_strawberries = {}  # 跟踪的草莓字典 {track_id: TrackedStrawberry}
+        # 2.0秒未检测到则认为草莓消失，减少闪烁；60像素距离阈值，减少重复检测
+        self.tracker = StrawberryTracker(track_timeout=2.0, distance_threshold=60)
         self.detection_history = {}  # 草莓检测历史（保留兼容性）
-        self.track_timeout = 2.0  # 2.0秒未检测到则认为草莓消失，减少闪烁
-        self.distance_threshold = 60  # 像素距离阈值，减少重复检测
-        self.next_track_id = 1  # 下一个跟踪ID
         
         # 成熟度颜色阈值（HSV色彩空间）- 修复成熟度识别
         self.maturity_thresholds = {
@@ -90,6 +168,13 @@ class StrawberryMaturityAnalyzer:
                 'confidence_threshold': 0.015  # 降低置信度阈值
             }
         }
+
+        # 单次遍历计算各成熟度颜色占比
+        self.color_extractor = ColorFeatureExtractor({
+            maturity: [((hue_min, t['saturation_min'], t['value_min']), (hue_max, 255, 255))
+                       for hue_min, hue_max in t['hue_ranges']]
+            for maturity, t in self.maturity_thresholds.items()
+        })
         
         self.init_model()
     
@@ -113,8 +198,45 @@ class StrawberryMaturityAnalyzer:
             print(f"❌ 模型加载失败: {e}")
             return False
     
-    def detect_strawberries(self, frame, qr_id=None) -> List[StrawberryDetection]:
-        """检测草莓并分析成熟度（支持持续跟踪）"""
+    @property
+    def tracked_strawberries(self) -> Dict[str, TrackedStrawberry]:
+        """跟踪的草莓字典 {track_id: TrackedStrawberry}"""
+        return self.tracker.tracks
+
+    def _build_detections(self, frame, result, current_time: float) -> List[StrawberryDetection]:
+        """将单帧YOLO结果转换为带成熟度的检测结果"""
+        detections = []
+        if not result.boxes:
+            return detections
+        for i, box in enumerate(result.boxes):
+            # 获取边界框和置信度
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            confidence = float(box.conf[0])
+
+            # 提取草莓区域进行成熟度分析
+            strawberry_roi = frame[y1:y2, x1:x2]
+            maturity_level, maturity_confidence = self.analyze_maturity(strawberry_roi)
+
+            # 输出所有检测的调试信息
+            if confidence > 0.2:
+                print(f"🔍 草莓 {i+1}: 成熟度={maturity_level}, 置信度={maturity_confidence:.3f}")
+
+            detections.append(StrawberryDetection(
+                bbox=(x1, y1, x2, y2),
+                confidence=confidence,
+                maturity_level=maturity_level,
+                maturity_confidence=maturity_confidence,
+                center=((x1 + x2) // 2, (y1 + y2) // 2),
+                area=(x2 - x1) * (y2 - y1),
+                last_seen=current_time
+            ))
+        return detections
+
+    def detect_strawberries(self, frame, qr_id=None, track=True) -> List[StrawberryDetection]:
+        """检测草莓并分析成熟度（支持持续跟踪）
+
+        track=False 时只返回当前帧的检测结果，不更新跟踪状态（离线批量处理乱序帧时使用）
+        """
         if self.model is None:
             return []
         
@@ -125,40 +247,12 @@ class StrawberryMaturityAnalyzer:
             # YOLO检测（进一步降低置信度，确保能检测到草莓）
             results = self.model(frame, conf=0.15, iou=0.4)
             
-            if results and results[0].boxes:
-                boxes = results[0].boxes
-                
-                for i, box in enumerate(boxes):
-                    # 获取边界框和置信度
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    confidence = float(box.conf[0])
-                    
-                    # 计算中心点和面积
-                    center_x = (x1 + x2) // 2
-                    center_y = (y1 + y2) // 2
-                    area = (x2 - x1) * (y2 - y1)
-                    
-                    # 提取草莓区域进行成熟度分析
-                    strawberry_roi = frame[y1:y2, x1:x2]
-                    maturity_level, maturity_confidence = self.analyze_maturity(strawberry_roi)
-                    
-                    # 输出所有检测的调试信息
-                    if confidence > 0.2:
-                        print(f"🔍 草莓 {i+1}: 成熟度={maturity_level}, 置信度={maturity_confidence:.3f}")
-                    
-                    # 创建检测结果
-                    detection = StrawberryDetection(
-                        bbox=(x1, y1, x2, y2),
-                        confidence=confidence,
-                        maturity_level=maturity_level,
-                        maturity_confidence=maturity_confidence,
-                        center=(center_x, center_y),
-                        area=area,
-                        last_seen=current_time
-                    )
-                    
-                    current_detections.append(detection)
+            if results:
+                current_detections = self._build_detections(frame, results[0], current_time)
             
+            if not track:
+                return current_detections
+
             # 更新跟踪状态
             self.update_tracking(current_detections, current_time)
             
@@ -170,10 +264,20 @@ class StrawberryMaturityAnalyzer:
         
         except Exception as e:
             print(f"❌ 草莓检测错误: {e}")
+            if not track:
+                return []
             # 即使检测失败，也返回之前跟踪的草莓
             active_detections = self.get_active_detections()
         
         return active_detections
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[List[StrawberryDetection]]:
+        """一次推理多帧（批量前向比逐帧调用快），返回每帧的检测结果，不更新跟踪状态"""
+        if self.model is None or not frames:
+            return [[] for _ in frames]
+        current_time = time.time()
+        results = self.model(list(frames), conf=0.15, iou=0.4, verbose=False)
+        return [self._build_detections(frame, result, current_time) for frame, result in zip(frames, results)]
     
     def analyze_maturity(self, roi) -> Tuple[str, float]:
         """分析草莓成熟度（改进的算法）"""
@@ -181,29 +285,8 @@ class StrawberryMaturityAnalyzer:
             if roi.size == 0:
                 return 'unknown', 0.0
             
-            # 转换到HSV色彩空间
-            hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-            
-            # 计算各成熟度等级的匹配度
-            maturity_scores = {}
-            
-            for maturity, thresholds in self.maturity_thresholds.items():
-                hue_ranges = thresholds['hue_ranges']
-                sat_min = thresholds['saturation_min']
-                val_min = thresholds['value_min']
-                
-                # 为每个色调范围创建掩码
-                combined_mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
-                
-                for hue_min, hue_max in hue_ranges:
-                    mask = cv2.inRange(hsv, 
-                                     (hue_min, sat_min, val_min), 
-                                     (hue_max, 255, 255))
-                    combined_mask = cv2.bitwise_or(combined_mask, mask)
-                
-                # 计算匹配像素比例
-                pixel_ratio = np.sum(combined_mask > 0) / combined_mask.size
-                maturity_scores[maturity] = pixel_ratio
+            # 计算各成熟度等级的匹配像素比例（一次联合直方图）
+            maturity_scores = self.color_extractor.color_ratios(roi)
             
             # 调试信息：显示所有成熟度得分
             print(f"  🎯 成熟度得分: ripe={maturity_scores.get('ripe', 0):.3f}, semi_ripe={maturity_scores.get('semi_ripe', 0):.3f}, unripe={maturity_scores.get('unripe', 0):.3f}")
@@ -254,72 +337,15 @@ class StrawberryMaturityAnalyzer:
     
     def update_tracking(self, current_detections: List[StrawberryDetection], current_time: float):
         """更新草莓跟踪状态"""
-        # 标记所有跟踪的草莓为未更新
-        for tracked in self.tracked_strawberries.values():
-            tracked.is_active = False
-        
-        # 为当前检测到的草莓分配跟踪ID
-        for detection in current_detections:
-            best_match_id = None
-            min_distance = float('inf')
-            
-            # 寻找最佳匹配的已跟踪草莓
-            for track_id, tracked in self.tracked_strawberries.items():
-                if not tracked.is_active:  # 只考虑未更新的草莓
-                    distance = self.calculate_distance(detection.center, tracked.detection.center)
-                    if distance < self.distance_threshold and distance < min_distance:
-                        min_distance = distance
-                        best_match_id = track_id
-            
-            if best_match_id:
-                # 更新已存在的跟踪
-                tracked = self.tracked_strawberries[best_match_id]
-                tracked.detection = detection
-                tracked.last_updated = current_time
-                tracked.update_count += 1
-                tracked.is_active = True
-                detection.track_id = best_match_id
-            else:
-                # 创建新的跟踪
-                track_id = f"strawberry_{self.next_track_id}"
-                self.next_track_id += 1
-                detection.track_id = track_id
-                
-                tracked_strawberry = TrackedStrawberry(
-                    track_id=track_id,
-                    detection=detection,
-                    first_detected=current_time,
-                    last_updated=current_time
-                )
-                
-                self.tracked_strawberries[track_id] = tracked_strawberry
-                print(f"🆕 新草莓跟踪: {track_id} 成熟度={detection.maturity_level}")
-        
-        # 移除超时的草莓
-        expired_tracks = []
-        for track_id, tracked in self.tracked_strawberries.items():
-            if not tracked.is_active and (current_time - tracked.last_updated) > self.track_timeout:
-                expired_tracks.append(track_id)
-        
-        for track_id in expired_tracks:
-            del self.tracked_strawberries[track_id]
-            print(f"⏰ 草莓跟踪超时移除: {track_id}")
+        self.tracker.update(current_detections, current_time)
     
     def calculate_distance(self, center1: Tuple[int, int], center2: Tuple[int, int]) -> float:
         """计算两个中心点之间的欧几里得距离"""
-        return ((center1[0] - center2[0]) ** 2 + (center1[1] - center2[1]) ** 2) ** 0.5
+        return StrawberryTracker.calculate_distance(center1, center2)
     
     def get_active_detections(self) -> List[StrawberryDetection]:
         """获取所有活跃的草莓检测结果"""
-        active_detections = []
-        current_time = time.time()
-        
-        for tracked in self.tracked_strawberries.values():
-            # 检查是否在超时范围内
-            if (current_time - tracked.last_updated) <= self.track_timeout:
-                active_detections.append(tracked.detection)
-        
-        return active_detections
+        return self.tracker.active(time.time())
     
     def is_recently_processed(self, strawberry_id, current_time) -> bool:
         """检查草莓是否最近已被处理（保留兼容性）"""
@@ -331,8 +357,7 @@ class StrawberryMaturityAnalyzer:
     def clear_detection_history(self):
         """清空检测历史和跟踪数据"""
         self.detection_history.clear()
-        self.tracked_strawberries.clear()
-        self.next_track_id = 1
+        self.tracker.clear()
         print("🧹 草莓检测历史和跟踪数据已清空")
     
     def draw_detections(self, frame, detections: List[StrawberryDetection]):
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+遥测环形缓冲
+Tello 以约10Hz在 UDP 8890 推送完整状态包；Tello驱动每收到一个包就写入预分配的 NumPy 环形缓冲（带时间戳）。
+状态广播、任务控制器、飞行记录仪从缓冲读取快照或时间窗口，不再逐项发送查询命令。
+只允许一个写线程（驱动所在的事件循环），读取不加锁：每行带序号，写入前后各标记一次，读到正在被覆盖的行时重读或丢弃
+"""
+
+import math
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# 状态包中的数值字段（mpry、agx 等不需要的字段不入缓冲）
+STATE_FIELDS = ('mid', 'x', 'y', 'z', 'pitch', 'roll', 'yaw', 'vgx', 'vgy', 'vgz',
+                'templ', 'temph', 'tof', 'h', 'bat', 'baro', 'time')
+FLOAT_FIELDS = {'baro'}
+
+_SEQ = 0     # 行序号列：写入中为 -1
+_T = 1       # 时间戳列
+
+
+def _value(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class TelemetryRing:
+    """预分配的状态包环形缓冲（单写多读）"""
+
+    def __init__(self, capacity: int = 1200, fields: Iterable[str] = STATE_FIELDS):
+        """
+        Args:
+            capacity: 保存的状态包数量（默认约2分钟@10Hz）
+            fields: 记录的状态包字段
+        """
+        self.capacity = max(2, int(capacity))
+        self.fields: Tuple[str, ...] = tuple(fields)
+        self._columns = {field: i + 2 for i, field in enumerate(self.fields)}
+        self._data = np.full((self.capacity, len(self.fields) + 2), np.nan)
+        self._data[:, _SEQ] = -1
+        self._count = 0
+
+    @property
+    def count(self) -> int:
+        """累计写入的状态包数"""
+        return self._count
+
+    def append(self, state: Dict[str, Any], t: Optional[float] = None):
+        """写入一个状态包（只能由一个线程调用）"""
+        n = self._count
+        row = self._data[n % self.capacity]
+        row[_SEQ] = -1
+        row[_T] = time.time() if t is None else t
+        row[2:] = [_value(state.get(field)) for field in self.fields]
+        row[_SEQ] = n
+        self._count = n + 1
+
+    def _latest_row(self) -> Optional[np.ndarray]:
+        for _ in range(3):
+            n = self._count - 1
+            if n < 0:
+                return None
+            row = self._data[n % self.capacity].copy()
+            if row[_SEQ] == n:
+                return row
+        return None
+
+    def _to_dict(self, t: float, values: np.ndarray) -> Dict[str, Any]:
+        snapshot: Dict[str, Any] = {'t': float(t)}
+        for field, value in zip(self.fields, values):
+            if not math.isnan(value):
+                snapshot[field] = float(value) if field in FLOAT_FIELDS else int(value)
+        return snapshot
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """最新状态包（键名与状态包一致，另加到达时间 t），还没有数据时为None"""
+        row = self._latest_row()
+        return self._to_dict(row[_T], row[2:]) if row is not None else None
+
+    def latest(self, field: str, default: Any = None) -> Any:
+        """最新状态包中的单个字段"""
+        snapshot = self.snapshot()
+        return snapshot.get(field, default) if snapshot else default
+
+    def age(self) -> float:
+        """最新状态包距今的秒数"""
+        row = self._latest_row()
+        return time.time() - row[_T] if row is not None else float('inf')
+
+    def window(self, seconds: Optional[float] = None, fields: Optional[Iterable[str]] = None) -> np.ndarray:
+        """最近的状态包（按时间从旧到新），每行为 [t, 字段...]；seconds 为None时返回缓冲中的全部"""
+        fields = self.fields if fields is None else tuple(fields)
+        end = self._count
+        start = max(0, end - self.capacity)
+        if end == start:
+            return np.empty((0, 1 + len(fields)))
+        sequence = np.arange(start, end)
+        rows = self._data[sequence % self.capacity]
+        rows = rows[rows[:, _SEQ] == sequence]   # 去掉读取期间被覆盖的行
+        if seconds is not None and len(rows):
+            rows = rows[rows[:, _T] >= rows[-1, _T] - seconds]
+        columns = [_T] + [self._columns[field] for field in fields]
+        return rows[:, columns]
+
+    def series(self, field: str, seconds: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """单个字段的 (时间, 数值) 序列"""
+        rows = self.window(seconds, [field])
+        return rows[:, 0], rows[:, 1]
+
+    def records(self, seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """最近的状态包字典列表（按时间从旧到新）"""
+        return [self._to_dict(row[0], row[1:]) for row in self.window(seconds)]
+
+    def rate(self, seconds: float = 5.0) -> float:
+        """最近 seconds 秒内的状态包频率（Hz）"""
+        times = self.window(seconds, [])[:, 0]
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def get_stats(self) -> Dict[str, Any]:
+        age = self.age()
+        return {
+            'packets': self._count,
+            'capacity': self.capacity,
+            'buffered': min(self._count, self.capacity),
+            'rate_hz': round(self.rate(), 1),
+            'age': round(age, 2) if math.isfinite(age) else None,
+        }
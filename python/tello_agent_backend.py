@@ -54,14 +54,8 @@ except ImportError as e:
     WEBSOCKETS_AVAILABLE = False
     logger.error(f"✗ websockets库导入失败: {e}")
 
-# DJI Tello导入
-try:
-    from djitellopy import Tello
-    TELLO_AVAILABLE = True
-    logger.info("✅ djitellopy库加载成功")
-except ImportError as e:
-    TELLO_AVAILABLE = False
-    logger.error(f"✗ djitellopy库导入失败: {e}")
+# Tello SDK 驱动：asyncio UDP 客户端，动作命令在协程中等待应答，不阻塞事件循环
+from async_tello import AsyncTello, state_temperature
 
 # OpenCV导入
 try:
@@ -207,18 +201,14 @@ class TelloIntelligentAgent:
     async def connect_tello(self) -> bool:
         """连接Tello无人机"""
         try:
-            if not TELLO_AVAILABLE:
-                self.logger.error("djitellopy库不可用")
-                return False
-            
             self.state = TelloAgentState.CONNECTING
             self.logger.info("正在连接Tello无人机...")
             
-            self.tello = Tello()
-            self.tello.connect()
+            self.tello = AsyncTello()
+            await self.tello.connect()
             
             # 获取基本状态
-            battery = self.tello.get_battery()
+            battery = await self.tello.read_battery()
             temperature = self.tello.get_temperature()
             
             self.drone_status.connected = True
@@ -253,7 +243,7 @@ class TelloIntelligentAgent:
                     await self.emergency_land()
                 
                 await self.stop_video_stream()
-                self.tello.end()
+                await self.tello.end()
                 self.tello = None
             
             self.state = TelloAgentState.DISCONNECTED
@@ -271,7 +261,7 @@ class TelloIntelligentAgent:
             if not self.tello or not CV2_AVAILABLE:
                 return
             
-            self.tello.streamon()
+            await self.tello.streamon()
             self.video_running = True
             
             # 启动视频处理线程
@@ -292,7 +282,7 @@ class TelloIntelligentAgent:
                 self.video_thread.join(timeout=2)
             
             if self.tello:
-                self.tello.streamoff()
+                await self.tello.streamoff()
             
             self.logger.info("视频流已停止")
             
@@ -394,19 +384,19 @@ class TelloIntelligentAgent:
                 if self.drone_status.battery < self.config.min_battery_level:
                     return {"success": False, "error": f"电池电量过低({self.drone_status.battery}%)，无法起飞"}
                 
-                self.tello.takeoff()
+                await self.tello.takeoff()
                 self.drone_status.flying = True
                 self.state = TelloAgentState.FLYING
                 result["message"] = "起飞成功"
                 
             elif action == "land":
-                self.tello.land()
+                await self.tello.land()
                 self.drone_status.flying = False
                 self.state = TelloAgentState.CONNECTED
                 result["message"] = "降落成功"
                 
             elif action == "emergency":
-                self.tello.emergency()
+                await self.tello.emergency()
                 self.drone_status.flying = False
                 self.state = TelloAgentState.CONNECTED
                 result["message"] = "紧急停止执行"
@@ -414,49 +404,49 @@ class TelloIntelligentAgent:
             # 移动命令
             elif action == "move_up":
                 distance = parameters.get("distance", 20)
-                self.tello.move_up(distance)
+                await self.tello.move_up(distance)
                 result["message"] = f"上升{distance}厘米"
                 
             elif action == "move_down":
                 distance = parameters.get("distance", 20)
-                self.tello.move_down(distance)
+                await self.tello.move_down(distance)
                 result["message"] = f"下降{distance}厘米"
                 
             elif action == "move_left":
                 distance = parameters.get("distance", 20)
-                self.tello.move_left(distance)
+                await self.tello.move_left(distance)
                 result["message"] = f"左移{distance}厘米"
                 
             elif action == "move_right":
                 distance = parameters.get("distance", 20)
-                self.tello.move_right(distance)
+                await self.tello.move_right(distance)
                 result["message"] = f"右移{distance}厘米"
                 
             elif action == "move_forward":
                 distance = parameters.get("distance", 20)
-                self.tello.move_forward(distance)
+                await self.tello.move_forward(distance)
                 result["message"] = f"前进{distance}厘米"
                 
             elif action == "move_back":
                 distance = parameters.get("distance", 20)
-                self.tello.move_back(distance)
+                await self.tello.move_back(distance)
                 result["message"] = f"后退{distance}厘米"
             
             # 旋转命令
             elif action == "rotate_clockwise":
                 degrees = parameters.get("degrees", 90)
-                self.tello.rotate_clockwise(degrees)
+                await self.tello.rotate_clockwise(degrees)
                 result["message"] = f"顺时针旋转{degrees}度"
                 
             elif action == "rotate_counter_clockwise":
                 degrees = parameters.get("degrees", 90)
-                self.tello.rotate_counter_clockwise(degrees)
+                await self.tello.rotate_counter_clockwise(degrees)
                 result["message"] = f"逆时针旋转{degrees}度"
             
             # 翻滚命令
             elif action in ["flip_forward", "flip_back", "flip_left", "flip_right"]:
                 direction = action.split("_")[1]
-                self.tello.flip(direction[0])  # f, b, l, r
+                await self.tello.flip(direction[0])  # f, b, l, r
                 result["message"] = f"{direction}方向翻滚"
             
             # 状态查询
@@ -495,7 +485,7 @@ class TelloIntelligentAgent:
         """紧急降落"""
         try:
             if self.tello and self.drone_status.flying:
-                self.tello.emergency()
+                await self.tello.emergency()
                 self.drone_status.flying = False
                 self.state = TelloAgentState.CONNECTED
                 await self.broadcast_status()
@@ -507,9 +497,12 @@ class TelloIntelligentAgent:
         """更新无人机状态"""
         try:
             if self.tello and self.drone_status.connected:
-                self.drone_status.battery = self.tello.get_battery()
-                self.drone_status.temperature = self.tello.get_temperature()
-                self.drone_status.height = self.tello.get_height()
+                # 一次读取遥测缓冲中的最新状态包，不再逐项查询
+                snapshot = self.tello.telemetry.snapshot()
+                if snapshot:
+                    self.drone_status.battery = snapshot.get('bat', self.drone_status.battery)
+                    self.drone_status.temperature = state_temperature(snapshot)
+                    self.drone_status.height = snapshot.get('h', self.drone_status.height)
                 
                 # 检查低电量
                 if (self.drone_status.battery < self.config.min_battery_level and 
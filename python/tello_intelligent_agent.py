@@ -17,12 +17,14 @@ import websockets
 from websockets.server import WebSocketServerProtocol
 import cv2
 import numpy as np
-from djitellopy import Tello
+from async_tello import AsyncTello, state_temperature
 import threading
 from queue import Queue, Empty
 import base64
 import httpx
 
+from json_extraction import extract_json_object
+
 # AI 服务支持
 try:
     from openai import OpenAI, AzureOpenAI
@@ -235,18 +237,18 @@ class TelloIntelligentAgent:
                 return {'success': True, 'message': '无人机已连接'}
             
             logger.info("正在连接Tello无人机...")
-            self.tello = Tello()
-            self.tello.connect()
+            self.tello = AsyncTello()
+            await self.tello.connect()
             
             # 检查连接状态
-            battery = self.tello.get_battery()
+            battery = await self.tello.read_battery()
             if battery > 0:
                 self.connected = True
                 self.drone_status['connected'] = True
                 self.drone_status['battery'] = battery
                 
-                # 启动状态更新线程
-                threading.Thread(target=self._status_update_loop, daemon=True).start()
+                # 启动状态更新任务（状态取自状态包，不需要单独的线程）
+                asyncio.create_task(self._status_update_loop())
                 
                 logger.info(f"Tello无人机连接成功，电池电量: {battery}%")
                 return {
@@ -275,11 +277,11 @@ class TelloIntelligentAgent:
             
             # 停止视频流
             if self.video_enabled:
-                self._stop_video_stream()
+                await self._stop_video_stream()
             
             # 断开连接
             if self.tello:
-                self.tello.end()
+                await self.tello.end()
             
             self.connected = False
             self.flying = False
@@ -405,71 +407,8 @@ class TelloIntelligentAgent:
             
             logger.info(f"AI分析结果: {ai_response}")
             
-            # 解析AI响应（增强容错处理）
-            def try_parse_json(text: str):
-                try:
-                    # 去除首尾空白和换行符
-                    text = text.strip()
-                    return json.loads(text)
-                except Exception:
-                    return None
-            
-            # 首先尝试直接解析
-            parsed = try_parse_json(ai_response)
-            
-            if parsed is None:
-                # 尝试从代码块提取JSON（支持各种markdown代码块）
-                import re
-                patterns = [
-                    r"```(?:json)?\s*([\s\S]*?)\s*```",  # 标准代码块
-                    r"```\s*([\s\S]*?)\s*```",           # 无语言标识的代码块
-                    r"`([\s\S]*?)`"                      # 单行代码块
-                ]
-                
-                for pattern in patterns:
-                    matches = re.findall(pattern, ai_response)
-                    for match in matches:
-                        parsed = try_parse_json(match)
-                        if parsed is not None and 'commands' in parsed:
-                            break
-                    if parsed is not None and 'commands' in parsed:
-                        break
-            
-            if parsed is None:
-                # 尝试查找JSON对象（寻找大括号包围的内容）
-                import re
-                json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-                matches = re.findall(json_pattern, ai_response, re.DOTALL)
-                
-                for match in matches:
-                    # 找到最完整的JSON对象（包含"commands"的）
-                    if '"commands"' in match:
-                        parsed = try_parse_json(match)
-                        if parsed is not None and 'commands' in parsed:
-                            break
-            
-            if parsed is None:
-                # 最后尝试：寻找所有可能的JSON结构
-                start_positions = []
-                end_positions = []
-                
-                for i, char in enumerate(ai_response):
-                    if char == '{':
-                        start_positions.append(i)
-                    elif char == '}':
-                        end_positions.append(i)
-                
-                # 尝试各种start和end的组合
-                for start in start_positions:
-                    for end in reversed(end_positions):
-                        if end > start:
-                            candidate = ai_response[start:end+1]
-                            if '"commands"' in candidate:
-                                parsed = try_parse_json(candidate)
-                                if parsed is not None and 'commands' in parsed:
-                                    break
-                    if parsed is not None and 'commands' in parsed:
-                        break
+            # 解析AI响应：单次线性扫描，跳过说明文字与代码块围栏，找到第一个包含commands的JSON对象
+            parsed = extract_json_object(ai_response or '', required_key='commands')
             
             # 验证解析结果
             if parsed is not None and isinstance(parsed, dict) and 'commands' in parsed:
@@ -546,7 +485,7 @@ class TelloIntelligentAgent:
         if self.flying:
             return {'message': '无人机已在飞行中'}
         
-        self.tello.takeoff()
+        await self.tello.takeoff()
         self.flying = True
         self.drone_status['flying'] = True
         return {'message': '起飞成功'}
@@ -556,14 +495,14 @@ class TelloIntelligentAgent:
         if not self.flying:
             return {'message': '无人机未在飞行中'}
         
-        self.tello.land()
+        await self.tello.land()
         self.flying = False
         self.drone_status['flying'] = False
         return {'message': '降落成功'}
     
     async def _emergency(self) -> Dict[str, Any]:
         """紧急停止"""
-        self.tello.emergency()
+        await self.tello.emergency()
         self.flying = False
         self.drone_status['flying'] = False
         return {'message': '紧急停止执行'}
@@ -571,49 +510,49 @@ class TelloIntelligentAgent:
     async def _move_forward(self, distance: int = 30) -> Dict[str, Any]:
         """向前移动"""
         distance = max(20, min(500, distance))  # 限制距离范围
-        self.tello.move_forward(distance)
+        await self.tello.move_forward(distance)
         return {'message': f'向前移动 {distance} 厘米'}
     
     async def _move_back(self, distance: int = 30) -> Dict[str, Any]:
         """向后移动"""
         distance = max(20, min(500, distance))
-        self.tello.move_back(distance)
+        await self.tello.move_back(distance)
         return {'message': f'向后移动 {distance} 厘米'}
     
     async def _move_left(self, distance: int = 30) -> Dict[str, Any]:
         """向左移动"""
         distance = max(20, min(500, distance))
-        self.tello.move_left(distance)
+        await self.tello.move_left(distance)
         return {'message': f'向左移动 {distance} 厘米'}
     
     async def _move_right(self, distance: int = 30) -> Dict[str, Any]:
         """向右移动"""
         distance = max(20, min(500, distance))
-        self.tello.move_right(distance)
+        await self.tello.move_right(distance)
         return {'message': f'向右移动 {distance} 厘米'}
     
     async def _move_up(self, distance: int = 30) -> Dict[str, Any]:
         """向上移动"""
         distance = max(20, min(500, distance))
-        self.tello.move_up(distance)
+        await self.tello.move_up(distance)
         return {'message': f'向上移动 {distance} 厘米'}
     
     async def _move_down(self, distance: int = 30) -> Dict[str, Any]:
         """向下移动"""
         distance = max(20, min(500, distance))
-        self.tello.move_down(distance)
+        await self.tello.move_down(distance)
         return {'message': f'向下移动 {distance} 厘米'}
     
     async def _rotate_clockwise(self, degrees: int = 90) -> Dict[str, Any]:
         """顺时针旋转"""
         degrees = max(1, min(360, degrees))
-        self.tello.rotate_clockwise(degrees)
+        await self.tello.rotate_clockwise(degrees)
         return {'message': f'顺时针旋转 {degrees} 度'}
     
     async def _rotate_counter_clockwise(self, degrees: int = 90) -> Dict[str, Any]:
         """逆时针旋转"""
         degrees = max(1, min(360, degrees))
-        self.tello.rotate_counter_clockwise(degrees)
+        await self.tello.rotate_counter_clockwise(degrees)
         return {'message': f'逆时针旋转 {degrees} 度'}
     
     async def _get_battery(self) -> Dict[str, Any]:
@@ -628,15 +567,13 @@ class TelloIntelligentAgent:
             return {'message': '无人机未连接'}
         
         try:
-            battery = self.tello.get_battery()
-            temperature = self.tello.get_temperature()
-            height = self.tello.get_height()
-            
-            self.drone_status.update({
-                'battery': battery,
-                'temperature': temperature,
-                'height': height
-            })
+            snapshot = self.tello.telemetry.snapshot()
+            if snapshot:
+                self.drone_status.update({
+                    'battery': snapshot.get('bat', self.drone_status.get('battery')),
+                    'temperature': state_temperature(snapshot),
+                    'height': snapshot.get('h', self.drone_status.get('height'))
+                })
             
             return {
                 'message': '状态获取成功',
@@ -650,30 +587,28 @@ class TelloIntelligentAgent:
         # Tello会自动悬停，这里只是确认状态
         return {'message': '无人机悬停中'}
     
-    def _status_update_loop(self):
+    async def _status_update_loop(self):
         """状态更新循环"""
         while self.connected:
             try:
-                if self.tello:
-                    battery = self.tello.get_battery()
-                    temperature = self.tello.get_temperature()
-                    height = self.tello.get_height()
-                    
+                # 读取遥测缓冲中的最新状态包（Tello约10Hz推送），不发查询命令
+                snapshot = self.tello.telemetry.snapshot() if self.tello else None
+                if snapshot:
                     self.drone_status.update({
-                        'battery': battery,
-                        'temperature': temperature,
-                        'height': height,
+                        'battery': snapshot.get('bat', self.drone_status.get('battery')),
+                        'temperature': state_temperature(snapshot),
+                        'height': snapshot.get('h', self.drone_status.get('height')),
                         'connected': self.connected,
                         'flying': self.flying
                     })
                     
                     # 广播状态更新
-                    asyncio.create_task(self._broadcast_status())
+                    await self._broadcast_status()
                     
             except Exception as e:
                 logger.error(f"状态更新失败: {e}")
             
-            time.sleep(2)  # 每2秒更新一次状态
+            await asyncio.sleep(2)  # 每2秒更新一次状态
     
     async def _broadcast_status(self):
         """广播状态更新到所有WebSocket客户端"""
@@ -719,13 +654,13 @@ class TelloIntelligentAgent:
         for client in clients_to_remove:
             self.websocket_clients.discard(client)
     
-    def _start_video_stream(self):
+    async def _start_video_stream(self):
         """启动视频流"""
         if not self.connected or self.video_enabled:
             return
         
         try:
-            self.tello.streamon()
+            await self.tello.streamon()
             self.video_enabled = True
             self.video_thread = threading.Thread(target=self._video_stream_loop, daemon=True)
             self.video_thread.start()
@@ -733,7 +668,7 @@ class TelloIntelligentAgent:
         except Exception as e:
             logger.error(f"启动视频流失败: {e}")
     
-    def _stop_video_stream(self):
+    async def _stop_video_stream(self):
         """停止视频流"""
         if not self.video_enabled:
             return
@@ -741,7 +676,7 @@ class TelloIntelligentAgent:
         try:
             self.video_enabled = False
             if self.tello:
-                self.tello.streamoff()
+                await self.tello.streamoff()
             logger.info("视频流已停止")
         except Exception as e:
             logger.error(f"停止视频流失败: {e}")
@@ -803,11 +738,11 @@ class TelloIntelligentAgent:
                 response.update(result)
                 
             elif message_type == 'start_video':
-                self._start_video_stream()
+                await self._start_video_stream()
                 response.update({'success': True, 'message': '视频流已启动'})
                 
             elif message_type == 'stop_video':
-                self._stop_video_stream()
+                await self._stop_video_stream()
                 response.update({'success': True, 'message': '视频流已停止'})
 
             elif message_type == 'update_ai_settings':
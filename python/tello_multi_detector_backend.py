@@ -29,14 +29,8 @@ if sys.platform.startswith('win'):
     except:
         pass
 
-# DJI Tello导入
-try:
-    from djitellopy import Tello
-    TELLO_AVAILABLE = True
-    print("✅ djitellopy库加载成功")
-except ImportError as e:
-    TELLO_AVAILABLE = False
-    print(f"✗ djitellopy库导入失败: {e}")
+# Tello SDK 驱动：asyncio UDP 客户端，动作命令在协程中等待应答，不阻塞事件循环
+from async_tello import AsyncTello
 
 # OpenCV导入
 try:
@@ -217,9 +211,10 @@ class TelloMultiDetectorService:
                         if connection_retry_count > max_connection_retry:
                             print("❌ 视频流连接失败次数过多，尝试重新初始化")
                             try:
-                                self.drone.streamoff()
+                                blocking = self.drone.blocking()
+                                blocking.streamoff()
                                 time.sleep(1)
-                                self.drone.streamon()
+                                blocking.streamon()
                                 time.sleep(2)
                                 connection_retry_count = 0
                                 print("✅ 视频流重新初始化完成")
@@ -521,22 +516,15 @@ class TelloMultiDetectorService:
     async def handle_drone_connect(self, websocket, data):
         """处理无人机连接"""
         try:
-            if not TELLO_AVAILABLE:
-                await self.send_error(websocket, "djitellopy库未安装，无法连接无人机")
-                return
-            
             if self.drone is None:
                 print("正在连接无人机...")
                 await self.broadcast_message('status_update', '🔗 正在连接无人机...')
                 
-                self.drone = Tello()
-                self.drone.RESPONSE_TIMEOUT = 10
-                self.drone.connect()
-                
-                await asyncio.sleep(2)
+                self.drone = AsyncTello(timeout=10)
+                await self.drone.connect(wait_state=2.0)
                 
                 try:
-                    battery = self.drone.get_battery()
+                    battery = await self.drone.read_battery()
                     if battery < 0:
                         raise Exception("无法获取有效的电池信息")
                     self.drone_state.update({
@@ -561,7 +549,7 @@ class TelloMultiDetectorService:
                 
                 while video_retry < max_video_retry and not video_stream_started:
                     try:
-                        self.drone.streamon()
+                        await self.drone.streamon()
                         await asyncio.sleep(3)
                         video_stream_started = True
                         print(f"✅ 视频流启动成功 (尝试 {video_retry + 1}/{max_video_retry})")
@@ -593,7 +581,7 @@ class TelloMultiDetectorService:
             await self.send_error(websocket, f"连接失败: {str(e)}")
             if self.drone:
                 try:
-                    self.drone.end()
+                    await self.drone.end()
                 except:
                     pass
                 self.drone = None
@@ -604,9 +592,7 @@ class TelloMultiDetectorService:
             if self.drone:
                 self.stop_video_streaming()
                 try:
-                    self.drone.streamoff()
-                    await asyncio.sleep(0.5)
-                    self.drone.end()
+                    await self.drone.end()
                 except:
                     pass
                 self.drone = None
@@ -626,7 +612,7 @@ class TelloMultiDetectorService:
     async def handle_drone_takeoff(self, websocket, data):
         """处理无人机起飞"""
         try:
-            if not TELLO_AVAILABLE or not self.drone:
+            if not self.drone:
                 await self.send_error(websocket, "无人机未连接")
                 return
             
@@ -637,7 +623,7 @@ class TelloMultiDetectorService:
             print("🚁 正在起飞...")
             await self.broadcast_message('status_update', '🚁 无人机正在起飞...')
             
-            self.drone.takeoff()
+            await self.drone.takeoff()
             self.drone_state['flying'] = True
             
             await self.broadcast_message('status_update', '✅ 无人机起飞成功')
@@ -650,7 +636,7 @@ class TelloMultiDetectorService:
     async def handle_drone_land(self, websocket, data):
         """处理无人机降落"""
         try:
-            if not TELLO_AVAILABLE or not self.drone:
+            if not self.drone:
                 await self.send_error(websocket, "无人机未连接")
                 return
             
@@ -661,7 +647,7 @@ class TelloMultiDetectorService:
             print("🛬 正在降落...")
             await self.broadcast_message('status_update', '🛬 无人机正在降落...')
             
-            self.drone.land()
+            await self.drone.land()
             self.drone_state['flying'] = False
             
             await self.broadcast_message('status_update', '✅ 无人机降落成功')
@@ -693,7 +679,7 @@ class TelloMultiDetectorService:
         try:
             if self.drone:
                 try:
-                    self.drone.streamon()
+                    await self.drone.streamon()
                 except Exception as e:
                     print(f"开启Tello视频失败(忽略继续): {e}")
             self.start_video_streaming()
@@ -707,7 +693,7 @@ class TelloMultiDetectorService:
             self.stop_video_streaming()
             if self.drone:
                 try:
-                    self.drone.streamoff()
+                    await self.drone.streamoff()
                 except Exception as e:
                     print(f"关闭Tello视频失败(忽略继续): {e}")
             await self.broadcast_message('status_update', '视频流已关闭')
@@ -820,7 +806,7 @@ class TelloMultiDetectorService:
         try:
             if self.drone:
                 try:
-                    self.drone.emergency()
+                    await self.drone.emergency()
                 except Exception as e:
                     print(f"执行急停失败(可能不支持): {e}")
                 self.drone_state['flying'] = False
@@ -860,7 +846,7 @@ class TelloMultiDetectorService:
             if enable_video_stream and not self.video_streaming:
                 if self.drone:
                     try:
-                        self.drone.streamon()
+                        await self.drone.streamon()
                         await asyncio.sleep(1)
                     except Exception as e:
                         print(f"启动Tello视频流失败: {e}")
@@ -1015,8 +1001,7 @@ class TelloMultiDetectorService:
         
         if self.drone:
             try:
-                self.drone.streamoff()
-                self.drone.end()
+                self.drone.close()
             except:
                 pass
             self.drone = None
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+检测驱动停留测试
+验证目标达成即离开、无检测时按固定上限、检测仍在变化时延长（有封顶）、任务控制器的停留接入，以及虚拟时钟下的停留
+"""
+
+import threading
+import time
+
+from adaptive_dwell import DwellMonitor
+from mission_clock import VirtualClock
+from mission_controller import MissionController
+
+
+def _feed(interval, steps, action):
+    """后台按间隔模拟检测流水线的回调"""
+    def run():
+        for i in range(steps):
+            time.sleep(interval)
+            action(i)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_goals_end_dwell_early():
+    """QR码读到、跟踪连续K次不变、候选帧足够后立即结束停留"""
+    monitor = DwellMonitor(stable_updates=3, frame_candidates=2, min_dwell=0.1)
+    monitor.begin(4, plants=['7'])
+
+    def detect(i):
+        monitor.on_qr(7)
+        monitor.on_strawberries([1, 2] if i else [1])
+        monitor.on_frame_candidate(7)
+    _feed(0.03, 10, detect).join()
+
+    result = monitor.wait(3.0)
+    assert result.reason == 'goals' and result.elapsed < 0.5
+    assert result.goals == {'qr': True, 'tracks': True, 'best_frame': True}
+
+    # 计划中的另一株植株没有出现，检测也不再变化：到上限即结束
+    monitor.changing_window = 0.1
+    monitor.begin(5, plants=['8', '9'])
+    monitor.on_qr('8')
+    result = monitor.wait(0.3)
+    assert result.reason == 'timeout' and 0.3 <= result.elapsed < 0.5 and not result.goals['qr']
+
+
+def test_extends_while_detections_change():
+    """到达上限时检测仍在变化则延长，变化停止后结束；持续变化时封顶"""
+    monitor = DwellMonitor(stable_updates=50, changing_window=0.2, require_best_frame=False)
+    monitor.begin(1)
+    monitor.on_qr('3')
+    _feed(0.05, 12, lambda i: monitor.on_strawberries(range(i + 1)))  # 0.6秒内不断出现新的跟踪
+    result = monitor.wait(0.3, cap=2.0)
+    assert result.reason == 'extended' and 0.7 <= result.elapsed < 1.1
+
+    monitor.begin(2)
+    _feed(0.05, 60, lambda i: monitor.on_strawberries(range(i + 1)))
+    result = monitor.wait(0.3, cap=0.8)
+    assert result.reason == 'extended' and 0.8 <= result.elapsed < 1.0
+
+    stats = monitor.get_stats()
+    assert stats['dwells'] == 2 and stats['extended'] == 2 and stats['saved'] < 0
+
+
+def test_controller_dwell():
+    """任务控制器使用停留监视器；未设置时保持固定停留"""
+    class Drone:
+        is_connected = True
+
+    controller = MissionController(Drone())
+    controller.stay_duration = 0.3
+    start = time.monotonic()
+    assert controller.dwell(1) == 0.3 and time.monotonic() - start >= 0.3
+
+    monitor = DwellMonitor(require_tracks=False, require_best_frame=False, min_dwell=0.0)
+    controller.set_dwell_monitor(monitor)
+    controller.stay_duration = 5.0
+    _feed(0.05, 1, lambda i: monitor.on_qr('1'))
+    assert controller.dwell(1, ['1']) < 0.5
+
+    controller.stop_mission = True
+    assert controller.dwell(2, ['2']) < 0.2
+
+
+def test_virtual_clock_dwell():
+    """接入使用虚拟时钟的任务控制器后，停留按虚拟时间计时与等待，不占用真实时间"""
+    class Drone:
+        is_connected = True
+
+    clock = VirtualClock(start=1000.0)
+    controller = MissionController(Drone(), clock=clock)
+    monitor = DwellMonitor(stable_updates=3, require_best_frame=False, changing_window=1.0)
+    controller.set_dwell_monitor(monitor)
+    assert monitor.clock is clock
+    controller.stay_duration = 8.0
+
+    # 模拟检测：第2秒读到QR码，之后每0.5秒一次草莓检测，跟踪在第3秒后不再变化
+    clock.call_later(2.0, lambda: monitor.on_qr('5'))
+    for i in range(12):
+        clock.call_later(2.0 + 0.5 * i, lambda i=i: monitor.on_strawberries(range(min(i, 2) + 1)))
+
+    started = time.perf_counter()
+    elapsed = controller.dwell(3, ['5'])
+    assert 3.5 <= elapsed < 4.5 and abs(clock.time() - 1000.0 - elapsed) < 1e-6
+
+    # 没有检测：停留到上限（虚拟的8秒）
+    elapsed = controller.dwell(4, ['6'])
+    assert 8.0 <= elapsed < 8.2
+    assert time.perf_counter() - started < 1.0
+    assert monitor.get_stats()['goals_met'] == 1 and monitor.get_stats()['timeouts'] == 1
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始检测驱动停留测试")
+    test_goals_end_dwell_early()
+    test_extends_while_detections_change()
+    test_controller_dwell()
+    test_virtual_clock_dwell()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
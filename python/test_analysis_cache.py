@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+AI分析结果缓存测试
+验证近似画面命中与不同画面未命中（汉明距离阈值）、TTL过期、LRU容量淘汰顺序、
+按植株ID区分缓存，以及命中/未命中/节省调用统计
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from analysis_cache import AnalysisResultCache, compute_dhash, hamming_distance
+
+
+def _scene(seed, size=(240, 320)):
+    """由随机色块组成的测试画面"""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 255, size=(6, 8, 3), dtype=np.uint8)
+    return cv2.resize(blocks, (size[1], size[0]), interpolation=cv2.INTER_NEAREST)
+
+
+def _near_duplicate(image, seed=99):
+    """轻微噪声与亮度变化（悬停时相邻帧的差异）"""
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(-4, 5, size=image.shape)
+    return np.clip(image.astype(np.int16) + noise + 3, 0, 255).astype(np.uint8)
+
+
+def test_hash_distance():
+    """近似画面的哈希距离很小，不同画面的哈希距离远超阈值"""
+    scene = _scene(1)
+    near = compute_dhash(_near_duplicate(scene))
+    assert compute_dhash(scene) == compute_dhash(scene.copy())
+    assert hamming_distance(compute_dhash(scene), near) <= 6
+    assert hamming_distance(compute_dhash(scene), compute_dhash(_scene(2))) > 6
+    assert compute_dhash(scene, hash_size=16) < 2 ** 256
+    try:
+        compute_dhash(np.zeros((0, 0, 3), dtype=np.uint8))
+        assert False
+    except ValueError:
+        pass
+
+
+def test_near_duplicate_hit_and_different_miss():
+    """近似画面命中并返回带距离的结果副本；不同画面未命中；阈值为0时只有完全相同才命中"""
+    cache = AnalysisResultCache(max_distance=6)
+    scene = _scene(1)
+    cache.store(cache.compute_hash(scene), {'status': 'ok', 'health_score': 80}, call_latency=2.0)
+
+    hit = cache.lookup(cache.compute_hash(_near_duplicate(scene)))
+    assert hit['health_score'] == 80 and hit['cache_hit']
+    assert 0 <= hit['cache_distance'] <= 6 and hit['cache_age_seconds'] >= 0
+    hit['health_score'] = 0
+    assert cache.lookup(cache.compute_hash(scene))['health_score'] == 80
+
+    assert cache.lookup(cache.compute_hash(_scene(2))) is None
+
+    strict = AnalysisResultCache(max_distance=0)
+    image_hash = strict.compute_hash(scene)
+    strict.store(image_hash, {'status': 'ok'})
+    assert strict.lookup(image_hash)['cache_distance'] == 0
+    assert strict.lookup(image_hash ^ 1) is None
+
+
+def test_ttl_expiry():
+    """超过有效期的条目在查找时被移除"""
+    cache = AnalysisResultCache(ttl_seconds=0.05)
+    image_hash = cache.compute_hash(_scene(1))
+    cache.store(image_hash, {'status': 'ok'})
+    assert cache.lookup(image_hash) is not None
+    time.sleep(0.1)
+    assert cache.lookup(image_hash) is None
+    stats = cache.get_stats()
+    assert stats['expirations'] == 1 and stats['entries'] == 0
+
+    forever = AnalysisResultCache(ttl_seconds=0)
+    forever.store(image_hash, {'status': 'ok'})
+    time.sleep(0.01)
+    assert forever.lookup(image_hash) is not None
+
+
+def test_lru_eviction_order():
+    """超出容量时淘汰最久未使用的条目，命中会刷新使用顺序"""
+    cache = AnalysisResultCache(max_entries=2, max_distance=0)
+    hashes = [cache.compute_hash(_scene(seed)) for seed in range(3)]
+    assert len(set(hashes)) == 3
+
+    cache.store(hashes[0], {'id': 0})
+    cache.store(hashes[1], {'id': 1})
+    assert cache.lookup(hashes[0])['id'] == 0     # 0 成为最近使用
+    cache.store(hashes[2], {'id': 2})             # 淘汰 1
+
+    assert cache.lookup(hashes[1]) is None
+    assert cache.lookup(hashes[0])['id'] == 0 and cache.lookup(hashes[2])['id'] == 2
+    stats = cache.get_stats()
+    assert stats['evictions'] == 1 and stats['entries'] == 2 and stats['max_entries'] == 2
+
+
+def test_plant_id_keying():
+    """同一画面按植株ID分别缓存，只在同一植株内复用；可按植株清除"""
+    cache = AnalysisResultCache()
+    image_hash = cache.compute_hash(_scene(1))
+    cache.store(image_hash, {'plant': 'A'}, plant_id='A')
+
+    assert cache.lookup(image_hash, plant_id='A')['plant'] == 'A'
+    assert cache.lookup(image_hash, plant_id='B') is None
+    assert cache.lookup(image_hash) is None
+
+    cache.store(image_hash, {'plant': 'B'}, plant_id='B')
+    assert cache.lookup(image_hash, plant_id='B')['plant'] == 'B'
+    cache.invalidate_plant('A')
+    assert cache.lookup(image_hash, plant_id='A') is None
+    assert cache.lookup(image_hash, plant_id='B') is not None
+
+
+def test_stats():
+    """统计命中、未命中、估算节省的调用次数与时间，以及命中距离分布；clear 保留统计"""
+    cache = AnalysisResultCache()
+    scene = _scene(1)
+    image_hash = cache.compute_hash(scene)
+    assert cache.lookup(image_hash) is None
+    cache.store(image_hash, {'status': 'ok'}, call_latency=1.5)
+    cache.lookup(image_hash)
+    cache.lookup(image_hash)
+    near = cache.lookup(cache.compute_hash(_near_duplicate(scene)))
+    cache.lookup(cache.compute_hash(_scene(2)))
+
+    stats = cache.get_stats()
+    assert stats['hits'] == 3 and stats['misses'] == 2 and stats['stores'] == 1
+    assert stats['hit_rate'] == 0.6
+    assert stats['estimated_saved_calls'] == 3 and stats['estimated_saved_seconds'] == 4.5
+    assert stats['hit_distances'][0] >= 2 and sum(stats['hit_distances'].values()) == 3
+    assert near['cache_distance'] in stats['hit_distances']
+
+    cache.clear()
+    assert cache.get_stats()['entries'] == 0 and cache.get_stats()['hits'] == 3
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始AI分析结果缓存测试")
+    test_hash_distance()
+    test_near_duplicate_hit_and_different_miss()
+    test_ttl_expiry()
+    test_lru_eviction_order()
+    test_plant_id_keying()
+    test_stats()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+植株AI分析协调器测试
+验证同一植株的并发请求共享一次分析、新鲜度窗口内复用结果、force 跳过复用、
+失败与模拟结果不复用，以及分析异常传递给所有等待者
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis_coordinator import PlantAnalysisCoordinator
+
+
+class SlowAnalysis:
+    """可控的分析函数：记录调用次数，等待 release 后返回结果"""
+
+    def __init__(self, result=None, error=None):
+        self.result = result if result is not None else {'status': 'ok', 'health_score': 80}
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(timeout=5)
+        if self.error is not None:
+            raise self.error
+        return dict(self.result)
+
+
+def _run_concurrently(coordinator, plant_id, analysis, callers=4):
+    """第一个调用者开始分析后再提交其余调用者，返回全部结果（或异常）"""
+    def call():
+        try:
+            return coordinator.run(plant_id, analysis)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        futures = [pool.submit(call)]
+        assert analysis.started.wait(timeout=5)
+        futures += [pool.submit(call) for _ in range(callers - 1)]
+        while coordinator.get_stats()['coalesced'] < callers - 1:
+            time.sleep(0.01)
+        analysis.release.set()
+        return [future.result(timeout=5) for future in futures]
+
+
+def test_concurrent_callers_share_result():
+    """同一植株的并发请求只执行一次分析，其余调用者共享结果"""
+    coordinator = PlantAnalysisCoordinator(freshness_seconds=600)
+    analysis = SlowAnalysis()
+    results = _run_concurrently(coordinator, 'P1', analysis)
+
+    assert analysis.calls == 1
+    assert all(r['health_score'] == 80 for r in results)
+    assert not results[0].get('analysis_shared')
+    assert all(r['analysis_shared'] for r in results[1:])
+    stats = coordinator.get_stats()
+    assert stats['requests'] == 4 and stats['executed'] == 1 and stats['coalesced'] == 3
+    assert stats['in_flight'] == 0
+
+
+def test_fresh_result_reused_and_force_bypass():
+    """新鲜度窗口内直接复用最近结果；force 重新分析并更新最近结果；窗口过期后重新分析"""
+    coordinator = PlantAnalysisCoordinator(freshness_seconds=600)
+    calls = []
+
+    def analyze():
+        calls.append(time.time())
+        return {'status': 'ok', 'health_score': 70 + len(calls)}
+
+    assert coordinator.run(7, analyze)['health_score'] == 71
+    reused = coordinator.run(7, analyze)
+    assert len(calls) == 1 and reused['analysis_reused'] and reused['health_score'] == 71
+    assert coordinator.is_fresh(7) and not coordinator.is_fresh(8)
+
+    forced = coordinator.run(7, analyze, force=True)
+    assert len(calls) == 2 and forced['health_score'] == 72 and 'analysis_reused' not in forced
+    assert coordinator.get_fresh_result(7)['health_score'] == 72
+
+    coordinator._latest_time[7] -= 601
+    assert coordinator.get_fresh_result(7) is None
+    assert coordinator.run(7, analyze)['health_score'] == 73
+
+    coordinator.invalidate(7)
+    assert not coordinator.is_fresh(7)
+    coordinator.set_freshness(0)
+    coordinator.run(7, analyze)
+    coordinator.run(7, analyze)
+    assert len(calls) == 5 and coordinator.get_stats()['fresh_reused'] == 1
+
+
+def test_failed_and_simulated_results_not_cached():
+    """失败结果与模拟结果不作为最近结果，下次请求重新分析"""
+    coordinator = PlantAnalysisCoordinator(freshness_seconds=600)
+    results = iter([
+        {'status': 'error', 'message': '超时'},
+        {'status': 'ok', 'health_score': 60, 'simulated': True},
+        {'status': 'ok', 'health_score': 90},
+    ])
+
+    assert coordinator.run('P2', lambda: next(results))['status'] == 'error'
+    assert not coordinator.is_fresh('P2')
+    assert coordinator.run('P2', lambda: next(results))['simulated']
+    assert not coordinator.is_fresh('P2')
+    assert coordinator.run('P2', lambda: next(results))['health_score'] == 90
+    assert coordinator.get_fresh_result('P2')['health_score'] == 90
+    assert coordinator.get_stats()['executed'] == 3
+
+
+def test_exception_propagates_to_all_waiters():
+    """分析异常传递给发起者与所有等待者，之后的请求可重新分析"""
+    coordinator = PlantAnalysisCoordinator(freshness_seconds=600)
+    analysis = SlowAnalysis(error=RuntimeError('云端不可用'))
+    results = _run_concurrently(coordinator, 'P3', analysis, callers=3)
+
+    assert analysis.calls == 1
+    assert all(isinstance(r, RuntimeError) and '云端不可用' in str(r) for r in results)
+    assert coordinator.get_stats()['in_flight'] == 0
+    assert coordinator.run('P3', lambda: {'status': 'ok'})['status'] == 'ok'
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始植株AI分析协调器测试")
+    test_concurrent_callers_share_result()
+    test_fresh_result_reused_and_force_bypass()
+    test_failed_and_simulated_results_not_cached()
+    test_exception_propagates_to_all_waiters()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+持久化分析任务队列测试
+验证任务落盘、中断后恢复、失败重试、仅采集模式下暂停后再消化队列，
+以及预算不足得到模拟结果时任务保留在队列中延后重试
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+
+import numpy as np
+
+from analysis_job_queue import AnalysisJobExecutor, AnalysisJobQueue, JobDeferred, check_analysis_result
+from cloud_budget import CloudBudgetManager, ProviderPolicy
+from crop_analyzer_dashscope import CropAnalyzer
+
+
+def _frame(value):
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    frame[:] = (0, value, 0)
+    return frame
+
+
+def test_jobs_survive_restart():
+    """执行中断的任务在重新打开队列后恢复为待执行，帧仍可读取"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'jobs.db')
+        queue = AnalysisJobQueue(db_path)
+        first = queue.enqueue('plant_ai', 7, _frame(120), {'qr_info': {'id': 7, 'rect': [1, 2, 3, 4]}})
+        queue.enqueue('comprehensive', 'A-1', _frame(200), priority=1)
+
+        claimed = queue.claim()
+        assert claimed.kind == 'comprehensive' and claimed.plant_id == 'A-1'
+        queue.close()  # 模拟后端崩溃：任务停留在执行中
+
+        reopened = AnalysisJobQueue(db_path)
+        assert reopened.recovered == 1
+        assert reopened.counts()['pending'] == 2
+
+        job = reopened.claim()
+        assert job.kind == 'comprehensive' and job.attempts == 2
+        frame = reopened.load_frame(job)
+        assert frame is not None and frame.shape == (48, 64, 3)
+
+        reopened.complete(job.job_id, {'status': 'ok'})
+        assert not os.path.exists(job.frame_path)
+
+        job = reopened.claim()
+        assert job.job_id == first and job.payload['qr_info']['rect'] == [1, 2, 3, 4]
+        assert reopened.fail(job.job_id, 'boom') == 'pending'
+        assert reopened.fail(job.job_id, 'boom', retry=False) == 'failed'
+        assert reopened.counts() == {'pending': 0, 'running': 0, 'done': 1, 'failed': 1}
+        reopened.close()
+
+
+def test_capture_only_then_drain():
+    """暂停时只入队不执行，恢复后按并发上限消化全部任务，失败任务按次数重试"""
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = AnalysisJobQueue(os.path.join(tmp, 'jobs.db'), max_attempts=2)
+        lock = threading.Lock()
+        active = {'now': 0, 'max': 0}
+        handled = []
+
+        def handler(job, frame):
+            with lock:
+                active['now'] += 1
+                active['max'] = max(active['max'], active['now'])
+            try:
+                if job.plant_id == 'bad':
+                    raise RuntimeError('AI分析失败')
+                threading.Event().wait(0.02)
+                handled.append(job.plant_id)
+                return {'status': 'ok'}
+            finally:
+                with lock:
+                    active['now'] -= 1
+
+        executor = AnalysisJobExecutor(queue, handler, concurrency=3, poll_interval=0.05)
+        executor.pause()
+        executor.start()
+        for plant_id in range(10):
+            queue.enqueue('plant_ai', plant_id, _frame(plant_id))
+        queue.enqueue('plant_ai', 'bad', _frame(1))
+
+        assert not executor.wait_idle(timeout=0.2)
+        assert handled == []
+
+        executor.resume()
+        assert executor.wait_idle(timeout=5.0)
+        executor.stop()
+
+        stats = executor.get_stats()
+        assert sorted(handled) == list(range(10))
+        assert active['max'] <= 3
+        assert stats['completed'] == 10 and stats['failed'] == 1 and stats['retried'] == 1
+        assert stats['queue']['failed'] == 1
+        queue.close()
+
+
+def test_budget_denied_job_stays_pending():
+    """预算不足时分析器返回模拟结果：任务不记为完成，按预算的恢复时间延后，且不消耗重试次数"""
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = AnalysisJobQueue(os.path.join(tmp, 'jobs.db'), max_attempts=1)
+        budget = CloudBudgetManager(policies={'dashscope': ProviderPolicy(rate_per_minute=1, burst=1)})
+        assert budget.acquire('dashscope').allowed   # 用掉唯一的令牌
+        analyzer = CropAnalyzer(api_key="test-key", app_id="test-app", budget=budget)
+
+        def handler(job, frame):
+            return check_analysis_result(analyzer.analyze_crop_health(frame, use_cache=False))
+
+        executor = AnalysisJobExecutor(queue, handler, concurrency=1, poll_interval=0.05)
+        job_id = queue.enqueue('plant_ai', 3, _frame(150))
+        executor.start()
+        assert executor.wait_idle(timeout=5.0)
+        executor.stop()
+
+        job = queue.list_jobs()[0]
+        assert job.job_id == job_id and job.status == 'pending' and job.attempts == 0
+        assert '云端预算不足' in job.last_error
+        assert os.path.exists(job.frame_path)
+        assert queue.claim() is None and queue.ready_count() == 0   # 恢复时间之前不会被取出
+        stats = executor.get_stats()
+        assert stats['deferred'] == 1 and stats['completed'] == 0 and stats['failed'] == 0
+
+        # 模拟结果（云端不可用）计入次数，超过重试次数后失败
+        queue._conn.execute('UPDATE jobs SET not_before = 0')
+        claimed = queue.claim()
+        try:
+            check_analysis_result({'status': 'ok', 'simulated': True})
+            assert False
+        except JobDeferred as e:
+            assert queue.defer(claimed.job_id, str(e), 0.0, e.count_attempt) == 'failed'
+        assert check_analysis_result({'status': 'ok', 'health_score': 80})['health_score'] == 80
+        queue.close()
+
+
+def test_worker_survives_claim_errors():
+    """取任务时数据库报错不会结束工作线程，退避后继续执行"""
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = AnalysisJobQueue(os.path.join(tmp, 'jobs.db'))
+        claim = queue.claim
+        failures = [3]
+
+        def flaky_claim():
+            if failures[0] > 0:
+                failures[0] -= 1
+                raise sqlite3.OperationalError('database is locked')
+            return claim()
+
+        queue.claim = flaky_claim
+        queue.enqueue('plant_ai', 1, _frame(10))
+        executor = AnalysisJobExecutor(queue, lambda job, frame: {'status': 'ok'}, concurrency=1,
+                                       poll_interval=0.02)
+        executor.start()
+        assert executor.wait_idle(timeout=5.0)
+        executor.stop()
+        stats = executor.get_stats()
+        assert stats['claim_errors'] == 3 and stats['completed'] == 1
+        queue.close()
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始分析任务队列测试")
+    test_jobs_survive_restart()
+    test_capture_only_then_drain()
+    test_budget_denied_job_stays_pending()
+    test_worker_survives_claim_errors()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
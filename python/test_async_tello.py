@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+异步Tello驱动测试
+在本机UDP上模拟Tello：验证动作命令执行期间事件循环不被阻塞、命令串行发送、超时重发、
+迟到应答的丢弃、状态包解析，以及后台线程通过同步外观调用
+"""
+
+import asyncio
+import time
+
+from async_tello import AsyncTello, TelloError, TelloTimeout, parse_state
+
+
+class FakeTello(asyncio.DatagramProtocol):
+    """模拟Tello命令端口：按脚本延迟应答、丢弃若干次命令，并向驱动的状态端口发送状态包"""
+
+    def __init__(self, delays=None, drops=None, replies=None):
+        self.delays = dict(delays or {})      # 命令名 -> 应答延迟（秒）
+        self.drops = dict(drops or {})        # 命令名 -> 前N次不应答
+        self.replies = dict(replies or {})    # 完整命令 -> 应答文本
+        self.received = []
+        self.transport = None
+        self.state_target = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        command = data.decode()
+        name = command.split()[0]
+        self.received.append((time.monotonic(), command))
+        if name == 'rc':
+            return
+        if self.drops.get(name, 0) > 0:
+            self.drops[name] -= 1
+            return
+        reply = self.replies.get(command) or ('87' if command == 'battery?' else 'ok')
+        loop = asyncio.get_running_loop()
+        loop.call_later(self.delays.get(name, 0.0), self.transport.sendto, reply.encode(), addr)
+        if name == 'command' and self.state_target:
+            loop.call_later(0.05, self.transport.sendto,
+                            b'mid:3;x:12;y:-4;z:100;pitch:0;roll:1;yaw:90;vgx:0;vgy:0;vgz:0;'
+                            b'templ:60;temph:62;tof:100;h:90;bat:76;baro:12.34;time:5;\r\n', self.state_target)
+
+    @property
+    def port(self):
+        return self.transport.get_extra_info('sockname')[1]
+
+
+async def _start(fake, **kwargs):
+    loop = asyncio.get_running_loop()
+    await loop.create_datagram_endpoint(lambda: fake, local_addr=('127.0.0.1', 0))
+    kwargs.setdefault('state_port', None)
+    return AsyncTello(host='127.0.0.1', command_port=fake.port, **kwargs)
+
+
+def test_connect_and_state():
+    """连接后解析状态包，电量、高度、任务垫直接读取状态包"""
+    async def run():
+        fake = FakeTello()
+        tello = await _start(fake, state_port=0)
+        await tello.connect(wait_state=0)
+        fake.state_target = ('127.0.0.1', tello.state_address[1])
+        await tello.send_control_command('command')
+        assert await tello.wait_for_state(1.0)
+        assert tello.get_battery() == 76 and tello.get_height() == 90
+        assert tello.get_mission_pad_id() == 3 and tello.get_temperature() == 61
+        state = tello.get_current_state()
+        assert state['baro'] == 12.34 and tello.get_current_state() is state
+        assert await tello.read_battery() == 76
+        await tello.end()
+        assert not tello.is_open
+    asyncio.run(run())
+
+    assert parse_state('mid:-1;x:0;mpry:0,0,0;agx:-1.00;\r\n') == {'mid': -1, 'x': 0, 'mpry': '0,0,0', 'agx': -1.0}
+
+
+def test_loop_stays_responsive():
+    """动作命令飞行期间事件循环照常运行；并发的命令排队，前一条应答后才发送"""
+    async def run():
+        fake = FakeTello(delays={'forward': 0.5})
+        tello = await _start(fake)
+        await tello.connect()
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.02)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        move = asyncio.create_task(tello.move_forward(100))
+        await asyncio.sleep(0.05)
+        battery = await tello.send_read_command('battery?')
+        assert move.done() and battery == '87'
+        task.cancel()
+        assert ticks >= 15
+
+        sent = {command: t for t, command in fake.received}
+        assert sent['battery?'] - sent['forward 100'] >= 0.45
+        assert tello.command_timeout('forward 300') == tello.timeout + 10
+        await tello.end()
+    asyncio.run(run())
+
+
+def test_timeouts_retries_and_late_replies():
+    """可安全重发的命令超时后重发；动作命令不重发；超时命令的迟到应答不会串到下一条命令"""
+    async def run():
+        fake = FakeTello(drops={'streamon': 1, 'forward': 1}, delays={'battery?': 0.3, 'takeoff': 0.5},
+                         replies={'flip x': 'error Not joystick'})
+        tello = await _start(fake, timeout=0.15, stale_grace=0.0)
+        await tello.connect()
+
+        assert await tello.streamon() and tello.stream_on
+        assert tello.stats['retries'] == 1
+
+        try:
+            await tello.send_command('forward 50', timeout=0.1)
+            assert False
+        except TelloTimeout:
+            pass
+        assert [c for _, c in fake.received].count('forward 50') == 1
+
+        # battery? 的应答在0.3秒后才到，此时 takeoff 正在等待：数值应答被丢弃，takeoff 收到自己的 ok
+        try:
+            await tello.send_command('battery?', timeout=0.1, retries=0)
+            assert False
+        except TelloTimeout:
+            pass
+        assert await tello.send_control_command('takeoff', timeout=1.0)
+        assert tello.stats['discarded'] >= 1
+
+        try:
+            await tello.flip('x')
+            assert False
+        except TelloError as e:
+            assert 'Not joystick' in str(e)
+
+        stats = tello.get_stats()
+        assert stats['timeouts'] == 3 and stats['errors'] == 1
+        await tello.end()
+    asyncio.run(run())
+
+
+def test_emergency_bypasses_inflight_command():
+    """动作命令等待应答期间，紧急停止立即发送而不排在其后"""
+    async def run():
+        fake = FakeTello(delays={'forward': 1.0})
+        tello = await _start(fake, stale_grace=0.0)
+        await tello.connect()
+
+        move = asyncio.create_task(tello.move_forward(500))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        assert await tello.emergency()
+        assert time.monotonic() - started < 0.2
+        await asyncio.sleep(0.05)
+        # forward 的应答要1秒后才到，emergency 在此之前已经发出
+        assert [c for _, c in fake.received][-2:] == ['forward 500', 'emergency']
+        sent = {command: t for t, command in fake.received}
+        assert sent['emergency'] - sent['forward 500'] < 0.5
+        # emergency 的 ok 结束了 forward 的等待，其迟到应答被丢弃
+        assert await asyncio.wait_for(move, 0.5)
+        await tello.end()
+    asyncio.run(run())
+
+
+def test_blocking_facade_from_thread():
+    """后台线程通过同步外观执行命令，rc 控制不等待应答；事件循环线程中禁止同步调用"""
+    async def run():
+        fake = FakeTello(delays={'up': 0.2})
+        tello = await _start(fake)
+        await tello.connect()
+        blocking = tello.blocking()
+        loop = asyncio.get_running_loop()
+
+        assert await loop.run_in_executor(None, blocking.move_up, 30)
+        await loop.run_in_executor(None, blocking.send_rc_control, 10, -200, 0, 5)
+        await asyncio.sleep(0.05)
+        assert fake.received[-1][1] == 'rc 10 -100 0 5'
+        assert blocking.get_battery() == -1
+
+        try:
+            blocking.takeoff()
+            assert False
+        except RuntimeError:
+            pass
+        await tello.end()
+    asyncio.run(run())
+
+
+def test_blocking_call_times_out():
+    """同步调用默认按命令超时加余量等待；超时后取消在途命令并抛出 TelloError，后续命令照常执行"""
+    async def run():
+        fake = FakeTello(drops={'forward': 1})
+        tello = await _start(fake, stale_grace=0.0)
+        await tello.connect()
+        loop = asyncio.get_running_loop()
+
+        assert tello.sync_timeout('battery?') == 3 * tello.timeout + 5.0
+        assert tello.sync_timeout() > tello.sync_timeout('forward 500') > tello.sync_timeout('forward 20')
+
+        started = time.monotonic()
+        try:
+            await loop.run_in_executor(None, tello.run_sync, tello.move_forward(50), 0.2)
+            assert False
+        except TelloError as e:
+            assert isinstance(e, TelloTimeout) and '0.2' in str(e)
+        assert time.monotonic() - started < 1.0
+        await asyncio.sleep(0.05)
+        assert tello._pending is None and tello._stale == 1
+        assert await loop.run_in_executor(None, tello.blocking().send_read_command, 'battery?') == '87'
+        await tello.end()
+    asyncio.run(run())
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始异步Tello驱动测试")
+    test_connect_and_state()
+    test_loop_stays_responsive()
+    test_timeouts_retries_and_late_replies()
+    test_emergency_bypasses_inflight_command()
+    test_blocking_facade_from_thread()
+    test_blocking_call_times_out()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
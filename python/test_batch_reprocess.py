@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+离线批量重处理测试
+用合成的录制飞行（带植株QR码的视频 + 遥测JSONL）验证帧读取、遥测对齐、进程池处理与植株观测写入
+"""
+
+import json
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from batch_reprocess import reprocess_recording
+from frame_source import FlightRecording, TelemetryTrack
+from plant_store import PlantStore, parse_plant_id
+
+
+FPS = 10.0
+
+
+def _write_recording(directory, plants=(3, 7), frames_per_plant=12, gap_frames=30):
+    """合成录制：每株植株前悬停若干帧，植株之间是没有QR码的空白飞行段"""
+    encoder = cv2.QRCodeEncoder_create()
+    writer = cv2.VideoWriter(os.path.join(directory, 'video.avi'), cv2.VideoWriter_fourcc(*'MJPG'), FPS, (640, 480))
+    telemetry = []
+    index = 0
+    for plant in plants:
+        qr = cv2.resize(encoder.encode(f"plant_{plant}"), (200, 200), interpolation=cv2.INTER_NEAREST)
+        for _ in range(frames_per_plant):
+            frame = np.full((480, 640, 3), 255, dtype=np.uint8)
+            frame[140:340, 220:420] = cv2.cvtColor(qr, cv2.COLOR_GRAY2BGR)
+            writer.write(frame)
+            telemetry.append({'t': index / FPS, 'state': {'h': 100, 'plant_hint': plant}})
+            index += 1
+        for _ in range(gap_frames):
+            writer.write(np.full((480, 640, 3), 90, dtype=np.uint8))
+            telemetry.append({'t': index / FPS, 'state': {'h': 100}})
+            index += 1
+    writer.release()
+    with open(os.path.join(directory, 'telemetry.jsonl'), 'w', encoding='utf-8') as f:
+        for record in telemetry:
+            f.write(json.dumps(record) + '\n')
+        f.write('损坏的行\n')
+    return index
+
+
+def test_telemetry_alignment():
+    """遥测按最近时间对齐，超出允许间隔时不附加"""
+    track = TelemetryTrack([{'t': 0.0, 'state': {'h': 0}}, {'t': 1.0, 'state': {'h': 50}}])
+    assert track.nearest(0.4) == {'h': 0}
+    assert track.nearest(0.6) == {'h': 50}
+    assert track.nearest(3.0) is None
+    assert parse_plant_id('plant_12') == 12 and parse_plant_id('{"id": "A-1"}') == 'A-1'
+
+
+def test_reprocess_synthetic_flight():
+    """进程池处理合成录制，植株观测写入存储；重跑时替换旧结果"""
+    with tempfile.TemporaryDirectory() as tmp:
+        flight_dir = os.path.join(tmp, 'flight_0601')
+        os.makedirs(flight_dir)
+        total = _write_recording(flight_dir)
+
+        recording = FlightRecording.open(flight_dir)
+        assert recording.flight_id == 'flight_0601' and len(recording.telemetry) == total
+
+        store = PlantStore(os.path.join(tmp, 'plants.db'))
+        report = reprocess_recording(recording, store, model_path=None, workers=2, stride=2)
+        print(report.format())
+
+        assert report.frames == (total + 1) // 2
+        assert report.plants == [3, 7]
+        summary = store.plant_summary('flight_0601')
+        assert set(summary) == {3, 7}
+        # 悬停帧 + QR码消失后 attach_seconds 内的帧
+        assert 6 <= summary[3]['frames'] <= 6 + int(2.0 * FPS / 2) + 1
+
+        first_count = store.count('flight_0601')
+        again = reprocess_recording(recording, store, model_path=None, workers=2, stride=2)
+        assert store.count('flight_0601') == first_count == again.observations
+        store.close()
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始离线批量重处理测试")
+    test_telemetry_alignment()
+    test_reprocess_synthetic_flight()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+云端调用预算测试
+验证令牌桶限速、任务限额、操作员优先通道，以及预算耗尽时CropAnalyzer回退到专业模拟
+"""
+
+import asyncio
+
+import numpy as np
+
+from cloud_budget import PRIORITY_AUTO, PRIORITY_OPERATOR, CloudBudgetManager, ProviderPolicy, TokenBucket
+from crop_analyzer_dashscope import CropAnalyzer
+from dashscope_client import AsyncDashScopeClient, DashScopeStubServer
+
+
+def test_token_bucket_and_quotas():
+    """自动请求受限速与任务限额约束，操作员请求可使用优先通道"""
+    bucket = TokenBucket(rate_per_minute=60, burst=2)
+    assert bucket.try_acquire(now=bucket.updated_at)
+    assert bucket.try_acquire(now=bucket.updated_at)
+    assert not bucket.try_acquire(now=bucket.updated_at)
+    assert bucket.try_acquire(now=bucket.updated_at + 1.0)
+
+    budget = CloudBudgetManager(policies={'dashscope': ProviderPolicy(rate_per_minute=0, burst=3, operator_burst=1)},
+                                mission_quota=2, daily_quota=0)
+    budget.start_mission('M1')
+    assert budget.acquire('dashscope', PRIORITY_AUTO).allowed
+    assert budget.acquire('dashscope', PRIORITY_AUTO).allowed
+    denied = budget.acquire('dashscope', PRIORITY_AUTO)
+    assert not denied.allowed and denied.reason == 'mission_quota'
+
+    # 任务限额耗尽后，操作员请求仍可通过优先通道（独立令牌桶）
+    operator = budget.acquire('dashscope', PRIORITY_OPERATOR)
+    assert operator.allowed and operator.reason == 'priority_lane:mission_quota'
+    assert not budget.acquire('dashscope', PRIORITY_OPERATOR).allowed
+
+    # 新任务重置任务计数，但令牌桶只剩一个令牌
+    budget.start_mission('M2')
+    assert budget.acquire('dashscope', PRIORITY_AUTO).allowed
+    limited = budget.acquire('dashscope', PRIORITY_AUTO)
+    assert not limited.allowed and limited.reason == 'rate_limit'
+
+    stats = budget.get_stats()['providers']['dashscope']
+    assert stats['granted'] == 4 and stats['operator_granted'] == 1
+    assert stats['denied'] == {'mission_quota': 2, 'rate_limit': 1}
+
+
+def test_analyzer_falls_back_when_budget_exhausted():
+    """预算耗尽时回退到专业模拟并标记；放行的调用按令牌用量计费"""
+    async def run():
+        server = await DashScopeStubServer().start()
+        budget = CloudBudgetManager(policies={'dashscope': ProviderPolicy(rate_per_minute=0, burst=1,
+                                                                          operator_burst=1)})
+        analyzer = CropAnalyzer(api_key="test-key", app_id="test-app", budget=budget)
+        analyzer.async_client = AsyncDashScopeClient("test-key", base_url=server.base_url)
+        try:
+            image = np.zeros((120, 160, 3), dtype=np.uint8)
+            first = await analyzer.analyze_crop_health_async(image, use_cache=False)
+            assert first['health_score'] == 82 and not first.get('budget_limited')
+
+            fallback = await analyzer.analyze_crop_health_async(image, use_cache=False)
+            assert fallback['status'] == 'ok'
+            assert fallback['budget_limited'] and fallback['budget_reason'] == 'rate_limit'
+
+            operator = await analyzer.analyze_crop_health_async(image, use_cache=False, priority=PRIORITY_OPERATOR)
+            assert operator['health_score'] == 82 and not operator.get('budget_limited')
+            assert server.request_count == 2
+        finally:
+            await analyzer.close()
+            await server.stop()
+
+        stats = analyzer.get_budget_stats()
+        provider = stats['providers']['dashscope']
+        print(f"📊 预算统计: {provider}")
+        assert provider['calls'] == 2
+        assert provider['input_tokens'] == 200 and provider['output_tokens'] == 100
+        assert abs(provider['estimated_cost'] - 2 * (0.1 * 0.003 + 0.05 * 0.009)) < 1e-4
+        assert stats['fallbacks'] == 1
+
+    asyncio.run(run())
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始云端调用预算测试")
+    test_token_bucket_and_quotas()
+    test_analyzer_falls_back_when_budget_exhausted()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+命令调度器测试
+在本机UDP模拟的Tello上验证优先级顺序、应答后立即发送下一条、降落抢占与取消排队动作、紧急停止不排队，
+以及任务线程通过优先级通道同步调用
+"""
+
+import asyncio
+
+from command_scheduler import (PRIORITY_AI, PRIORITY_LAND, PRIORITY_MISSION, PRIORITY_OPERATOR,
+                               CommandCancelled, CommandScheduler)
+from test_async_tello import FakeTello, _start
+
+
+async def _scheduler(fake, **kwargs):
+    tello = await _start(fake, **kwargs)
+    await tello.connect()
+    scheduler = CommandScheduler(tello)
+    scheduler.start()
+    return tello, scheduler
+
+
+def _sent(fake):
+    return [command for _, command in fake.received if command != 'command']
+
+
+def test_priority_order_and_pipelining():
+    """排队命令按 操作员 > 任务 > AI 执行，同级先进先出；上一条应答后立即发送下一条"""
+    async def run():
+        fake = FakeTello(delays={'forward': 0.2})
+        tello, scheduler = await _scheduler(fake)
+
+        first = scheduler.submit('forward 50', PRIORITY_MISSION)
+        await asyncio.sleep(0.02)
+        queued = [scheduler.submit('cw 90', PRIORITY_AI),
+                  scheduler.submit('up 20', PRIORITY_MISSION),
+                  scheduler.submit('down 20', PRIORITY_MISSION),
+                  scheduler.submit('back 20', PRIORITY_OPERATOR)]
+        assert scheduler.get_stats()['queued'] == 4
+        assert await first == 'ok'
+        assert await asyncio.gather(*queued) == ['ok'] * 4
+        assert _sent(fake) == ['forward 50', 'back 20', 'up 20', 'down 20', 'cw 90']
+
+        # back 20 等 forward 50 的应答（0.2秒）后才发送；其余命令收到上一条应答后紧接着发出（留出事件循环卡顿的余量）
+        sent = {command: t for t, command in fake.received}
+        assert 0.18 <= sent['back 20'] - sent['forward 50'] < 0.5
+        assert sent['cw 90'] - sent['back 20'] < 0.3
+
+        stats = scheduler.get_stats()['classes']
+        assert stats[PRIORITY_MISSION]['completed'] == 3 and stats[PRIORITY_AI]['completed'] == 1
+        assert stats[PRIORITY_AI]['average_wait'] >= 0.18
+        assert stats[PRIORITY_MISSION]['max_round_trip'] >= 0.18
+        await scheduler.stop()
+        await tello.end()
+    asyncio.run(run())
+
+
+def test_land_preempts_moves():
+    """降落插到队首，取消排队中的动作命令（非动作命令保留），并用 stop 打断正在执行的任务动作"""
+    async def run():
+        fake = FakeTello(delays={'forward': 1.0})
+        tello, scheduler = await _scheduler(fake, stale_grace=0.1)
+
+        move = scheduler.submit('forward 300', PRIORITY_MISSION)
+        await asyncio.sleep(0.05)
+        rotate = scheduler.submit('cw 90', PRIORITY_MISSION)
+        climb = scheduler.submit('up 30', PRIORITY_AI, source='agent')
+        speed = scheduler.submit('speed 50', PRIORITY_OPERATOR)
+        land = scheduler.submit('land', PRIORITY_LAND)
+
+        for future in (rotate, climb):
+            try:
+                await future
+                assert False
+            except CommandCancelled as e:
+                assert '降落优先' in str(e)
+        assert await land == 'ok' and await speed == 'ok'
+        assert move.done()
+        assert _sent(fake) == ['forward 300', 'stop', 'land', 'speed 50']
+
+        stats = scheduler.get_stats()
+        assert stats['preemptions'] == 1 and stats['queued'] == 0
+        assert stats['classes'][PRIORITY_MISSION]['cancelled'] == 1
+        assert stats['classes'][PRIORITY_AI]['cancelled'] == 1
+        assert scheduler.cancel_moves(source='agent') == 0
+        await scheduler.stop()
+        await tello.end()
+    asyncio.run(run())
+
+
+def test_emergency_bypasses_queue():
+    """紧急停止不等待在途命令，立即发送并清空队列"""
+    async def run():
+        fake = FakeTello(delays={'forward': 0.5})
+        tello, scheduler = await _scheduler(fake)
+
+        move = scheduler.submit('forward 100', PRIORITY_OPERATOR)
+        await asyncio.sleep(0.05)
+        queued = [scheduler.submit('land', PRIORITY_LAND), scheduler.submit('battery?', PRIORITY_AI)]
+        assert await scheduler.emergency()
+        await asyncio.sleep(0.05)
+        assert _sent(fake) == ['forward 100', 'emergency']
+        assert not scheduler.get_stats()['queued']
+        for future in queued:
+            assert isinstance(future.exception(), CommandCancelled)
+        await move
+        await scheduler.stop()
+        await tello.end()
+    asyncio.run(run())
+
+
+def test_lanes_from_mission_thread():
+    """任务线程经任务通道同步调用；通道上的降落总是以降落优先级提交，状态读取直接访问驱动"""
+    async def run():
+        fake = FakeTello(delays={'up': 0.1})
+        tello, scheduler = await _scheduler(fake)
+        mission = scheduler.lane(PRIORITY_MISSION, 'mission').blocking()
+        operator = scheduler.lane(PRIORITY_OPERATOR)
+        loop = asyncio.get_running_loop()
+
+        assert await loop.run_in_executor(None, mission.move_up, 30)
+        assert await loop.run_in_executor(None, mission.go_xyz_speed_mid, 0, 0, 80, 30, 2)
+        assert await operator.streamon() and tello.stream_on
+        assert await operator.land()
+        assert mission.get_battery() == -1
+
+        stats = scheduler.get_stats()['classes']
+        assert stats[PRIORITY_MISSION]['completed'] == 2
+        assert stats[PRIORITY_OPERATOR]['completed'] == 1 and stats[PRIORITY_LAND]['completed'] == 1
+        assert _sent(fake) == ['up 30', 'go 0 0 80 30 m2', 'streamon', 'land']
+
+        await scheduler.stop()
+        try:
+            await operator.move_forward(20)
+            assert False
+        except Exception as e:
+            assert '未启动' in str(e)
+        await tello.end()
+    asyncio.run(run())
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始命令调度器测试")
+    test_priority_order_and_pipelining()
+    test_land_preempts_moves()
+    test_emergency_bypasses_queue()
+    test_lanes_from_mission_thread()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+DashScope异步客户端测试
+使用本地桩服务器验证并发上限、重试、截止时间以及CropAnalyzer接入
+"""
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+import crop_analyzer_dashscope
+from dashscope_client import AsyncDashScopeClient, DashScopeAPIError, DashScopeStubServer
+from crop_analyzer_dashscope import CropAnalyzer
+
+
+MESSAGES = [{"role": "user", "content": [{"text": "ping"}]}]
+
+
+def test_concurrency_limit():
+    """并发请求数不超过客户端上限"""
+    async def run():
+        server = await DashScopeStubServer(delay=0.1).start()
+        client = AsyncDashScopeClient("test-key", base_url=server.base_url, max_concurrency=3)
+        try:
+            start = time.monotonic()
+            await asyncio.gather(*[client.call_multimodal("qwen-vl-max", MESSAGES) for _ in range(9)])
+            elapsed = time.monotonic() - start
+        finally:
+            await client.close()
+            await server.stop()
+
+        print(f"📊 9个请求耗时 {elapsed:.2f}s，服务端最大并发 {server.max_in_flight}")
+        assert server.max_in_flight <= 3
+        assert client.get_stats()['succeeded'] == 9
+        # 3路并发、每个请求0.1秒，至少需要三轮
+        assert elapsed >= 0.25
+
+    asyncio.run(run())
+
+
+def test_retry_on_server_error():
+    """503错误经抖动退避后重试成功，4xx错误不重试"""
+    async def run():
+        server = await DashScopeStubServer(fail_first=2, fail_status=503).start()
+        client = AsyncDashScopeClient("test-key", base_url=server.base_url,
+                                      max_retries=3, backoff_base=0.01)
+        try:
+            response = await client.call_multimodal("qwen-vl-max", MESSAGES)
+            assert response['output']['choices'][0]['message']['content']
+            assert server.request_count == 3
+            assert client.get_stats()['retries'] == 2
+
+            rejecting = await DashScopeStubServer(fail_first=10, fail_status=400).start()
+            strict = AsyncDashScopeClient("test-key", base_url=rejecting.base_url, backoff_base=0.01)
+            try:
+                await strict.call_multimodal("qwen-vl-max", MESSAGES)
+                raise AssertionError("400错误应直接抛出")
+            except DashScopeAPIError as e:
+                assert e.status == 400 and not e.retryable
+                assert rejecting.request_count == 1
+            finally:
+                await strict.close()
+                await rejecting.stop()
+        finally:
+            await client.close()
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_deadline():
+    """慢响应在截止时间内被取消"""
+    async def run():
+        server = await DashScopeStubServer(delay=2.0).start()
+        client = AsyncDashScopeClient("test-key", base_url=server.base_url, max_retries=0)
+        try:
+            start = time.monotonic()
+            try:
+                await client.call_multimodal("qwen-vl-max", MESSAGES, deadline=0.3)
+                raise AssertionError("应当超时")
+            except asyncio.TimeoutError:
+                pass
+            assert time.monotonic() - start < 1.0
+            assert client.get_stats()['timeouts'] == 1
+        finally:
+            await client.close()
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_stream_retries_request_timeout():
+    """流式请求的单次超时在截止时间内按退避重试，与非流式请求一致"""
+    async def run():
+        server = await DashScopeStubServer(delay=0.5).start()
+        client = AsyncDashScopeClient("test-key", base_url=server.base_url, request_timeout=0.2,
+                                      deadline=3.0, backoff_base=0.01)
+
+        async def recover():
+            while server.request_count < 1:
+                await asyncio.sleep(0.01)
+            server.delay = 0.0
+
+        watcher = asyncio.create_task(recover())
+        try:
+            text = ''.join([delta async for delta in client.stream_multimodal("qwen-vl-max", MESSAGES)])
+        finally:
+            watcher.cancel()
+            await client.close()
+            await server.stop()
+
+        assert '"health_score": 82' in text
+        assert server.request_count == 2
+        stats = client.get_stats()
+        assert stats['retries'] == 1 and stats['timeouts'] == 0 and stats['succeeded'] == 1
+
+    asyncio.run(run())
+
+
+def test_session_bound_to_other_loop():
+    """换到新的事件循环时，在原事件循环中关闭旧连接池；原事件循环已停止时拒绝改绑"""
+    async def serve():
+        return await DashScopeStubServer().start()
+
+    owner = asyncio.new_event_loop()
+    thread = threading.Thread(target=owner.run_forever, daemon=True)
+    thread.start()
+    server = asyncio.run_coroutine_threadsafe(serve(), owner).result(timeout=5)
+    client = AsyncDashScopeClient("test-key", base_url=server.base_url)
+    try:
+        asyncio.run_coroutine_threadsafe(
+            client.call_multimodal("qwen-vl-max", MESSAGES), owner).result(timeout=5)
+        old_session = client._session
+
+        async def call_from_new_loop():
+            await client.call_multimodal("qwen-vl-max", MESSAGES)
+            assert old_session.closed and client._session is not old_session
+            await client.close()
+
+        asyncio.run(call_from_new_loop())
+        assert client._session is None and server.request_count == 2
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), owner).result(timeout=5)
+        owner.call_soon_threadsafe(owner.stop)
+        thread.join(timeout=5)
+        owner.close()
+
+    async def open_session():
+        await client._ensure_session()
+
+    asyncio.run(open_session())
+    try:
+        asyncio.run(open_session())
+        raise AssertionError("原事件循环已停止时应拒绝改绑")
+    except RuntimeError as e:
+        assert 'close()' in str(e)
+
+
+def test_crop_analyzer_with_stub():
+    """CropAnalyzer通过异步客户端解析桩服务器的分析结果"""
+    async def run():
+        server = await DashScopeStubServer().start()
+        analyzer = CropAnalyzer(api_key="test-key", app_id="test-app")
+        analyzer.async_client = AsyncDashScopeClient("test-key", base_url=server.base_url)
+        try:
+            image = np.zeros((120, 160, 3), dtype=np.uint8)
+            image[:, :80] = (0, 160, 0)
+            result = await analyzer.analyze_crop_health_async(image, plant_id="P1")
+            assert result['status'] == 'ok'
+            assert result['health_score'] == 82
+
+            # 同步入口在工作线程中调用，经主事件循环转发
+            analyzer.attach_event_loop(asyncio.get_running_loop())
+            loop = asyncio.get_running_loop()
+            sync_result = await loop.run_in_executor(
+                None, lambda: analyzer.analyze_crop_health(image, plant_id="P2"))
+            assert sync_result['health_score'] == 82
+            assert server.request_count == 2
+        finally:
+            await analyzer.close()
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_blocked_client_loop_falls_back():
+    """客户端事件循环被阻塞时，同步入口等待超时后取消请求并改用模拟分析，不把超时异常抛给工作线程"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    loop.call_soon_threadsafe(time.sleep, 1.0)   # 模拟阻塞事件循环的回调
+
+    analyzer = CropAnalyzer(api_key="test-key", app_id="test-app")
+    analyzer.async_client = AsyncDashScopeClient("test-key", base_url="http://127.0.0.1:9", deadline=0.1)
+    analyzer.attach_event_loop(loop)
+    margin = crop_analyzer_dashscope.LOOP_WAIT_MARGIN
+    crop_analyzer_dashscope.LOOP_WAIT_MARGIN = 0.2
+    try:
+        image = np.zeros((120, 160, 3), dtype=np.uint8)
+        start = time.monotonic()
+        result = analyzer.analyze_crop_health(image, plant_id="P3", use_cache=False)
+        elapsed = time.monotonic() - start
+    finally:
+        crop_analyzer_dashscope.LOOP_WAIT_MARGIN = margin
+        asyncio.run_coroutine_threadsafe(analyzer.close(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+    assert elapsed < 0.9
+    assert result['status'] == 'ok' and result.get('simulated')
+
+
+def test_streaming_progress():
+    """流式分析在完整回复之前回调部分字段，最终结果与非流式一致"""
+    async def run():
+        server = await DashScopeStubServer(stream_chunk_size=8, stream_chunk_delay=0.02).start()
+        analyzer = CropAnalyzer(api_key="test-key", app_id="test-app")
+        analyzer.async_client = AsyncDashScopeClient("test-key", base_url=server.base_url)
+        progress = []
+        try:
+            image = np.zeros((120, 160, 3), dtype=np.uint8)
+            start = time.monotonic()
+            result = await analyzer.analyze_crop_health_async(
+                image, use_cache=False,
+                progress_callback=lambda fields, elapsed: progress.append((dict(fields), elapsed)))
+            total = time.monotonic() - start
+        finally:
+            await analyzer.close()
+            await server.stop()
+
+        assert result['status'] == 'ok' and result['health_score'] == 82
+        assert progress[0][0] == {'health_score': 82}
+        assert progress[-1][0]['urgency'] == 'low'
+        assert progress[-1][0]['crop_type']['name'] == '草莓'
+        print(f"📊 首个字段 {progress[0][1]:.2f}s，完整结果 {total:.2f}s")
+        assert progress[0][1] < total / 2
+
+    asyncio.run(run())
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始DashScope客户端测试")
+    print("=" * 50)
+    test_concurrency_limit()
+    test_retry_on_server_error()
+    test_deadline()
+    test_stream_retries_request_timeout()
+    test_session_bound_to_other_loop()
+    test_crop_analyzer_with_stub()
+    test_blocked_client_loop_falls_back()
+    test_streaming_progress()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
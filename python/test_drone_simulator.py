@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模拟无人机测试
+验证任务垫可见性（飞行高度与检测半径）、漏检注入、动作耗时与电量消耗，
+以及带漏检的计划任务在虚拟时间内的恢复与时长
+"""
+
+from drone_simulator import LAND_SECONDS, TAKEOFF_SECONDS, SimulatedDrone
+from mission_clock import VirtualClock
+from mission_controller import MissionController
+from mission_planner import MissionPlan
+
+
+def _drone(**kwargs):
+    clock = VirtualClock()
+    return clock, SimulatedDrone({1: (0, 0), 2: (100, 0)}, clock=clock, **kwargs)
+
+
+def test_pad_visibility():
+    """起飞前与低于最低高度时看不到任务垫；检测半径内看到最近的一张，半径外看不到"""
+    clock, drone = _drone(start_pad=2)
+    assert drone.mission_pad_id == -1 and drone.pad_position is None
+
+    assert drone.takeoff() and not drone.takeoff()
+    assert drone.mission_pad_id == 2 and drone.pad_position == (0.0, 0.0, 80.0)
+    assert drone.set_height(20)
+    assert drone.mission_pad_id == -1
+    assert drone.set_height(80)
+
+    # 以 20cm/s 向左飞 2 秒：距离 2 号垫 40cm，超出默认 30cm 检测半径
+    drone.manual_control(-20, 0, 0, 0)
+    clock.sleep(1.0)
+    assert drone.mission_pad_id == 2 and drone.pad_position == (-20.0, 0.0, 80.0)
+    clock.sleep(1.0)
+    assert drone.mission_pad_id == -1
+    clock.sleep(2.0)
+    drone.manual_control(0, 0, 0, 0)
+    clock.sleep(10.0)
+    assert drone.position == [20.0, 0.0] and drone.mission_pad_id == 1
+
+    # go 命令只有看到目标垫时才能执行
+    assert not drone.move_to_mission_pad(2, 0, 0, 80, 50)
+    assert drone.move_to_mission_pad(1, 100, 0, 80, 50)
+    assert drone.mission_pad_id == 2 and drone.distance_flown == 160.0
+
+
+def test_missed_sightings():
+    """注入的漏检按查询次数消耗，之后恢复正常检测；不影响其他任务垫"""
+    clock, drone = _drone(missed_sightings={1: 3})
+    drone.takeoff()
+    assert [drone.mission_pad_id for _ in range(4)] == [-1, -1, -1, 1]
+    assert drone.missed_sightings[1] == 0
+
+    assert drone.move_to_mission_pad(1, 100, 0, 80, 50)
+    assert drone.mission_pad_id == 2
+
+
+def test_battery_drain_and_timing():
+    """只有飞行中按时钟耗电；动作按估算耗时推进虚拟时间"""
+    clock, drone = _drone(battery=90, drain_per_second=0.5)
+    clock.sleep(100.0)
+    assert drone.battery == 90
+
+    drone.takeoff()
+    assert clock.time() == 100.0 + TAKEOFF_SECONDS
+    assert drone.battery == int(90 - 0.5 * TAKEOFF_SECONDS)
+    clock.sleep(20.0)
+    assert drone.battery == int(90 - 0.5 * (TAKEOFF_SECONDS + 20.0))
+
+    assert drone.land() and not drone.land()
+    landed_battery = drone.battery
+    assert landed_battery == int(90 - 0.5 * (TAKEOFF_SECONDS + 20.0 + LAND_SECONDS))
+    stats = drone.get_stats()
+    assert stats['commands'] == 3 and stats['flight_time'] == TAKEOFF_SECONDS + 20.0 + LAND_SECONDS
+    clock.sleep(100.0)
+    assert drone.battery == landed_battery
+
+    _, empty = _drone(battery=5, drain_per_second=1.0)
+    empty.takeoff()
+    empty.clock.sleep(60.0)
+    assert empty.battery == 0
+
+
+def test_virtual_plan_mission():
+    """按计划飞行且有一次漏检：在虚拟时间内检查恢复次数与各轮时长"""
+    plan = MissionPlan.from_dict({
+        'start_pad': 1,
+        'speed': 40,
+        'pads': [{'id': pad, 'x': 80 * (pad - 1), 'y': 0, 'plants': [str(pad)]} for pad in range(1, 5)],
+    })
+    clock = VirtualClock()
+    drone = SimulatedDrone({pad: (node.x, node.y) for pad, node in plan.pads.items()}, clock=clock,
+                           missed_sightings={3: 25})
+    mission_controller = MissionController(drone, clock=clock)
+    mission_controller.set_mission_rounds(2)
+    mission_controller.set_stay_duration(1)
+    mission_controller.set_mission_plan(plan)
+
+    assert mission_controller.start_mission(blocking=True)
+    reports = mission_controller.get_route_reports()
+    print(f"⏱️ 虚拟任务时长 {clock.time():.1f}s，{[r['actual_time'] for r in reports]}")
+
+    assert len(reports) == 2 and all(r['completed'] for r in reports)
+    assert reports[0]['visited'] == [1, 2, 3, 4] and reports[0]['recoveries'] == 1
+    assert reports[1]['recoveries'] == 0
+    assert reports[0]['planned_length'] == 480 and 480 <= reports[1]['actual_length'] < 500
+    # 发生恢复的一轮多了4秒找垫与旋转，正常一轮保持在预算内
+    assert reports[1]['actual_time'] < reports[0]['actual_time']
+    # 预算：计划飞行与停留时间，加上每个任务垫最多6秒的定位与稳定
+    assert reports[1]['actual_time'] < reports[1]['planned_time'] + 6 * len(reports[1]['visited'])
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始模拟无人机测试")
+    test_pad_visibility()
+    test_missed_sightings()
+    test_battery_drain_and_timing()
+    test_virtual_plan_mission()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+飞行记录仪测试
+录制合成帧与遥测，验证分段写入、二进制遥测、按时间定位回放与磁盘上限淘汰
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from flight_recorder import FlightRecorder, read_telemetry_log
+from frame_source import FlightRecording
+
+
+def _record(recorder, flight_id, seconds, fps=10.0):
+    recorder.start(flight_id=flight_id)
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        frame = np.full((120, 160, 3), i % 256, dtype=np.uint8)
+        while not recorder.add_frame(frame, t=t):
+            pass
+        recorder.record_state({'bat': 90 - i // 10, 'h': 100, 'mid': 3 if t >= 2.0 else -1,
+                               'x': i, 'y': -i, 'z': 100}, t=t)
+    return recorder.stop()
+
+
+def test_record_and_seek():
+    """分段录制后回放：帧号连续、时间戳为录制时间、遥测按时间对齐、可从任意时间开始"""
+    with tempfile.TemporaryDirectory() as tmp:
+        recorder = FlightRecorder(tmp, segment_seconds=1.0, fps=10.0)
+        stats = _record(recorder, 'flight_a', seconds=3.5)
+        assert stats['frames_written'] == 35 and stats['frames_dropped'] == 0
+        assert stats['segments'] == 4
+
+        records = read_telemetry_log(os.path.join(tmp, 'flight_a', 'telemetry.bin'))
+        assert len(records) == 35 and records[20]['state']['mid'] == 3
+
+        recording = FlightRecording.open(os.path.join(tmp, 'flight_a'))
+        assert recording.flight_id == 'flight_a' and recording.frame_count() == 35
+        frames = list(recording.frames(stride=3))
+        assert [f.index for f in frames] == list(range(0, 35, 3))
+        assert abs(frames[4].timestamp - 1.2) < 1e-9 and frames[4].telemetry['x'] == 12
+
+        sought = list(recording.seek(2.05, limit=3))
+        assert [f.index for f in sought] == [21, 22, 23]
+        assert sought[0].telemetry['mid'] == 3
+        # MJPG有损压缩，像素值近似
+        assert abs(int(sought[0].frame.mean()) - 21) <= 2
+
+
+def test_ring_eviction():
+    """超过磁盘上限时先删除最早飞行的分段，删空的飞行目录整体移除"""
+    with tempfile.TemporaryDirectory() as tmp:
+        recorder = FlightRecorder(tmp, segment_seconds=1.0, fps=10.0)
+        _record(recorder, 'flight_old', seconds=2.0)
+        assert [r['segments'] for r in recorder.list_recordings()] == [2]
+
+        segment_bytes = os.path.getsize(os.path.join(tmp, 'flight_old', 'segment_0000.avi'))
+        recorder.max_bytes = int(segment_bytes * 3.5)
+        _record(recorder, 'flight_new', seconds=3.0)
+
+        recordings = {r['flight_id']: r for r in recorder.list_recordings()}
+        assert 'flight_old' not in recordings
+        assert not os.path.exists(os.path.join(tmp, 'flight_old'))
+        assert recordings['flight_new']['segments'] >= 1
+
+        replay = FlightRecording.open(os.path.join(tmp, 'flight_new'))
+        indices = [f.index for f in replay.frames()]
+        assert indices == list(range(indices[0], 30))
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始飞行记录仪测试")
+    test_record_and_seek()
+    test_ring_eviction()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
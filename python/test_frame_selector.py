@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+最佳帧选择测试
+验证清晰度打分、空闲/超时关闭窗口、切换植株关闭窗口、有草莓的帧优先，以及 flush 与 discard
+"""
+
+import cv2
+import numpy as np
+
+from frame_selector import BestFrameSelector, score_frame
+
+
+def _sharp_frame(seed=0):
+    """高频纹理 + 中间灰曝光的测试帧"""
+    rng = np.random.default_rng(seed)
+    frame = np.full((240, 320, 3), 128, dtype=np.uint8)
+    noise = rng.integers(-60, 60, size=(240, 320, 1))
+    return np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def _blurred(frame):
+    return cv2.GaussianBlur(frame, (15, 15), 5)
+
+
+def test_score_prefers_sharp_frames():
+    """清晰帧的清晰度与得分高于模糊帧；QR码越大得分越高；过曝帧曝光分低"""
+    sharp = _sharp_frame()
+    blurred = _blurred(sharp)
+    sharp_metrics = score_frame(sharp)
+    blurred_metrics = score_frame(blurred)
+    assert sharp_metrics['sharpness'] > 10 * blurred_metrics['sharpness']
+    assert sharp_metrics['score'] > blurred_metrics['score']
+
+    near = score_frame(sharp, qr_rect=(100, 60, 80, 80))
+    far = score_frame(sharp, qr_rect=(100, 60, 20, 20))
+    assert near['qr_ratio'] > far['qr_ratio'] and near['score'] > far['score']
+
+    overexposed = np.full((240, 320, 3), 255, dtype=np.uint8)
+    assert score_frame(overexposed)['exposure'] == 0.0
+    assert 0.9 < sharp_metrics['exposure'] <= 1.0
+
+
+def test_best_frame_and_strawberry_priority():
+    """窗口保留得分最高的候选帧；有草莓检测结果的帧优先于得分更高但没有草莓的帧"""
+    selector = BestFrameSelector(idle_seconds=1.0, max_window_seconds=10.0)
+    sharp = _sharp_frame()
+    blurred = _blurred(sharp)
+    qr_info = {'id': 7, 'rect': (100, 60, 60, 60)}
+
+    selector.offer(7, blurred, qr_info, now=0.0)
+    selector.offer(7, sharp, qr_info, now=0.1)
+    selector.offer(7, blurred, qr_info, now=0.2)
+    window = selector.flush()[0]
+    assert window.candidates == 3 and window.best.timestamp == 0.1
+    assert np.array_equal(window.best.frame, sharp)
+
+    selector.offer(8, sharp, qr_info, now=1.0)
+    selector.offer(8, blurred, qr_info, strawberry_detections=['berry'], now=1.1)
+    window = selector.flush()[0]
+    assert window.with_strawberries == 1 and window.best.strawberry_detections == ['berry']
+    assert window.best.to_dict()['timestamp'] == 1.1
+
+    stats = selector.get_stats()
+    assert stats['frames_offered'] == 5 and stats['frames_skipped'] == 1
+    assert stats['windows_closed'] == 2 and stats['frames_per_window'] == 2.5
+
+
+def test_idle_and_max_window_close():
+    """植株超过空闲时间未出现时关闭窗口；持续悬停时按最长窗口时间关闭"""
+    selector = BestFrameSelector(idle_seconds=1.0, max_window_seconds=3.0)
+    frame = _sharp_frame()
+
+    selector.offer(1, frame, {'id': 1}, now=0.0)
+    assert selector.poll(now=0.9) == []
+    closed = selector.poll(now=1.0)
+    assert [w.plant_id for w in closed] == [1] and selector.get_stats()['open_windows'] == 0
+
+    for i in range(6):
+        selector.offer(2, frame, {'id': 2}, now=10.0 + i * 0.5)
+        if i < 5:
+            assert selector.poll(now=10.0 + i * 0.5) == []
+    closed = selector.poll(now=13.0)
+    assert [w.plant_id for w in closed] == [2] and closed[0].candidates == 6
+
+
+def test_switch_plant_closes_window():
+    """出现另一株植株时立即交出上一株的窗口；关闭该选项时窗口并存"""
+    selector = BestFrameSelector(idle_seconds=5.0)
+    frame = _sharp_frame()
+    assert selector.offer(1, frame, {'id': 1}, now=0.0) == []
+    closed = selector.offer(2, frame, {'id': 2}, now=0.5)
+    assert [w.plant_id for w in closed] == [1]
+
+    selector = BestFrameSelector(idle_seconds=5.0, close_on_switch=False)
+    selector.offer(1, frame, {'id': 1}, now=0.0)
+    assert selector.offer(2, frame, {'id': 2}, now=0.5) == []
+    assert sorted(w.plant_id for w in selector.flush()) == [1, 2]
+
+
+def test_flush_and_discard():
+    """flush 交出全部未关闭的窗口（任务结束时最后一株不丢失）；discard 丢弃窗口不交出结果"""
+    selector = BestFrameSelector()
+    frame = _sharp_frame()
+    selector.offer(3, frame, {'id': 3}, now=0.0)
+    windows = selector.flush()
+    assert [w.plant_id for w in windows] == [3] and windows[0].best is not None
+    assert selector.flush() == []
+
+    selector.offer(4, frame, {'id': 4}, now=1.0)
+    selector.discard()
+    assert selector.flush() == [] and selector.poll(now=100.0) == []
+    assert selector.get_stats()['open_windows'] == 0
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始最佳帧选择测试")
+    test_score_prefers_sharp_frames()
+    test_best_frame_and_strawberry_priority()
+    test_idle_and_max_window_close()
+    test_switch_plant_closes_window()
+    test_flush_and_discard()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+图片存档测试
+验证内容寻址去重、按植株查询、缩略图、保留策略与旧版图片导入
+"""
+
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from image_archive import ImageArchive
+
+
+def _image(value, size=(480, 640)):
+    image = np.zeros((size[0], size[1], 3), dtype=np.uint8)
+    image[:] = (0, value, 0)
+    cv2.circle(image, (size[1] // 2, size[0] // 2), 50, (0, 0, value), -1)
+    return image
+
+
+def test_store_dedup_and_lookup():
+    """相同画面只存一份，按植株查询最新记录，缩略图不超过设定尺寸"""
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = ImageArchive(tmp, thumbnail_side=128)
+        first = archive.store(_image(100), plant_id=3, captured_at=1000.0)
+        second = archive.store(_image(100), plant_id=3, captured_at=2000.0)
+        other = archive.store(_image(200), plant_id='B-2', captured_at=1500.0)
+
+        assert first.image_hash == second.image_hash != other.image_hash
+        assert os.path.dirname(first.image_path).endswith(os.path.join(first.image_hash[:2], first.image_hash[2:4]))
+        thumb = cv2.imread(first.thumbnail_path)
+        assert max(thumb.shape[:2]) == 128
+
+        entries = archive.lookup(plant_id=3)
+        assert [e.captured_at for e in entries] == [2000.0, 1000.0]
+        assert archive.lookup(plant_id='B-2')[0].image_hash == other.image_hash
+        assert entries[0].to_dict(root=tmp)['thumbnail_url'].startswith('thumbs/')
+
+        stats = archive.get_stats()
+        assert stats['captures'] == 3 and stats['blobs'] == 2 and stats['deduplicated'] == 1
+        archive.close()
+
+
+def test_retention_by_age_and_size():
+    """过期记录被删除，不再引用的图片随之清理；超出总大小时从最早的记录开始删除"""
+    with tempfile.TemporaryDirectory() as tmp:
+        now = time.time()
+        archive = ImageArchive(tmp, max_age_days=30, max_bytes=0)
+        old = archive.store(_image(10), plant_id=1, captured_at=now - 40 * 86400)
+        shared = archive.store(_image(20), plant_id=1, captured_at=now - 40 * 86400)
+        archive.store(_image(20), plant_id=2, captured_at=now - 86400)
+
+        result = archive.enforce_retention(now=now)
+        assert result['captures_expired'] == 2 and result['blobs_removed'] == 1
+        assert not os.path.exists(old.image_path) and not os.path.exists(old.thumbnail_path)
+        assert os.path.exists(shared.image_path)
+
+        for day in range(5):
+            archive.store(_image(50 + day * 20), plant_id=3, captured_at=now - (5 - day) * 86400 + 1)
+        archive.max_bytes = archive.get_stats()['total_mb'] * 1024 * 1024 * 0.6
+        archive.enforce_retention(now=now)
+        stats = archive.get_stats()
+        assert stats['total_mb'] * 1024 * 1024 <= archive.max_bytes
+        remaining = archive.lookup(limit=100)
+        assert remaining and min(e.captured_at for e in remaining) > now - 4 * 86400
+        archive.close()
+
+
+def test_migrate_legacy_images():
+    """旧版 plant_{id}_{时间}.jpg 文件按内容导入并解析植株与时间"""
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_dir = os.path.join(tmp, 'images')
+        os.makedirs(legacy_dir)
+        cv2.imwrite(os.path.join(legacy_dir, 'plant_12_20250601_101500.jpg'), _image(90))
+        cv2.imwrite(os.path.join(legacy_dir, 'plant_A-3_20250602_080000.jpg'), _image(160))
+        cv2.imwrite(os.path.join(legacy_dir, 'notes.jpg'), _image(30))
+
+        archive = ImageArchive(os.path.join(tmp, 'archive'))
+        assert archive.migrate_legacy_images(legacy_dir, remove=True) == 2
+        entry = archive.lookup(plant_id=12)[0]
+        assert entry.metadata['legacy_filename'] == 'plant_12_20250601_101500.jpg'
+        assert time.localtime(entry.captured_at).tm_hour == 10
+        assert archive.lookup(plant_id='A-3')
+        assert sorted(os.listdir(legacy_dir)) == ['notes.jpg']
+        archive.close()
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始图片存档测试")
+    test_store_dedup_and_lookup()
+    test_retention_by_age_and_size()
+    test_migrate_legacy_images()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
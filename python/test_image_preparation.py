@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+云端视觉图像预处理测试
+验证由QR码矩形与草莓检测框并集计算感兴趣区域、上传字节预算、最长边限制，以及旧版上传字节数与实测延迟的对比统计
+"""
+
+import base64
+
+import cv2
+import numpy as np
+
+from image_preparation import ImagePreparer, compute_roi, qr_rect_to_box
+
+
+def _field_frame(height=720, width=960, seed=0):
+    """带纹理的田间画面（随机噪声难以压缩，便于检验字节预算）"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(60, 200, (height, width, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (3, 3), 0)
+    cv2.circle(frame, (500, 380), 120, (40, 40, 200), -1)
+    return frame
+
+
+def _decode(prepared):
+    data = base64.b64decode(prepared.data_url.split(',', 1)[1])
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_roi_from_qr_rect():
+    """QR码矩形按上下文倍数扩展为植株区域，再加边距并裁剪到图像范围内"""
+    box = qr_rect_to_box((300, 200, 40, 40))
+    assert box == (240, 140, 400, 300)
+    assert qr_rect_to_box((300, 200, 40, 40), context_scale=2.0) == (280, 180, 360, 260)
+
+    roi = compute_roi((720, 960, 3), [box], margin=0.1, min_side=0)
+    assert roi == (224, 124, 416, 316)
+
+    # 靠近边缘的QR码：区域被裁剪到图像内
+    edge = compute_roi((720, 960, 3), [qr_rect_to_box((0, 0, 40, 40))], margin=0.1, min_side=0)
+    assert edge[0] == 0 and edge[1] == 0 and edge[2] == 116 and edge[3] == 116
+
+
+def test_roi_from_strawberry_union():
+    """多个草莓检测框取并集并按比例加边距；区域过小时扩展到最小边长；没有检测框时返回None"""
+    boxes = [(100, 100, 200, 180), (300, 150, 400, 300)]
+    assert compute_roi((720, 960), boxes, margin=0.1, min_side=0) == (70, 80, 430, 320)
+    assert compute_roi((720, 960), boxes + [None], margin=0.0, min_side=0) == (100, 100, 400, 300)
+
+    small = compute_roi((720, 960), [(500, 500, 520, 520)], margin=0.0, min_side=224)
+    assert small == (398, 398, 622, 622)
+
+    assert compute_roi((720, 960), []) is None
+    assert compute_roi((720, 960), [None]) is None
+    assert compute_roi((720, 960), [(2000, 2000, 2100, 2100)], min_side=0) is None
+
+
+def test_output_within_byte_budget():
+    """编码结果在字节预算内；预算很小时降低质量并继续缩小尺寸"""
+    frame = _field_frame()
+    for target_kb in (120, 40, 12):
+        preparer = ImagePreparer(target_bytes=target_kb * 1024)
+        prepared = preparer.prepare(frame)
+        assert prepared.jpeg_bytes <= target_kb * 1024, (target_kb, prepared.to_dict())
+        assert prepared.upload_bytes == len(prepared.data_url)
+        assert preparer.min_quality <= prepared.quality <= preparer.max_quality
+        assert _decode(prepared).shape[1::-1] == prepared.prepared_size
+
+    tight = ImagePreparer(target_bytes=12 * 1024).prepare(frame)
+    assert tight.encode_attempts > 1 and max(tight.prepared_size) < 960
+
+
+def test_longest_side_capped_and_roi_crop():
+    """最长边不超过上限且保持宽高比；提供检测框时只上传感兴趣区域"""
+    frame = _field_frame()
+    preparer = ImagePreparer(max_side=480, target_bytes=1024 * 1024)
+    prepared = preparer.prepare(frame)
+    assert prepared.original_size == (960, 720) and prepared.prepared_size == (480, 360)
+
+    cropped = preparer.prepare(frame, roi_boxes=[(420, 300, 580, 460)])
+    assert cropped.roi == (388, 268, 612, 492)   # 边距后不足最小边长，扩展到224
+    assert cropped.prepared_size == (224, 224)
+    assert cropped.upload_bytes < prepared.upload_bytes
+
+    legacy = ImagePreparer(enabled=False).prepare(frame, roi_boxes=[(420, 300, 580, 460)])
+    assert legacy.roi is None and legacy.prepared_size == (960, 720)
+    assert legacy.quality == ImagePreparer.LEGACY_QUALITY
+
+
+def test_colors_preserved():
+    """OpenCV的BGR帧直接编码：解码后颜色与原图一致（红色仍是红色），旧版整帧上传同样如此"""
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    frame[:] = (0, 0, 220)    # BGR 红色
+    for preparer in (ImagePreparer(), ImagePreparer(enabled=False)):
+        blue, green, red = _decode(preparer.prepare(frame)).reshape(-1, 3).mean(axis=0)
+        assert red > 200 and blue < 20 and green < 20
+
+
+def test_baseline_stats_and_configure():
+    """开启旧版字节数统计后报告节省比例；configure 限制参数下限并可切换统计开关"""
+    frame = _field_frame()
+    preparer = ImagePreparer(target_bytes=40 * 1024)
+    prepared = preparer.prepare(frame, roi_boxes=[(420, 300, 580, 460)])
+    preparer.record(prepared, latency=0.5, plant_id='P1')
+    stats = preparer.get_stats()
+    assert stats['analyses'] == 1 and 'bytes_saved_ratio' not in stats
+    assert not stats['measure_baseline']
+
+    preparer.configure(measure_baseline=True)
+    baseline = preparer.baseline_bytes(frame)
+    assert baseline > prepared.upload_bytes
+    preparer.record(prepared, latency=0.3, baseline_bytes=baseline, plant_id='P2')
+    stats = preparer.get_stats()
+    assert stats['measure_baseline'] and stats['avg_baseline_bytes'] == baseline
+    assert 0 < stats['bytes_saved_ratio'] < 1
+    assert stats['recent'][-1]['baseline_bytes'] == baseline and stats['avg_latency'] == 0.4
+
+    # 关闭预处理期间按旧版整帧上传，其延迟单独统计为实测的旧版延迟
+    preparer.configure(enabled=False)
+    legacy = preparer.prepare(frame)
+    preparer.record(legacy, latency=0.8, plant_id='P3')
+    stats = preparer.get_stats()
+    assert legacy.legacy and stats['legacy_analyses'] == 1 and stats['recent'][-1]['legacy']
+    assert stats['avg_latency'] == 0.4 and stats['avg_baseline_latency'] == 0.8
+    assert stats['latency_saved_ratio'] == 0.5
+    assert stats['avg_upload_bytes'] == prepared.upload_bytes
+
+    preparer.configure(max_side=10, target_bytes=100)
+    assert preparer.max_side == 64 and preparer.target_bytes == 8 * 1024
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始图像预处理测试")
+    test_roi_from_qr_rect()
+    test_roi_from_strawberry_union()
+    test_output_within_byte_budget()
+    test_longest_side_capped_and_roi_crop()
+    test_colors_preserved()
+    test_baseline_stats_and_configure()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
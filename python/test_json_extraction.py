@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JSON提取器测试
+覆盖代码块、字符串内括号、流式分块输入，并用随机回复做模糊测试与100KB回复的性能对比
+"""
+
+import json
+import random
+import time
+
+from json_extraction import PartialFieldScanner, StreamingJSONExtractor, extract_json_object
+
+
+COMMANDS = {"commands": [{"action": "takeoff", "parameters": {}, "description": "起飞"},
+                         {"action": "move_forward", "parameters": {"distance": 50},
+                          "description": "前进 {50} 厘米 \"快速\""}]}
+
+
+def _legacy_extract(text):
+    """旧版兜底逻辑：所有 { 与 } 位置两两组合尝试解析"""
+    starts = [i for i, c in enumerate(text) if c == '{']
+    ends = [i for i, c in enumerate(text) if c == '}']
+    for start in starts:
+        for end in reversed(ends):
+            if end > start:
+                candidate = text[start:end + 1]
+                if '"commands"' in candidate:
+                    try:
+                        parsed = json.loads(candidate)
+                        if 'commands' in parsed:
+                            return parsed
+                    except Exception:
+                        pass
+    return None
+
+
+def test_basic_cases():
+    """常见回复格式"""
+    payload = json.dumps(COMMANDS, ensure_ascii=False)
+    cases = [
+        payload,
+        f"好的，解析如下：\n```json\n{payload}\n```\n请确认。",
+        f"```\n{payload}\n```",
+        f"注意 {{不是JSON}} 的说明文字，然后：{payload} 结束",
+        f"前面有未闭合的括号 {{ 然后是 {payload}",
+        f"`{payload}`",
+        f'正文里的引号 " 不影响扫描 {payload}',
+    ]
+    for text in cases:
+        assert extract_json_object(text, required_key='commands') == COMMANDS, text[:60]
+
+    # 第一个对象不含目标键时继续查找
+    text = '{"note": "先说明"} 然后 ' + payload
+    assert extract_json_object(text, required_key='commands') == COMMANDS
+    assert extract_json_object(text) == {"note": "先说明"}
+
+    # 外层对象无效时在其直接子对象中查找
+    assert extract_json_object('{ 说明: ' + payload + ' }', required_key='commands') == COMMANDS
+
+    # 代码块中的数组
+    assert extract_json_object("结果：\n```json\n[1, 2, 3]\n```") == [1, 2, 3]
+
+    assert extract_json_object("没有任何JSON") is None
+    assert extract_json_object('{"unterminated": "abc') is None
+
+
+def test_streaming_split_points():
+    """任意位置切分流式输入，结果与一次性输入一致"""
+    payload = json.dumps(COMMANDS, ensure_ascii=False)
+    text = f'说明 {{x}} "引号\\" 文本\n```json\n{payload}\n```\n结尾'
+    for split in range(len(text) + 1):
+        extractor = StreamingJSONExtractor(required_key='commands')
+        extractor.feed(text[:split])
+        extractor.feed(text[split:])
+        assert extractor.finish() == COMMANDS, split
+
+    # 逐字符输入：对象一闭合就返回，不等待结束
+    extractor = StreamingJSONExtractor()
+    found_at = None
+    for i, char in enumerate(payload + " 后续文本"):
+        if extractor.feed(char) is not None and found_at is None:
+            found_at = i
+    assert found_at == len(payload) - 1
+
+
+def test_partial_fields():
+    """流式回复中字段值完整后才返回，数字不会被截断读取"""
+    scanner = PartialFieldScanner(['health_score', 'urgency'])
+    assert scanner.feed('{"analysis_summary": "含 \\"health_score\\": 1 的文字", "health_score": 8') == {}
+    assert scanner.feed('5') == {}
+    assert scanner.feed(', "urg') == {'health_score': 85}
+    assert scanner.feed('ency": "hi') == {}
+    assert scanner.feed('gh"}') == {'urgency': 'high'}
+
+
+def _random_value(rng, depth=0):
+    kind = rng.randrange(6 if depth < 3 else 4)
+    if kind == 0:
+        return rng.randint(-1000, 1000)
+    if kind == 1:
+        return ''.join(rng.choice('ab{}[]"\\:, 草莓\n') for _ in range(rng.randint(0, 12)))
+    if kind == 2:
+        return rng.choice([True, False, None])
+    if kind == 3:
+        return rng.random()
+    if kind == 4:
+        return [_random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f"k{i}": _random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+
+
+def test_fuzz_embedded_objects():
+    """随机对象嵌入含零散括号的随机正文中，总能被完整提取"""
+    rng = random.Random(1234)
+    noise_chars = 'abc 草莓无人机，。\n:;[]}{'
+    for _ in range(500):
+        target = {"commands": [_random_value(rng)], "extra": _random_value(rng)}
+        prefix = ''.join(rng.choice(noise_chars) for _ in range(rng.randint(0, 80)))
+        suffix = ''.join(rng.choice(noise_chars) for _ in range(rng.randint(0, 80)))
+        text = prefix + json.dumps(target, ensure_ascii=rng.random() < 0.5) + suffix
+        assert extract_json_object(text, required_key='commands') == target, text
+
+        # 分块流式输入
+        extractor = StreamingJSONExtractor(required_key='commands')
+        position = 0
+        while position < len(text):
+            step = rng.randint(1, 40)
+            extractor.feed(text[position:position + step])
+            position += step
+        assert extractor.finish() == target
+
+
+def test_benchmark_100kb_reply():
+    """100KB的啰嗦回复：线性扫描，json.loads 总输入量与回复长度同量级"""
+    payload = json.dumps(COMMANDS, ensure_ascii=False)
+    filler = '思考过程 {步骤} 包含 {"a": 1 以及未配对的 } 括号。' * 2800
+    text = filler[:100 * 1024] + '\n```json\n' + payload + '\n```'
+
+    start = time.perf_counter()
+    extractor = StreamingJSONExtractor(required_key='commands')
+    extractor.feed(text)
+    result = extractor.finish()
+    elapsed = time.perf_counter() - start
+    assert result == COMMANDS
+    assert extractor.parsed_chars <= 2 * len(text)
+    print(f"📊 100KB回复提取耗时 {elapsed * 1000:.1f}ms，解析尝试 {extractor.parse_attempts} 次")
+    assert elapsed < 1.0
+
+    # 旧版兜底在小得多的回复上已明显更慢
+    small = filler[:3000] + payload
+    start = time.perf_counter()
+    assert _legacy_extract(small) == COMMANDS
+    legacy_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    assert extract_json_object(small, required_key='commands') == COMMANDS
+    new_elapsed = time.perf_counter() - start
+    print(f"📊 3KB回复: 旧版 {legacy_elapsed * 1000:.1f}ms, 新版 {new_elapsed * 1000:.2f}ms")
+    assert new_elapsed < legacy_elapsed
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始JSON提取器测试")
+    test_basic_cases()
+    test_streaming_split_points()
+    test_partial_fields()
+    test_fuzz_embedded_objects()
+    test_benchmark_100kb_reply()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务时钟测试
+验证虚拟时钟按时间顺序触发定时回调、sleep 只推进虚拟时间，以及在虚拟时间内跑完整的往返任务
+"""
+
+import time
+
+from drone_simulator import SimulatedDrone
+from mission_clock import MissionClock, VirtualClock
+from mission_controller import MissionController
+
+
+def test_advance_fires_timers_in_order():
+    """推进时间时按时间顺序触发到期回调，同一时刻按登记顺序；回调中看到的是触发时刻"""
+    clock = VirtualClock(start=100.0)
+    fired = []
+    clock.call_at(103.0, lambda: fired.append(('c', clock.time())))
+    clock.call_at(101.0, lambda: fired.append(('a', clock.time())))
+    clock.call_at(103.0, lambda: fired.append(('d', clock.time())))
+    clock.call_later(2.0, lambda: fired.append(('b', clock.time())))
+    clock.call_at(110.0, lambda: fired.append(('late', clock.time())))
+
+    clock.advance(1.5)
+    assert fired == [('a', 101.0)] and clock.time() == 101.5
+    clock.advance(1.5)
+    assert fired == [('a', 101.0), ('b', 102.0), ('c', 103.0), ('d', 103.0)]
+    assert clock.time() == 103.0
+
+    clock.advance(-5)
+    assert clock.time() == 103.0
+    clock.advance(10)
+    assert fired[-1] == ('late', 110.0) and clock.time() == 113.0
+
+
+def test_callbacks_can_schedule_more_timers():
+    """回调中登记的定时器在同一次推进中按顺序触发；已经过去的时刻不会让时间倒退"""
+    clock = VirtualClock()
+    fired = []
+
+    def tick():
+        fired.append(clock.time())
+        if len(fired) < 4:
+            clock.call_later(1.0, tick)
+
+    clock.call_at(1.0, tick)
+    clock.advance(10.0)
+    assert fired == [1.0, 2.0, 3.0, 4.0] and clock.time() == 10.0
+
+    clock.call_at(5.0, lambda: fired.append(clock.time()))
+    clock.advance(0.0)
+    assert fired[-1] == 10.0 and clock.time() == 10.0
+
+
+def test_sleep_is_virtual():
+    """虚拟时钟的 sleep 不阻塞，只累计等待时长；真实时钟按实际时间等待"""
+    clock = VirtualClock()
+    started = time.perf_counter()
+    for _ in range(100):
+        clock.sleep(60.0)
+    clock.sleep(-1.0)
+    assert time.perf_counter() - started < 0.5
+    assert clock.time() == 6000.0 and clock.slept == 6000.0 and clock.sleeps == 101
+    assert clock.virtual and not MissionClock().virtual
+
+    real = MissionClock()
+    started = real.time()
+    real.sleep(0.05)
+    real.sleep(-1.0)
+    assert 0.04 <= real.time() - started < 0.5
+
+
+def test_virtual_round_trip_mission():
+    """在虚拟时间内对模拟无人机跑完3轮 1号垫 <-> 6号垫 往返任务"""
+    clock = VirtualClock()
+    drone = SimulatedDrone({1: (0, 0), 6: (50, 0)}, clock=clock)
+    status_messages = []
+    mission_controller = MissionController(drone, status_callback=status_messages.append, clock=clock)
+    mission_controller.set_mission_rounds(3)
+
+    started = time.perf_counter()
+    assert mission_controller.start_mission(blocking=True)
+    real_seconds = time.perf_counter() - started
+
+    print(f"⏱️ 虚拟任务时长 {clock.time():.1f}s，实际耗时 {real_seconds * 1000:.0f}ms，{drone.get_stats()}")
+    assert "Mission complete: 3/3 rounds successful" in status_messages
+    assert not drone.is_flying and not mission_controller.is_mission_running
+    assert real_seconds < 2.0
+    # 时长预算：每轮两次3秒停留、两次4秒找垫以及稳定等待
+    assert 60 < clock.time() < 130
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始任务时钟测试")
+    test_advance_fires_timers_in_order()
+    test_callbacks_can_schedule_more_timers()
+    test_sleep_is_virtual()
+    test_virtual_round_trip_mission()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+挑战卡任务规划测试
+验证计划解析、最近邻 + 2-opt 访问顺序、超程航段拆分，任务控制器按计划以 go mid 指令飞行并报告计划/实际航程，
+以及按电量拆分出航与巡检进度续飞
+"""
+
+import os
+import tempfile
+from dataclasses import replace
+
+from mission_controller import MissionController
+from mission_planner import (EnergyModel, MissionPlan, SurveyProgress, _nearest_neighbour, partition_sorties,
+                             plan_route, route_length)
+from settle_detector import SettleResult
+
+
+def _plan(positions, **kwargs):
+    pads = [{'id': pad, 'x': x, 'y': y, 'plants': [f"{pad}{c}" for c in 'ab']} for pad, (x, y) in positions.items()]
+    return MissionPlan.from_dict(dict(pads=pads, **kwargs))
+
+
+class GoDrone:
+    """模拟 go x y z speed mid：只能在看到出发挑战卡时移动，每跳在x方向多飞 overshoot cm"""
+
+    def __init__(self, plan, start_pad, overshoot=5, battery=None, drain=10):
+        self.pads = {pad_id: (node.x, node.y) for pad_id, node in plan.pads.items()}
+        self.position = self.pads[start_pad]
+        self.overshoot = overshoot
+        self.battery = battery      # 每次跳转消耗 drain%
+        self.drain = drain
+        self.moves = []
+        self.is_connected = True
+        self.is_flying = True
+        self.pad_events_available = True
+
+    @property
+    def mission_pad_id(self):
+        for pad_id, (x, y) in self.pads.items():
+            if abs(self.position[0] - x) <= 30 and abs(self.position[1] - y) <= 30:
+                return pad_id
+        return -1
+
+    @property
+    def pad_position(self):
+        pad = self.mission_pad_id
+        if pad <= 0:
+            return None
+        x, y = self.pads[pad]
+        return self.position[0] - x, self.position[1] - y, 100
+
+    def move_to_mission_pad(self, pad_id, x, y, z, speed):
+        if self.mission_pad_id != pad_id:
+            return False
+        self.moves.append((pad_id, x, y))
+        px, py = self.pads[pad_id]
+        drift = self.overshoot if (x, y) != (0, 0) else 0
+        self.position = (px + x + drift, py + y)
+        if self.battery is not None and (x, y) != (0, 0):
+            self.battery -= self.drain
+        return True
+
+    def wait_for_pad(self, pad_id=None, timeout=10.0, sightings=2, cancel=None):
+        pad = self.mission_pad_id
+        return pad if pad > 0 and pad_id in (None, pad) else -1
+
+    def wait_settled(self, timeout=3.0, cancel=None):
+        return SettleResult(True, 0.0, 0)
+
+    def rotate(self, degrees):
+        return True
+
+
+def test_plan_parsing_and_order():
+    """一排乱序编号的挑战卡：按位置顺序访问；2-opt 不会比最近邻更差"""
+    plan = _plan({1: (0, 0), 2: (300, 0), 3: (100, 0), 4: (200, 0)}, return_to_start=False)
+    route = plan_route(plan)
+    assert route.order == [1, 3, 4, 2] and route.length == 300
+    assert MissionPlan.from_dict(plan.to_dict()).to_dict() == plan.to_dict()
+
+    # 两排交错：最近邻会来回穿插，2-opt 去掉交叉
+    grid = _plan({1: (0, 0), 2: (100, 0), 3: (200, 0), 4: (300, 0),
+                  5: (0, 120), 6: (100, 120), 7: (200, 120), 8: (300, 120)})
+    dist, _ = grid.hop_graph()
+    greedy = route_length(_nearest_neighbour(1, list(grid.pads), dist), dist, True)
+    route = plan_route(grid)
+    assert route.closed and route.length <= greedy
+    assert route.length == 2 * 300 + 2 * 120
+    assert route.legs[-1][-1] == 1 and sorted(route.order) == list(range(1, 9))
+
+    for bad in ({'pads': []}, {'pads': [{'id': 9}]}, {'pads': [{'id': 1}, {'id': 1}]},
+                {'pads': [{'id': 1}], 'start_pad': 2}):
+        try:
+            MissionPlan.from_dict(bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+
+def test_long_legs_split_through_pads():
+    """超出单次 go 范围（±500cm）的航段经中转卡拆分；孤立的挑战卡拒绝"""
+    plan = _plan({1: (0, 0), 2: (400, 0), 3: (800, 0)})
+    route = plan_route(plan, start_pad=1)
+    assert route.order == [1, 2, 3]
+    assert route.legs == [[1, 2], [2, 3], [3, 2, 1]]
+    assert len(route.hops()) == 4 and route.length == 1600
+
+    try:
+        _plan({1: (0, 0), 2: (800, 0)})
+        assert False
+    except ValueError:
+        pass
+
+
+def test_controller_flies_plan():
+    """任务控制器按计划逐跳飞行，每张卡停留一次并报告计划/实际航程"""
+    plan = _plan({1: (0, 0), 2: (300, 0), 3: (100, 0), 4: (200, 0)}, speed=50)
+    drone = GoDrone(plan, start_pad=1)
+    positions = []
+    controller = MissionController(drone, position_callback=positions.append)
+    controller.stay_duration = 0
+    controller.set_mission_plan(plan)
+    controller.last_pad_id = 1
+
+    assert controller.execute_plan_sortie()
+    report = controller.get_route_reports()[0]
+    assert report['planned_order'] == [1, 3, 4, 2] and report['visited'] == [1, 3, 4, 2]
+    assert report['planned_length'] == 600 and report['planned_time'] == 12.0
+    # 每跳多飞5cm再回正：3 x (105 + 5) + (295 + 5)
+    assert report['actual_length'] == 630 and report['hops'] == 4 and report['completed']
+    assert len(report['plants']) == 8
+    hops = [move for move in drone.moves if move[1:] != (0, 0)]
+    assert hops == [(1, 100, 0), (3, 100, 0), (4, 100, 0), (2, -300, 0)]
+    assert [p['current_pad'] for p in positions] == [1, 3, 4, 2] and positions[-1]['progress'] == 100.0
+
+
+def test_energy_model_from_telemetry():
+    """从遥测窗口拟合悬停与移动消耗；数据不足时使用默认值"""
+    records = []
+    battery = 100.0
+    x = 0.0
+    for i in range(3000):  # 10Hz，5分钟；奇数分钟内以20cm/s往返移动
+        t = i / 10
+        moving = int(t // 60) % 2 == 1
+        step = (2.0 if int(t // 5) % 2 else -2.0) if moving else 0.0
+        x += step
+        battery -= 0.01 + 0.003 * abs(step)
+        records.append({'t': t, 'state': {'bat': int(battery), 'h': 100, 'mid': 1, 'x': int(x), 'y': 0, 'z': 100}})
+
+    model = EnergyModel.from_telemetry([records])
+    assert abs(model.hover_rate - 0.1) < 0.02 and abs(model.move_rate - 0.003) < 0.001
+    assert model.fitted_seconds > 250
+    assert EnergyModel.from_telemetry([records[:300]]).hover_rate == EnergyModel().hover_rate
+
+    model.calibrate([{'predicted': 40, 'battery_used': 50}, {'predicted': 40, 'battery_used': 60}, {}])
+    assert model.scale == 1.5
+
+
+def test_partition_and_resume():
+    """按电量拆分出航；进度写入文件，下一块电池从未访问的挑战卡继续"""
+    plan = _plan({pad: (100 * (pad - 1), 0) for pad in range(1, 9)}, speed=50)
+    model = EnergyModel(hover_rate=2.0, move_rate=0.0, overhead=5.0, settle_allowance=3.0)
+    sorties = partition_sorties(plan, model, plan.pads, dwell=0, battery=100, reserve=25)
+    assert [s.pads for s in sorties] == [[1, 2, 3, 4, 5], [6, 7], [8]]
+    assert all(s.predicted <= 75 for s in sorties) and sorties[0].predicted == 67
+    assert partition_sorties(plan, model, plan.pads, dwell=0, battery=60, reserve=25)[0].pads == [1, 2]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'survey', 'progress.json')
+
+        def fly(battery):
+            progress = SurveyProgress(path)
+            progress.bind(plan)
+            drone = GoDrone(plan, start_pad=1, battery=battery)
+            controller = MissionController(drone)
+            controller.stay_duration = 0
+            controller.set_mission_plan(plan)
+            controller.set_survey(progress, replace(model))
+            controller.last_pad_id = 1
+            return controller.execute_plan_sortie(), controller, drone
+
+        ok, controller, drone = fly(100)
+        assert ok and controller.get_survey_summary()['visited'] == [1, 2, 3, 4, 5]
+        assert drone.battery == 50
+
+        # 重新加载进度：上次实际耗电50%（预测67%），校准后剩余三张卡一次飞完
+        ok, controller, drone = fly(100)
+        assert 0.7 < controller.energy_model.scale < 0.8
+        summary = controller.get_survey_summary()
+        assert ok and summary['visited'] == [1, 2, 3, 4, 5, 6, 7, 8] and summary['completed']
+        assert [hop[0] for hop in drone.moves if hop[1:] != (0, 0)] == [1, 6, 7, 8, 3]
+        assert len(SurveyProgress(path).sorties) == 2
+
+        # 已完成的巡检重新开始；电量不足时拒绝出航
+        ok, controller, drone = fly(30)
+        assert not ok and drone.moves == []
+        assert controller.get_survey_summary()['pending'] == list(range(1, 9))
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始挑战卡任务规划测试")
+    test_plan_parsing_and_order()
+    test_long_legs_split_through_pads()
+    test_controller_flies_plan()
+    test_energy_model_from_telemetry()
+    test_partition_and_resume()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
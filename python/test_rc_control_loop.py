@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+rc 控制发送器测试
+验证高频输入按固定频率合并发送、低频输入按最新值持续发送、失联保护归零后停止发送、同步停止时的归零，以及抖动统计
+"""
+
+import asyncio
+import time
+
+from rc_control_loop import NEUTRAL, NEUTRAL_REPEATS, RCControlLoop, clamp_sticks
+
+
+class Recorder:
+    """记录发送的 rc 命令"""
+
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, *sticks):
+        self.sent.append((time.monotonic(), sticks))
+
+    @property
+    def values(self):
+        return [sticks for _, sticks in self.sent]
+
+
+def test_coalesces_fast_input():
+    """60Hz 的输入按20Hz发送，每次发送的都是最新的摇杆值"""
+    async def run():
+        recorder = Recorder()
+        rc = RCControlLoop(recorder, rate_hz=20, deadman_timeout=0.3)
+        rc.start()
+        inputs = []
+        start = time.monotonic()
+        i = 0
+        while time.monotonic() - start < 0.5:
+            inputs.append(rc.update(i, -i, 0, 200))
+            i += 1
+            await asyncio.sleep(1 / 60)
+        last_sent = recorder.values[-1]
+        await rc.stop()
+
+        stats = rc.get_stats()
+        sends = len(recorder.sent) - 1   # 减去 stop 时的归零
+        assert stats['inputs'] == len(inputs) >= 10
+        assert sends < len(inputs)
+        assert stats['coalesced'] >= len(inputs) - len(recorder.sent) - 1
+        assert all(value in inputs for value in recorder.values[:-1])
+        assert last_sent in inputs[-3:] and recorder.values[-1] == NEUTRAL
+        assert inputs[-1][3] == 100
+
+        # 发送次数与间隔按实际经过的时间判断：事件循环偶尔被阻塞时会跳过错过的拍，但不会多发
+        times = [t for t, _ in recorder.sent[:-1]]
+        elapsed = times[-1] - times[0]
+        assert sends <= elapsed * 20 + 2
+        assert sends >= (elapsed * 20 + 1) / 2
+        intervals = sorted(b - a for a, b in zip(times, times[1:]))
+        assert 0.04 <= intervals[len(intervals) // 2] <= 0.06
+        assert all(dt > 0.02 for dt in intervals)
+        assert stats['jitter_ms']['p95'] < 50
+    asyncio.run(run())
+
+
+def test_holds_slow_input_and_deadman():
+    """低频输入期间按最新值持续发送；超时无输入时归零，发送几次归零后停止发送"""
+    async def run():
+        recorder = Recorder()
+        rc = RCControlLoop(recorder, rate_hz=50, deadman_timeout=0.2)
+        rc.start()
+        await asyncio.sleep(0.05)
+        assert not recorder.sent and not rc.active
+
+        rc.update(30, 0, 0, 0)
+        await asyncio.sleep(0.15)
+        held = len(recorder.sent)
+        assert held >= 6 and set(recorder.values) == {(30, 0, 0, 0)}
+
+        await asyncio.sleep(0.3)
+        stats = rc.get_stats()
+        assert stats['deadman_trips'] == 1 and not rc.active
+        assert recorder.values[-NEUTRAL_REPEATS:] == [NEUTRAL] * NEUTRAL_REPEATS
+        assert recorder.values[-NEUTRAL_REPEATS - 1] == (30, 0, 0, 0)
+        count = len(recorder.sent)
+        await asyncio.sleep(0.1)
+        assert len(recorder.sent) == count
+
+        rc.neutral()
+        await asyncio.sleep(0.1)
+        assert recorder.values[count:] == [NEUTRAL] * NEUTRAL_REPEATS
+        await rc.stop()
+        assert not rc.is_running
+    asyncio.run(run())
+
+
+def test_configure_and_send_errors():
+    """频率限制在允许范围内；发送失败计数但不中断发送协程"""
+    async def run():
+        def broken(*sticks):
+            raise OSError('link down')
+
+        rc = RCControlLoop(broken, rate_hz=500)
+        assert rc.rate_hz == 50
+        rc.configure(rate_hz=1, deadman_timeout=0.01)
+        assert rc.rate_hz == 5 and rc.deadman_timeout == 0.05
+        rc.configure(rate_hz=40)
+        rc.start()
+        rc.update(0, 10, 0, 0)
+        await asyncio.sleep(0.1)
+        assert rc.is_running and rc.get_stats()['send_errors'] >= 3
+        await rc.stop()
+    asyncio.run(run())
+
+    assert clamp_sticks('12', -150, 3.7, 0) == (12, -100, 3, 0)
+
+
+def test_halt_sends_neutral():
+    """同步停止：归零后立即发送一次归零并取消发送协程，之后不再发送；未启动时什么都不做"""
+    async def run():
+        recorder = Recorder()
+        rc = RCControlLoop(recorder, rate_hz=50)
+        assert rc.halt() is None
+        rc.start()
+        rc.update(0, 40, 0, 0)
+        await asyncio.sleep(0.05)
+        count = len(recorder.sent)
+
+        rc.neutral()
+        task = rc.halt()
+        assert len(recorder.sent) == count + 1 and recorder.values[-1] == NEUTRAL
+        assert not rc.is_running and rc.sticks == NEUTRAL
+        await asyncio.sleep(0.05)
+        assert task.cancelled() and len(recorder.sent) == count + 1
+        await rc.stop()
+    asyncio.run(run())
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始rc控制发送器测试")
+    test_coalesces_fast_input()
+    test_holds_slow_input_and_deadman()
+    test_configure_and_send_errors()
+    test_halt_sends_neutral()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+悬停稳定检测测试
+验证容差窗口判定、仍在移动时不会误判、超时/取消，以及任务控制器在稳定后提前结束固定等待
+"""
+
+import threading
+import time
+
+from mission_controller import MissionController
+from settle_detector import SettleDetector
+from state_stream import StateStream
+
+
+def _packet(vgx=0, pitch=0, h=100, mid=3, x=0):
+    return {'vgx': vgx, 'vgy': 0, 'vgz': 0, 'pitch': pitch, 'roll': 0, 'h': h, 'mid': mid, 'x': x, 'y': 0, 'z': h}
+
+
+class HoveringDrone:
+    """发送状态包的模拟无人机：前 drift_seconds 秒仍在移动，之后悬停"""
+
+    def __init__(self, drift_seconds=0.3, packet_interval=0.02):
+        self.drift_seconds = drift_seconds
+        self.packet_interval = packet_interval
+        self.is_connected = True
+        self.is_flying = True
+        self.state_stream = StateStream()
+        self.settle_detector = SettleDetector(window=0.2)
+        self.state_stream.subscribe(self.settle_detector.on_state)
+        self.moved_at = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._send_packets, daemon=True)
+        self._thread.start()
+
+    def _send_packets(self):
+        while not self._stop.is_set():
+            moving = time.monotonic() - self.moved_at < self.drift_seconds
+            self.state_stream.publish(_packet(vgx=5 if moving else 0, x=20 if moving else 0))
+            time.sleep(self.packet_interval)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def pad_events_available(self):
+        return self.state_stream.age() < 1.0
+
+    def wait_settled(self, timeout=3.0, cancel=None):
+        return self.settle_detector.wait_settled(timeout=timeout, cancel=cancel)
+
+    def set_height(self, height):
+        self.moved_at = time.monotonic()
+        return True
+
+
+def test_window_and_tolerances():
+    """窗口内全部读数在容差内才算稳定；速度、姿态或任务垫坐标超差都会重新计时"""
+    detector = SettleDetector(window=0.2, min_samples=3)
+    for i in range(4):
+        detector.on_state(_packet(), i * 0.05)
+    assert not detector.is_settled()          # 只覆盖0.15秒
+    detector.on_state(_packet(), 0.25)
+    assert detector.is_settled()
+
+    detector.on_state(_packet(pitch=8), 0.3)
+    assert not detector.is_settled()
+    for i in range(7, 12):
+        detector.on_state(_packet(x=(i % 2) * 10), i * 0.05)
+    assert not detector.is_settled()          # 相对任务垫来回漂移10cm
+    for i in range(12, 18):
+        detector.on_state(_packet(mid=-1), i * 0.05)
+    assert detector.is_settled()              # 看不到任务垫时只看速度、姿态和高度
+
+
+def test_timeout_and_cancel():
+    """没有稳定的状态包时按最长等待时间返回；取消立即返回"""
+    detector = SettleDetector(window=0.2)
+    result = detector.wait_settled(timeout=0.1)
+    assert not result.settled and result.reason == 'timeout' and result.elapsed >= 0.1
+
+    start = time.monotonic()
+    result = detector.wait_settled(timeout=5.0, cancel=lambda: time.monotonic() - start > 0.1)
+    assert result.reason == 'cancelled' and result.elapsed < 0.5
+    assert detector.get_stats()['timeouts'] == 2
+
+
+def test_controller_settles_early():
+    """任务控制器在稳定后立即继续；状态流不可用时退回固定等待"""
+    drone = HoveringDrone(drift_seconds=0.3)
+    try:
+        controller = MissionController(drone)
+        drone.set_height(100)
+        waited = controller.settle(2)
+        assert 0.4 <= waited < 1.0
+        stats = controller.get_settle_stats()
+        assert stats['settled'] == 1 and stats['saved'] > 1.0
+    finally:
+        drone.close()
+
+    time.sleep(1.1)  # 状态包过期，回退到固定等待
+    assert not drone.pad_events_available
+    waited = controller.settle(0.2)
+    assert waited >= 0.2 and controller.get_settle_stats()['timeouts'] == 1
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始悬停稳定检测测试")
+    test_window_and_tolerances()
+    test_timeout_and_cancel()
+    test_controller_settles_early()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+状态包流与任务垫事件测试
+验证新状态包检测、连续N次看到的确认规则、截止时间与取消，以及任务控制器按事件等待任务垫
+"""
+
+import threading
+import time
+
+from mission_controller import MissionController
+from state_stream import MissionPadMonitor, StateStream
+
+
+class PacketDrone:
+    """以固定频率发送状态包的模拟无人机：旋转后一段时间内看到目标任务垫"""
+
+    def __init__(self, packet_interval=0.02, pad_after_rotations=2, pad_id=6):
+        self.packet_interval = packet_interval
+        self.pad_after_rotations = pad_after_rotations
+        self.target_pad = pad_id
+        self.rotations = 0
+        self.visible_pad = -1
+        self.is_connected = True
+        self.is_flying = True
+        self.state_stream = StateStream()
+        self.pad_monitor = MissionPadMonitor()
+        self.state_stream.subscribe(self.pad_monitor.on_state)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._send_packets, daemon=True)
+        self._thread.start()
+
+    def _send_packets(self):
+        while not self._stop.is_set():
+            self.state_stream.publish({'mid': self.visible_pad, 'x': 3, 'y': -2, 'z': 100})
+            time.sleep(self.packet_interval)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def pad_events_available(self):
+        return self.state_stream.age() < 1.0
+
+    @property
+    def mission_pad_id(self):
+        return self.pad_monitor.visible_pad()
+
+    def wait_for_pad(self, pad_id=None, timeout=10.0, sightings=2, cancel=None):
+        return self.pad_monitor.wait_for(pad_id, sightings=sightings, timeout=timeout, cancel=cancel)
+
+    def rotate(self, degrees):
+        self.rotations += 1
+        if self.rotations >= self.pad_after_rotations:
+            self.visible_pad = self.target_pad
+        return True
+
+
+def test_state_stream_detects_new_packets():
+    """只有新的状态包对象才会被发布"""
+    packets = [{'mid': -1}, {'mid': 2}, {'mid': 2}]
+    current = {'state': packets[0]}
+    received = []
+    stream = StateStream(lambda: current['state'], poll_interval=0.001)
+    stream.subscribe(lambda state, t: received.append(state))
+    stream.start()
+    try:
+        for packet in packets[1:]:
+            time.sleep(0.02)
+            current['state'] = packet
+        time.sleep(0.02)
+    finally:
+        stream.stop()
+    assert [id(p) for p in received] == [id(p) for p in packets]
+    assert not stream.running
+
+
+def test_consistent_sightings_and_deadline():
+    """要求连续N个包看到同一任务垫；闪现一次不算；超时与取消返回-1"""
+    monitor = MissionPadMonitor()
+    events = []
+    monitor.add_listener(events.append)
+
+    monitor.on_state({'mid': 4, 'x': 10, 'y': 5, 'z': 90}, time.monotonic())
+    monitor.on_state({'mid': -1}, time.monotonic())
+    monitor.on_state({'mid': 4, 'x': 11, 'y': 5, 'z': 90}, time.monotonic())
+    assert monitor.wait_for(4, sightings=2, timeout=0.05) == -1
+    monitor.on_state({'mid': 4, 'x': 12, 'y': 5, 'z': 90}, time.monotonic())
+    assert monitor.wait_for(4, sightings=2, timeout=0.05) == 4
+    assert monitor.wait_for(None, sightings=2, timeout=0.05) == 4
+    assert [e.pad_id for e in events] == [4, -1, 4] and events[0].x == 10
+
+    start = time.monotonic()
+    assert monitor.wait_for(7, timeout=5.0, cancel=lambda: time.monotonic() - start > 0.15) == -1
+    assert time.monotonic() - start < 0.5
+
+
+def test_controller_waits_on_pad_events():
+    """任务控制器在看到任务垫后立即返回，而不是每次旋转后固定等待2秒"""
+    drone = PacketDrone(pad_after_rotations=2)
+    try:
+        controller = MissionController(drone)
+        controller.set_required_sightings(3)
+
+        start = time.monotonic()
+        assert controller.find_pad_by_rotation(6)
+        elapsed = time.monotonic() - start
+        # 第一次旋转后等满2秒，第二次旋转后约3个状态包即确认
+        assert 2.0 <= elapsed < 2.5 and drone.rotations == 2
+        assert controller.last_pad_id == 6
+
+        start = time.monotonic()
+        assert controller.wait_for_pad(6, timeout=2)
+        assert time.monotonic() - start < 0.2
+        assert not controller.wait_for_pad(1, timeout=0.1)
+    finally:
+        drone.close()
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始状态包流与任务垫事件测试")
+    test_state_stream_detects_new_packets()
+    test_consistent_sightings_and_deadline()
+    test_controller_waits_on_pad_events()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
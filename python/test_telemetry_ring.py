@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+遥测环形缓冲测试
+验证状态包写入与快照、回绕后的时间窗口、并发读取时快照的一致性，以及Tello驱动从缓冲读取电量等状态
+"""
+
+import threading
+
+import numpy as np
+
+from async_tello import AsyncTello
+from flight_recorder import TELEMETRY_FIELDS
+from telemetry_ring import TelemetryRing
+
+
+def _packet(i):
+    return {'mid': 1, 'x': i, 'y': i, 'z': i, 'pitch': 0, 'roll': 0, 'yaw': i % 360, 'vgx': 0, 'vgy': 0,
+            'vgz': 0, 'templ': 60, 'temph': 62, 'tof': 100, 'h': 90, 'bat': 100 - i // 100,
+            'baro': 12.5, 'time': i // 10, 'mpry': '0,0,0'}
+
+
+def test_snapshot_and_window():
+    """快照类型与状态包一致；回绕后窗口按时间排序且只保留最近 capacity 个包"""
+    ring = TelemetryRing(capacity=50)
+    assert ring.snapshot() is None and ring.window().shape == (0, 1 + len(ring.fields))
+
+    for i in range(120):
+        ring.append(_packet(i), t=100 + i * 0.1)
+
+    snapshot = ring.snapshot()
+    assert snapshot['x'] == 119 and isinstance(snapshot['x'], int) and snapshot['baro'] == 12.5
+    assert snapshot['t'] == 100 + 119 * 0.1 and 'mpry' not in snapshot
+    assert ring.latest('bat') == 99 and ring.latest('agx', -1) == -1
+
+    rows = ring.window()
+    assert rows.shape == (50, 1 + len(ring.fields)) and np.all(np.diff(rows[:, 0]) > 0)
+    t, x = ring.series('x', seconds=1.0)
+    assert list(x) == list(range(109, 120)) and len(t) == 11
+    assert [r['x'] for r in ring.records(0.25)] == [117, 118, 119]
+    assert abs(ring.rate() - 10.0) < 0.01
+    assert ring.get_stats()['buffered'] == 50 and ring.count == 120
+
+
+def test_concurrent_readers_see_whole_packets():
+    """一个写线程高速写入时，读线程不加锁读取，快照和窗口中的每一行都来自同一个状态包"""
+    ring = TelemetryRing(capacity=64)
+    stop = threading.Event()
+    errors = []
+    reads = [0]
+
+    def reader():
+        while not stop.is_set():
+            snapshot = ring.snapshot()
+            if snapshot and not snapshot['x'] == snapshot['y'] == snapshot['z']:
+                errors.append(snapshot)
+            rows = ring.window(fields=['x', 'y', 'z'])
+            if len(rows) and not (np.all(rows[:, 1] == rows[:, 2]) and np.all(rows[:, 2] == rows[:, 3])
+                                  and np.all(np.diff(rows[:, 0]) > 0)):
+                errors.append(rows)
+            reads[0] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for i in range(20000):
+        ring.append(_packet(i), t=float(i))
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert not errors and reads[0] > 0
+    assert ring.snapshot()['x'] == 19999
+
+
+def test_driver_reads_from_ring():
+    """驱动收到状态包即写入缓冲；电量、高度、温度和记录仪所需字段都从快照读取"""
+    tello = AsyncTello(telemetry_capacity=100)
+    assert tello.get_battery() == -1 and tello.state_age() == float('inf')
+    for i in range(150):
+        tello._on_state(f'mid:{i % 8 + 1};x:{i};y:0;z:100;h:{80 + i % 5};bat:{90 - i // 50};'
+                        f'templ:60;temph:64;baro:1.5;\r\n'.encode())
+
+    assert tello.telemetry.count == 150 and len(tello.telemetry.window()) == 100
+    assert tello.get_battery() == 88 and tello.get_height() == 84
+    assert tello.get_temperature() == 62 and tello.get_mission_pad_id() == 6
+    assert tello.state_age() < 1.0
+    snapshot = tello.telemetry.snapshot()
+    assert all(key in snapshot for key in TELEMETRY_FIELDS)
+    assert tello.get_stats()['telemetry']['packets'] == 150
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始遥测环形缓冲测试")
+    test_snapshot_and_window()
+    test_concurrent_readers_see_whole_packets()
+    test_driver_reads_from_ring()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批量上传分析测试
+验证有界并发、批次内重复项标记、跨批次缓存复用、逐项进度与视频按间隔抽帧
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from upload_batch import KIND_VIDEO, MODE_COUNT, UploadBatchProcessor
+
+
+class CountingAnalyzer:
+    """记录调用次数与最大并发数的分析函数"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, frame):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return {'qr_codes': [{'id': int(frame[0, 0, 0])}], 'strawberries': 2,
+                'maturity': {'ripe': 1, 'unripe': 1}, 'detections': []}
+
+
+def _png(value):
+    frame = np.full((64, 64, 3), value, dtype=np.uint8)
+    return cv2.imencode('.png', frame)[1].tobytes()
+
+
+def test_image_batch_dedup_and_bound():
+    """重复图片只分析一次，并发不超过工作线程数，再次上传复用缓存"""
+    analyzer = CountingAnalyzer()
+    processor = UploadBatchProcessor(analyzer, workers=3, max_pending=4)
+    progress = []
+    batch = processor.begin(total=12, on_progress=lambda record, p: progress.append(p['done']))
+    for i in range(12):
+        batch.add_image(f"img_{i}.png", _png(i % 8))
+    batch.add_image("broken.png", b'not an image')
+    summary = processor.finish(batch.batch_id)
+
+    assert analyzer.calls == 8 and analyzer.max_active <= 3
+    assert summary['analyzed'] == 8 and summary['duplicates'] == 4 and summary['failed'] == 1
+    assert sorted(progress) == list(range(1, 14))
+    assert summary['strawberries'] == 16 and summary['maturity']['ripe'] == 8
+    assert summary['plants'] == {str(v): 2 for v in range(8)}
+    duplicate = next(r for r in summary['records'] if r['name'] == 'img_8.png')
+    assert duplicate['duplicate_of'] == 'img_0.png'
+
+    again = processor.begin()
+    again.add_image("same.png", _png(3))
+    summary = processor.finish(again.batch_id)
+    assert analyzer.calls == 8 and summary['cached'] == 1
+    assert summary['records'][0]['name'] == 'same.png'
+    processor.shutdown()
+
+
+def test_video_batch_stride():
+    """视频分块上传，按间隔抽帧，静止段的相同帧只分析一次"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'survey.avi')
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10.0, (64, 64))
+        for i in range(40):
+            writer.write(np.full((64, 64, 3), 0 if i < 20 else i * 5, dtype=np.uint8))
+        writer.release()
+        with open(path, 'rb') as f:
+            data = f.read()
+
+    analyzer = CountingAnalyzer(delay=0.0)
+    processor = UploadBatchProcessor(analyzer, workers=2, max_pending=2)
+    batch = processor.begin(kind=KIND_VIDEO, name='survey.avi', stride=4)
+    for start in range(0, len(data), 4096):
+        batch.add_video_chunk(data[start:start + 4096])
+    summary = processor.finish(batch.batch_id)
+
+    assert summary['done'] == 10
+    assert summary['duplicates'] == 4 and analyzer.calls == 6
+    assert [r['frame_index'] for r in sorted(summary['records'], key=lambda r: r['frame_index'])] == list(range(0, 40, 4))
+
+    repeat = processor.begin(kind=KIND_VIDEO, name='survey.avi', stride=4)
+    repeat.add_video_chunk(data)
+    summary = processor.finish(repeat.batch_id)
+    assert analyzer.calls == 6 and summary['cached'] == 10
+    processor.shutdown()
+
+
+def test_video_count_mode():
+    """计数模式把整段视频交给计数函数，同一视频与间隔的结果被缓存"""
+    calls = []
+
+    def count_video(path, stride, on_progress):
+        calls.append((os.path.exists(path), stride))
+        on_progress({'percent': 100.0})
+        return {'fruit': 3, 'plants': {'1': {'ripe': 3, 'total': 3}}}
+
+    processor = UploadBatchProcessor(CountingAnalyzer(), count_video=count_video)
+    progress = []
+    batch = processor.begin(kind=KIND_VIDEO, name='walk.mp4', stride=6, mode=MODE_COUNT,
+                            on_video_progress=progress.append)
+    batch.add_video_chunk(b'fake video bytes')
+    summary = processor.finish(batch.batch_id)
+    assert calls == [(True, 6)] and progress == [{'percent': 100.0}]
+    assert summary['video']['fruit'] == 3 and summary['mode'] == MODE_COUNT
+
+    repeat = processor.begin(kind=KIND_VIDEO, name='walk.mp4', stride=6, mode=MODE_COUNT)
+    repeat.add_video_chunk(b'fake video bytes')
+    assert processor.finish(repeat.batch_id)['video']['cached'] and len(calls) == 1
+    processor.shutdown()
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始批量上传分析测试")
+    test_image_batch_dedup_and_bound()
+    test_video_batch_stride()
+    test_video_count_mode()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
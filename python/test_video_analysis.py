@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+视频文件分析测试
+合成手持巡检视频（植株QR码 + 缓慢移动的草莓），用颜色检测代替YOLO，
+验证跳帧批量处理、跨帧跟踪只计数一次以及按植株归属
+"""
+
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from strawberry_maturity_analyzer import StrawberryDetection, StrawberryTracker
+from video_analysis import VideoFruitCounter
+
+
+FPS = 10.0
+
+
+class ColorBlobDetector:
+    """按颜色找圆形色块的检测器，接口与 StrawberryMaturityAnalyzer.detect_batch 一致"""
+
+    RANGES = {'ripe': ((0, 120, 80), (10, 255, 255)), 'unripe': ((45, 120, 80), (75, 255, 255))}
+
+    def __init__(self):
+        self.batches = []
+
+    def detect_batch(self, frames):
+        self.batches.append(len(frames))
+        results = []
+        for frame in frames:
+            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+            detections = []
+            for level, (low, high) in self.RANGES.items():
+                mask = cv2.inRange(hsv, np.array(low), np.array(high))
+                contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                for contour in contours:
+                    x, y, w, h = cv2.boundingRect(contour)
+                    if w * h < 50:
+                        continue
+                    detections.append(StrawberryDetection(
+                        bbox=(x, y, x + w, y + h), confidence=0.9, maturity_level=level,
+                        maturity_confidence=0.8, center=(x + w // 2, y + h // 2), area=w * h))
+            results.append(detections)
+        return results
+
+
+def _write_walkthrough(path):
+    """植株1：两颗成熟草莓；植株2：一颗未熟草莓；画面缓慢右移"""
+    encoder = cv2.QRCodeEncoder_create()
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), FPS, (480, 360))
+    for plant, fruits in ((1, [((0, 0, 220), 200, 90), ((0, 0, 220), 330, 260)]),
+                          (2, [((0, 200, 0), 260, 180)])):
+        qr = cv2.resize(encoder.encode(f"plant_{plant}"), (140, 140), interpolation=cv2.INTER_NEAREST)
+        for i in range(30):
+            frame = np.full((360, 480, 3), 255, dtype=np.uint8)
+            frame[20:160, 10:150] = cv2.cvtColor(qr, cv2.COLOR_GRAY2BGR)
+            for color, x, y in fruits:
+                cv2.circle(frame, (x + 2 * i, y), 18, color, -1)
+            writer.write(frame)
+    writer.release()
+
+
+def test_tracker_video_time():
+    """跟踪器使用调用方给出的时间：超时按视频时间计算"""
+    tracker = StrawberryTracker(track_timeout=1.0, distance_threshold=30, verbose=False)
+    det = lambda x: StrawberryDetection(bbox=(x, 0, x + 10, 10), confidence=0.9, maturity_level='ripe',
+                                        maturity_confidence=0.9, center=(x + 5, 5), area=100)
+    first = det(0)
+    tracker.update([first], 0.0)
+    second = det(10)
+    tracker.update([second], 0.5)
+    assert second.track_id == first.track_id
+    tracker.update([], 2.0)
+    assert tracker.active(2.0) == []
+    third = det(20)
+    tracker.update([third], 2.1)
+    assert third.track_id != first.track_id
+
+
+def test_count_walkthrough():
+    """跳帧 + 批量推理，每颗草莓只计一次并归属到对应植株"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'walk.avi')
+        _write_walkthrough(path)
+
+        detector = ColorBlobDetector()
+        progress = []
+        counter = VideoFruitCounter(detector, stride=3, batch_size=4, min_hits=2)
+        report = counter.analyze(path, on_progress=progress.append, progress_interval=0.0)
+        print(report.format())
+
+    assert report.frames_analyzed == 20
+    assert max(detector.batches) == 4 and sum(detector.batches) == 20
+    assert report.plants['1']['ripe'] == 2 and report.plants['1']['total'] == 2
+    assert report.plants['2']['unripe'] == 1 and report.plants['2']['total'] == 1
+    assert report.fruit == 3
+    assert progress and progress[-1]['frames_analyzed'] == 20
+    assert report.to_dict()['plants'] == report.plants
+
+
+def run_all_tests():
+    """运行全部测试"""
+    print("🧪 开始视频文件分析测试")
+    test_tracker_video_time()
+    test_count_walkthrough()
+    print("✅ 所有测试完成")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批量上传分析
+一次请求上传多张图片或一个视频：图片逐项到达即解码并交给有界工作池处理，视频分块写入临时文件后按间隔抽帧；
+相同内容（SHA-256）只分析一次，同一批次内的重复项直接标记，跨批次的重复项复用缓存结果。
+每项完成时回报进度，结果为紧凑记录（QR码、草莓数量、成熟度分布、检测框），不回传图片。
+视频也可使用计数模式（mode='count'）：跨帧跟踪，按植株统计草莓数量（见 video_analysis）
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from frame_source import iter_video_frames
+
+
+KIND_IMAGES = 'images'
+KIND_VIDEO = 'video'
+MODE_FRAMES = 'frames'
+MODE_COUNT = 'count'
+
+# 分析函数：输入BGR帧，返回可JSON序列化的紧凑结果
+AnalyzeFn = Callable[[np.ndarray], Dict[str, Any]]
+# 进度回调：(单项记录, 批次进度)
+ProgressFn = Callable[[Dict[str, Any], Dict[str, Any]], None]
+# 视频计数函数：(视频路径, 取帧间隔, 进度回调) -> 计数结果
+CountVideoFn = Callable[[str, int, Callable[[Dict[str, Any]], None]], Dict[str, Any]]
+
+
+class UploadBatch:
+    """一次批量上传的会话"""
+
+    def __init__(self, processor: 'UploadBatchProcessor', kind: str, name: str = '', total: Optional[int] = None,
+                 stride: int = 5, on_progress: Optional[ProgressFn] = None, batch_id: Optional[str] = None,
+                 mode: str = MODE_FRAMES, on_video_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.processor = processor
+        self.batch_id = batch_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.mode = mode
+        self.on_video_progress = on_video_progress
+        self.video_result: Optional[Dict[str, Any]] = None
+        self.name = name
+        self.total = total
+        self.stride = max(1, int(stride))
+        self.on_progress = on_progress
+        self.started = time.time()
+
+        self.records: List[Dict[str, Any]] = []
+        self.counts = {'received': 0, 'analyzed': 0, 'duplicates': 0, 'cached': 0, 'failed': 0}
+        self._seen: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._idle = threading.Condition(self._lock)
+        self._video_file = None
+        self._video_path = None
+        self._video_hash = hashlib.sha256() if kind == KIND_VIDEO else None
+
+    def add_image(self, name: str, data: bytes):
+        """提交一张图片（编码后的字节），工作池满时阻塞直到有空位"""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self.counts['received'] += 1
+            first = self._seen.get(digest)
+            if first is None:
+                self._seen[digest] = name
+        if first is not None:
+            self._finish_item({'name': name, 'hash': digest[:16], 'status': 'duplicate', 'duplicate_of': first})
+            return
+        cached = self.processor.cached(digest)
+        if cached is not None:
+            self._finish_item(dict(cached, name=name, cached=True))
+            return
+        self._submit(self._analyze_image, name, digest, data)
+
+    def add_video_chunk(self, data: bytes):
+        """追加视频数据块（按顺序）"""
+        if self._video_file is None:
+            suffix = os.path.splitext(self.name)[1] or '.mp4'
+            self._video_file = tempfile.NamedTemporaryFile(prefix='upload_', suffix=suffix, delete=False)
+            self._video_path = self._video_file.name
+        self._video_file.write(data)
+        self._video_hash.update(data)
+
+    def finish(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """结束上传：视频在此时抽帧分析；等待所有项完成后返回批次汇总"""
+        if self.kind == KIND_VIDEO:
+            self._process_video()
+        with self._idle:
+            self._idle.wait_for(lambda: self._outstanding == 0, timeout=timeout)
+        return self.summary()
+
+    def _process_video(self):
+        if self._video_file is None:
+            raise ValueError("未收到视频数据")
+        self._video_file.close()
+        digest = self._video_hash.hexdigest()
+        try:
+            if self.mode == MODE_COUNT:
+                self._count_video(digest)
+                return
+            cached = self.processor.cached(digest)
+            if cached is not None:
+                # 同一视频再次上传：直接复用上次的逐帧记录
+                with self._lock:
+                    self.counts['received'] += len(cached['frames'])
+                for record in cached['frames']:
+                    self._finish_item(dict(record, cached=True))
+                return
+            for source_frame in iter_video_frames(self._video_path, stride=self.stride):
+                # 静止镜头的完全相同帧只分析一次
+                frame_digest = hashlib.sha256(source_frame.frame.tobytes()).hexdigest()
+                name = f"{self.name}#{source_frame.index}"
+                with self._lock:
+                    self.counts['received'] += 1
+                    first = self._seen.get(frame_digest)
+                    if first is None:
+                        self._seen[frame_digest] = name
+                if first is not None:
+                    self._finish_item({'name': name, 'frame_index': source_frame.index,
+                                       'timestamp': round(source_frame.timestamp, 3),
+                                       'status': 'duplicate', 'duplicate_of': first})
+                    continue
+                self._submit(self._analyze_video_frame, name, source_frame.index,
+                             source_frame.timestamp, source_frame.frame)
+            with self._idle:
+                self._idle.wait_for(lambda: self._outstanding == 0)
+            frames = [r for r in self.records if r.get('status') in ('ok', 'duplicate')]
+            self.processor.remember(digest, {'frames': frames})
+        finally:
+            os.remove(self._video_path)
+
+    def _count_video(self, digest: str):
+        """计数模式：整段视频跟踪计数，结果按 (内容哈希, 取帧间隔) 缓存"""
+        if self.processor.count_video is None:
+            raise ValueError("视频计数不可用")
+        key = f"{digest}:count:{self.stride}"
+        cached = self.processor.cached(key)
+        if cached is not None:
+            self.video_result = dict(cached, cached=True)
+            return
+        self.video_result = self.processor.count_video(self._video_path, self.stride,
+                                                       self.on_video_progress or (lambda progress: None))
+        self.processor.remember(key, self.video_result)
+
+    def _submit(self, fn, *args):
+        self.processor.acquire_slot()
+        with self._lock:
+            self._outstanding += 1
+        try:
+            self.processor.executor.submit(self._run, fn, *args)
+        except Exception:
+            self.processor.release_slot()
+            with self._idle:
+                self._outstanding -= 1
+            raise
+
+    def _run(self, fn, *args):
+        try:
+            record = fn(*args)
+        except Exception as e:
+            record = {'name': args[0], 'status': 'error', 'message': str(e)}
+        finally:
+            self.processor.release_slot()
+        self._finish_item(record, outstanding=True)
+
+    def _analyze_image(self, name: str, digest: str, data: bytes) -> Dict[str, Any]:
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("图片解码失败")
+        record = {'hash': digest[:16], 'status': 'ok', 'width': frame.shape[1], 'height': frame.shape[0]}
+        record.update(self.processor.analyze(frame))
+        self.processor.remember(digest, record)
+        return dict(record, name=name)
+
+    def _analyze_video_frame(self, name: str, index: int, timestamp: float, frame: np.ndarray) -> Dict[str, Any]:
+        record = {'name': name, 'frame_index': index, 'timestamp': round(timestamp, 3), 'status': 'ok'}
+        record.update(self.processor.analyze(frame))
+        return record
+
+    def _finish_item(self, record: Dict[str, Any], outstanding: bool = False):
+        status = record.get('status')
+        with self._idle:
+            self.records.append(record)
+            if record.get('cached'):
+                self.counts['cached'] += 1
+            elif status == 'ok':
+                self.counts['analyzed'] += 1
+            elif status == 'duplicate':
+                self.counts['duplicates'] += 1
+            else:
+                self.counts['failed'] += 1
+            if outstanding:
+                self._outstanding -= 1
+                self._idle.notify_all()
+            progress = self.progress()
+        if self.on_progress:
+            try:
+                self.on_progress(record, progress)
+            except Exception as e:
+                print(f"⚠️ 上传进度回调失败: {e}")
+
+    def progress(self) -> Dict[str, Any]:
+        done = len(self.records)
+        return {
+            'batch_id': self.batch_id,
+            'done': done,
+            'total': self.total if self.total is not None else self.counts['received'],
+            **self.counts
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """批次汇总：各植株草莓数与成熟度合计"""
+        plants: Dict[str, int] = {}
+        maturity = {'ripe': 0, 'semi_ripe': 0, 'unripe': 0, 'unknown': 0}
+        strawberries = 0
+        for record in self.records:
+            if record.get('status') != 'ok':
+                continue
+            strawberries += record.get('strawberries', 0)
+            for level, count in record.get('maturity', {}).items():
+                maturity[level] = maturity.get(level, 0) + count
+            for code in record.get('qr_codes', []):
+                key = str(code['id'])
+                plants[key] = max(plants.get(key, 0), record.get('strawberries', 0))
+        return {
+            **self.progress(),
+            'kind': self.kind,
+            'mode': self.mode,
+            'video': self.video_result,
+            'name': self.name,
+            'elapsed': round(time.time() - self.started, 2),
+            'strawberries': strawberries,
+            'maturity': maturity,
+            'plants': plants,
+            'records': self.records
+        }
+
+    def discard(self):
+        """放弃未结束的上传（连接断开时），删除临时视频"""
+        if self._video_file is not None:
+            self._video_file.close()
+            if os.path.exists(self._video_path):
+                os.remove(self._video_path)
+
+
+class UploadBatchProcessor:
+    """批量上传的有界工作池与内容哈希结果缓存"""
+
+    def __init__(self, analyze: AnalyzeFn, workers: int = 4, max_pending: int = 16, cache_size: int = 2000,
+                 count_video: Optional[CountVideoFn] = None):
+        """
+        Args:
+            analyze: 单帧分析函数
+            count_video: 视频计数函数（计数模式使用）
+            workers: 工作线程数
+            max_pending: 已提交未完成的最大项数，超出时提交方阻塞（图片解码前只保留压缩字节）
+            cache_size: 按内容哈希缓存的结果数
+        """
+        self.analyze = analyze
+        self.count_video = count_video
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._batches: Dict[str, UploadBatch] = {}
+        self.stats = {'batches': 0, 'items': 0, 'cache_hits': 0, 'rejected': 0}
+
+    def begin(self, kind: str = KIND_IMAGES, name: str = '', total: Optional[int] = None, stride: int = 5,
+              on_progress: Optional[ProgressFn] = None, batch_id: Optional[str] = None, mode: str = MODE_FRAMES,
+              on_video_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> UploadBatch:
+        """开始一个批次"""
+        if kind not in (KIND_IMAGES, KIND_VIDEO):
+            raise ValueError(f"未知的上传类型: {kind}")
+        if mode not in (MODE_FRAMES, MODE_COUNT) or (mode == MODE_COUNT and kind != KIND_VIDEO):
+            raise ValueError(f"未知的分析模式: {mode}")
+        batch = UploadBatch(self, kind, name=name, total=total, stride=stride, on_progress=on_progress,
+                            batch_id=batch_id, mode=mode, on_video_progress=on_video_progress)
+        self._batches[batch.batch_id] = batch
+        self.stats['batches'] += 1
+        return batch
+
+    def get(self, batch_id: str) -> Optional[UploadBatch]:
+        return self._batches.get(batch_id)
+
+    def finish(self, batch_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """结束批次并返回汇总"""
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            raise KeyError(batch_id)
+        try:
+            summary = batch.finish(timeout=timeout)
+        finally:
+            self._batches.pop(batch_id, None)
+        self.stats['items'] += summary['done']
+        return summary
+
+    def discard(self, batch_id: str):
+        batch = self._batches.pop(batch_id, None)
+        if batch is not None:
+            batch.discard()
+
+    def try_submit(self, fn, *args) -> bool:
+        """不阻塞地提交单个任务（单帧上传），工作池已满时返回False"""
+        if not self._slots.acquire(blocking=False):
+            self.stats['rejected'] += 1
+            return False
+
+        def run():
+            try:
+                fn(*args)
+            finally:
+                self._slots.release()
+        self.executor.submit(run)
+        return True
+
+    def acquire_slot(self):
+        self._slots.acquire()
+
+    def release_slot(self):
+        self._slots.release()
+
+    def cached(self, digest: str) -> Optional[Dict[str, Any]]:
+        with self._cache_lock:
+            record = self._cache.get(digest)
+            if record is not None:
+                self._cache.move_to_end(digest)
+                self.stats['cache_hits'] += 1
+            return record
+
+    def remember(self, digest: str, record: Dict[str, Any]):
+        with self._cache_lock:
+            self._cache[digest] = record
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def shutdown(self):
+        for batch_id in list(self._batches):
+            self.discard(batch_id)
+        self.executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['active_batches'] = len(self._batches)
+        stats['cached_results'] = len(self._cache)
+        return stats
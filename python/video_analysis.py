@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+视频文件分析（手持巡检视频 → 各植株草莓成熟度计数）
+后台线程每N帧解码一帧（跳过的帧只grab不解码），主线程按批送入YOLO推理；
+跟踪以视频时间为准，同一颗草莓跨帧只计一次，按多数帧的成熟度归类，归属到最近识别到QR码的植株
+
+用法:
+    python video_analysis.py greenhouse_walk.mp4 --stride 6 --batch 8
+"""
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+import cv2
+
+from detection_utils import DEFAULT_MODEL_PATH, detect_plant_qr_codes
+from frame_source import iter_video_frames
+from strawberry_maturity_analyzer import StrawberryTracker
+
+
+MATURITY_LEVELS = ('ripe', 'semi_ripe', 'unripe', 'unknown')
+UNASSIGNED = 'unassigned'
+
+
+@dataclass
+class VideoAnalysisReport:
+    """一次视频分析的结果"""
+    video: str
+    stride: int
+    frames_analyzed: int = 0
+    duration: float = 0.0
+    wall_seconds: float = 0.0
+    plants: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    stage_seconds: Dict[str, float] = field(default_factory=lambda: {'decode_wait': 0.0, 'qr': 0.0, 'yolo': 0.0})
+
+    @property
+    def realtime_factor(self) -> float:
+        """视频时长 / 处理耗时"""
+        return self.duration / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    @property
+    def fruit(self) -> int:
+        return sum(counts['total'] for counts in self.plants.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'video': os.path.basename(self.video),
+            'stride': self.stride,
+            'frames_analyzed': self.frames_analyzed,
+            'duration': round(self.duration, 2),
+            'wall_seconds': round(self.wall_seconds, 2),
+            'realtime_factor': round(self.realtime_factor, 2),
+            'fruit': self.fruit,
+            'plants': self.plants,
+            'stage_seconds': {k: round(v, 3) for k, v in self.stage_seconds.items()}
+        }
+
+    def format(self) -> str:
+        lines = [f"✅ {os.path.basename(self.video)}: 视频 {self.duration:.1f}s，分析 {self.frames_analyzed} 帧，"
+                 f"耗时 {self.wall_seconds:.1f}s（{self.realtime_factor:.1f}x 实时），草莓 {self.fruit} 个"]
+        for plant, counts in self.plants.items():
+            lines.append(f"   - 植株 {plant}: 成熟 {counts['ripe']}，半熟 {counts['semi_ripe']}，"
+                         f"未熟 {counts['unripe']}，未知 {counts['unknown']}")
+        return '\n'.join(lines)
+
+
+class VideoFruitCounter:
+    """视频文件的草莓计数"""
+
+    def __init__(self, analyzer, stride: int = 5, batch_size: int = 8, attach_seconds: float = 2.0,
+                 match_distance: Optional[float] = None, min_hits: int = 1, model_lock=None):
+        """
+        Args:
+            analyzer: 提供 detect_batch(frames) 的检测器（StrawberryMaturityAnalyzer）
+            stride: 每N帧分析一帧
+            batch_size: 每批推理的帧数
+            attach_seconds: 没有QR码的帧归属到此时间内最近识别到的植株
+            match_distance: 跟踪匹配的像素距离，默认按画面尺寸与取帧间隔放大
+            min_hits: 被计数的草莓至少出现的帧数（过滤单帧误检）
+            model_lock: 与其他线程共享检测模型时的推理锁
+        """
+        self.analyzer = analyzer
+        self.stride = max(1, int(stride))
+        self.batch_size = max(1, int(batch_size))
+        self.attach_seconds = attach_seconds
+        self.match_distance = match_distance
+        self.min_hits = max(1, int(min_hits))
+        self.model_lock = model_lock or threading.Lock()
+
+    def analyze(self, video_path: str, on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                progress_interval: float = 1.0) -> VideoAnalysisReport:
+        """分析视频，按 progress_interval 秒回报一次进度"""
+        capture = cv2.VideoCapture(video_path)
+        if not capture.isOpened():
+            raise IOError(f"无法打开视频: {video_path}")
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH) or 960)
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT) or 720)
+        capture.release()
+
+        report = VideoAnalysisReport(video=video_path, stride=self.stride, duration=total_frames / fps)
+        # 取帧间隔越大，相邻分析帧之间草莓在画面中移动越远
+        sample_gap = self.stride / fps
+        distance = self.match_distance or 0.06 * max(width, height) * min(self.stride, 4) ** 0.5
+        tracker = StrawberryTracker(track_timeout=max(2.0, 3 * sample_gap), distance_threshold=distance,
+                                    verbose=False)
+
+        # 解码与推理并行：解码线程预取帧到有界队列
+        frames_queue: 'queue.Queue' = queue.Queue(maxsize=self.batch_size * 2)
+        stop_event = threading.Event()
+        decode_error = []
+
+        def decode():
+            try:
+                for source_frame in iter_video_frames(video_path, stride=self.stride):
+                    while not stop_event.is_set():
+                        try:
+                            frames_queue.put(source_frame, timeout=0.2)
+                            break
+                        except queue.Full:
+                            continue
+                    if stop_event.is_set():
+                        return
+            except Exception as e:
+                decode_error.append(e)
+            finally:
+                while not stop_event.is_set():
+                    try:
+                        frames_queue.put(None, timeout=0.2)
+                        break
+                    except queue.Full:
+                        continue
+
+        decoder = threading.Thread(target=decode, daemon=True, name="video-decode")
+        started = time.perf_counter()
+        decoder.start()
+
+        tracks: Dict[str, Dict[str, Any]] = {}
+        last_plant, last_plant_time = None, None
+        last_progress = started
+        finished = False
+        try:
+            while not finished:
+                batch = []
+                wait_start = time.perf_counter()
+                while len(batch) < self.batch_size:
+                    source_frame = frames_queue.get()
+                    if source_frame is None:
+                        finished = True
+                        break
+                    batch.append(source_frame)
+                report.stage_seconds['decode_wait'] += time.perf_counter() - wait_start
+                if not batch:
+                    break
+
+                start = time.perf_counter()
+                qr_per_frame = [detect_plant_qr_codes(f.frame) for f in batch]
+                report.stage_seconds['qr'] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                with self.model_lock:
+                    detections_per_frame = self.analyzer.detect_batch([f.frame for f in batch])
+                report.stage_seconds['yolo'] += time.perf_counter() - start
+
+                for source_frame, qr_codes, detections in zip(batch, qr_per_frame, detections_per_frame):
+                    t = source_frame.timestamp
+                    if qr_codes:
+                        last_plant, last_plant_time = qr_codes[-1]['id'], t
+                    plant = last_plant if last_plant is not None and t - last_plant_time <= self.attach_seconds else None
+
+                    tracker.update(detections, t)
+                    for det in detections:
+                        track = tracks.setdefault(det.track_id, {'plants': Counter(), 'maturity': Counter(), 'hits': 0})
+                        track['hits'] += 1
+                        track['maturity'][det.maturity_level] += 1
+                        if plant is not None:
+                            track['plants'][plant] += 1
+                    report.frames_analyzed += 1
+
+                now = time.perf_counter()
+                if on_progress and (now - last_progress >= progress_interval or finished):
+                    last_progress = now
+                    position = batch[-1].timestamp
+                    elapsed = now - started
+                    on_progress({
+                        'frames_analyzed': report.frames_analyzed,
+                        'position': round(position, 2),
+                        'duration': round(report.duration, 2),
+                        'percent': round(min(100.0, position / report.duration * 100), 1) if report.duration else 0.0,
+                        'realtime_factor': round(position / elapsed, 2) if elapsed > 0 else 0.0,
+                        'fruit': sum(1 for track in tracks.values() if track['hits'] >= self.min_hits)
+                    })
+        finally:
+            stop_event.set()
+            decoder.join(timeout=5.0)
+        if decode_error:
+            raise decode_error[0]
+
+        report.wall_seconds = time.perf_counter() - started
+        report.plants = self._count(tracks)
+        return report
+
+    def _count(self, tracks: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+        """每个跟踪计一颗草莓：成熟度取多数帧的结果，植株取多数帧的归属"""
+        plants: Dict[str, Dict[str, int]] = {}
+        for track in tracks.values():
+            if track['hits'] < self.min_hits:
+                continue
+            plant = str(track['plants'].most_common(1)[0][0]) if track['plants'] else UNASSIGNED
+            maturity = track['maturity'].most_common(1)[0][0]
+            counts = plants.setdefault(plant, {**{level: 0 for level in MATURITY_LEVELS}, 'total': 0})
+            counts[maturity if maturity in counts else 'unknown'] += 1
+            counts['total'] += 1
+        return dict(sorted(plants.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='视频文件草莓成熟度计数')
+    parser.add_argument('video', help='视频文件路径')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help='草莓检测模型路径')
+    parser.add_argument('--stride', type=int, default=5, help='每N帧分析一帧')
+    parser.add_argument('--batch', type=int, default=8, help='每批推理的帧数')
+    parser.add_argument('--min-hits', type=int, default=2, help='草莓至少出现的帧数')
+    args = parser.parse_args(argv)
+
+    from strawberry_maturity_analyzer import StrawberryMaturityAnalyzer
+    analyzer = StrawberryMaturityAnalyzer(args.model)
+    if analyzer.model is None:
+        print("❌ 草莓检测模型不可用")
+        return 1
+
+    counter = VideoFruitCounter(analyzer, stride=args.stride, batch_size=args.batch, min_hits=args.min_hits)
+    report = counter.analyze(args.video, on_progress=lambda p: print(
+        f"⏳ {p['percent']:5.1f}% ({p['position']:.1f}/{p['duration']:.1f}s，{p['realtime_factor']:.1f}x 实时)，"
+        f"草莓 {p['fruit']} 个"))
+    print(report.format())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())